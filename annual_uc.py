@@ -0,0 +1,156 @@
+#   Annual (8760-hour) unit commitment in monthly blocks
+#
+#   Author: Paul Kerl (paul.kerl@gatech.edu)
+#
+#   A full year is out of reach as one MIP, but its months are only linked by
+#   the commitment and generation carried over from one month into the next.
+#   The horizon is split into one block per (year, month) of the grid, and
+#   the blocks are solved in parallel worker processes in two passes:
+#     overlap pass: a short window around each boundary between consecutive
+#                   months (the last overlap_days of one month and the first
+#                   overlap_days of the next, linked across the boundary) is
+#                   solved, and its state in the last hour of the earlier
+#                   month becomes the boundary state
+#     block pass:   each month is solved starting from the boundary state
+#                   before it, with its last hour fixed to the boundary state
+#                   after it, so the stitched blocks are one feasible annual
+#                   schedule
+#   With minimum up/down times (tight formulation) the boundary state also
+#   holds the commitment, startups and shutdowns of the earlier month's last
+#   hours that those rows reach, and the block before the boundary fixes
+#   its commitment in these hours too.
+#   A year then takes about the wall time of its longest month plus one
+#   short window.
+#
+import calendar
+import multiprocessing
+import numpy as np
+import matrix_build
+import rolling_horizon
+
+
+########    annual result   ########
+#stitched (plants x hours) solution arrays over the full horizon
+class AnnualResult:
+    def __init__(self, on, start, shutdown, gen, obj_val, optimal,
+                 num_blocks, num_boundaries):
+        self.on = on
+        self.start = start
+        self.shutdown = shutdown
+        self.gen = gen
+        self.obj_val = obj_val
+        self.optimal = optimal #every block solved to optimality (MIPGap)
+        self.num_blocks = num_blocks
+        self.num_boundaries = num_boundaries #linked month boundaries
+    def __str__(self):
+        return "Annual: %d monthly blocks, %d linked boundaries, objective " \
+            "$%s" % (self.num_blocks, self.num_boundaries,
+                     '{0:,.2f}'.format(self.obj_val))
+
+
+#####################################
+########       Blocks        ########
+#####################################
+
+_coeffs = None #UCCoefficients of the full horizon, set once in each worker
+_params = None #solver parameters of the block and window models
+_solver = None #solver backend
+
+
+def _init_worker(c, params, solver):
+    global _coeffs, _params, _solver
+    _coeffs = c
+    _params = params
+    _solver = solver
+
+
+#day keys of the grid of c split into (year, month) blocks, in order, and
+#for each pair of consecutive blocks whether they are consecutive in the
+#calendar (the first block ends on its month's last day and the second
+#starts on the first day of the next month), the years counted from
+#start_year
+def month_blocks(c, start_year):
+    blocks = []
+    for key in c.grid.day_keys:
+        if blocks and blocks[-1][-1][:2] == key[:2]:
+            blocks[-1].append(key)
+        else:
+            blocks.append([key])
+    linked = []
+    for before, after in zip(blocks[:-1], blocks[1:]):
+        t, m, d = before[-1]
+        following = (t + 1, 1, 1) if m == 12 else (t, m + 1, 1)
+        linked.append(d == calendar.monthrange(start_year + t, m)[1] and
+                      after[0] == following)
+    return blocks, linked
+
+
+#state in the last hour of the days before, solved over the window of the
+#days before and after the boundary b: the initial conditions of the block
+#after it (see rolling_horizon.initial_state) and the final state of the
+#block before it, its commitment over the hours of the history
+def _solve_overlap(args):
+    b, before, after = args
+    sub, idx = _coeffs.subset(before + after, link_months=True)
+    values, solution = rolling_horizon.solve_window(
+        sub, None, _params, "uc_overlap_%s" % b, _solver)
+    k = len(before) * len(sub.grid.hours) - 1
+    initial = rolling_horizon.initial_state(sub, k, *values)
+    history = sub.grid.linked_hours(
+        k, matrix_build.history_hours(sub) + 1)
+    return b, (initial, (values[0][:, history], values[3][:, k]))
+
+
+#solve block b over its days from the initial to the final state, returns
+#its hours' positions in the full grid and their solution arrays
+def _solve_block(args):
+    b, days, initial, final = args
+    sub, idx = _coeffs.subset(days)
+    if initial is not None:
+        initial = initial[0] #initial conditions of the block after it
+    if final is not None:
+        final = final[1] #final state of the block before it
+    values, solution = rolling_horizon.solve_window(
+        sub, initial, _params, "uc_month_%s" % b, _solver, final)
+    return b, idx, values, solution.optimal, solution.status
+
+
+#solve the horizon of c (years counted from start_year) month by month over
+#workers processes (None uses every core), the months linked by the
+#boundary states of overlap windows of overlap_days on each side
+def solve_annual(c, start_year, overlap_days=1, workers=None, params=None,
+                 solver="gurobi"):
+    if overlap_days < 1:
+        raise Exception("Annual error, overlap of %s days" % overlap_days)
+    #the workers' solves run side by side, without a shared log file
+    params = dict(params or {})
+    params.pop("LogFile", None)
+    params["OutputFlag"] = 0
+    blocks, linked = month_blocks(c, start_year)
+    shape = (len(c.pp), c.grid.num_hours)
+    on, start, shutdown, gen = [np.zeros(shape) for _ in range(4)]
+
+    pool = multiprocessing.Pool(workers, _init_worker, (c, params, solver))
+    try:
+        windows = [(b, blocks[b][-overlap_days:], blocks[b + 1][:overlap_days])
+                   for b in range(len(linked)) if linked[b]]
+        boundary = dict(pool.map(_solve_overlap, windows, chunksize=1))
+        results = pool.map(_solve_block,
+                           [(b, days, boundary.get(b - 1), boundary.get(b))
+                            for b, days in enumerate(blocks)], chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+    optimal = True
+    for b, idx, values, block_optimal, status in results:
+        for full, part in zip((on, start, shutdown, gen), values):
+            full[:, idx] = part
+        optimal = optimal and block_optimal
+        print "Block %d of %d (year %s, month %s, %d days), status %s" % \
+            (b + 1, len(blocks), start_year + blocks[b][0][0],
+             blocks[b][0][1], len(blocks[b]), status)
+
+    return AnnualResult(on, start, shutdown, gen,
+                        c.objective_value(on, start, shutdown, gen),
+                        optimal, len(blocks), len(boundary))
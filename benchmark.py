@@ -0,0 +1,320 @@
+#!/opt/python/bin/python2.7
+# above line for condor direct execution if need be via condor/isye
+
+#   Build and solve benchmarks on synthetic instances
+#
+#   Author: Paul Kerl (paul.kerl@gatech.edu)
+#
+#   Arguments, all optional, in order: plant counts (comma separated,
+#                        100,500,1000 by default), number of days, months
+#                        (comma separated, of 1 and 7), number of years,
+#                        the fuel mix (comma separated PLFUELCT:share pairs)
+#                        and the solver backends (comma separated, gurobi by
+#                        default, see solver_backend)
+#
+#   e.g. benchmark.py 100,500,1000 3 7 1 COAL:0.3,GAS:0.5,NUCLEAR:0.2 \
+#                     gurobi,highs
+#
+#   For each plant count a synthetic instance shaped like the real input
+#   files (plant_info.csv with the fuel mix of plant types, the cost tables,
+#   load curves following the instance's capacity and the health cost files
+#   of January and July) is generated under data/benchmark/, and the unit
+#   commitment and capacity planning models are run on it with each solver
+#   backend, each in a fresh process, with the phase timer on (see
+#   phase_timer): reading the inputs, setting up, building (coefficient
+#   matrices, variables, constraints), solving, extracting and writing the
+#   results. The model sizes, the solver
+#   statistics, the time and CPU time of every phase and the peak memory of
+#   each run go to a JSON report in data/output/ for tracking regressions
+#   and comparing the backends.
+#
+import os
+import csv
+import json
+import time
+import random
+import datetime
+import multiprocessing
+from sys import argv #to unpack arguments
+import phase_timer
+import run_report
+import solver_backend
+import unit_commitment as uc
+import capacity_planning as cp
+
+################################# CONSTANTS ###################################
+
+#default arguments
+plant_counts = [100, 500, 1000]
+num_days = 3
+months = [7]
+num_years = 1
+fuel_mix = {"COAL": 0.2, "GAS": 0.4, "OIL": 0.1, "NUCLEAR": 0.05,
+            "HYDRO": 0.15, "BIOMASS": 0.1}
+
+#models run on every instance, with every solver backend (see
+#solver_backend)
+models = ["UC", "CP"]
+solvers = ["gurobi"]
+
+#time limit of each solve, in seconds
+time_limit = 600
+
+#instances and report
+benchmark_dir = "data/benchmark/"
+seed = 2007
+
+#plant shapes by PLFUELCT: PLPRMFL fuel code, nameplate capacity range (MW),
+#capacity factor, minimum power (share of capacity)
+plant_shapes = {"COAL": ("BIT", (200, 1800), 0.85, 0.35),
+                "GAS": ("NG", (50, 800), 0.95, 0.2),
+                "OIL": ("DFO", (20, 300), 0.9, 0.05),
+                "NUCLEAR": ("NUC", (1000, 2300), 0.95, 0.8),
+                "HYDRO": ("WAT", (20, 400), 0.5, 0.0),
+                "BIOMASS": ("WDS", (10, 100), 0.8, 0.3)}
+
+#share of the emitting plants with their own health cost file (the others use
+#the north / south Georgia files)
+own_hc_share = 0.2
+
+#peak load as a share of the available capacity
+peak_load_share = 0.6
+
+################################ END CONSTANTS ################################
+
+
+#####################################
+########      Generator      ########
+#####################################
+
+#write a synthetic instance of num_plants plants under directory, in the
+#layout load_inputs of both models reads
+def generate_instance(directory, num_plants, mix, rnd):
+    for sub in ("data/hc_data_so4", "data/lc_data", "data/output",
+                "logs/gurobi_logs"):
+        if not os.path.isdir(os.path.join(directory, sub)):
+            os.makedirs(os.path.join(directory, sub))
+
+    #cost tables, by year and fuel code
+    fuels = [uc.pp_fuel_types[i] for i in sorted(uc.pp_fuel_types)]
+    for name, base in (("var_costs", 3.0), ("fuel_costs", 20.0),
+                       ("startup_costs", 50.0)):
+        with open(os.path.join(directory, "data", name + ".csv"), 'wb') as f:
+            w = csv.writer(f)
+            w.writerow(["YEAR"] + fuels)
+            for year in range(2004, 2014):
+                w.writerow([year] + [round(base * rnd.uniform(0.5, 2.0) *
+                                           (1 + 0.02 * (year - 2004)), 3)
+                                     for fuel in fuels])
+
+    #plants, their types drawn by the fuel mix
+    total = float(sum(mix.values()))
+    types = sorted(mix)
+    plants = []
+    for i in range(num_plants):
+        r, pp_type = rnd.random() * total, types[-1]
+        for t in types:
+            r -= mix[t]
+            if r < 0:
+                pp_type = t
+                break
+        fuel, (low, high), cap_factor, min_power = plant_shapes[pp_type]
+        plants.append({"PNAME": "Plant %04d %s" % (i, pp_type.title()),
+                       "PLFUELCT": pp_type, "ORIS": str(10000 + i),
+                       "PLPRMFL": fuel, "INC_COST": 1000, "DEC_COST": 500,
+                       "NAMEPCAP": round(rnd.uniform(low, high), 1),
+                       "CAPFAC_FIXED": cap_factor,
+                       "LAT": round(rnd.uniform(30.7, 34.9), 4),
+                       "LON": round(rnd.uniform(-85.6, -81.0), 4),
+                       "MIN_POW": min_power, "FIXED_COST": 30000,
+                       "FIXED_COST_PCT": 35000, "FIXED_COST_FS": 32000,
+                       "FUEL_COST_2004": round(rnd.uniform(15, 40), 2),
+                       "VAR_OM": round(rnd.uniform(1, 6), 2)})
+    header = ["PNAME", "PLFUELCT", "ORIS", "PLPRMFL", "INC_COST", "DEC_COST",
+              "NAMEPCAP", "CAPFAC_FIXED", "LAT", "LON", "MIN_POW",
+              "FIXED_COST", "FIXED_COST_PCT", "FIXED_COST_FS",
+              "FUEL_COST_2004", "VAR_OM"]
+    with open(os.path.join(directory, "data/plant_info.csv"), 'wb') as f:
+        w = csv.writer(f)
+        w.writerow(header)
+        w.writerows([p[h] for h in header] for p in plants)
+
+    #health cost files of January and July: the general files and the own
+    #files of some emitting plants
+    def hc_file(name, month, suffix):
+        rows = []
+        for day in range(1, 32):
+            for hour in range(24):
+                rows.append((name, month, day, hour,
+                             rnd.uniform(0.001, 0.01), rnd.uniform(500, 1500),
+                             rnd.uniform(1, 10), rnd.uniform(20, 40)))
+        with open(os.path.join(directory, "data/hc_data_so4",
+                               "%s_%02d_%s.csv" % (name, month, suffix)),
+                  'wb') as f:
+            w = csv.writer(f)
+            w.writerow(("SOURCE", "MONTH", "DAY", "HOUR", "VAL", "MWH",
+                        "EMIS", "EMIS_AGG"))
+            w.writerows(rows)
+    for month in (1, 7):
+        for name in ("ga_north", "ga_south", "wansley_comb"):
+            hc_file(name, month, "general_health_costs")
+        for p in plants:
+            if p["PLFUELCT"] in ("COAL", "GAS", "OIL", "BIOMASS") and \
+                    int(p["ORIS"]) % 100 < own_hc_share * 100:
+                hc_file(p["ORIS"], month, "health_costs")
+
+    #load curves, a daily shape under the peak load
+    available = sum(p["NAMEPCAP"] * p["CAPFAC_FIXED"] for p in plants)
+    peak = peak_load_share * available
+    for name, last_year in (("load_curves_2004_2013.csv", 2013),
+                            ("load_curves_2004_2010.csv", 2010)):
+        rows = []
+        day = datetime.date(2004, 1, 1)
+        while day.year <= last_year:
+            for hour in range(24):
+                shape = 0.6 + 0.4 * (1 - abs(15 - hour) / 15.0)
+                rows.append((day.year, day.month, day.day, hour,
+                             round(peak * shape * rnd.uniform(0.95, 1.0), 1)))
+            day += datetime.timedelta(1)
+        with open(os.path.join(directory, "data/lc_data", name), 'wb') as f:
+            w = csv.writer(f)
+            w.writerow(("YEAR", "MONTH", "DAY", "HOUR", "LOAD"))
+            w.writerows(rows)
+
+
+#####################################
+########        Runs         ########
+#####################################
+
+#run one model with the solver backend on the instance in directory with the
+#phase timer on, returns its report entry (run in a fresh process, so the
+#peak memory is the run's own)
+def run_model(model, solver, directory, num_plants, days, months, years):
+    m = uc if model == "UC" else cp
+    m.solver = solver
+    m.base_dir = directory
+    m.num_days, m.days = days, list(range(1, days + 1))
+    m.months = months
+    m.num_years, m.years = years, list(range(years))
+    m.use_result_cache = False
+    m.use_model_cache = False #every run builds its model
+    m.use_result_store = False
+    start_year = 2007 if model == "UC" else 2004
+
+    timer = phase_timer.start()
+    entry = {"model": model, "solver": solver, "num_plants": num_plants}
+    try:
+        phase_timer.begin("inputs")
+        inputs = m.load_inputs(directory)
+        phase_timer.end()
+        phase_timer.begin("setup")
+        if model == "UC":
+            s = m.setup_scenario(inputs, 6.0, 0.06, True, start_year,
+                                 {"TimeLimit": time_limit})
+        else:
+            s = m.setup_scenario(inputs, 6.0, 0.06, True, start_year)
+            s.params["TimeLimit"] = time_limit
+        phase_timer.end()
+        phase_timer.begin("build")
+        m.build_model(s)
+        phase_timer.end()
+        phase_timer.begin("solve")
+        m.solve_model(s)
+        phase_timer.end()
+        if s.solution is not None:
+            stats = s.solution.stats()
+        else:
+            stats = run_report.solver_stats(s.mod)
+        if stats is not None:
+            entry.update((k, stats[k]) for k in
+                         ("num_vars", "num_constrs", "num_nonzeros",
+                          "status", "mip_gap", "runtime", "node_count"))
+        if stats is None or stats["sol_count"]:
+            phase_timer.begin("extract")
+            result = m.extract_results(s)
+            phase_timer.end()
+            entry["obj_val"] = result.obj_val
+    except Exception as e: #e.g. a gurobi license too small for the instance
+        entry["error"] = str(e)
+    phase_timer.stop()
+    entry.update(timer.report())
+    print timer
+    return entry
+
+
+#run a model in a fresh worker process
+def run_in_process(*args):
+    pool = multiprocessing.Pool(1)
+    try:
+        return pool.apply(run_model, args)
+    finally:
+        pool.close()
+        pool.join()
+
+
+#benchmark every plant count, returns the report
+def run_benchmark(counts, days, months, years, mix, solver_list):
+    rnd = random.Random(seed)
+    runs = []
+    for n in counts:
+        directory = "%s%d_plants/" % (uc.base_dir + benchmark_dir, n)
+        started = time.time()
+        generate_instance(directory, n, mix, rnd)
+        print "Instance of %d plants: %.1f seconds" % (n, time.time() - started)
+        for model in models:
+            for solver in solver_list:
+                runs.append(run_in_process(model, solver, directory, n, days,
+                                           months, years))
+    return {"created": time.time(), "num_days": days, "months": months,
+            "num_years": years, "fuel_mix": mix, "solvers": solver_list,
+            "time_limit": time_limit,
+            "uc_solve_mode": uc.solve_mode,
+            "use_matrix_build": [uc.use_matrix_build, cp.use_matrix_build],
+            "runs": runs}
+
+
+#plant counts, days, months, years, fuel mix and solver backends from the
+#arguments
+def benchmark_arguments(argv):
+    if len(argv) > 7:
+        raise Exception("Argument error, expected at most plant counts, "
+                        "days, months, years, fuel mix and solvers")
+    args = list(argv[1:]) + [None] * (7 - len(argv))
+    counts = map(int, args[0].split(",")) if args[0] else plant_counts
+    days = int(args[1]) if args[1] else num_days
+    month_list = map(int, args[2].split(",")) if args[2] else months
+    years = int(args[3]) if args[3] else num_years
+    mix = fuel_mix
+    if args[4]:
+        mix = dict((k.upper(), float(v)) for k, v in
+                   (pair.split(":") for pair in args[4].split(",")))
+    solver_list = args[5].split(",") if args[5] else solvers
+    if min(counts) < 1 or not 1 <= days <= 31 or not 1 <= years <= 7:
+        raise Exception("Argument error, %s plants, %s days, %s years" %
+                        (counts, days, years))
+    if [mo for mo in month_list if mo not in (1, 7)]:
+        raise Exception("Argument error, months %s, the health cost files "
+                        "cover January (1) and July (7)" % month_list)
+    if [k for k in mix if k not in plant_shapes]:
+        raise Exception("Argument error, fuel mix %s, plant types are %s" %
+                        (mix, ", ".join(sorted(plant_shapes))))
+    for solver in solver_list:
+        solver_backend.check(solver)
+    return counts, days, month_list, years, mix, solver_list
+
+
+if __name__ == "__main__":
+    report = run_benchmark(*benchmark_arguments(argv))
+    path = uc.base_dir + "data/output/benchmark_" + str(int(time.time())) + \
+        ".json"
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'wb') as f:
+        json.dump(report, f, indent=1, sort_keys=True)
+    print "--------------------------------------------"
+    for r in report["runs"]:
+        print "%s %-6s %5d plants: %8.1f s, %8.1f MB peak" % \
+            (r["model"], r["solver"], r["num_plants"], r["seconds"],
+             r["peak_rss_mb"] or 0.0)
+    print "Report: %s" % path
+    print "--------------------------------------------"
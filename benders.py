@@ -0,0 +1,292 @@
+#   Benders decomposition of the capacity planning model
+#
+#   Author: Paul Kerl (paul.kerl@gatech.edu)
+#
+#   The investment columns (capacities x, inc/dec capacities y and q and
+#   generation types pi_* of each plant and year) are the only columns the
+#   hours share. For a fixed investment the hourly dispatch splits into one
+#   LP per block of days (a day or a year). The master MIP holds the
+#   investment columns and their rows, the reserve rows (one per year, at its
+#   peak load) and one dispatch cost column per block. Each iteration solves
+#   the master, solves the block LPs with the master's investment fixed in
+#   parallel worker processes, and adds one optimality cut per block from
+#   the reduced costs of the fixed investment columns, until the master's
+#   bound and the best investment's cost meet.
+#   Plain Benders zigzags: the early masters only see a few cuts and jump
+#   between extreme investments, so the lower bound can stay flat for
+#   several iterations and the gap closes slowly even with one cut per block
+#   (day blocks give more cuts per master than year blocks, for a faster
+#   bound and a larger master). The blocks are therefore solved at an
+#   in-out point between the master's investment and the best one found so
+#   far (stabilization weight on the best one); the dispatch cost is convex
+#   in the investment, so its cuts hold everywhere, and the point is a
+#   candidate for the best investment when its integer columns are integer.
+#   When the cuts there don't cut off the master's investment, the blocks
+#   are solved at the master's investment too, so every iteration makes the
+#   progress of plain Benders at least.
+#   The load rows of the blocks carry penalized shortfall and surplus columns,
+#   so every investment of the master has a dispatch (no feasibility cuts).
+#
+import multiprocessing
+import numpy as np
+import matrix_build
+import solver_backend #gurobi or HiGHS
+
+#investment column families of matrix_build.cp_investment_vars, in the
+#order of the master's investment vector
+investment = ("x", "y", "q", "pi_non", "pi_pct", "pi_fs")
+
+
+########    benders result   ########
+class BendersResult:
+    def __init__(self, capacity, gen, hc_values, obj_val, lower_bound,
+                 converged, optimal, iterations, unmet_load):
+        self.capacity = capacity   #(plants x years) capacities
+        self.gen = gen             #(plants x hours) generation
+        self.hc_values = hc_values #health cost total, then per plant
+        self.obj_val = obj_val     #cost of the best investment found
+        self.lower_bound = lower_bound #bound of the last master
+        self.converged = converged #bounds met within the tolerance
+        self.optimal = optimal     #converged, load met in every block
+        self.iterations = iterations
+        self.unmet_load = unmet_load #shortfall and surplus, MWh
+        self.gap = (obj_val - lower_bound) / max(abs(obj_val), 1e-10)
+    def __str__(self):
+        return "Benders decomposition: %d iterations%s, objective $%s, " \
+            "lower bound $%s, gap %.4f%%" % \
+            (self.iterations, "" if self.converged else " (not converged)",
+             '{0:,.2f}'.format(self.obj_val),
+             '{0:,.2f}'.format(self.lower_bound), 100 * self.gap)
+
+
+#day keys of grid in blocks of one "day" or one "year"
+def day_blocks(grid, block="day"):
+    if block == "day":
+        return [[key] for key in grid.day_keys]
+    if block != "year":
+        raise Exception("Benders error, %s blocks are not days or years" %
+                        block)
+    blocks = []
+    for key in grid.day_keys:
+        if blocks and blocks[-1][-1][0] == key[0]:
+            blocks[-1].append(key)
+        else:
+            blocks.append([key])
+    return blocks
+
+
+#####################################
+########       Master        ########
+#####################################
+
+#master MIP of the investment columns, with the reserve rows at each year's
+#peak load and a dispatch cost column per block, returns the model, the
+#investment column indices (investment order) and the cost columns; the
+#dispatch costs are nonnegative, so the cost columns start bounded by 0
+def master_matrices(args, num_blocks):
+    (pp, grid, years, load, var_cost, disc, health_cost, health_cost_pct,
+     health_cost_fs, emissions_adj, reserve, pct_change, weight) = args
+    num_plants = len(pp)
+    mm = matrix_build.MatrixModel()
+    inv = matrix_build.cp_investment_vars(mm, pp, years, disc)
+    matrix_build.cp_change_capacity_rows(mm, inv, years)
+    matrix_build.cp_plant_type_rows(mm, pp, inv, years)
+    matrix_build.cp_set_type_rows(mm, pp, inv, years)
+
+    #reserve must be available in the peak hour of each year
+    year = np.array([key[0] for key in grid.keys], dtype=np.int64)
+    peak = np.array([load[year == t].max() if (year == t).any() else 0.0
+                     for t in years])
+    mm.add_constrs(
+        np.repeat(np.arange(len(years)), num_plants), inv["x"].T.ravel(),
+        np.ones(len(years) * num_plants), matrix_build.GREATER_EQUAL,
+        peak * (1 + reserve), ["reserve_%s" % t for t in years])
+
+    cost_cols = mm.add_vars(num_blocks, obj=1.0,
+                            names=["dispatch_cost_%s" % b
+                                   for b in range(num_blocks)])
+    inv_cols = np.concatenate([inv[name].ravel() for name in investment])
+    return mm, inv, inv_cols, cost_cols
+
+
+#####################################
+########   Dispatch blocks   ########
+#####################################
+
+_args = None    #matrix_build.cp_matrices arguments of the model
+_params = None  #solver parameters of the block LPs
+_solver = None  #solver backend
+_penalty = None #cost of a MWh of unmet load
+
+
+def _init_worker(args, params, solver, penalty):
+    global _args, _params, _solver, _penalty
+    _args = args
+    _params = params
+    _solver = solver
+    _penalty = penalty
+
+
+#capacity planning matrices (matrix_build.cp_matrices, every investment
+#column included) over the days of a block, with a shortfall and a surplus
+#column on each of its load rows at penalty (discounted) per MWh; returns
+#the model, its index, the block's hours in the full grid and the slack
+#columns
+def block_matrices(args, days, penalty):
+    (pp, grid, years, load, var_cost, disc, health_cost, health_cost_pct,
+     health_cost_fs, emissions_adj, reserve, pct_change, weight) = args
+    sub = matrix_build.TimeGrid(days, grid.hours)
+    idx = np.array([grid.index(*key) for key in sub.keys], dtype=np.int64)
+    mm, index = matrix_build.cp_matrices(
+        pp, sub, years, load[idx], var_cost, disc, health_cost[:, idx],
+        health_cost_pct[:, idx], health_cost_fs[:, idx], emissions_adj,
+        reserve, pct_change, None if weight is None else weight[idx])
+    K = sub.num_hours
+    year = np.array([key[0] for key in sub.keys], dtype=np.int64)
+    hour_disc = np.asarray(disc, dtype=float)[year]
+    if weight is not None:
+        hour_disc = hour_disc * weight[idx]
+    slack = mm.add_vars(2 * K, obj=np.tile(penalty * hour_disc, 2))
+    mm.add_terms(np.tile(index["rows"]["load"], 2), slack,
+                 np.repeat([1.0, -1.0], K))
+    return mm, index, idx, slack
+
+
+#solve the dispatch LP of block b for the investment inv_x (investment
+#order), returns its dispatch cost and the cost's subgradient in the
+#investment, its hours, generation, health costs and unmet load
+def _solve_block(args):
+    b, days, inv_x = args
+    mm, index, idx, slack = block_matrices(_args, days, _penalty)
+    inv_cols = np.concatenate([index[name].ravel() for name in investment])
+    mm.fix_vars(inv_cols, inv_x)
+    inv_obj = np.concatenate(mm.obj)[inv_cols]
+    solution = solver_backend.solve(mm, _params, "cp_block_%s" % b, _solver)
+    if solution.reduced_cost is None:
+        raise solver_backend.SolverError(
+            "Benders error, block %s has no LP solution, %s status %s" %
+            (b, _solver, solution.status))
+    #the fixed investment columns' own costs belong to the master
+    cost = solution.obj_val - float(np.dot(inv_obj, inv_x))
+    grad = solution.reduced_cost[inv_cols] - inv_obj
+    x = solution.x
+    return (b, cost, grad, idx, x[index["z"]],
+            solution.row_x[index["rows"]["health_cost"]],
+            float(x[slack].sum()))
+
+
+#cost of the investment inv_x (its own costs inv_obj and the dispatch costs
+#of the blocks, solved in the pool) and the block results
+def _evaluate(pool, blocks, inv_x, inv_obj):
+    results = pool.map(_solve_block,
+                       [(b, days, inv_x) for b, days in enumerate(blocks)],
+                       chunksize=1)
+    return float(np.dot(inv_obj, inv_x)) + sum(r[1] for r in results), results
+
+
+#####################################
+########      Iterations     ########
+#####################################
+
+#Benders decomposition of the capacity planning model of args (the
+#arguments of matrix_build.cp_matrices over the model's grid)
+#   block: "day" or "year" dispatch blocks
+#   max_iterations: master solves
+#   tolerance: relative gap between the bounds to stop at
+#   workers: number of worker processes (None uses every core)
+#   params: solver parameters of the master and the block LPs
+#   penalty: cost of a MWh of unmet load in the blocks
+#   stabilization: weight of the best investment in the in-out point the
+#                  blocks are solved at (0 is plain Benders)
+def solve_benders(args, block="day", max_iterations=100, tolerance=1e-4,
+                  workers=None, params=None, solver="gurobi", penalty=1e5,
+                  stabilization=0.5):
+    (pp, grid, years, load, var_cost, disc, health_cost, health_cost_pct,
+     health_cost_fs, emissions_adj, reserve, pct_change, weight) = args
+    if min(np.min(var_cost), np.min(health_cost), np.min(health_cost_pct),
+           np.min(health_cost_fs), min(emissions_adj)) < 0:
+        raise Exception("Benders error, negative dispatch costs")
+    params = params or {}
+    block_params = dict(params)
+    block_params.pop("LogFile", None)
+    block_params["OutputFlag"] = 0
+    blocks = day_blocks(grid, block)
+    mm, inv, inv_cols, cost_cols = master_matrices(args, len(blocks))
+    inv_obj = np.concatenate(mm.obj)[inv_cols]
+    integer = np.concatenate(mm.vtype)[inv_cols] != matrix_build.CONTINUOUS
+    best_cost = float("inf")
+    lower = -float("inf")
+    best = None
+
+    pool = multiprocessing.Pool(workers, _init_worker,
+                                (args, block_params, solver, penalty))
+    try:
+        for it in range(max_iterations):
+            master = solver_backend.solve(mm, params, "cp_master", solver)
+            if master.x is None:
+                raise solver_backend.SolverError(
+                    "Benders error, no master solution, %s status %s" %
+                    (solver, master.status))
+            lower = master.obj_bound if master.obj_bound is not None else \
+                master.obj_val
+            inv_x = master.x[inv_cols]
+            theta = master.x[cost_cols]
+
+            #the in-out point
+            point = inv_x
+            if best is not None and stabilization > 0:
+                point = stabilization * best[0] + (1 - stabilization) * inv_x
+            evaluated = [(point, _evaluate(pool, blocks, point, inv_obj))]
+
+            #the master's investment too, when the cuts at the in-out point
+            #don't raise its dispatch cost
+            if point is not inv_x:
+                raised = sum(r[1] + float(np.dot(r[2], inv_x - point)) -
+                             theta[r[0]] for r in evaluated[0][1][1])
+                if raised <= tolerance * max(abs(best_cost), 1e-10):
+                    evaluated.append((inv_x, _evaluate(pool, blocks, inv_x,
+                                                       inv_obj)))
+
+            #(the master's investment is integer up to the MIP tolerance)
+            for x, (cost, results) in evaluated:
+                if cost < best_cost and (x is inv_x or np.allclose(
+                        x[integer], np.round(x[integer]), atol=1e-6)):
+                    best_cost, best = cost, (x, results)
+            gap = (best_cost - lower) / max(abs(best_cost), 1e-10)
+            print "Benders iteration %d: lower bound $%s, upper bound $%s, " \
+                "gap %.4f%%" % (it + 1, '{0:,.2f}'.format(lower),
+                                '{0:,.2f}'.format(best_cost), 100 * gap)
+            if gap <= tolerance:
+                break
+
+            #optimality cuts: cost_b >= cost(x) + grad (inv - x)
+            for n, (x, (cost, results)) in enumerate(evaluated):
+                for b, block_cost, grad, _, _, _, _ in results:
+                    nz = np.nonzero(grad)[0]
+                    mm.add_constrs(
+                        np.zeros(len(nz) + 1),
+                        np.append(cost_cols[b], inv_cols[nz]),
+                        np.append(1.0, -grad[nz]), matrix_build.GREATER_EQUAL,
+                        block_cost - float(np.dot(grad, x)),
+                        ["cut_%s_%s_%s" % (it, n, b)])
+    finally:
+        pool.close()
+        pool.join()
+
+    inv_x, results = best
+    gen = np.zeros((len(pp), grid.num_hours))
+    hc_values = np.zeros(len(pp) + 1)
+    unmet_load = 0.0
+    for b, block_cost, grad, idx, block_gen, block_hc, block_unmet in results:
+        gen[:, idx] = block_gen
+        hc_values += block_hc
+        unmet_load += block_unmet
+    met = unmet_load <= 1e-6 * float(np.sum(load)) #up to LP tolerances
+    if not met:
+        print "Load not met by %.2f MWh in the dispatch blocks, raise the " \
+            "penalty" % unmet_load
+    capacity = inv_x[:inv["x"].size].reshape(inv["x"].shape)
+    converged = gap <= tolerance
+    return BendersResult(capacity, gen, hc_values, best_cost,
+                         min(lower, best_cost), converged,
+                         converged and met, it + 1, unmet_load)
@@ -8,12 +8,30 @@
 #
 #   Author: Paul Kerl (paul.kerl@gatech.edu)
 #
+#   Run as a script for the constants below, or import it and call
+#   load_inputs once and run_scenario for each scenario (or setup_scenario,
+#   build_model, solve_model and extract_results for the separate steps)
+#
 
 import datetime #for processing dates
 import time #for adding time stamps to files
-import gurobipy as gp
-from pylab import * #also includes numpy as np
+import numpy as np
 import csv
+import inspect
+import lazy_import
+gp = lazy_import.LazyModule("gurobipy") #imported on first use
+import matrix_build #bulk (sparse matrix) model construction
+import benders #investment master and dispatch blocks
+import representative_days #clustered days of the dispatch block
+import result_cache #solved scenario cache
+import model_cache #built model cache
+import columnar_output #npz output files
+import result_store #solved scenarios by run parameters
+import phase_timer #phase timing
+import run_report #json run reports
+import solver_backend #gurobi or HiGHS
+import hc_data #cached health cost sensitivity files
+import load_data #cached load curves
 #import random #for use on monte-carlo-izing demand load curves, health impacts
 
 ###############################################################################
@@ -72,7 +90,6 @@ pp_var_costs_text = """20.14016	51.75959	57.94612	6.59	18.93	51.59
 32.70524	142.38768	32.71338	11.34	25.48	35.67"""
 
 pp_var_costs_arr = pp_var_costs_text.splitlines()
-start_year = 2004
 pp_var_costs = {}
 store_year = 2004
 for line in pp_var_costs_arr :
@@ -92,25 +109,11 @@ R = 0.15 #13.5% within 3 years, and 15% for longer forecasts
 # identifies the need for new resources beginning in 2009 and continuing through
 # 2023."
 
-#VSL
-VSL = 6000000
-
-#Beta
-BETA = 0.06 / 10.0 #6% per 10 micrograms / m**3 PM2.5
+#VSL (in millions of USD2007)
+VSL = 6.0
 
-
- 
-if health_cost_included == True :
-    #PCT emissions rate decrease
-    PCT_EMISSIONS = 1 #0.1 #TODO fix emissions rate change
-    
-    #PCT emissions rate decrease
-    FS_EMISSIONS = 1 #0.01 #TODO fix emissions rate change
-    
-    #NONE emissions rate (should be 1.0 except for testing)
-    NONE_EMISSIONS_ADJ = 1
-else :
-    PCT_EMISSIONS, FS_EMISSIONS, NONE_EMISSIONS_ADJ = 0.0, 0.0, 0.0
+#Beta (in percent per 10 microg / m**3)
+BETA = 0.06 #6% per 10 micrograms / m**3 PM2.5
 
 #Risk-adjusted real discount factor (7%)
 int_rate = 0.07 #from dong gu's paper
@@ -135,6 +138,80 @@ hours = list(xrange(num_hours))
 #months in our case -- july and january here
 months = [1,7]
 
+#build the model from sparse coefficient matrices in bulk (True) or with one
+#addVar / addConstr call per index (False), both give the same model
+use_matrix_build = True
+
+#how the model is solved:
+#   "monolithic": one MIP over the whole horizon
+#   "benders": the investment columns in a master MIP and the hourly dispatch
+#              in one LP per benders_block ("day" or "year"), solved over
+#              benders_workers processes (None uses every core), for up to
+#              benders_iterations master solves or until the bounds are
+#              within benders_gap; load not met in a block costs
+#              benders_penalty per MWh; the blocks are solved at an in-out
+#              point with benders_stabilization weight on the best
+#              investment found (0 is plain Benders, see benders.py)
+#   the Benders bounds can close slowly on a large model (a flat lower bound
+#   for the first iterations, a gap of a few percent after tens of them), so
+#   the iteration limit is generous; a run stopped at benders_iterations
+#   prints its bounds and gap and is not optimal
+solve_mode = "monolithic"
+benders_block = "day"
+benders_workers = None
+benders_iterations = 300
+benders_gap = 1e-4
+benders_penalty = 1e5
+benders_stabilization = 0.5
+
+#build the model over representative_day_count representative days per year
+#instead of every day (see representative_days): the days are clustered by
+#their load and health cost profiles, each representative day's costs
+#weighted by the days it stands for, the peak load day always kept for the
+#reserve rows; representative_compare_full also solves the model over every
+#day to report the error (matrix-built models, 0 uses every day)
+representative_day_count = 0
+representative_compare_full = False
+
+#solver backend (see solver_backend): "gurobi", or "highs" for the open-source
+#HiGHS command line solver, which needs no license (the matrix-built model
+#handed over as an MPS file)
+solver = "gurobi"
+
+#reuse the stored solution of an identical scenario (same inputs, constants
+#and solver settings), evicting entries unused for result_cache_max_days or
+#beyond result_cache_max_mb in total (off by default)
+use_result_cache = False
+result_cache_max_mb = 2000
+result_cache_max_days = 30
+
+#keep the built model (matrix-built) as a compressed MPS file with its index
+#maps (see model_cache), keyed by a hash of the inputs: a run that only
+#changes the solver settings (s.params, solver) reads the file instead of
+#building the model, evicting entries unused for model_cache_max_days or
+#beyond model_cache_max_mb in total
+use_model_cache = False
+model_cache_max_mb = 5000
+model_cache_max_days = 30
+
+#output files: "csv" for the csv files, or "npz" for one compressed columnar
+#file with a json sidecar (see columnar_output), holding the outputs up to
+#output_level: "summary" (objective, health cost and totals only), "plant"
+#(also the per-plant totals and capacities) or "hourly" (also every hourly
+#result)
+output_format = "csv"
+output_level = "hourly"
+
+#record every solved scenario in the result store (see result_store), an
+#SQLite file indexed by VSL, BETA, health costs on/off and start year (off by
+#default)
+use_result_store = False
+
+#write a json run report of every scenario run (see run_report) under the
+#gurobi logs: phase timings, memory, object counts and solver statistics
+#(off by default)
+write_run_report = False
+
 ################################ END CONSTANTS ################################
 
 
@@ -213,303 +290,573 @@ class PowerPlant:
         return "%s \n\t Type: %s \n\t Cap Factor: %s \n\t Capacity (MW): %s \n\t Minimum Gen (MW): %s \n\t %s \n\t %s" % (self.name, self.type, self.cap_factor, self.capacity, self.min_power, self.location, self.costs)
 
 
+########    model inputs   ########
+#everything read from the input files, shared by all scenarios (the plants'
+#health costs are per unit of VSL * BETA)
+class ModelInputs:
+    def __init__(self, pp, lc, emissions_rate_so2, emissions_tot_so2,
+                 total_capacity_avail):
+        self.pp = pp
+        self.lc = lc #load_data.LoadStore, load by hour
+        self.emissions_rate_so2 = emissions_rate_so2
+        self.emissions_tot_so2 = emissions_tot_so2
+        self.total_capacity_avail = total_capacity_avail #a check value
+    def __str__(self):
+        return "Model inputs: %d plants, %d days of load curves" % \
+            (len(self.pp), self.lc.num_days)
+
+
+########    scenario   ########
+#one (VSL, BETA, health_cost_included, start_year) point: its plants,
+#discounting, load curves and output files (setup_scenario), its gurobi model
+#(build_model) and its solution status (solve_model)
+class Scenario:
+    def __init__(self, inputs, VSL_in, BETA_in, health_cost_included,
+                 start_year, pp, cost_adj, lc_array, emission_adj,
+                 output_files):
+        self.inputs = inputs
+        self.VSL_in = VSL_in #as given, in millions of USD2007
+        self.BETA_in = BETA_in #as given, in percent per 10 microg / m**3
+        self.health_cost_included = health_cost_included
+        self.start_year = start_year
+        self.pp = pp #plants with the scenario's health costs
+        self.cost_adj = cost_adj #discount factors by year
+        self.lc_array = lc_array
+        self.emission_adj = emission_adj #NONE, PCT and FS emissions
+        self.output_files = output_files
+        self.cache_key = None #result cache entry, None if the cache is off
+        self.cache_dir = None
+        self.model_key = None #model cache entry, None if the cache is off
+        self.model_dir = None
+        self.model_file = None #MPS file of the model, from the model cache
+        self.time_stamp = None #of the output files
+        self.report_file = None #run report, None if not written
+        self.params = {} #extra solver parameters, by their gurobi names
+        self.mod = None #gurobi model, set by build_model
+        self.variables = None #x, y, q, pi_non, pi_pct, pi_fs, z_non, z_pct,
+                              #z_fs, z
+        self.matrices = None #matrix model and index, for solver backends
+        self.arguments = None #matrix_build.cp_matrices arguments, for the
+                              #benders solve mode
+        self.solution = None #solver backend Solution, set by solve_model
+        self.benders = None #BendersResult, set by solve_model (benders)
+        self.grid = None #time grid of the model, set by setup_scenario
+        self.representative = None #RepresentativeDays of the model, if any
+        self.weight = None #per-hour weights of the representative days
+        self.full_solution = None #Solution and index of the model over
+                                  #every day (representative_compare_full)
+        self.full_error = None #errors against it, set by extract_results
+        self.solved = False
+    def __str__(self):
+        state = "not built"
+        if self.solved:
+            state = "solved"
+        elif self.mod is not None or self.matrices is not None or \
+                self.arguments is not None:
+            state = "built"
+        return "Scenario VSL %s, BETA %s, hc %s, %s (%s)" % \
+            (self.VSL_in, self.BETA_in, self.health_cost_included,
+             self.start_year, state)
+
+
+########    scenario result   ########
+class ScenarioResult:
+    def __init__(self, VSL, BETA, health_cost_included, start_year, obj_val,
+                 hc, total_load, total_plant_load, optimal, cached, capacity,
+                 gen):
+        self.VSL = VSL #as given, in millions of USD2007
+        self.BETA = BETA #as given, in percent per 10 microg / m**3
+        self.health_cost_included = health_cost_included
+        self.start_year = start_year
+        self.obj_val = obj_val
+        self.hc = hc
+        self.total_load = total_load
+        self.total_plant_load = total_plant_load
+        self.optimal = optimal
+        self.cached = cached #answered from the result cache
+        self.capacity = capacity #(plants x years) capacities
+        self.gen = gen           #(plants x hours) generation
+    def __str__(self):
+        return "VSL %s, BETA %s, hc %s, %s: objective $%s, health cost $%s" \
+            % (self.VSL, self.BETA, self.health_cost_included,
+               self.start_year, '{0:,.2f}'.format(self.obj_val),
+               func(self.hc, 3))
+
+
+
 
 ###############################################################################
 #################################  INPUT FILES ################################
 ###############################################################################
 
-#########################     power plant data    #############################
-#load the power plants with extra information
-pp = []
-#this file has everything in it that doesn't change year-to-year, current capacity (2004) etc...
-pp_file = base_dir + "data/plant_info.csv"
-pp_file = open(pp_file,'rU')
-reader = csv.reader(pp_file)
-
-header = {} #header row store
-pp_data = [] #the big set of all the stuff
-iter = 0
-for row in reader:
-    #print iter
-    if iter == 0:
-        header = row
-    else:
-        i = 0
-        pp_data_ele = {}
-        for h in header:
-            pp_data_ele[h] = row[i]
-            i = i + 1
-        pp_data.append(pp_data_ele)
-    iter = iter + 1
-total_capacity_avail = 0 #a check value
-
-emissions_rate_so2 = {} #hourly emissions rate dictionary for output files
-emissions_tot_so2 = {} #hourly emissions rate dictionary for output files
-
-for pow_plant in pp_data:
-    pp_name = pow_plant['PNAME']
-    pp_type = plantFuelStringToType(pow_plant['PLFUELCT'])
-    pp_oris = pow_plant['ORIS']
-    pp_short_name = ""    
-    if("harllee" in pp_name.lower()) : 
-        pp_short_name = "harllee"
-    elif("scherer" in pp_name.lower()) :
-        pp_short_name = "scherer"        
-    elif("bowen" in pp_name.lower()) :
-        pp_short_name = "bowen"
-    elif("mcdonough" in pp_name.lower()) :
-        pp_short_name = "mcdonough"        
-    #print pp_type
+#read every input file, independent of the scenario
+def load_inputs(base_dir):
+    #########################     power plant data    #############################
+    #load the power plants with extra information
+    pp = []
+    phase_timer.begin("plant_table")
+    #this file has everything in it that doesn't change year-to-year, current capacity (2004) etc...
+    pp_file = base_dir + "data/plant_info.csv"
+    pp_file = open(pp_file,'rU')
+    reader = csv.reader(pp_file)
+
+    header = {} #header row store
+    pp_data = [] #the big set of all the stuff
+    iter = 0
+    for row in reader:
+        #print iter
+        if iter == 0:
+            header = row
+        else:
+            i = 0
+            pp_data_ele = {}
+            for h in header:
+                pp_data_ele[h] = row[i]
+                i = i + 1
+            pp_data.append(pp_data_ele)
+        iter = iter + 1
+    phase_timer.end(len(pp_data))
+    total_capacity_avail = 0 #a check value
+
+    #health costs of every plant, shared by its health_cost, health_cost_pct and
+    #health_cost_fs
+    hc_table = hc_data.HealthCostTable(len(pp_data),months,days,hours)
+    hc_cache_dir = base_dir + hc_data.cache_dir #parsed health cost files
+
+    emissions_rate_so2 = {} #hourly emissions rate dictionary for output files
+    emissions_tot_so2 = {} #hourly emissions rate dictionary for output files
+
+    phase_timer.begin("plants") #records and health cost files of each plant
+    for pow_plant in pp_data:
+        pp_name = pow_plant['PNAME']
+        pp_type = plantFuelStringToType(pow_plant['PLFUELCT'])
+        pp_oris = pow_plant['ORIS']
+        pp_short_name = ""    
+        if("harllee" in pp_name.lower()) : 
+            pp_short_name = "harllee"
+        elif("scherer" in pp_name.lower()) :
+            pp_short_name = "scherer"        
+        elif("bowen" in pp_name.lower()) :
+            pp_short_name = "bowen"
+        elif("mcdonough" in pp_name.lower()) :
+            pp_short_name = "mcdonough"        
+        #print pp_type
     
-    #costs
-    fixed_cap_cost = float(pow_plant['FIXED_COST']) / 6.0 # for 2 months of fixed costs
-    fixed_cap_cost_pct = float(pow_plant['FIXED_COST_PCT']) / 6.0 # for 2 months of fixed costs
-    fixed_cap_cost_fs = float(pow_plant['FIXED_COST_FS'])  / 6.0 # for 2 months of fixed costs
-    inc_cap_cost = float(pow_plant['INC_COST'])
-    dec_cap_cost = float(pow_plant['DEC_COST'])
-    #2004 fuel costs
-    fuel_cost = float(pow_plant['FUEL_COST_2004']) + float(pow_plant['VAR_OM'])
-    fuel_cost_pct = float(pow_plant['FUEL_COST_2004']) + float(pow_plant['VAR_OM'])
-    fuel_cost_fs = float(pow_plant['FUEL_COST_2004']) + float(pow_plant['VAR_OM'])
-    #2012? fuel costs
-    #fuel_cost = float(pow_plant['FUEL_COST'])
-    #fuel_cost_pct = float(pow_plant['FUEL_COST_PCT'])
-    #fuel_cost_fs = float(pow_plant['FUEL_COST_FS'])
-    health_cost = {} 
-    health_cost_pct = {} 
-    health_cost_fs = {} 
-    text_months = ["01","07"]
-    #first load emissions sensitivities and values for point source plants
-    if pp_short_name in ["bowen", "mcdonough", "scherer", "harllee"] :
-        print "loading ", pp_short_name
-        hc = {}
-        if pp_name not in emissions_rate_so2 :
-            emissions_rate_so2[pp_name] = {}
-            emissions_tot_so2[pp_name] = {}
-        print "emissions_rate loaded for %s" % pp_name
-        for text_month in text_months :
-            hc_file_name = base_dir + "data/hc_data_so4/%s_%s_health_costs.csv" % (pp_short_name,text_month)
-            hc_file = open(hc_file_name,'rU')        
-            print hc_file_name
-            reader = csv.reader(hc_file)
-            header = reader.next()
-            for row in reader :
-                month = int(row[1])
-                day = int(row[2])
-                hour = int(row[3])
-                val = row[4]
-                mwh = row[5]
-                emis = row[6]
-                emissions_rate_so2[pp_name][month,day,hour] = float(emis) / float(mwh)
-                emissions_tot_so2[pp_name][month,day,hour] = float(emis)
-                hc[month,day,hour] = VSL * BETA * float(val) / float(mwh) #(1/mwh = emissions / mwh * 1 / emissions )
-                #print month,day,hour
-
-                        
-        hc_file.close()
-        for t in years:
-            for m in months:
-                for d in days:
-                    for h in hours:
-                        health_cost[t,m,d,h] = hc[m,d,h] 
-                        health_cost_pct[t,m,d,h] = hc[m,d,h] 
-                        health_cost_fs[t,m,d,h] = hc[m,d,h] 
-    #next, Load health costs for each emitting (oil, gas, biomass and coal only!)                        
-    elif pp_type in [0,1,2,5,6]  : #for plants in aggregated sources
-        #print "loading ", pp_name
-        #set the default emissions rate depending on plant type (from the EPA)
-        so2_emissions_rate = pp_so2_emissions[pp_type]
-        nox_emissions_rate = pp_nox_emissions[pp_type]
-        hc = {}
-        for text_month in text_months :        
-            hc_file_name = base_dir + "data/hc_data_so4/%s_%s_health_costs.csv" % (pp_oris,text_month)
-
-            #check if the plants has appeared in CEM files at all        
-            try:
-               with open(hc_file_name):
-                     print "Appears in CEM and has HC file"
-                     hc_file = open(hc_file_name,'rU')        
-                     print hc_file_name
-                     reader = csv.reader(hc_file)
-                     header = reader.next()
-                     if pp_name not in emissions_rate_so2 :
-                         emissions_rate_so2[pp_name] = {}
-                         emissions_tot_so2[pp_name] = {}
-                     print "emissions_rate loaded for %s" % pp_name
-                     for row in reader :
-                         month = int(row[1])
-                         day = int(row[2])
-                         hour = int(row[3])
-                         val = row[4]
-                         mwh = row[5]
-                         emis = row[6]
-                         emis_agg = row[7]
-                         if float(mwh) > 0 :
-                             hc[month,day,hour] = VSL * BETA * float(val) * float(emis) / float(mwh) / float(emis_agg) #val * emissions rate (emis/mwh) / agg emissions
-                             emissions_rate_so2[pp_name][month,day,hour] =  float(emis) / float(mwh)
-                             emissions_tot_so2[pp_name][month,day,hour] = float(emis_agg)
-                         else :
-                             hc[month,day,hour] = VSL * BETA * float(val) * so2_emissions_rate / float(emis_agg) #val * emissions rate (emis/mwh) / agg emissions
-                             emissions_rate_so2[pp_name][month,day,hour] =  so2_emissions_rate
-                             emissions_tot_so2[pp_name][month,day,hour] = float(emis_agg)
-                         #print month,day,hour
-                     
-            except IOError:
-               #if the plant doesn't appear in a CEM file, set up the sensitivities, emissions and emissions rates 
-               print "Does not appear in CEM"
-               print "%s|%s|%s" % (pp_name,pp_oris,pp_types[pp_type])
+        #costs
+        fixed_cap_cost = float(pow_plant['FIXED_COST']) / 6.0 # for 2 months of fixed costs
+        fixed_cap_cost_pct = float(pow_plant['FIXED_COST_PCT']) / 6.0 # for 2 months of fixed costs
+        fixed_cap_cost_fs = float(pow_plant['FIXED_COST_FS'])  / 6.0 # for 2 months of fixed costs
+        inc_cap_cost = float(pow_plant['INC_COST'])
+        dec_cap_cost = float(pow_plant['DEC_COST'])
+        #2004 fuel costs
+        fuel_cost = float(pow_plant['FUEL_COST_2004']) + float(pow_plant['VAR_OM'])
+        fuel_cost_pct = float(pow_plant['FUEL_COST_2004']) + float(pow_plant['VAR_OM'])
+        fuel_cost_fs = float(pow_plant['FUEL_COST_2004']) + float(pow_plant['VAR_OM'])
+        #2012? fuel costs
+        #fuel_cost = float(pow_plant['FUEL_COST'])
+        #fuel_cost_pct = float(pow_plant['FUEL_COST_PCT'])
+        #fuel_cost_fs = float(pow_plant['FUEL_COST_FS'])
+        health_cost = hc_table.plant(len(pp))
+        text_months = ["01","07"]
+        #first load emissions sensitivities and values for point source plants
+        if pp_short_name in ["bowen", "mcdonough", "scherer", "harllee"] :
+            print "loading ", pp_short_name
+            hc = {}
+            if pp_name not in emissions_rate_so2 :
+                emissions_rate_so2[pp_name] = {}
+                emissions_tot_so2[pp_name] = {}
+            print "emissions_rate loaded for %s" % pp_name
+            for text_month in text_months :
+                hc_file_name = base_dir + "data/hc_data_so4/%s_%s_health_costs.csv" % (pp_short_name,text_month)
+                print hc_file_name
+                for month,day,hour,val,mwh,emis,emis_agg in \
+                        hc_data.load(hc_file_name,hc_cache_dir).tolist() :
+                    month,day,hour = int(month),int(day),int(hour)
+                    emissions_rate_so2[pp_name][month,day,hour] = emis / mwh
+                    emissions_tot_so2[pp_name][month,day,hour] = emis
+                    hc[month,day,hour] = val / mwh #(1/mwh = emissions / mwh * 1 / emissions ), per unit of VSL * BETA
+                    #print month,day,hour
+
+            health_cost.fill(hc)
+        #next, Load health costs for each emitting (oil, gas, biomass and coal only!)                        
+        elif pp_type in [0,1,2,5,6]  : #for plants in aggregated sources
+            #print "loading ", pp_name
+            #set the default emissions rate depending on plant type (from the EPA)
+            so2_emissions_rate = pp_so2_emissions[pp_type]
+            nox_emissions_rate = pp_nox_emissions[pp_type]
+            hc = {}
+            for text_month in text_months :        
+                hc_file_name = base_dir + "data/hc_data_so4/%s_%s_health_costs.csv" % (pp_oris,text_month)
+
+                #check if the plants has appeared in CEM files at all (only
+                #opening the file is tried, an error reading or caching it
+                #must not pass for a plant without a file)
+                try:
+                    open(hc_file_name).close()
+                    in_cem = True
+                except IOError:
+                    in_cem = False
+                if in_cem:
+                    print "Appears in CEM and has HC file"
+                    print hc_file_name
+                    if pp_name not in emissions_rate_so2 :
+                        emissions_rate_so2[pp_name] = {}
+                        emissions_tot_so2[pp_name] = {}
+                    print "emissions_rate loaded for %s" % pp_name
+                    for month,day,hour,val,mwh,emis,emis_agg in \
+                            hc_data.load(hc_file_name,hc_cache_dir).tolist() :
+                        month,day,hour = int(month),int(day),int(hour)
+                        if mwh > 0 :
+                            hc[month,day,hour] = val * emis / mwh / emis_agg #val * emissions rate (emis/mwh) / agg emissions
+                            emissions_rate_so2[pp_name][month,day,hour] =  emis / mwh
+                            emissions_tot_so2[pp_name][month,day,hour] = emis_agg
+                        else :
+                            hc[month,day,hour] = val * so2_emissions_rate / emis_agg #val * emissions rate (emis/mwh) / agg emissions
+                            emissions_rate_so2[pp_name][month,day,hour] =  so2_emissions_rate
+                            emissions_tot_so2[pp_name][month,day,hour] = emis_agg
+                        #print month,day,hour
+                else:
+                   #if the plant doesn't appear in a CEM file, set up the sensitivities, emissions and emissions rates 
+                   print "Does not appear in CEM"
+                   print "%s|%s|%s" % (pp_name,pp_oris,pp_types[pp_type])
                
-               #use north ga, south ga or wansley depending on plant location
-               lat_check = float(pow_plant['LAT']) 
-               for text_month in text_months :          
-                   if int(pp_oris) == 55965 : #Wansley Combined Cycle doesn't appear in CEM?
-                       hc_file_name = base_dir + "data/hc_data_so4/%s_%s_general_health_costs.csv" % ("wansley_comb",text_month)
-                   elif lat_check > 33.07 : #north georgia for our purposes
-                       hc_file_name = base_dir + "data/hc_data_so4/%s_%s_general_health_costs.csv" % ("ga_north",text_month)
-                   elif lat_check < 33.07 : #south georgia for our purposes
-                       hc_file_name = base_dir + "data/hc_data_so4/%s_%s_general_health_costs.csv" % ("ga_south",text_month)
-                   else : #plant didn't appear anywhere, that's a problem!
-                       print "Fail!"
+                   #use north ga, south ga or wansley depending on plant location
+                   lat_check = float(pow_plant['LAT']) 
+                   for text_month in text_months :          
+                       if int(pp_oris) == 55965 : #Wansley Combined Cycle doesn't appear in CEM?
+                           hc_file_name = base_dir + "data/hc_data_so4/%s_%s_general_health_costs.csv" % ("wansley_comb",text_month)
+                       elif lat_check > 33.07 : #north georgia for our purposes
+                           hc_file_name = base_dir + "data/hc_data_so4/%s_%s_general_health_costs.csv" % ("ga_north",text_month)
+                       elif lat_check < 33.07 : #south georgia for our purposes
+                           hc_file_name = base_dir + "data/hc_data_so4/%s_%s_general_health_costs.csv" % ("ga_south",text_month)
+                       else : #plant didn't appear anywhere, that's a problem!
+                           print "Fail!"
                    
-                   #assign costs for plants without their own CEM file
-                   with open(hc_file_name) as hc_file:
+                       #assign costs for plants without their own CEM file
                        print "loading from %s" % hc_file_name
-                       reader = csv.reader(hc_file)
-                       header = reader.next()               
                        if pp_name not in emissions_rate_so2 :
                            emissions_rate_so2[pp_name] = {}
                            emissions_tot_so2[pp_name] = {}
-                       print "emissions_rate loaded for %s" % pp_name                       
-                       for row in reader :
-                            month = int(row[1])
-                            day = int(row[2])
-                            hour = int(row[3])
-                            val = row[4]
-                            emis_agg = row[7]
-                            hc[month,day,hour] = VSL * BETA * float(val) * so2_emissions_rate / float(emis_agg) #val * (emissions rate / total aggregate source emissions)
+                       print "emissions_rate loaded for %s" % pp_name
+                       for month,day,hour,val,mwh,emis,emis_agg in \
+                               hc_data.load(hc_file_name,hc_cache_dir).tolist() :
+                            month,day,hour = int(month),int(day),int(hour)
+                            hc[month,day,hour] = val * so2_emissions_rate / emis_agg #val * (emissions rate / total aggregate source emissions)
                             emissions_rate_so2[pp_name][month,day,hour] =  so2_emissions_rate
-                            emissions_tot_so2[pp_name][month,day,hour] = float(emis_agg)
+                            emissions_tot_so2[pp_name][month,day,hour] = emis_agg
     
-        for t in years:
-             for m in months:
-                 for d in days:
-                     for h in hours:
-                         health_cost[t,m,d,h] = hc[m,d,h] 
-                         health_cost_pct[t,m,d,h] = hc[m,d,h] 
-                         health_cost_fs[t,m,d,h] = hc[m,d,h] 
+            health_cost.fill(hc)
         
                          
 
-    #else case -- nuclear, other and hydro plants
-    else :
-        for t in years:
-             for m in months:
-                 for d in days:
-                     for h in hours:
-                         health_cost[t,m,d,h] = 0.0
-                         health_cost_pct[t,m,d,h] = 0.0
-                         health_cost_fs[t,m,d,h] = 0.0
+        #else case -- nuclear, other and hydro plants, no health costs (the table
+        #starts at zero)
     
     
-    costs = PowerPlantCosts(fixed_cap_cost,fixed_cap_cost_pct,fixed_cap_cost_fs,inc_cap_cost,dec_cap_cost,fuel_cost,fuel_cost_pct,fuel_cost_fs,health_cost,health_cost_pct,health_cost_fs)
+        costs = PowerPlantCosts(fixed_cap_cost,fixed_cap_cost_pct,fixed_cap_cost_fs,inc_cap_cost,dec_cap_cost,fuel_cost,fuel_cost_pct,fuel_cost_fs,health_cost,health_cost,health_cost)
 
     
-    #check value of total capacity available    
-    total_capacity_avail += float(pow_plant['NAMEPCAP'])*float(pow_plant['CAPFAC_FIXED'])
-    #location
-    # For reference or testing purposes,
-    # Georgia corner coordinates 34.966999,-85.649414
-    #                            30.694612,-80.90332
-
-    r_lat = float(pow_plant['LAT']) 
-    r_lon = float(pow_plant['LON']) 
-    loc = Location(r_lat,r_lon,"GA")
-
-    #add the power plant
-    cap_factor = float(pow_plant['CAPFAC_FIXED'])
-    capacity = float(pow_plant['NAMEPCAP'])
-    min_power = float(pow_plant['MIN_POW'])
-
-            #         (type, cap_factor, capacity, min_p, name, location, costs):
-    ppadd = PowerPlant(pp_type,cap_factor,capacity,min_power,pp_name,loc,costs)
-
-    pp.append(ppadd)
-
-num_plants = len(pp)
-
-#close power plant data file
-pp_file.close()
-
-#load up array of load curves for use here 2004-2010 (or for years less than 2010)
-lc_data = [] 
-lc_dict = {}
-lc_file = base_dir + "data/lc_data/load_curves_2004_2010.csv"
-lc_file = open(lc_file,'rU')
-reader = csv.reader(lc_file)
-iter = 0
-for row in reader:
-    if iter == 0:
-        header = row
-    else:
-        i = 0
-        lc_data_ele = {}
-        #load up a quick dictionary based on the headers (probably a better way to do this?)
-        for h in header:
-            lc_data_ele[h] = row[i]
-            i = i + 1
-        #construct a date
-        date = datetime.date(int(lc_data_ele["YEAR"]), int(lc_data_ele["MONTH"]), int(lc_data_ele["DAY"]))
-
-        #get the load from this row
-        load = lc_data_ele["LOAD"]
-        
-        #get the hour from this row
-        hour = int(lc_data_ele["HOUR"])
-        
-        #store the load in a load curve dictionary for a given date,hour combo
-        if date in lc_dict :
-            lc_dict[date][hour] = float(load)
-        else :
-            lc_dict[date] = {}
-            lc_dict[date][hour] = float(load)
-    iter = iter + 1
-
-#next, load the load_curve into LoadCurve objects (better way to do this?)
-lc_array = {}
-for t in years:
-    for m in months:
-        for d in days :
-            load_new = []
-            for hour in hours :
+        #check value of total capacity available    
+        total_capacity_avail += float(pow_plant['NAMEPCAP'])*float(pow_plant['CAPFAC_FIXED'])
+        #location
+        # For reference or testing purposes,
+        # Georgia corner coordinates 34.966999,-85.649414
+        #                            30.694612,-80.90332
+
+        r_lat = float(pow_plant['LAT']) 
+        r_lon = float(pow_plant['LON']) 
+        loc = Location(r_lat,r_lon,"GA")
+
+        #add the power plant
+        cap_factor = float(pow_plant['CAPFAC_FIXED'])
+        capacity = float(pow_plant['NAMEPCAP'])
+        min_power = float(pow_plant['MIN_POW'])
+
+                #         (type, cap_factor, capacity, min_p, name, location, costs):
+        ppadd = PowerPlant(pp_type,cap_factor,capacity,min_power,pp_name,loc,costs)
+
+        pp.append(ppadd)
+
+    num_plants = len(pp)
+    phase_timer.end(num_plants)
+
+    #close power plant data file
+    pp_file.close()
+
+    #load curves for use here 2004-2010, by hour
+    lc = load_data.load(base_dir + "data/lc_data/load_curves_2004_2010.csv",
+                        base_dir + load_data.cache_dir)
+
+    return ModelInputs(pp, lc, emissions_rate_so2, emissions_tot_so2,
+                       total_capacity_avail)
+
+
+#load curves of a scenario, by (t, m, d)
+def load_curve_array(lc, start_year):
+    #next, load the load_curve into LoadCurve objects (better way to do this?)
+    lc_array = {}
+    for t in years:
+        for m in months:
+            for d in days :
                 year_in= start_year + t       
                 date = datetime.date(year_in, m, d)
                 #TODO Probabilistic load curve ? +/- 1000 MWh?
-                load_new.append(lc_dict[date][hour])
-                #print load_new
-            lc_array[t,m,d] = LoadCurve(load_new,date)
-#print lc
-
-#close load curve file
-lc_file.close()
+                load_new = lc.day(date)[hours].tolist()
+                lc_array[t,m,d] = LoadCurve(load_new,date)
+    return lc_array
+
+
+#plants of a scenario, with the health costs scaled by hc_scale (VSL * BETA)
+def scenario_plants(pp, hc_scale):
+    plants = []
+    for p in pp:
+        c = p.costs
+        health_cost = c.health_cost.scaled(hc_scale)
+        costs = PowerPlantCosts(c.fixed_cap_cost, c.fixed_cap_cost_pct,
+                                c.fixed_cap_cost_fs, c.inc_cap_cost,
+                                c.dec_cap_cost, c.fuel_cost, c.fuel_cost_pct,
+                                c.fuel_cost_fs, health_cost, health_cost,
+                                health_cost)
+        plants.append(PowerPlant(p.type, p.cap_factor, p.capacity,
+                                 p.min_power, p.name, p.location, costs))
+    return plants
 
 
 #interest rate adjustments year to year
-cost_adj = {}
+def discount_factors(real_years):
+    cost_adj = {}
+
+    for y in real_years :
+        t = y - base_year
+        v = 1 / (1 + int_rate)**t
+        cost_adj[y] = v
+    return cost_adj
 
-for y in real_years :
-    t = y - base_year
-    v = 1 / (1 + int_rate)**t
-    cost_adj[y] = v
-#print cost_adj
 
 ###############################################################################
 ############################ END INPUT FILES FOR MODEL ########################
 ###############################################################################
 
-############################ OPTIMIZE #########################################
-try:
+#set up one scenario, returns its Scenario (not built yet)
+#   inputs: ModelInputs from load_inputs
+#   VSL (in millions of USD2007), BETA (in percent per 10 microg / m**3)
+#   label: appended to the time stamp of the output files, keeps the files
+#          of scenarios started in the same second apart
+def setup_scenario(inputs, VSL, BETA, health_cost_included, start_year,
+                   label=""):
+    VSL_in, BETA_in = VSL, BETA
+    VSL = VSL * 1000000 #convert to millions
+    BETA = BETA / 10.0 #convert to 1 micrograms / m**3 PM2.5
+    real_years = range(start_year, start_year + num_years)
+    pp = scenario_plants(inputs.pp, VSL * BETA)
+    lc_array = load_curve_array(inputs.lc, start_year)
+    cost_adj = discount_factors(real_years)
+    emissions_rate_so2 = inputs.emissions_rate_so2
+    emissions_tot_so2 = inputs.emissions_tot_so2
+
+    if health_cost_included == True :
+        #PCT emissions rate decrease
+        PCT_EMISSIONS = 1 #0.1 #TODO fix emissions rate change
+    
+        #PCT emissions rate decrease
+        FS_EMISSIONS = 1 #0.01 #TODO fix emissions rate change
+    
+        #NONE emissions rate (should be 1.0 except for testing)
+        NONE_EMISSIONS_ADJ = 1
+    else :
+        PCT_EMISSIONS, FS_EMISSIONS, NONE_EMISSIONS_ADJ = 0.0, 0.0, 0.0
+
+    #output files
+    time_stamp = str(int(time.time())) + label
+    years_days_hours = str(num_years) + str(num_days) + str(num_hours)    
+    if health_cost_included :
+        hc_or_not = "_hc_" + years_days_hours + "_" + time_stamp + "_so4"
+    else :
+        hc_or_not = "_no_hc_" + years_days_hours + "_" + time_stamp + "_so4"
+    output_files = {}
+    if output_format == "npz":
+        output_files["summary"] = base_dir + 'data/output/output' + hc_or_not + '.json'
+        if columnar_output.writes(output_level, "plant"):
+            output_files["columns"] = base_dir + 'data/output/output' + hc_or_not + '.npz'
+    elif output_format == "csv":
+        if columnar_output.writes(output_level, "plant"):
+            output_files["plant"] = base_dir + 'data/output/output_plant_test' + hc_or_not + '.csv'
+        if columnar_output.writes(output_level, "hourly"):
+            output_files.update({
+                "output": base_dir + 'data/output/output' + hc_or_not + 'test.csv',
+                "plant_type": base_dir + 'data/output/output_plant_type_test' + hc_or_not + '.csv'})
+    else:
+        raise Exception("Output format error, %s is not csv or npz" %
+                        output_format)
+
+    s = Scenario(inputs, VSL_in, BETA_in, health_cost_included, start_year,
+                 pp, cost_adj, lc_array,
+                 (NONE_EMISSIONS_ADJ, PCT_EMISSIONS, FS_EMISSIONS),
+                 output_files)
+    s.time_stamp = time_stamp
+    solver_backend.check(solver)
+    if solve_mode not in ("monolithic", "benders"):
+        raise Exception("Solve mode error, %s is not monolithic or benders" %
+                        solve_mode)
+    if solver != "gurobi" and not use_matrix_build and \
+            solve_mode == "monolithic":
+        raise Exception("Solver error, %s solves the matrix-built model only"
+                        % solver)
+    if use_model_cache and not use_matrix_build:
+        raise Exception("Model cache error, only matrix-built models are "
+                        "cached")
+    if representative_day_count and not use_matrix_build:
+        raise Exception("Representative days error, only matrix-built "
+                        "models are built over representative days")
+    if write_run_report:
+        s.report_file = base_dir + run_report.log_dir + "CP_" + time_stamp + \
+            str(health_cost_included) + ".json"
+
+    #########  time grid  #########
+    s.grid = matrix_build.time_grid(years, months, days, hours)
+    if representative_day_count:
+        s.representative = representative_days.select_days(
+            s.grid, inputs.lc.grid_load(s.grid, start_year),
+            matrix_build.plant_health_costs(pp, s.grid),
+            representative_day_count)
+        print s.representative
+        s.grid, s.weight = s.representative.grid, \
+            s.representative.hour_weight
+
+    #########  model and result caches  #########
+    #the model is determined by the inputs and the code that turns them into
+    #matrices (not by this whole file, so that changing the solver here keeps
+    #the model), the solution also by the solver
+    model_parts = ("CP", pp, pp_var_costs, lc_array, cost_adj, VSL, BETA,
+                   health_cost_included, start_year, years, months, days,
+                   hours, R, pct_change, int_rate, base_year,
+                   NONE_EMISSIONS_ADJ, PCT_EMISSIONS, FS_EMISSIONS,
+                   representative_day_count,
+                   inspect.getsource(matrix_arguments))
+
+    #the model built before for the same inputs is read from the model cache
+    if use_model_cache and solve_mode == "monolithic":
+        s.model_key = result_cache.scenario_key(
+            model_parts, [matrix_build.__file__,
+                          representative_days.__file__])
+        s.model_dir = base_dir + model_cache.cache_dir
+
+    #an identical scenario solved before is answered from the result cache
+    if use_result_cache:
+        cache_dir = base_dir + result_cache.cache_dir
+        cache_key = result_cache.scenario_key(
+            model_parts + (emissions_rate_so2, emissions_tot_so2,
+                           output_format, output_level, solver, solve_mode,
+                           benders_block, benders_iterations, benders_gap,
+                           benders_penalty, benders_stabilization,
+                           representative_compare_full),
+            [__file__, matrix_build.__file__, columnar_output.__file__,
+             solver_backend.__file__, benders.__file__,
+             representative_days.__file__])
+        s.cache_key, s.cache_dir = cache_key, cache_dir
+    return s
+
+
+#print how the model was solved: to optimality, by a Benders run (benders,
+#its bounds) stopped at benders_iterations or with load not met, or not
+#at all
+def print_status(optimal, obj_val, benders):
+    if optimal:
+        print "Optimal Solution Found."
+    elif benders is None:
+        print 'Relaxation is infeasible'
+    elif not benders["converged"]:
+        print "Benders not converged after %d iterations: lower bound $%s, " \
+            "upper bound $%s, gap %.4f%%" % \
+            (benders["iterations"], '{0:,.2f}'.format(benders["lower_bound"]),
+             '{0:,.2f}'.format(obj_val), 100 * benders["gap"])
+    else:
+        print "Benders converged, but load is not met in the dispatch " \
+            "blocks (raise benders_penalty)"
+
+
+#the result of s from the result cache, with its output files restored, or
+#None if s wasn't solved before (or the cache is off)
+def cached_result(s):
+    if s.cache_key is None:
+        return None
+    cache_key, health_cost_included = s.cache_key, s.health_cost_included
+    cached = result_cache.fetch(cache_key, s.cache_dir)
+    if cached is not None:
+        cached.restore(s.output_files)
+        print "Cached solution found (%s), output files restored" % cache_key
+        print "--------------------------------------------"
+        if health_cost_included == True :
+            print "Objective (with health costs): $" + '{0:,.2f}'.format(cached.info["obj_val"])
+        else :
+            print "Objective (no health costs): $" + '{0:,.2f}'.format(cached.info["obj_val"])
+        print "Health cost: $%s" % func(cached.info["hc"],3)
+        print "--------------------------------------------"
+        print "Total load (MWh): %s (generated)\nPlant load (MWh): %s (demanded)" % ('{0:,.2f}'.format(cached.info["total_load"]), '{0:,.2f}'.format(cached.info["total_plant_load"]))
+        print_status(cached.info["optimal"], cached.info["obj_val"],
+                     cached.info.get("benders"))
+        return ScenarioResult(s.VSL_in, s.BETA_in, health_cost_included,
+                              s.start_year, cached.info["obj_val"],
+                              cached.info["hc"], cached.info["total_load"],
+                              cached.info["total_plant_load"],
+                              cached.info["optimal"], True,
+                              cached.arrays["capacity"], cached.arrays["gen"])
+
+
+#arguments of matrix_build.cp_matrices (and build_cp, after the model) of s
+#over grid, with the per-hour weights weight (None for every day)
+def matrix_arguments(s, grid, weight):
+    pp, cost_adj, start_year = s.pp, s.cost_adj, s.start_year
+    return (pp, grid, years, s.inputs.lc.grid_load(grid, start_year),
+            matrix_build.plant_year_costs(pp, pp_var_costs, years, start_year,
+                                          column=[p.type for p in pp]),
+            [cost_adj[start_year + t] for t in years],
+            matrix_build.plant_health_costs(pp, grid, "health_cost"),
+            matrix_build.plant_health_costs(pp, grid, "health_cost_pct"),
+            matrix_build.plant_health_costs(pp, grid, "health_cost_fs"),
+            s.emission_adj, R, pct_change, weight)
+
+
+#build the matrices of the model of s for a solver backend other than gurobi
+#or for the model cache, kept in s; a cached model is only looked up, and read
+#by the solver
+def build_matrices(s):
+    if s.model_key is not None:
+        cached = model_cache.fetch(s.model_key, s.model_dir)
+        if cached is not None:
+            print "Cached model found (%s), build skipped" % s.model_key
+            s.model_file, s.matrices = cached.model_file, (None, cached.index)
+            return s
+    s.matrices = matrix_build.cp_matrices(
+        *matrix_arguments(s, s.grid, s.weight))
+    if s.model_key is not None:
+        phase_timer.begin("model_cache")
+        s.model_file = model_cache.store(s.model_key, s.matrices[0],
+                                         s.matrices[1], s.model_dir,
+                                         "cap_planning").model_file
+        result_cache.evict(s.model_dir, model_cache_max_mb,
+                           model_cache_max_days)
+        phase_timer.end()
+    return s
+
+
+#build the gurobi model of s, kept in s (in the benders solve mode only the
+#model's arguments, its master and blocks are built while solving)
+def build_model(s):
+    if solve_mode == "benders":
+        s.arguments = matrix_arguments(s, s.grid, s.weight)
+        return s
+    if solver != "gurobi" or s.model_key is not None:
+        return build_matrices(s)
+    pp, cost_adj, lc_array = s.pp, s.cost_adj, s.lc_array
+    start_year, lc = s.start_year, s.inputs.lc
+    NONE_EMISSIONS_ADJ, PCT_EMISSIONS, FS_EMISSIONS = s.emission_adj
+    num_plants = len(pp)
+
     #########  create model  #########
     mod = gp.Model("cap_planning")
+    for param, value in s.params.items():
+        mod.setParam(param, value)
 
     #########  optimization parameters  #########
     #Set tolerance if need be, default is 10^-06
@@ -530,66 +877,77 @@ try:
     z_non = {} #non-FS, non-PCT electricity generated at plant i in year t, month m, day d, hour h
     hc = {}
     
-    #capacity of plant i in year t
-    for t in years:
-        disc = cost_adj[start_year + t] #discounting factor
-        for i,p in enumerate(pp):
-            x[i,t] = mod.addVar(vtype = gp.GRB.CONTINUOUS,
-                              obj = disc * p.costs.fixed_cap_cost,
-                              name = 'capacity_%s_%s' % (i,t))
+    if use_matrix_build:
+        #the dispatch block is assembled as block-structured sparse matrices
+        #over the (plant x hour) grid, sharing the investment variables
+        (x, y, q, pi_non, pi_pct, pi_fs,
+         z_non, z_pct, z_fs, z) = matrix_build.build_cp(
+            mod, *matrix_arguments(s, s.grid, s.weight))
+    else:
+        phase_timer.begin("variables")
+        #capacity of plant i in year t
+        for t in years:
+            disc = cost_adj[start_year + t] #discounting factor
+            for i,p in enumerate(pp):
+                x[i,t] = mod.addVar(vtype = gp.GRB.CONTINUOUS,
+                                  obj = disc * p.costs.fixed_cap_cost,
+                                  name = 'capacity_%s_%s' % (i,t))
 
-    #inc capacity of plant i in year t
-    for t in years:
-        disc = cost_adj[start_year + t] #discounting factor
-        for i,p in enumerate(pp):
-            y[i,t] = mod.addVar(vtype = gp.GRB.INTEGER,
-                              obj = disc * p.costs.inc_cap_cost,
-                              name = 'inc_capacity_%s_%s' % (i,t))
+        #inc capacity of plant i in year t
+        for t in years:
+            disc = cost_adj[start_year + t] #discounting factor
+            for i,p in enumerate(pp):
+                y[i,t] = mod.addVar(vtype = gp.GRB.INTEGER,
+                                  obj = disc * p.costs.inc_cap_cost,
+                                  name = 'inc_capacity_%s_%s' % (i,t))
 
-    #dec capacity of plant i in year t
-    for t in years:
-        disc = cost_adj[start_year + t] #discounting factor
-        for i,p in enumerate(pp):            
-            q[i,t] = mod.addVar(vtype = gp.GRB.INTEGER,
-                              obj = disc * p.costs.dec_cap_cost,
-                              name = 'dec_capacity_%s_%s' % (i,t))
+        #dec capacity of plant i in year t
+        for t in years:
+            disc = cost_adj[start_year + t] #discounting factor
+            for i,p in enumerate(pp):            
+                q[i,t] = mod.addVar(vtype = gp.GRB.INTEGER,
+                                  obj = disc * p.costs.dec_cap_cost,
+                                  name = 'dec_capacity_%s_%s' % (i,t))
 
-    #generation type of plant i in year t (binary)
-    for t in years:
-        for i,p in enumerate(pp):
-            pi_non[i,t] = mod.addVar(vtype = gp.GRB.BINARY,
-                              obj = 0.0,
-                              name = 'pi_non_%s_%s' % (i,t))                              
-            pi_pct[i,t] = mod.addVar(vtype = gp.GRB.BINARY,
-                              obj = 0.0,
-                              name = 'pi_pct_%s_%s' % (i,t))                              
-            pi_fs[i,t] = mod.addVar(vtype = gp.GRB.BINARY,
-                              obj = 0.0,
-                              name = 'pi_fs_%s_%s' % (i,t))                              
+        #generation type of plant i in year t (binary)
+        for t in years:
+            for i,p in enumerate(pp):
+                pi_non[i,t] = mod.addVar(vtype = gp.GRB.BINARY,
+                                  obj = 0.0,
+                                  name = 'pi_non_%s_%s' % (i,t))                              
+                pi_pct[i,t] = mod.addVar(vtype = gp.GRB.BINARY,
+                                  obj = 0.0,
+                                  name = 'pi_pct_%s_%s' % (i,t))                              
+                pi_fs[i,t] = mod.addVar(vtype = gp.GRB.BINARY,
+                                  obj = 0.0,
+                                  name = 'pi_fs_%s_%s' % (i,t))                              
                               
-    #electricity generated at plant i in year t, season s, hour h
-    for t in years:
-        disc = cost_adj[start_year + t] #discounting factor                
-        for m in months:
-            for d in days:
-                for h in hours:
-                    for i,p in enumerate(pp):
-                        var_cost = float(pp_var_costs[2004+t][p.type])
-                        z_non[i,t,m,d,h] = mod.addVar(vtype = gp.GRB.CONTINUOUS,
-                                          obj = disc * (var_cost + p.costs.health_cost[t,m,d,h] * NONE_EMISSIONS_ADJ ),
-                                          name = 'gen_%s_%s_%s_%s_%s' % (i,t,m,d,h))
-                        z_pct[i,t,m,d,h] = mod.addVar(vtype = gp.GRB.CONTINUOUS,
-                                          obj = disc * (var_cost + p.costs.health_cost_pct[t,m,d,h] * PCT_EMISSIONS ),
-                                          name = 'gen_pct_%s_%s_%s_%s_%s' % (i,t,m,d,h))
-                        z_fs[i,t,m,d,h] = mod.addVar(vtype = gp.GRB.CONTINUOUS,
-                                          obj = disc * (var_cost + p.costs.health_cost_fs[t,m,d,h] * FS_EMISSIONS ),
-                                          name = 'gen_fs_%s_%s_%s_%s_%s' % (i,t,m,d,h))
-                        z[i,t,m,d,h] = mod.addVar(vtype = gp.GRB.CONTINUOUS,
-                                          obj = 0.0,
-                                          name = 'gen_total_%s_%s_%s_%s_%s' % (i,t,m,d,h))                                      
+        #electricity generated at plant i in year t, season s, hour h
+        for t in years:
+            disc = cost_adj[start_year + t] #discounting factor                
+            for m in months:
+                for d in days:
+                    for h in hours:
+                        for i,p in enumerate(pp):
+                            var_cost = float(pp_var_costs[start_year+t][p.type])
+                            z_non[i,t,m,d,h] = mod.addVar(vtype = gp.GRB.CONTINUOUS,
+                                              obj = disc * (var_cost + p.costs.health_cost[t,m,d,h] * NONE_EMISSIONS_ADJ ),
+                                              name = 'gen_%s_%s_%s_%s_%s' % (i,t,m,d,h))
+                            z_pct[i,t,m,d,h] = mod.addVar(vtype = gp.GRB.CONTINUOUS,
+                                              obj = disc * (var_cost + p.costs.health_cost_pct[t,m,d,h] * PCT_EMISSIONS ),
+                                              name = 'gen_pct_%s_%s_%s_%s_%s' % (i,t,m,d,h))
+                            z_fs[i,t,m,d,h] = mod.addVar(vtype = gp.GRB.CONTINUOUS,
+                                              obj = disc * (var_cost + p.costs.health_cost_fs[t,m,d,h] * FS_EMISSIONS ),
+                                              name = 'gen_fs_%s_%s_%s_%s_%s' % (i,t,m,d,h))
+                            z[i,t,m,d,h] = mod.addVar(vtype = gp.GRB.CONTINUOUS,
+                                              obj = 0.0,
+                                              name = 'gen_total_%s_%s_%s_%s_%s' % (i,t,m,d,h))                                      
+        phase_timer.end()
     
     # Integrate new variables
+    phase_timer.begin("update")
     mod.update()
+    phase_timer.end()
 
     #########  objective  #########
     #objective
@@ -597,118 +955,121 @@ try:
     mod.setAttr(gp.GRB.attr.ModelSense, gp.GRB.MINIMIZE)
 
     #########  constraints  #########
-    cap_constr = {}
+    if not use_matrix_build:
+        phase_timer.begin("constraints")
+        cap_constr = {}
     
-    #yearly change in capacity balance constraints
-    for t in years:
-        for i,p in enumerate(pp):
-            if(t > 0):
-                #mod.addConstr(x[i,t] - x[i,(t-1)] == y[i,t] - q[i,t] , "change_cap_%s_%s" % (i,t))
-                cap_constr[i,t] = mod.addConstr(x[i,t] - x[i,(t-1)] == y[i,t] - q[i,t] , "change_cap_%s_%s" % (i,t))
-
-    #constraints on pi vars
-    #for i,p in enumerate(pp):
-    #    for t in years:
-    #        if(t > 0):
-    #            cap_constr[i,t] = mod.addConstr(x[i,t] - x[i,(t-1)] == y[i,t] - q[i,t] , "change_cap_%s_%s" % (i,t))
+        #yearly change in capacity balance constraints
+        for t in years:
+            for i,p in enumerate(pp):
+                if(t > 0):
+                    #mod.addConstr(x[i,t] - x[i,(t-1)] == y[i,t] - q[i,t] , "change_cap_%s_%s" % (i,t))
+                    cap_constr[i,t] = mod.addConstr(x[i,t] - x[i,(t-1)] == y[i,t] - q[i,t] , "change_cap_%s_%s" % (i,t))
+
+        #constraints on pi vars
+        #for i,p in enumerate(pp):
+        #    for t in years:
+        #        if(t > 0):
+        #            cap_constr[i,t] = mod.addConstr(x[i,t] - x[i,(t-1)] == y[i,t] - q[i,t] , "change_cap_%s_%s" % (i,t))
  
 
-    #demand must be met with available capacity
-    for h in hours:
-        for m in months:
-            for d in days:
-                for t in years:
-                    mod.addConstr(gp.quicksum([z[i,t,m,d,h] for i in range(num_plants)]) == lc_array[t,m,d].load[h], "load_%s_%s_%s_%s" % (h,m,d,t))
+        #demand must be met with available capacity
+        for h in hours:
+            for m in months:
+                for d in days:
+                    for t in years:
+                        mod.addConstr(gp.quicksum([z[i,t,m,d,h] for i in range(num_plants)]) == lc_array[t,m,d].load[h], "load_%s_%s_%s_%s" % (h,m,d,t))
                 
-    #reserve must be available if need be -- R = % above load needed on reserve           
-    for h in hours:
-        for m in months:
-            for d in days:
-                for t in years:
-                    #TODO could just change this to >= max(lc_array) for the year t... but for now just leave it since it's easier
-                    mod.addConstr(gp.quicksum([x[i,t] for i in range(num_plants)]) >= lc_array[t,m,d].load[h] * (1+R), "reserve_%s_%s_%s_%s" % (h,m,d,t))
+        #reserve must be available if need be -- R = % above load needed on reserve           
+        for h in hours:
+            for m in months:
+                for d in days:
+                    for t in years:
+                        #TODO could just change this to >= max(lc_array) for the year t... but for now just leave it since it's easier
+                        mod.addConstr(gp.quicksum([x[i,t] for i in range(num_plants)]) >= lc_array[t,m,d].load[h] * (1+R), "reserve_%s_%s_%s_%s" % (h,m,d,t))
                 
-    ##capacity constraints
-    #all plants
-    for h in hours:
-        for m in months:
-            for d in days:
-                for t in years:
-                    for i,p in enumerate(pp):
-                        #baseload capacity (% of minimum capacities)                    
-                        mod.addConstr(z[i,t,m,d,h] >= p.min_power*x[i,t], "plant_min_cap_%s_%s_%s_%s_%s" % (i,t,m,d,h))                        
+        ##capacity constraints
+        #all plants
+        for h in hours:
+            for m in months:
+                for d in days:
+                    for t in years:
+                        for i,p in enumerate(pp):
+                            #baseload capacity (% of minimum capacities)                    
+                            mod.addConstr(z[i,t,m,d,h] >= p.min_power*x[i,t], "plant_min_cap_%s_%s_%s_%s_%s" % (i,t,m,d,h))                        
                     
-                        #capacity of a plant (based on capacity factor and nameplate capacity)                        
-                        mod.addConstr(z[i,t,m,d,h] <= p.cap_factor*x[i,t], "plant_cap_%s_%s_%s_%s_%s" % (i,t,m,d,h))
+                            #capacity of a plant (based on capacity factor and nameplate capacity)                        
+                            mod.addConstr(z[i,t,m,d,h] <= p.cap_factor*x[i,t], "plant_cap_%s_%s_%s_%s_%s" % (i,t,m,d,h))
                         
-                        #generation must be one of three different types of generation at a plant -- FS, PCT or neither
-                        mod.addConstr(z[i,t,m,d,h] == z_non[i,t,m,d,h] + z_fs[i,t,m,d,h] + z_pct[i,t,m,d,h], "plant_gen_types_%s_%s_%s_%s_%s" % (i,t,m,d,h))
+                            #generation must be one of three different types of generation at a plant -- FS, PCT or neither
+                            mod.addConstr(z[i,t,m,d,h] == z_non[i,t,m,d,h] + z_fs[i,t,m,d,h] + z_pct[i,t,m,d,h], "plant_gen_types_%s_%s_%s_%s_%s" % (i,t,m,d,h))
                         
-                        #must choose exactly one generation type, but no more! (big-M constraints using p.capacity as "M")
-                        mod.addConstr(z_pct[i,t,m,d,h] <= pi_pct[i,t]*p.capacity, "plant_gen_pct_%s_%s_%s_%s_%s" % (i,t,m,d,h))
-                        mod.addConstr(z_non[i,t,m,d,h] <= pi_non[i,t]*p.capacity, "plant_gen_non_%s_%s_%s_%s_%s" % (i,t,m,d,h))
-                        mod.addConstr(z_fs[i,t,m,d,h] <= pi_fs[i,t]*p.capacity, "plant_gen_fs_%s_%s_%s_%s_%s" % (i,t,m,d,h))
+                            #must choose exactly one generation type, but no more! (big-M constraints using p.capacity as "M")
+                            mod.addConstr(z_pct[i,t,m,d,h] <= pi_pct[i,t]*p.capacity, "plant_gen_pct_%s_%s_%s_%s_%s" % (i,t,m,d,h))
+                            mod.addConstr(z_non[i,t,m,d,h] <= pi_non[i,t]*p.capacity, "plant_gen_non_%s_%s_%s_%s_%s" % (i,t,m,d,h))
+                            mod.addConstr(z_fs[i,t,m,d,h] <= pi_fs[i,t]*p.capacity, "plant_gen_fs_%s_%s_%s_%s_%s" % (i,t,m,d,h))
 
 
-    #all plants final max capacity
-    for t in years:
-        for i,p in enumerate(pp):
-            #all plants final max capacity    
-            mod.addConstr(x[i,t] <= p.capacity , "plant_cap_%s_%s" % (i,t))
+        #all plants final max capacity
+        for t in years:
+            for i,p in enumerate(pp):
+                #all plants final max capacity    
+                mod.addConstr(x[i,t] <= p.capacity , "plant_cap_%s_%s" % (i,t))
             
-            #generation type choice
-            mod.addConstr(pi_pct[i,t] + pi_fs[i,t] + pi_non[i,t] == 1.0, "plant_gen_type_%s_%s" % (i,t))
+                #generation type choice
+                mod.addConstr(pi_pct[i,t] + pi_fs[i,t] + pi_non[i,t] == 1.0, "plant_gen_type_%s_%s" % (i,t))
 
-    #TODO TESTING
-    #all plants set to no pct, no fs
-    for t in years:
-        for i,p in enumerate(pp):
-            #generation type choice
-            mod.addConstr(pi_pct[i,t] == 1.0, "plant_gen_set_type_%s_%s" % (i,t))
-    #TODO TESTING
+        #TODO TESTING
+        #all plants set to no pct, no fs
+        for t in years:
+            for i,p in enumerate(pp):
+                #generation type choice
+                mod.addConstr(pi_pct[i,t] == 1.0, "plant_gen_set_type_%s_%s" % (i,t))
+        #TODO TESTING
 
 
 
-    #change in power usage constraint
-    for t in years:
-        for m in months:
-            for d in days: 
-                for h in hours:
-                    for i,p in enumerate(pp):
-                            #baseload capacity (just % minimum capacities)                    
-                            if (h > 0 and p.type == 0)  : #coal plants only
-                                mod.addConstr(z[i,t,m,d,h] - z[i,t,m,d,(h-1)] <= pct_change * x[i,t], "plant_change_usage_%s_%s_%s_%s_%s" % (i,t,m,d,h))                        
+        #change in power usage constraint
+        for t in years:
+            for m in months:
+                for d in days: 
+                    for h in hours:
+                        for i,p in enumerate(pp):
+                                #baseload capacity (just % minimum capacities)                    
+                                if (h > 0 and p.type == 0)  : #coal plants only
+                                    mod.addConstr(z[i,t,m,d,h] - z[i,t,m,d,(h-1)] <= pct_change * x[i,t], "plant_change_usage_%s_%s_%s_%s_%s" % (i,t,m,d,h))                        
                             
 
 
 
-    #health cost total
-    expr = gp.LinExpr(0.0)
-    for t in years:
-        disc = cost_adj[start_year + t] #discounting factor                
-        for m in months:
-            for d in days:
-                for h in hours:
-                    for i,p in enumerate(pp):
-                        expr.add(z_non[i,t,m,d,h] * disc * (p.costs.health_cost[t,m,d,h] ))
-                        expr.add(z_pct[i,t,m,d,h] * disc * (p.costs.health_cost_pct[t,m,d,h] ))
-                        expr.add(z_fs[i,t,m,d,h] * disc * (p.costs.health_cost_fs[t,m,d,h] ))
-                                          
-    mod.addConstr(expr >= -1000000000, "health_cost");
-
-    #health cost plant total
-    expr_arr = {}
-    for i,p in enumerate(pp):
-        expr_arr[i] = gp.LinExpr(0.0)
+        #health cost total
+        expr = gp.LinExpr(0.0)
         for t in years:
             disc = cost_adj[start_year + t] #discounting factor                
             for m in months:
                 for d in days:
                     for h in hours:
-                        expr_arr[i].add(z_non[i,t,m,d,h] * disc * (p.costs.health_cost[t,m,d,h] ))
-                        expr_arr[i].add(z_pct[i,t,m,d,h] * disc * (p.costs.health_cost_pct[t,m,d,h] ))
-                        expr_arr[i].add(z_fs[i,t,m,d,h] * disc * (p.costs.health_cost_fs[t,m,d,h] ))
-        mod.addConstr(expr_arr[i] >= -1000000000, "health_cost_%s" % i);                                      
+                        for i,p in enumerate(pp):
+                            expr.add(z_non[i,t,m,d,h] * disc * (p.costs.health_cost[t,m,d,h] ))
+                            expr.add(z_pct[i,t,m,d,h] * disc * (p.costs.health_cost_pct[t,m,d,h] ))
+                            expr.add(z_fs[i,t,m,d,h] * disc * (p.costs.health_cost_fs[t,m,d,h] ))
+                                          
+        mod.addConstr(expr >= -1000000000, "health_cost");
+
+        #health cost plant total
+        expr_arr = {}
+        for i,p in enumerate(pp):
+            expr_arr[i] = gp.LinExpr(0.0)
+            for t in years:
+                disc = cost_adj[start_year + t] #discounting factor                
+                for m in months:
+                    for d in days:
+                        for h in hours:
+                            expr_arr[i].add(z_non[i,t,m,d,h] * disc * (p.costs.health_cost[t,m,d,h] ))
+                            expr_arr[i].add(z_pct[i,t,m,d,h] * disc * (p.costs.health_cost_pct[t,m,d,h] ))
+                            expr_arr[i].add(z_fs[i,t,m,d,h] * disc * (p.costs.health_cost_fs[t,m,d,h] ))
+            mod.addConstr(expr_arr[i] >= -1000000000, "health_cost_%s" % i);                                      
+        phase_timer.end()
     
 
 
@@ -742,119 +1103,309 @@ try:
 
     #renewable electricity standard
 
-    #########  solve  #########
-    mod.optimize()
-
-    #########  output  #########
-    
-    #calculate health costs from dummy constraint
-    health_cost = mod.getConstrByName("health_cost")
-    slack = health_cost.getAttr(gp.GRB.attr.Slack)
-    rhs = health_cost.getAttr(gp.GRB.attr.RHS)
-    hc = rhs - slack
-
-    #calculate health costs from plant dummy constraints
-    hc_arr = {}
-    for i,p in enumerate(pp):
-        hc_arr[i] = 0.0
-        health_cost_p = mod.getConstrByName("health_cost_%s" % i)
-        slack = health_cost_p.getAttr(gp.GRB.attr.Slack)
-        rhs = health_cost_p.getAttr(gp.GRB.attr.RHS)
-        hc_arr[i] = rhs - slack
-        #print "Health cost at %s is %f" % (p.name,hc_arr[i])
-
-    for v in mod.getVars():
-        #gather data for each hour, for each power plant type (coal, nuclear, etc...)
-        #inverse the key-value mapping for power plant types
-        inv_pp_types = {v:k for k, v in pp_types.items()}
-        #print if larger than 0
-        #if v.x > 0.0 :
-            #print "%s\t:\t%.1f " % (v.varName, v.x)
-
-
-    load_totals = {}
-    for t in years:
-        for m in months:
-            for d in days:
-                for h in hours :
-                    for j,k in pp_types.items():
-                        load_totals[j,t,m,d,h] = 0.0
+    s.mod = mod
+    s.variables = (x, y, q, pi_non, pi_pct, pi_fs, z_non, z_pct, z_fs, z)
+    return s
+
+
+#solve the model of s
+def solve_model(s):
+    if s.matrices is not None:
+        mm, index = s.matrices
+        if mm is None: #from the model cache
+            s.solution = solver_backend.solve_file(s.model_file, s.params,
+                                                   "cap_planning", solver)
+        else:
+            s.solution = solver_backend.solve(mm, s.params, "cap_planning",
+                                              solver)
+        print s.solution
+    elif s.arguments is not None:
+        phase_timer.begin("benders")
+        s.benders = benders.solve_benders(
+            s.arguments, benders_block, benders_iterations, benders_gap,
+            benders_workers, s.params, solver, benders_penalty,
+            benders_stabilization)
+        phase_timer.end()
+        print s.benders
+    else:
+        phase_timer.begin("optimize")
+        s.mod.optimize()
+        phase_timer.end()
+
+    #the model over every day, for the error of the representative days
+    if s.representative is not None and representative_compare_full:
+        phase_timer.begin("full_model")
+        grid = matrix_build.time_grid(years, months, days, hours)
+        mm, index = matrix_build.cp_matrices(*matrix_arguments(s, grid, None))
+        s.full_solution = (solver_backend.solve(mm, s.params,
+                                                "cap_planning_full", solver),
+                           index)
+        phase_timer.end()
+    s.solved = True
+    return s
+
+
+#health costs, totals and output files of the solved s (stored in the result
+#cache), returns its ScenarioResult
+def extract_results(s):
+    pp, mod, start_year = s.pp, s.mod, s.start_year
+    health_cost_included, output_files = s.health_cost_included, s.output_files
+    cache_key, cache_dir = s.cache_key, s.cache_dir
+    emissions_rate_so2 = s.inputs.emissions_rate_so2
+    emissions_tot_so2 = s.inputs.emissions_tot_so2
+    num_plants = len(pp)
+    grid = s.grid
+    #days each hour stands for (1 without representative days)
+    weight = s.weight if s.weight is not None else np.ones(grid.num_hours)
+
+    #(plants x years) capacities and (plants x hours) generation, with one
+    #bulk X query each; every total below is a reduction of these arrays and
+    #the writers read the same arrays (and the bounds of a benders run, for
+    #one stopped before they met)
+    benders_info = None
+    if s.solution is not None:
+        #columns of the solver backend's solution, and the health costs of
+        #the dummy rows, total and per plant
+        index = s.matrices[1]
+        sol_x = s.solution.x
+        if sol_x is None:
+            raise solver_backend.SolverError(
+                "No solution found, %s status %s" %
+                (solver, s.solution.status))
+        capacity_x = sol_x[index["x"]]
+        gen_x = sol_x[index["z"]]
+        hc_values = s.solution.row_x[index["rows"]["health_cost"]]
+        obj_val, optimal = s.solution.obj_val, s.solution.optimal
+    elif s.benders is not None:
+        capacity_x, gen_x = s.benders.capacity, s.benders.gen
+        hc_values = s.benders.hc_values
+        obj_val, optimal = s.benders.obj_val, s.benders.optimal
+        benders_info = {"converged": s.benders.converged,
+                        "lower_bound": s.benders.lower_bound,
+                        "gap": s.benders.gap,
+                        "iterations": s.benders.iterations}
+    else:
+        x, y, q, pi_non, pi_pct, pi_fs, z_non, z_pct, z_fs, z = s.variables
+        capacity_x = np.array(mod.getAttr("X", [x[i,t] for i in range(num_plants) for t in years])).reshape(num_plants, num_years)
+        gen_x, = matrix_build.solution_grids(mod, [z], num_plants, grid)
+
+        #calculate health costs from the dummy constraints, total and per plant
+        hc_constrs = [mod.getConstrByName("health_cost")] + \
+            [mod.getConstrByName("health_cost_%s" % i) for i in range(num_plants)]
+        hc_values = np.array(mod.getAttr("RHS", hc_constrs)) - \
+            np.array(mod.getAttr("Slack", hc_constrs))
+        obj_val, optimal = mod.objVal, mod.status == gp.GRB.status.OPTIMAL
+    hc = float(hc_values[0])
+    hc_arr = hc_values[1:]
+
+    #load by plant, by plant type and hour, and in total
+    plant_load = np.dot(gen_x, weight)
+    plant_type = np.array([p.type for p in pp])
+    load_totals = np.array([gen_x[plant_type == j].sum(axis=0)
+                            for j in pp_types])
+    total_plant_load = float(plant_load.sum())
+
+    print "--------------------------------------------"
+    if health_cost_included == True :
+        print "Objective (with health costs): $" + '{0:,.2f}'.format(obj_val)
+        print "Health cost: $%s" % func(hc,3)
 
-    #calculate plant load and output results to output.csv
-    total_plant_load = 0.0
-    
-    time_stamp = str(int(time.time()))
-    years_days_hours = str(num_years) + str(num_days) + str(num_hours)    
-    if health_cost_included :
-        hc_or_not = "_hc_" + years_days_hours + "_" + time_stamp + "_so4"
     else :
-        hc_or_not = "_no_hc_" + years_days_hours + "_" + time_stamp + "_so4"
-    with open(base_dir + 'data/output/output' + hc_or_not + 'test.csv', 'wb') as csvfile:
-        w = csv.writer(csvfile)
-        w.writerow(("Name", "Lat", "Lon", "Year", "Month", "Day", "Hour", "Load", "SO2_EMISSIONS_RATE", "SO2_EMISSIONS_TOT", "HEALTH_COST"))
-        for t in years:
-            for m in months:
-                for d in days:
-                    for h in hours :
-                        for i,p in enumerate(pp) :
-                            total_plant_load += z[i,t,m,d,h].getAttr("X")
-                            for j,k in pp_types.items():
-                                if p.type == j:
-                                    load_totals[j,t,m,d,h] += z[i,t,m,d,h].getAttr("X")
-                            if p.type in [0,1,2,5,6] :
-                                emissions_rate_so2_hour = emissions_rate_so2[p.name][m,d,h]
-                                emissions_tot_so2_hour = emissions_tot_so2[p.name][m,d,h]
-                                health_cost_hour = p.costs.health_cost[t,m,d,h]
-                            else :
-                                emissions_rate_so2_hour = 0.0
-                                emissions_tot_so2_hour = 0.0
-                                health_cost_hour = 0.0
-                            #print (p.name, p.location.lat, p.location.lon, t, m, d, h, z[i,t,m,d,h].getAttr("X"), emissions_rate_so2_hour, emissions_tot_so2_hour, health_cost_hour)
-                            w.writerow((p.name, p.location.lat, p.location.lon, t, m, d, h, z[i,t,m,d,h].getAttr("X"), emissions_rate_so2_hour, emissions_tot_so2_hour, health_cost_hour))
- 
+        print "Objective (no health costs): $" + '{0:,.2f}'.format(obj_val)
+        print "Health cost: $%s" % func(hc,3)
+    print "--------------------------------------------"
+
+    #error of the representative days against the model over every day
+    if s.full_solution is not None:
+        full, index = s.full_solution
+        if full.x is None:
+            raise solver_backend.SolverError(
+                "No solution found for the full model, %s status %s" %
+                (solver, full.status))
+        full_hc = float(full.row_x[index["rows"]["health_cost"]][0])
+        s.full_error = {
+            "obj_val": full.obj_val,
+            "obj_error": (obj_val - full.obj_val) / max(abs(full.obj_val),
+                                                        1e-10),
+            "hc": full_hc,
+            "hc_error": (hc - full_hc) / max(abs(full_hc), 1e-10),
+            "capacity_error": float(np.abs(capacity_x -
+                                           full.x[index["x"]]).max())}
+        print "Full model: objective $%s (%.4f%% error), health cost $%s " \
+            "(%.4f%% error), capacity off by up to %.1f MW" % \
+            ('{0:,.2f}'.format(full.obj_val),
+             100 * s.full_error["obj_error"], func(full_hc, 3),
+             100 * s.full_error["hc_error"], s.full_error["capacity_error"])
         print "--------------------------------------------"
-        if health_cost_included == True :
-            print "Objective (with health costs): $" + '{0:,.2f}'.format(mod.objVal)
-            print "Health cost: $%s" % func(hc,3)
 
-        else :
-            print "Objective (no health costs): $" + '{0:,.2f}'.format(mod.objVal)
-            print "Health cost: $%s" % func(hc,3)
-        print "--------------------------------------------"
-    #calculate individual plant load and output total results for each plant
-    with open(base_dir + 'data/output/output_plant_test' + hc_or_not + '.csv', 'wb') as csvfile:
-        w = csv.writer(csvfile)
-        w.writerow(("Name", "Type", "Lat", "Lon", "Load", "Health_Impact"))
-        for i,p in enumerate(pp) :
-            plant_load = 0.0
-            for t in years:
-                for m in months:
-                    for d in days:
-                        for h in hours :
-                            plant_load += z[i,t,m,d,h].getAttr("X")
-            w.writerow((p.name, pp_types[p.type], p.location.lat, p.location.lon, plant_load, hc_arr[i]))
-
-    #calculate plant type load and output total results for each plant type
-    with open(base_dir + 'data/output/output_plant_type_test' + hc_or_not + '.csv', 'wb') as csvfile:
-        w = csv.writer(csvfile)
-        w.writerow(("Type", "Year", "Month", "Day", "Hour", "Load"))
-        for t in years:
-             for m in months:
-                 for d in days:
-                     for h in hours :
-                        for j,pp_type in pp_types.items():
-                             w.writerow((pp_type, t, m, d, h, load_totals[j,t,m,d,h]))
+    #hourly SO2 emissions rates, totals and health costs of the emitting
+    #plants, (hour x plant) like the rows of the output file
+    hourly = columnar_output.writes(output_level, "hourly")
+    if hourly:
+        emitting = np.array([p.type in [0,1,2,5,6] for p in pp])
+        hour_keys = [(m, d, h) for (t, m, d, h) in grid.keys]
+        so2_rate, so2_tot = [], []
+        for p, e in zip(pp, emitting):
+            if e:
+                so2_rate.append([emissions_rate_so2[p.name][key]
+                                 for key in hour_keys])
+                so2_tot.append([emissions_tot_so2[p.name][key]
+                                for key in hour_keys])
+            else:
+                so2_rate.append([0.0] * grid.num_hours)
+                so2_tot.append([0.0] * grid.num_hours)
+        so2_rate, so2_tot = zip(*so2_rate), zip(*so2_tot)
+        hour_hc = np.where(emitting[:, None],
+                           matrix_build.plant_health_costs(pp, grid), 0.0)
 
     #add up total production across entire planning period
-    total_load = 0.0
-    for h in hours:
-        for m in months:
-            for d in days:
-                for t in years:
-                    total_load += lc_array[t,m,d].load[h]
+    total_load = float(np.dot(s.inputs.lc.grid_load(grid, start_year),
+                              weight))
+
+    phase_timer.begin("write")
+    #columnar output file and its sidecar
+    if output_format == "npz":
+        phase_timer.begin("columns")
+        cols = columnar_output.Columns()
+        if columnar_output.writes(output_level, "plant"):
+            cols.add("name", [p.name for p in pp], ["plant"], "plant name")
+            cols.add("type", plant_type, ["plant"],
+                     "plant type (index of type_name)")
+            cols.add("lat", [p.location.lat for p in pp], ["plant"],
+                     "latitude")
+            cols.add("lon", [p.location.lon for p in pp], ["plant"],
+                     "longitude")
+            cols.add("load", plant_load, ["plant"], "generation (MWh)")
+            cols.add("health_impact", hc_arr, ["plant"],
+                     "discounted health cost (USD2007)")
+            cols.add("capacity", capacity_x, ["plant", "year"],
+                     "capacity in each year of the horizon (MW)")
+        if hourly:
+            cols.add("year", [t + start_year for (t, m, d, h) in grid.keys],
+                     ["hour"], "year")
+            cols.add("month", [m for (t, m, d, h) in grid.keys], ["hour"],
+                     "month")
+            cols.add("day", [d for (t, m, d, h) in grid.keys], ["hour"],
+                     "day of the month")
+            cols.add("hour", [h for (t, m, d, h) in grid.keys], ["hour"],
+                     "hour of the day")
+            if s.weight is not None:
+                cols.add("weight", weight, ["hour"],
+                         "days the hour's representative day stands for")
+            cols.add("gen", gen_x, ["plant", "hour"], "generation (MWh)")
+            cols.add("so2_rate", np.array(so2_rate).T, ["plant", "hour"],
+                     "SO2 emissions rate")
+            cols.add("so2_tot", np.array(so2_tot).T, ["plant", "hour"],
+                     "SO2 emissions")
+            cols.add("health_cost", hour_hc, ["plant", "hour"],
+                     "health cost per MWh (USD2007, undiscounted)")
+            cols.add("type_name", pp_types.values(), ["type"],
+                     "plant type name")
+            cols.add("type_load", load_totals, ["type", "hour"],
+                     "generation by plant type (MWh)")
+        summary = {"model": "CP", "VSL": s.VSL_in, "BETA": s.BETA_in,
+                   "health_cost_included": health_cost_included,
+                   "start_year": start_year, "obj_val": obj_val, "hc": hc,
+                   "total_load": total_load,
+                   "total_plant_load": total_plant_load,
+                   "optimal": optimal, "benders": benders_info,
+                   "type_load": dict((k, float(np.dot(load_totals[n], weight)))
+                                     for n, k in enumerate(pp_types.values()))}
+        columnar_output.write(output_files["summary"], output_level, summary,
+                              cols)
+        phase_timer.end(len(cols.info))
+
+    #hourly rows of each plant (with representative days, each row also
+    #holds the days its hour stands for, as do the plant type rows)
+    if "output" in output_files:
+        phase_timer.begin("output")
+        with open(output_files["output"], 'wb') as csvfile:
+            w = csv.writer(csvfile)
+            header = ("Name", "Lat", "Lon", "Year", "Month", "Day", "Hour", "Load", "SO2_EMISSIONS_RATE", "SO2_EMISSIONS_TOT", "HEALTH_COST")
+            w.writerow(header + (("Weight",) if s.weight is not None else ()))
+            columns = [gen_x.T.tolist(), so2_rate, so2_tot, hour_hc.T.tolist()]
+            for k, (t, m, d, h) in enumerate(grid.keys):
+                extra = (weight[k],) if s.weight is not None else ()
+                w.writerows((p.name, p.location.lat, p.location.lon, t, m, d, h,
+                             load, rate, tot, cost) + extra
+                            for p, load, rate, tot, cost in
+                            zip(pp, *[col[k] for col in columns]))
+        phase_timer.end(grid.num_hours * len(pp))
+
+    #total results for each plant
+    if "plant" in output_files:
+        phase_timer.begin("plant")
+        with open(output_files["plant"], 'wb') as csvfile:
+            w = csv.writer(csvfile)
+            w.writerow(("Name", "Type", "Lat", "Lon", "Load", "Health_Impact"))
+            for i,p in enumerate(pp) :
+                w.writerow((p.name, pp_types[p.type], p.location.lat, p.location.lon, float(plant_load[i]), float(hc_arr[i])))
+        phase_timer.end(len(pp))
+
+    #hourly total results for each plant type
+    if "plant_type" in output_files:
+        phase_timer.begin("plant_type")
+        with open(output_files["plant_type"], 'wb') as csvfile:
+            w = csv.writer(csvfile)
+            w.writerow(("Type", "Year", "Month", "Day", "Hour", "Load") +
+                       (("Weight",) if s.weight is not None else ()))
+            type_load = load_totals.T.tolist()
+            for k, (t, m, d, h) in enumerate(grid.keys):
+                extra = (weight[k],) if s.weight is not None else ()
+                w.writerows((pp_type, t, m, d, h, load) + extra
+                            for pp_type, load in
+                            zip(pp_types.values(), type_load[k]))
+        phase_timer.end(grid.num_hours * len(pp_types))
+
+    phase_timer.end()
+
     #these should match...
     print "Total load (MWh): %s (generated)\nPlant load (MWh): %s (demanded)" % ('{0:,.2f}'.format(total_load), '{0:,.2f}'.format(total_plant_load))
 
+    #store the solved scenario for identical runs
+    if use_result_cache:
+        result_cache.store(cache_key,
+                           {"capacity": capacity_x, "gen": gen_x},
+                           {"obj_val": obj_val, "hc": hc,
+                            "total_load": total_load,
+                            "total_plant_load": total_plant_load,
+                            "optimal": optimal, "benders": benders_info},
+                           output_files, cache_dir)
+        result_cache.evict(cache_dir, result_cache_max_mb,
+                           result_cache_max_days)
+
+    #record the run, pointing to its hourly arrays
+    if use_result_store:
+        arrays = None
+        if "columns" in output_files and hourly:
+            arrays = output_files["columns"]
+        elif use_result_cache:
+            arrays = result_cache.solution_file(cache_key, cache_dir)
+        result_store.record(
+            base_dir + result_store.store_file,
+            {"model": "CP", "VSL": s.VSL_in, "BETA": s.BETA_in,
+             "health_cost_included": health_cost_included,
+             "start_year": start_year,
+             "settings": {"num_years": num_years, "months": months,
+                          "num_days": num_days, "solver": solver,
+                          "solve_mode": solve_mode,
+                          "benders_block": benders_block,
+                          "benders_iterations": benders_iterations,
+                          "benders_gap": benders_gap,
+                          "benders_penalty": benders_penalty,
+                          "benders_stabilization": benders_stabilization,
+                          "representative_day_count":
+                              representative_day_count},
+             "solve_mode": solve_mode, "obj_val": obj_val, "hc": hc,
+             "total_load": total_load, "total_plant_load": total_plant_load,
+             "optimal": optimal,
+             "cache_key": cache_key, "output_files": output_files,
+             "arrays": arrays,
+             "profile_error": (s.representative.profile_error
+                               if s.representative is not None else None)},
+            [(p.name, p.type, float(plant_load[i]), float(hc_arr[i]))
+             for i, p in enumerate(pp)])
+
 
     #check constraints
 #==============================================================================
@@ -865,26 +1416,16 @@ try:
 #                     blank = 0
 #==============================================================================
     # Check optimization result
-    if mod.status != gp.GRB.status.OPTIMAL:
-        print 'Relaxation is infeasible'
-    else:
-        print "Optimal Solution Found."
+    print_status(optimal, obj_val, benders_info)
 ############################################
 ####### make a horizontal bar chart ########
 ############################################
-
+#(matplotlib to be imported here, where it's used, not with the model)
 
 #==============================================================================
 #     # the bar lengths
-#     val = [0.0] * num_plant_types #start at zero
-# 
 #     #add up total production across entire planning period
-#     for t in years:
-#          for m in months:
-#              for d in days:
-#                  for h in hours :
-#                     for j,k in pp_types.items():
-#                         val[j] += load_totals[j,t,m,d,h]
+#     val = list(load_totals.sum(axis=1))
 # 
 #     for v in val:
 #         print v
@@ -900,6 +1441,8 @@ try:
 #     # to match the length of your data.
 #     my_colors = ['k', '#660000', '#FF9900', 'b', 'y',  'g', '0.75']
 # 
+#     import matplotlib.pyplot as plt
+#     from matplotlib.ticker import FuncFormatter
 #     x_format = FuncFormatter(func)
 #     fig, ax = plt.subplots()
 #     ax.xaxis.set_major_formatter(x_format)
@@ -909,16 +1452,92 @@ try:
 #     for j,t in pp_types.items():
 #         labels[j] = pp_types[j]
 # 
-#     labels = array(labels)
-#     barh(pos, val, align='center', color = my_colors)
-#     yticks(pos, labels)
-#     xlabel('MWh')
-#     title('Power plant total fuel use over given time period')
+#     labels = np.array(labels)
+#     plt.barh(pos, val, align='center', color = my_colors)
+#     plt.yticks(pos, labels)
+#     plt.xlabel('MWh')
+#     plt.title('Power plant total fuel use over given time period')
 #
-#     grid(True)
+#     plt.grid(True)
 #
-#     show()
+#     plt.show()
 #==============================================================================
 
-except gp.GurobiError as e:
-    print "Oops, gurobi error! \"%s,\" a.k.a. error #%s " % (e.message, e.errno)
+    return ScenarioResult(s.VSL_in, s.BETA_in, health_cost_included,
+                          s.start_year, obj_val, hc, total_load,
+                          total_plant_load, optimal, False, capacity_x, gen_x)
+
+
+#write the run report of s (result None if it wasn't solved, error the
+#solver error if one stopped it), stopping the phase timer
+def write_report(s, result, error=None):
+    timer = phase_timer.stop()
+    scenario = {"VSL": s.VSL_in, "BETA": s.BETA_in,
+                "health_cost_included": s.health_cost_included,
+                "start_year": s.start_year, "time_stamp": s.time_stamp,
+                "solver": solver, "solve_mode": solve_mode,
+                "num_plants": len(s.pp), "num_years": num_years,
+                "num_hours": len(years) * len(months) * len(days) *
+                len(hours), "cache_key": s.cache_key,
+                "output_files": s.output_files, "error": error}
+    if s.representative is not None:
+        scenario["representative_days"] = len(s.representative.day_keys)
+        scenario["profile_error"] = s.representative.profile_error
+        scenario["full_model"] = s.full_error
+    if result is not None:
+        result = {"obj_val": float(result.obj_val), "hc": float(result.hc),
+                  "total_load": float(result.total_load),
+                  "total_plant_load": float(result.total_plant_load),
+                  "optimal": bool(result.optimal), "cached": result.cached}
+    if s.solution is not None:
+        stats = s.solution.stats()
+    else:
+        stats = run_report.solver_stats(s.mod)
+    run_report.write(s.report_file, "CP", scenario, result, timer, stats)
+
+
+#solve one scenario and write its output files, returns a ScenarioResult (None
+#after a solver error), arguments as for setup_scenario; with
+#write_run_report its phases are timed (along with those of a timer started
+#before, e.g. around load_inputs) and reported
+def run_scenario(inputs, VSL, BETA, health_cost_included, start_year,
+                 label=""):
+    if write_run_report and phase_timer.timer is None:
+        phase_timer.start()
+    phase_timer.begin("setup")
+    s = setup_scenario(inputs, VSL, BETA, health_cost_included, start_year,
+                       label)
+    phase_timer.end()
+    result = cached_result(s)
+    error = None
+
+    #########  optimize  #########
+    if result is None:
+        try:
+            phase_timer.begin("build")
+            build_model(s)
+            phase_timer.end()
+            phase_timer.begin("solve")
+            solve_model(s)
+            phase_timer.end()
+            phase_timer.begin("extract")
+            result = extract_results(s)
+            phase_timer.end()
+        except solver_backend.SolverError as e:
+            print "Oops, %s error! \"%s\"" % (solver, e)
+            error = str(e)
+        except solver_backend.gurobi_errors(solver) as e:
+            print "Oops, gurobi error! \"%s,\" a.k.a. error #%s " % (e.message, e.errno)
+            error = "%s (error #%s)" % (e.message, e.errno)
+    if write_run_report:
+        write_report(s, result, error)
+    return result
+
+
+if __name__ == "__main__":
+    if write_run_report:
+        phase_timer.start()
+    phase_timer.begin("inputs")
+    inputs = load_inputs(base_dir)
+    phase_timer.end()
+    run_scenario(inputs, VSL, BETA, health_cost_included, start_year)
@@ -0,0 +1,1407 @@
+#   Checks of the model builds, the solve modes and their numpy helpers
+#
+#   Author: Paul Kerl (paul.kerl@gatech.edu)
+#
+#   Small checks on synthetic data, run with
+#       python checks.py [base_dir]
+#   The matrices of the unit commitment and capacity planning models (see
+#   matrix_build) are built for a few plants and hours and checked against
+#   schedules worked out by hand: a feasible schedule satisfies every row and
+#   bound and has the expected objective, and schedules breaking a row are
+#   caught. The standard and tight unit commitment rows are compared on a
+#   random instance (optimum, LP bound, minimum up/down runs). The Lagrangian
+#   plant DP is checked against every commitment of a few hours, the unit
+#   clusters, the commitment presolve and the annual mode's monthly blocks
+#   against hand-worked splits and fixings, the result, model and health cost
+#   caches on a temporary directory (keys, hits, invalidation and eviction),
+#   the result store (replaced re-runs and queries), the columnar output files
+#   against the csv files of a synthetic capacity planning result at every
+#   output level, the phase timer's phase tree and the run reports read back,
+#   the health cost model's points and run_years' start years re-solved in
+#   place against fresh builds (with gurobipy), the load curve store, the
+#   representative day selection and the sweep's points and result rows. The
+#   checks that solve a model use gurobi, or else the HiGHS command line solver
+#   when it is on the PATH (see solver_backend), and are skipped without
+#   either; the checks of the Lagrangian plant MIPs need gurobipy. The build
+#   checks build the unit commitment and capacity planning models both with one
+#   addVar / addConstr call per index and from sparse matrices
+#   (use_matrix_build) and compare the two row by row and column by column:
+#   names, bounds, objective, types, senses, right hand sides and coefficients.
+#   They need gurobipy and the model inputs under base_dir, and are skipped
+#   without them.
+#
+import os
+import sys
+import csv
+import time
+import shutil
+import sqlite3
+import datetime
+import tempfile
+import itertools
+import traceback
+from distutils.spawn import find_executable
+import numpy as np
+import matrix_build
+import rolling_horizon
+import lagrangian
+import result_cache
+import hc_data
+import file_cache
+import load_data
+import clustered_uc
+import presolve
+import result_store
+import solver_backend
+import model_cache
+import annual_uc
+import benders
+import representative_days
+import columnar_output
+import phase_timer
+import run_report
+
+
+#a check that can't run here
+class Skipped(Exception):
+    pass
+
+
+#check that calling f raises an exception
+def assert_raises(f, what):
+    try:
+        f()
+    except Exception:
+        pass
+    else:
+        raise AssertionError("%s accepted" % what)
+
+
+#####################################
+########   Synthetic models  ########
+#####################################
+
+#plant with the attributes the model builders read
+class _Plant:
+    def __init__(self, plant_type, capacity, cap_factor, min_power,
+                 fuel_type=0, name="plant"):
+        self.type = plant_type
+        self.fuel_type = fuel_type
+        self.capacity = capacity
+        self.cap_factor = cap_factor
+        self.min_power = min_power
+        self.name = name
+
+
+#unit commitment coefficients of plants pp over the July days, hours 0 to 3
+#of each day, with per-plant fuel and startup costs
+def _uc_coefficients(pp, days, load, fuel_cost, startup_cost, on_cost=1.0,
+                     formulation="standard"):
+    grid = matrix_build.TimeGrid([(0, 7, d) for d in days], range(4))
+    n = len(pp)
+    return matrix_build.UCCoefficients(
+        pp, grid, load, np.array(fuel_cost, dtype=float).reshape(n, 1),
+        np.array(startup_cost, dtype=float).reshape(n, 1),
+        np.full((n, 1), on_cost), [1.0], np.zeros((n, grid.num_hours)), 0,
+        0.25, formulation)
+
+
+#largest violation of the bounds, integrality and rows of the matrix model
+#mm by the column values x
+def violation(mm, x):
+    lb, ub = np.concatenate(mm.lb), np.concatenate(mm.ub)
+    vtype = np.concatenate(mm.vtype)
+    ax = mm.matrix().dot(x)
+    sense = np.concatenate(mm.sense) if mm.sense else np.array([])
+    rhs = np.concatenate(mm.rhs) if mm.rhs else np.array([])
+    rows = np.where(sense == matrix_build.LESS_EQUAL, ax - rhs,
+                    np.where(sense == matrix_build.GREATER_EQUAL, rhs - ax,
+                             abs(ax - rhs)))
+    integer = vtype != matrix_build.CONTINUOUS
+    return max(np.append(rows, 0.0).max(), (lb - x).max(), (x - ub).max(),
+               np.append(abs(x - np.round(x))[integer], 0.0).max())
+
+
+#column values of a unit commitment model from its (plants x hours) on,
+#start, shutdown and generation arrays
+def uc_columns(mm, index, on, start, shutdown, gen):
+    x = np.zeros(mm.num_vars)
+    for name, values in zip(("on_u", "start_v", "shutdown_w", "z"),
+                            (on, start, shutdown, gen)):
+        x[index[name]] = values
+    return x
+
+
+#startups and shutdowns of the (plants x hours) commitment on over grid
+def transitions(grid, on):
+    linked = grid.prev >= 0
+    before = np.where(linked, on[:, np.maximum(grid.prev, 0)], on)
+    return (np.where(linked, np.maximum(on - before, 0.0), 0.0),
+            np.where(linked, np.maximum(before - on, 0.0), 0.0))
+
+
+#solver backend the solving checks use: gurobi, else HiGHS on the PATH
+def solver_name():
+    if gurobi_available():
+        return "gurobi"
+    if find_executable(solver_backend.highs_executable):
+        return "highs"
+    raise Skipped("no gurobipy and no %s on the PATH" %
+                  solver_backend.highs_executable)
+
+
+def gurobi_available():
+    try:
+        import gurobipy
+    except ImportError:
+        return False
+    return True
+
+
+#####################################
+########   Model matrices    ########
+#####################################
+
+def check_time_grid():
+    grid = matrix_build.TimeGrid([(0, 7, 1), (0, 7, 2), (0, 8, 1)], range(3))
+    assert list(grid.prev) == [-1, 0, 1, 2, 3, 4, -1, 6, 7], grid.prev
+    assert grid.index(0, 7, 2, 1) == 4
+    assert grid.linked_hours(5, 10) == [0, 1, 2, 3, 4, 5]
+    assert grid.linked_hours(5, 2) == [4, 5]
+    assert grid.linked_hours(7, 10) == [6, 7]
+    grid = matrix_build.time_grid([0, 1], [7], [1, 2], range(3))
+    assert grid.day_keys == [(0, 7, 1), (0, 7, 2), (1, 7, 1), (1, 7, 2)]
+    assert grid.prev[6] == -1 and grid.prev[9] == 8, grid.prev
+
+    #August 1 follows July 2 only in a grid linking the months
+    grid = matrix_build.TimeGrid([(0, 7, 1), (0, 7, 2), (0, 8, 1)], range(3),
+                                 link_months=True)
+    assert grid.prev[6] == 5, grid.prev
+
+
+#coal plant ramping 25 MW an hour and a peaking gas plant over hours 0 to 3
+#of July 1
+def _two_plants():
+    pp = [_Plant(0, 100.0, 1.0, 0.2), _Plant(2, 50.0, 1.0, 0.0)]
+    return _uc_coefficients(pp, [1], [60.0, 80.0, 120.0, 90.0], [10.0, 50.0],
+                            [100.0, 20.0])
+
+
+def check_uc_matrices():
+    c = _two_plants()
+    mm, index = matrix_build.uc_matrices(c)
+    assert mm.num_vars == 4 * 2 * 4
+    assert index["on_u"][1, 2] == 4 * (2 * 2 + 1), index["on_u"]
+    assert mm.var_names[index["z"][1, 2]] == "gen_total_1_0_7_1_2"
+    assert list(np.concatenate(mm.rhs)[index["rows"]["load"]]) == \
+        list(c.load)
+
+    on = np.array([[1.0, 1.0, 1.0, 1.0], [0.0, 0.0, 1.0, 0.0]])
+    gen = np.array([[60.0, 80.0, 100.0, 90.0], [0.0, 0.0, 20.0, 0.0]])
+    start, shutdown = transitions(c.grid, on)
+    x = uc_columns(mm, index, on, start, shutdown, gen)
+    assert violation(mm, x) < 1e-9, violation(mm, x)
+    assert np.isclose(np.dot(np.concatenate(mm.obj), x),
+                      c.objective_value(on, start, shutdown, gen))
+
+    #the coal plant can't take the gas plant's 20 MW in hour 2 (capacity
+    #and ramp), the gas plant can't run without its startup, or above its
+    #capacity
+    for bad in ((on, start, shutdown, gen + [[0, 0, 20, 0], [0, 0, -20, 0]]),
+                (on, 0 * start, shutdown, gen),
+                (on, start, shutdown, gen + [[0, 0, -40, 0], [0, 0, 40, 0]])):
+        assert violation(mm, uc_columns(mm, index, *bad)) > 0.5
+
+
+#plants with the investment costs the capacity planning builder reads
+class _Costs:
+    def __init__(self, fixed_cap_cost, inc_cap_cost, dec_cap_cost):
+        self.fixed_cap_cost = fixed_cap_cost
+        self.inc_cap_cost = inc_cap_cost
+        self.dec_cap_cost = dec_cap_cost
+
+
+def _cp_plants():
+    pp = [_Plant(0, 100.0, 0.9, 0.2), _Plant(2, 80.0, 1.0, 0.0)]
+    pp[0].costs = _Costs(5.0, 100.0, 50.0)
+    pp[1].costs = _Costs(8.0, 60.0, 30.0)
+    return pp
+
+
+#capacity planning arguments (as for matrix_build.cp_matrices) of two
+#years of July 1 and 2, hours 0 to 3
+def _cp_arguments(weight=None):
+    pp = _cp_plants()
+    grid = matrix_build.TimeGrid([(t, 7, d) for t in (0, 1) for d in (1, 2)],
+                                 range(4))
+    K = grid.num_hours
+    load = np.tile([50.0, 70.0, 90.0, 60.0], 4) * \
+        np.repeat([1.0, 1.0, 1.1, 1.1], 4)
+    var_cost = np.array([[20.0, 21.0], [45.0, 44.0]])
+    health_cost = np.vstack([np.full(K, 3.0), np.full(K, 1.0)])
+    return (pp, grid, [0, 1], load, var_cost, [1.0, 0.9], health_cost,
+            0.5 * health_cost, 0.2 * health_cost, (1.0, 1.0, 1.0), 0.15,
+            0.25, weight)
+
+
+def check_cp_matrices():
+    args = _cp_arguments()
+    (pp, grid, years, load, var_cost, disc, health_cost, health_cost_pct,
+     health_cost_fs) = args[:9]
+    mm, index = matrix_build.cp_matrices(*args)
+    K = grid.num_hours
+    year = np.array([key[0] for key in grid.keys])
+
+    #all pct plants at full capacity, the coal plant at its minimum and the
+    #gas plant covering the rest
+    x = np.zeros(mm.num_vars)
+    x[index["x"]] = [[100.0, 100.0], [80.0, 80.0]]
+    x[index["pi_pct"]] = 1.0
+    gen = np.vstack([np.full(K, 20.0), load - 20.0])
+    x[index["z_pct"]] = gen
+    x[index["z"]] = gen
+    assert violation(mm, x) < 1e-9, violation(mm, x)
+    hc = (gen * health_cost_pct * np.asarray(disc)[year][None, :])
+    row_x = mm.matrix().dot(x)[index["rows"]["health_cost"]]
+    assert np.allclose(row_x, [hc.sum()] + list(hc.sum(axis=1)))
+
+    #generation above the capacity factor, or a capacity below the reserve
+    x[index["z_pct"][0, 2]] = x[index["z"][0, 2]] = 95.0
+    assert violation(mm, x) > 1.0
+    x[index["z_pct"][0, 2]] = x[index["z"][0, 2]] = 20.0
+    x[index["x"][1]] = 50.0
+    assert violation(mm, x) > 1.0
+
+
+#####################################
+########     Solve modes     ########
+#####################################
+
+#coal plant ramping 25 MW an hour and a gas plant over three July days, the
+#load climbing over the boundaries of the days
+def _three_days():
+    pp = [_Plant(0, 100.0, 1.0, 0.3), _Plant(2, 100.0, 1.0, 0.0)]
+    load = [40.0, 50.0, 60.0, 70.0, 90.0, 100.0, 110.0, 120.0,
+            80.0, 60.0, 45.0, 40.0]
+    return _uc_coefficients(pp, [1, 2, 3], load, [10.0, 40.0], [50.0, 10.0])
+
+
+def check_rolling_state():
+    c = _three_days()
+    on = np.ones((2, 12))
+    on[1, [0, 1, 2, 3, 8, 9, 10, 11]] = 0.0
+    gen = np.vstack([[40.0, 50.0, 60.0, 70.0, 90.0, 100.0, 100.0, 100.0,
+                      80.0, 60.0, 45.0, 40.0], np.zeros(12)])
+    gen[1] = c.load - gen[0]
+    start, shutdown = transitions(c.grid, on)
+    mm, index = matrix_build.uc_matrices(c)
+    assert violation(mm, uc_columns(mm, index, on, start, shutdown, gen)) \
+        < 1e-9
+
+    #the second day's window starts from hour 3 of the first day
+    sub, idx = c.subset([(0, 7, 2)])
+    assert list(idx) == [4, 5, 6, 7]
+    k = c.grid.prev[idx[0]]
+    assert k == 3
+    initial = rolling_horizon.initial_state(c, k, on, start, shutdown, gen)
+    assert list(initial[0]) == [1.0, 0.0] and list(initial[1]) == [70.0, 0.0]
+    mm, index = matrix_build.uc_matrices(sub, initial)
+    part = [v[:, idx] for v in (on, start, shutdown, gen)]
+    assert violation(mm, uc_columns(mm, index, *part)) < 1e-9
+
+    #the window can't drop the gas plant's startup in its first hour, nor
+    #ramp the coal plant past 25 MW from the hour before it
+    bad = [v.copy() for v in part]
+    bad[1][1, 0] = 0.0
+    assert violation(mm, uc_columns(mm, index, *bad)) > 0.5
+    bad = [v.copy() for v in part]
+    bad[3][:, 0] = [100.0, -10.0]
+    assert violation(mm, uc_columns(mm, index, *bad)) > 1.0
+
+
+def check_rolling_solve():
+    solver = solver_name()
+    c = _three_days()
+    params = {"OutputFlag": 0, "MIPGap": 0.0}
+    r = rolling_horizon.solve_rolling(c, 1, 1, params, solver)
+    assert r.num_windows == 3 and r.optimal, str(r)
+
+    #the stitched windows are a schedule of the whole horizon, and cost at
+    #least the monolithic optimum
+    mm, index = matrix_build.uc_matrices(c)
+    x = uc_columns(mm, index, r.on, r.start, r.shutdown, r.gen)
+    assert violation(mm, x) < 1e-6, violation(mm, x)
+    assert np.isclose(r.obj_val, np.dot(np.concatenate(mm.obj), x))
+    full = solver_backend.solve(mm, params, "check_full", solver)
+    assert r.obj_val >= full.obj_val - 1e-6 * abs(full.obj_val), \
+        (r.obj_val, full.obj_val)
+
+    #ramp-limited coal across the window boundaries (hours 3-4 and 7-8)
+    ramp = 0.25 * 100.0
+    assert (abs(np.diff(r.gen[0])) <= ramp + 1e-6).all(), r.gen[0]
+
+
+#a coal plant and three others with random costs over July 1 to 3, each
+#plant with the minimum up and down times min_up and min_down
+def _random_uc(formulation, min_up=1, min_down=1):
+    rng = np.random.RandomState(3)
+    pp = [_Plant(0, 150.0, 0.9, 0.4), _Plant(2, 100.0, 1.0, 0.3),
+          _Plant(2, 80.0, 1.0, 0.5), _Plant(1, 60.0, 1.0, 0.2)]
+    for p in pp:
+        p.min_up, p.min_down = min_up, min_down
+    load = rng.uniform(80.0, 300.0, 12)
+    fuel_cost = rng.uniform(10.0, 50.0, 4)
+    startup_cost = rng.uniform(50.0, 500.0, 4)
+    return _uc_coefficients(pp, [1, 2, 3], load, fuel_cost, startup_cost,
+                            20.0, formulation)
+
+
+#MIP and LP relaxation solutions of the model of c
+def _mip_and_lp(c, params, solver):
+    mm, index = matrix_build.uc_matrices(c)
+    mip = solver_backend.solve(mm, params, "check_mip", solver)
+    mm.vtype = [np.full(mm.num_vars, matrix_build.CONTINUOUS)]
+    lp = solver_backend.solve(mm, params, "check_lp", solver)
+    return mip, lp, index
+
+
+#hours of the (plants x hours) commitment on that break a minimum up time
+#(on after a startup) or minimum down time (off after a shutdown), runs
+#ending with the horizon aside
+def short_runs(grid, on, min_up, min_down):
+    start, shutdown = transitions(grid, on)
+    nxt = np.full(grid.num_hours, -1)
+    nxt[grid.prev[grid.prev >= 0]] = np.nonzero(grid.prev >= 0)[0]
+    short = []
+    for i, k in zip(*np.nonzero(start + shutdown)):
+        state, length = on[i, k], (min_up if start[i, k] else min_down)
+        h = k
+        for s in range(length):
+            if h < 0:
+                break
+            if on[i, h] != state:
+                short.append((i, k))
+                break
+            h = nxt[h]
+    return short
+
+
+def check_uc_formulations():
+    solver = solver_name()
+    params = {"OutputFlag": 0, "MIPGap": 0.0}
+
+    #without minimum up/down times: the same optimum, a stronger LP bound
+    standard, standard_lp, index = _mip_and_lp(_random_uc("standard"),
+                                               params, solver)
+    tight, tight_lp, index = _mip_and_lp(_random_uc("tight"), params, solver)
+    assert np.isclose(standard.obj_val, tight.obj_val), \
+        (standard.obj_val, tight.obj_val)
+    assert tight_lp.obj_val >= standard_lp.obj_val - 1e-6, \
+        (tight_lp.obj_val, standard_lp.obj_val)
+
+    #minimum up time 3 and down time 2: the standard rows (which don't model
+    #them) give short runs, the tight rows none
+    c = _random_uc("tight", 3, 2)
+    on = np.round(standard.x[index["on_u"]])
+    assert short_runs(c.grid, on, 3, 2), on
+    tight, tight_lp, index = _mip_and_lp(c, params, solver)
+    on = np.round(tight.x[index["on_u"]])
+    assert not short_runs(c.grid, on, 3, 2), on
+    assert tight.obj_val >= standard.obj_val - 1e-6
+    assert tight_lp.obj_val >= standard_lp.obj_val - 1e-6
+
+
+#two plants without ramp rows over July 1 and August 1 (not linked)
+def _dp_coefficients():
+    pp = [_Plant(2, 100.0, 0.9, 0.3), _Plant(1, 60.0, 1.0, 0.5)]
+    grid = matrix_build.TimeGrid([(0, 7, 1), (0, 8, 1)], range(4))
+    K = grid.num_hours
+    return matrix_build.UCCoefficients(
+        pp, grid, np.full(K, 50.0), np.array([[30.0], [20.0]]),
+        np.array([[40.0], [25.0]]), np.array([[3.0], [2.0]]), [1.0],
+        np.zeros((2, K)), 0, 0.25)
+
+
+#lowest cost of plant i of c at generation costs gen_cost over every
+#commitment of its hours (that keeps its fixed commitments)
+def _enumerated_plant(c, i, gen_cost):
+    p = c.pp[i]
+    low, high = p.min_power * p.capacity, p.capacity * p.cap_factor
+    stage = c.var_om_cost[i, c.year] + np.minimum(gen_cost * low,
+                                                  gen_cost * high)
+    best = float("inf")
+    for pattern in itertools.product((0.0, 1.0), repeat=c.grid.num_hours):
+        on = np.array(pattern)[None, :]
+        if c.fixed_on is not None and \
+                (on[0] != np.where(np.isnan(c.fixed_on[i]), on[0],
+                                   c.fixed_on[i])).any():
+            continue
+        start = transitions(c.grid, on)[0][0]
+        best = min(best, float(np.dot(on[0], stage) +
+                               np.dot(start, c.startup_cost[i, c.year])))
+    return best
+
+
+def check_lagrangian_dp():
+    c = _dp_coefficients()
+    K = c.grid.num_hours
+    nan = np.nan
+    fixed = c.with_fixed_on(np.array([[nan, 1.0, nan, 0.0, nan, nan, 1.0,
+                                       nan], [0.0] * 4 + [nan] * 4]))
+    for uc, i in itertools.product((c, fixed), range(len(c.pp))):
+        for gen_cost in (np.full(K, 5.0),
+                         np.array([-1.0, -2.0, 3.0, -4.0, 1.0, -0.5, -3.0,
+                                   2.0]),
+                         np.array([-0.1, -0.1, -0.1, -2.0, -2.0, 0.5, -0.2,
+                                   -0.2])):
+            value, on, start, shutdown, gen = \
+                lagrangian._plant_dp(uc, i, gen_cost)
+            assert np.isclose(value, _enumerated_plant(uc, i, gen_cost)), \
+                (i, gen_cost, value)
+            sub = uc.plant(i)
+            assert np.isclose(value, sub.objective_value(
+                on[None], start[None], shutdown[None], gen[None]) -
+                float(np.dot(uc.objective()[3][i], gen)) +
+                float(np.dot(gen_cost, gen)))
+            if uc.fixed_on is not None: #the fixed hours keep their state
+                free = np.isnan(uc.fixed_on[i])
+                assert (on[~free] == uc.fixed_on[i][~free]).all(), on
+
+    #the repaired commitment can carry the load in every hour
+    on = lagrangian.repair_commitment(c, np.zeros((2, K)))
+    high = np.array([p.capacity * p.cap_factor for p in c.pp])
+    low = np.array([p.min_power * p.capacity for p in c.pp])
+    assert (np.dot(high, on) >= c.load).all() and \
+        (np.dot(low, on) <= c.load).all(), on
+
+
+def check_lagrangian_mip():
+    if not gurobi_available():
+        raise Skipped("no gurobipy")
+    c = _dp_coefficients()
+    lagrangian._init_worker(c, {"OutputFlag": 0, "MIPGap": 0.0})
+    try:
+        gen_cost = np.array([-1.0, -2.0, 3.0, -4.0, 1.0, -0.5, -3.0, 2.0])
+        for i in range(len(c.pp)):
+            bound = lagrangian._plant_mip(c, i, gen_cost)[0]
+            value = lagrangian._plant_dp(c, i, gen_cost)[0]
+            assert np.isclose(bound, value, rtol=1e-6, atol=1e-6), \
+                (i, bound, value)
+    finally:
+        lagrangian._init_worker(None, None)
+
+
+def check_clustered_uc():
+    pp = [_Plant(2, 100.0, 1.0, 0.2, 3, "a"), _Plant(0, 200.0, 0.9, 0.4, 0,
+                                                      "b"),
+          _Plant(2, 80.0, 1.0, 0.2, 3, "c"), _Plant(2, 60.0, 1.0, 0.2, 3, "d")]
+    key = ("type", "fuel_type", "cap_factor", "min_power")
+    cl = clustered_uc.clusters(pp, key)
+    assert [g.members for g in cl] == [[0, 2, 3], [1]]
+    assert cl[0].units == 3 and cl[0].capacity == 80.0, str(cl[0])
+
+    c = _uc_coefficients(pp, [1], np.full(4, 150.0), [30.0, 10.0, 20.0, 40.0],
+                         np.zeros(4))
+    cc = clustered_uc.cluster_coefficients(c, cl)
+    assert np.isclose(cc.fuel_cost[0, 0], (100 * 30.0 + 80 * 20.0 +
+                                           60 * 40.0) / 240.0)
+
+    #the cheapest members of a cluster are on, as many as its count
+    on_count = np.array([[0.0, 1.0, 2.0, 3.0], [1.0, 1.0, 0.0, 1.0]])
+    on = clustered_uc.disaggregate(c, cl, on_count)
+    assert on.tolist() == [[0, 0, 1, 1], [1, 1, 0, 1], [0, 1, 1, 1],
+                           [0, 0, 0, 1]], on
+
+    #capacity buckets of 50 MW: plant a (100 MW) leaves the cluster
+    bucketed = clustered_uc.clusters(pp, key + (("capacity", 50.0),))
+    assert [g.members for g in bucketed] == [[0], [1], [2, 3]]
+
+    #presolve fixings: the cluster count is fixed where every member is,
+    #and the fixed members keep their commitment when it is split
+    nan = np.nan
+    c = c.with_fixed_on(np.array([[nan, nan, 1.0, nan], [1.0] * 4,
+                                  [0.0, nan, 0.0, nan], [0.0, 0.0, 0.0, nan]]))
+    cc = clustered_uc.cluster_coefficients(c, cl)
+    assert np.array_equal(np.isnan(cc.fixed_on),
+                          [[True, True, False, True], [False] * 4])
+    assert cc.fixed_on[0, 2] == 1.0 and (cc.fixed_on[1] == 1.0).all()
+    on = clustered_uc.disaggregate(c, cl, on_count)
+    assert on.tolist() == [[0, 0, 1, 1], [1, 1, 1, 1], [0, 1, 0, 1],
+                           [0, 0, 0, 1]], on
+
+
+def check_presolve():
+    pp = [_Plant(2, 100.0, 0.5, 0.9), #minimum above available capacity
+          _Plant(1, 50.0, 1.0, 0.0), #must run
+          _Plant(2, 100.0, 1.0, 0.8), #minimum above the low load
+          _Plant(2, 200.0, 1.0, 0.0)]
+    grid = matrix_build.TimeGrid([(0, 7, 1)], range(4))
+    K = grid.num_hours
+    costs = np.ones((len(pp), 1))
+    c = matrix_build.UCCoefficients(
+        pp, grid, [60.0, 150.0, 300.0, 60.0], costs, costs, costs, [1.0],
+        np.zeros((len(pp), K)), 0, 0.25)
+    fixed, report = presolve.presolve_commitment(c, must_run_types=(1,))
+
+    nan = np.nan
+    expected = np.array([[0, 0, 0, 0],
+                         [1, 1, 1, 1],
+                         [0, nan, 1, 0],
+                         [1, nan, 1, 1]])
+    assert np.array_equal(np.isnan(fixed.fixed_on), np.isnan(expected))
+    assert (np.nan_to_num(fixed.fixed_on) == np.nan_to_num(expected)).all(), \
+        fixed.fixed_on
+    assert c.fixed_on is None
+    assert dict(report.counts) == {"never on": 4, "must run": 4,
+                                   "above load": 2, "needed": 4}, \
+        report.counts
+    assert (report.num_on, report.num_transitions, report.num_vars) == \
+        (14, 16, 48), str(report)
+
+
+#coefficients with only the grid, as annual_uc.month_blocks reads them
+class _GridOnly:
+    def __init__(self, day_keys):
+        self.grid = matrix_build.TimeGrid(day_keys, range(24))
+
+
+def check_month_blocks():
+    c = _GridOnly([(0, 6, 29), (0, 6, 30), (0, 7, 1), (0, 7, 2), (0, 8, 1),
+                   (0, 12, 31), (1, 1, 1)])
+    blocks, linked = annual_uc.month_blocks(c, 2007)
+    assert blocks == [[(0, 6, 29), (0, 6, 30)], [(0, 7, 1), (0, 7, 2)],
+                      [(0, 8, 1)], [(0, 12, 31)], [(1, 1, 1)]], blocks
+    assert linked == [True, False, False, True], linked
+
+    #February 28 ends the month in 2007 but not in the leap year 2008
+    c = _GridOnly([(0, 2, 28), (0, 3, 1)])
+    assert annual_uc.month_blocks(c, 2007)[1] == [True]
+    assert annual_uc.month_blocks(c, 2008)[1] == [False]
+
+
+def check_benders():
+    solver = solver_name()
+    args = _cp_arguments()
+    params = {"OutputFlag": 0, "MIPGap": 0.0}
+    mm, index = matrix_build.cp_matrices(*args)
+    full = solver_backend.solve(mm, params, "check_full", solver)
+    for block in ("day", "year"):
+        for stabilization in (0.0, 0.5):
+            r = benders.solve_benders(args, block, 50, 1e-6, 1, params,
+                                      solver, stabilization=stabilization)
+            assert r.optimal and r.unmet_load < 1e-6, str(r)
+            assert np.isclose(r.obj_val, full.obj_val, rtol=1e-5), \
+                (block, stabilization, r.obj_val, full.obj_val)
+            assert r.lower_bound <= full.obj_val * (1 + 1e-6), str(r)
+
+    #a run stopped at the iteration limit: bounds around the optimum, not
+    #converged
+    r = benders.solve_benders(args, "day", 1, 1e-6, 1, params, solver)
+    assert not r.converged and not r.optimal and r.gap > 1e-6, str(r)
+    assert r.lower_bound <= full.obj_val * (1 + 1e-6) <= \
+        r.obj_val * (1 + 2e-6), str(r)
+    assert "not converged" in str(r)
+
+
+def check_k_medoids():
+    #two groups of rows on a line
+    x = np.array([0.0, 1.0, 2.0, 10.0, 11.0, 12.0])
+    dist = np.abs(x[:, None] - x[None, :])
+    medoids, assigned = representative_days.k_medoids(dist, 2)
+    assert sorted(medoids) == [1, 4], medoids
+    assert list(assigned) == [1, 1, 1, 4, 4, 4], assigned
+
+    #more medoids than rows: every row its own medoid
+    medoids, assigned = representative_days.k_medoids(dist, 10)
+    assert sorted(medoids) == list(range(6)), medoids
+    assert list(assigned) == list(range(6)), assigned
+
+
+def check_select_days():
+    #ten July days: four flat days, five days with a step at noon and the
+    #peak day 3
+    grid = matrix_build.TimeGrid([(0, 7, d) for d in range(1, 11)],
+                                 range(24))
+    step = np.where(np.arange(24) < 12, 50.0, 100.0)
+    load = np.vstack([np.full(24, 300.0) if d == 3 else
+                      np.full(24, 100.0) if d < 6 else step
+                      for d in range(1, 11)]).ravel()
+    health_cost = np.zeros((2, grid.num_hours))
+    rep = representative_days.select_days(grid, load, health_cost, 3)
+
+    assert len(rep.day_keys) == 3, rep.day_keys
+    weight = dict(zip(rep.day_keys, rep.day_weight))
+    assert weight[0, 7, 3] == 1, weight
+    assert sorted(rep.day_weight) == [1, 4, 5], weight
+    assert rep.day_keys == sorted(rep.day_keys), rep.day_keys
+    assert rep.num_days == 10
+    for (t, m, d), key in rep.represented_by.items():
+        assert (key[2] == 3) == (d == 3), (d, key)
+        assert (key[2] < 6) == (d < 6), (d, key)
+    assert rep.profile_error < 1e-12, rep.profile_error
+    assert rep.grid.num_hours == 3 * 24
+    assert len(rep.hour_weight) == 3 * 24
+    assert rep.hour_weight.sum() == 10 * 24
+
+    assert_raises(lambda: representative_days.select_days(
+        grid, load, health_cost, 1), "one representative day")
+
+
+#####################################
+########       Solvers       ########
+#####################################
+
+#x0 + 2 x1 - x2 over x0 + x1 >= 1.5 (x0 binary), x1 + x2 <= 4, x2 <= 3
+def _small_model(integer=True):
+    mm = matrix_build.MatrixModel()
+    x = mm.add_vars(3, obj=[1.0, 2.0, -1.0], ub=[1.0, None, 3.0],
+                    vtype=[matrix_build.BINARY if integer else
+                           matrix_build.CONTINUOUS,
+                           matrix_build.CONTINUOUS, matrix_build.CONTINUOUS],
+                    names=["x0", "x1", "x2"])
+    mm.add_constrs([0, 0, 1, 1], [x[0], x[1], x[1], x[2]], np.ones(4),
+                   [matrix_build.GREATER_EQUAL, matrix_build.LESS_EQUAL],
+                   [1.5, 4.0], ["r0", "r1"])
+    return mm
+
+
+def check_solver_backend():
+    solver = solver_name()
+    for backend in solver_backend.backends:
+        if backend != solver and not (backend == "highs" and find_executable(
+                solver_backend.highs_executable)):
+            continue
+        s = solver_backend.solve(_small_model(), {"OutputFlag": 0},
+                                 "check", backend)
+        assert s.optimal and s.backend == backend, str(s)
+        assert np.allclose(s.x, [1.0, 0.5, 3.0]), s.x
+        assert np.isclose(s.obj_val, -1.0) and np.allclose(s.row_x,
+                                                           [1.5, 3.5])
+        assert (s.num_vars, s.num_constrs, s.num_nonzeros, s.num_bin_vars) \
+            == (3, 2, 4, 1), s.stats()
+
+        #an LP has the reduced costs, those of x0 and x2 at their upper
+        #bounds less the dual 2 of r0 and 0 of r1
+        s = solver_backend.solve(_small_model(False), {"OutputFlag": 0},
+                                 "check", backend)
+        assert np.allclose(s.x, [1.0, 0.5, 3.0]) and s.optimal, s.x
+        assert np.allclose(s.reduced_cost, [-1.0, 0.0, -1.0]), s.reduced_cost
+
+    assert_raises(lambda: solver_backend.check("cplex"), "unknown solver")
+    mm = _small_model()
+    mm.add_constrs([0], [0], [1.0], matrix_build.GREATER_EQUAL, 2.0, ["r2"])
+    s = solver_backend.solve(mm, {"OutputFlag": 0}, "check", solver)
+    assert s.x is None and s.status == solver_backend.INFEASIBLE, str(s)
+
+
+#####################################
+########       Caches        ########
+#####################################
+
+def check_result_cache():
+    directory = tempfile.mkdtemp(prefix="checks_")
+    try:
+        source = os.path.join(directory, "model.py")
+        with open(source, 'wb') as f:
+            f.write("x = 1\n")
+        parts = {"VSL": 6.0, "load": np.arange(4.0), "plants": [_Plant(
+            0, 100.0, 1.0, 0.2)]}
+        key = result_cache.scenario_key(parts, [source])
+        assert key == result_cache.scenario_key(dict(parts), [source])
+        parts["load"] = np.arange(4.0) + 1
+        assert result_cache.scenario_key(parts, [source]) != key
+        parts["load"] = np.arange(4.0)
+        with open(source, 'wb') as f:
+            f.write("x = 2\n")
+        assert result_cache.scenario_key(parts, [source]) != key
+
+        #a stored entry is a hit with its arrays, info and output files
+        cache = os.path.join(directory, "cache")
+        output = os.path.join(directory, "plant.csv")
+        with open(output, 'wb') as f:
+            f.write("a,1\n")
+        assert result_cache.fetch(key, cache) is None
+        result_cache.store(key, {"on": np.eye(2)}, {"obj_val": 1.5},
+                           {"plant": output}, cache)
+        hit = result_cache.fetch(key, cache)
+        assert (hit.arrays["on"] == np.eye(2)).all()
+        assert hit.info == {"obj_val": 1.5}, hit.info
+        restored = os.path.join(directory, "restored.csv")
+        hit.restore({"plant": restored})
+        with open(restored, 'rb') as f:
+            assert f.read() == "a,1\n"
+
+        #eviction: the entry unused for two days, then the rest beyond 0 MB
+        result_cache.store("other", {"on": np.zeros(3)}, {}, {}, cache)
+        old = time.time() - 2 * 86400
+        os.utime(os.path.join(cache, key), (old, old))
+        assert result_cache.evict(cache, max_age_days=1) == 1
+        assert result_cache.fetch(key, cache) is None
+        assert result_cache.fetch("other", cache) is not None
+        assert result_cache.evict(cache, max_mb=0) == 1
+        assert os.listdir(cache) == []
+    finally:
+        shutil.rmtree(directory)
+
+
+def check_health_cost_cache():
+    directory = tempfile.mkdtemp(prefix="checks_")
+    parse = hc_data.parse
+    version = hc_data.parse_version
+    parsed = []
+    def counted(file_name):
+        parsed.append(file_name)
+        return parse(file_name)
+    hc_data.parse = counted
+    try:
+        file_name = os.path.join(directory, "plant_health_costs.csv")
+        def write(rows):
+            with open(file_name, 'wb') as f:
+                f.write("source,month,day,hour,val,mwh,emis\n")
+                for row in rows:
+                    f.write("s,%s\n" % ",".join(str(v) for v in row))
+        write([(7, 1, h, 10.0 + h, 1.0, 2.0) for h in range(3)])
+        cache = os.path.join(directory, "cache")
+        data = hc_data.load(file_name, cache)
+        assert data.shape == (3, len(hc_data.columns)), data.shape
+        assert list(data[:, 3]) == [10.0, 11.0, 12.0]
+        assert np.isnan(data[:, 6]).all() #no emis_agg column
+        assert len(parsed) == 1
+
+        #loaded once per process, then from the cache file by a new one
+        assert hc_data.load(file_name, cache) is data
+        file_cache._loaded.clear()
+        assert (hc_data.load(file_name, cache)[:, :6] == data[:, :6]).all()
+        assert len(parsed) == 1, parsed
+
+        #a changed file is parsed again, its old cache file replaced
+        write([(7, 1, h, 20.0 + h, 1.0, 2.0) for h in range(4)])
+        st = os.stat(file_name)
+        os.utime(file_name, (st.st_atime, st.st_mtime + 10))
+        data = hc_data.load(file_name, cache)
+        assert list(data[:, 3]) == [20.0, 21.0, 22.0, 23.0]
+        assert len(parsed) == 2 and len(os.listdir(cache)) == 1
+
+        #so is an unchanged file after a parser version bump
+        hc_data.parse_version += 1
+        file_cache._loaded.clear()
+        hc_data.load(file_name, cache)
+        assert len(parsed) == 3 and len(os.listdir(cache)) == 1
+    finally:
+        hc_data.parse_version = version
+        hc_data.parse = parse
+        file_cache._loaded.clear()
+        shutil.rmtree(directory)
+
+
+def check_model_cache():
+    directory = tempfile.mkdtemp(prefix="checks_")
+    try:
+        c = _two_plants()
+        mm, index = matrix_build.uc_matrices(c)
+        assert model_cache.fetch("uc", directory) is None
+        stored = model_cache.store("uc", mm, index, directory, "check")
+        hit = model_cache.fetch("uc", directory)
+        assert hit.info["num_vars"] == mm.num_vars and \
+            hit.info["num_constrs"] == mm.num_constrs, str(hit)
+        for name in ("on_u", "start_v", "shutdown_w", "z"):
+            assert (hit.index[name] == index[name]).all(), name
+        assert (hit.index["rows"]["load"] == index["rows"]["load"]).all()
+
+        #the stored file is the same model
+        solver = solver_name()
+        params = {"OutputFlag": 0, "MIPGap": 0.0}
+        a = solver_backend.solve(mm, params, "check", solver)
+        b = solver_backend.solve_file(hit.model_file, params, "check", solver)
+        assert np.isclose(a.obj_val, b.obj_val), (a.obj_val, b.obj_val)
+        assert (b.num_vars, b.num_constrs) == (mm.num_vars, mm.num_constrs)
+    finally:
+        shutil.rmtree(directory)
+
+
+#####################################
+########       Inputs        ########
+#####################################
+
+def check_load_data():
+    directory = tempfile.mkdtemp(prefix="checks_")
+    try:
+        #two days, rows out of order, hour 23 of the second day missing
+        file_name = os.path.join(directory, "load_curves.csv")
+        rows = [(2007, 3, 1, h, 2000.0 + h) for h in range(23)] + \
+            [(2007, 2, 28, h, 1000.0 + h) for h in range(24)]
+        with open(file_name, 'wb') as f:
+            f.write("LOAD,YEAR,MONTH,DAY,HOUR\n")
+            for year, month, day, hour, load in rows:
+                f.write("%s,%s,%s,%s,%s\n" % (load, year, month, day, hour))
+
+        arrays = load_data.parse(file_name)
+        first_day = datetime.date(1970, 1, 1) + \
+            datetime.timedelta(int(arrays["first_day"]))
+        assert first_day == datetime.date(2007, 2, 28), first_day
+        assert len(arrays["load"]) == 48, len(arrays["load"])
+        assert (arrays["load"][:24] == 1000.0 + np.arange(24)).all()
+        assert (arrays["load"][24:47] == 2000.0 + np.arange(23)).all()
+        assert np.isnan(arrays["load"][47])
+
+        store = load_data.load(file_name, os.path.join(directory, "cache"))
+        assert store.num_days == 2
+        assert store.day(datetime.date(2007, 3, 1))[5] == 2005.0
+        assert store.hour_index(datetime.date(2007, 3, 1), 2) == 26
+        for bad in (lambda: store.month(2007, 2),
+                    lambda: store.day(datetime.date(2007, 3, 2))):
+            assert_raises(bad, "load outside the load curves")
+
+        grid = matrix_build.TimeGrid([(0, 2, 28), (0, 3, 1)], [0, 5])
+        assert list(store.grid_load(grid, 2007)) == \
+            [1000.0, 1005.0, 2000.0, 2005.0]
+        grid = matrix_build.TimeGrid([(0, 3, 1)], [22, 23])
+        assert_raises(lambda: store.grid_load(grid, 2007), "missing hour")
+    finally:
+        file_cache._loaded.clear()
+        shutil.rmtree(directory)
+
+
+#####################################
+########       Results       ########
+#####################################
+
+def check_result_store():
+    directory = tempfile.mkdtemp(prefix="checks_")
+    try:
+        path = os.path.join(directory, "results.sqlite")
+        run = {"model": "UC", "VSL": 6.0, "BETA": 0.06,
+               "health_cost_included": True, "start_year": 2007,
+               "settings": {"mip_gap": 0.0025, "solve_mode": "monolithic"},
+               "solve_mode": "monolithic", "obj_val": 10.0, "optimal": True,
+               "output_files": {"plant": "a.csv"}}
+        result_store.record(path, run, [("a", 0, 1.0, 2.0)])
+
+        #a re-run of the key replaces the run and its plants
+        run["obj_val"] = 9.0
+        second = result_store.record(path, run, [("a", 0, 3.0, 4.0),
+                                                 ("b", 2, 5.0, 6.0)])
+        rows = result_store.query(path, model="UC")
+        assert len(rows) == 1 and rows[0]["id"] == second, rows
+        assert rows[0]["obj_val"] == 9.0 and rows[0]["optimal"] == 1, rows
+        assert [(p["name"], p["load"]) for p in
+                result_store.plant_totals(path, second)] == \
+            [("a", 3.0), ("b", 5.0)]
+        conn = sqlite3.connect(path)
+        assert conn.execute("SELECT COUNT(*) FROM plants").fetchone()[0] == 2
+        conn.close()
+
+        #other settings or VSL are other runs
+        run["settings"] = {"solve_mode": "monolithic", "mip_gap": 0.01}
+        result_store.record(path, run, [])
+        run["VSL"] = 3.0
+        result_store.record(path, run, [])
+        assert len(result_store.query(path)) == 3
+        assert result_store.series(path, "VSL", "obj_val", model="UC")[0] \
+            == (3.0, 9.0)
+        assert_raises(lambda: result_store.query(path, columns=["id",
+                                                                "plant"]),
+                      "unknown column")
+
+        #a store written before profile_error was a run column gets it
+        path = os.path.join(directory, "old.sqlite")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE runs (id INTEGER PRIMARY KEY, %s)" %
+                     ", ".join("%s %s" % c for c in result_store.run_columns
+                               if c[0] != "profile_error"))
+        conn.commit()
+        conn.close()
+        run["profile_error"] = 0.05
+        result_store.record(path, run, [])
+        assert result_store.query(path, ["profile_error"]) == \
+            [{"profile_error": 0.05}]
+    finally:
+        shutil.rmtree(directory)
+
+
+#inputs of a scenario as the scripts read them: a load of 100 MW, varying
+#by up to swing MW from hour to hour and rising with the year, and the SO2
+#emissions of the emitting plants by (month, day, hour)
+class _LoadCurves:
+    def __init__(self, swing=0.0):
+        self.swing = swing
+    def grid_load(self, grid, start_year):
+        k = np.arange(grid.num_hours)
+        return 100.0 + self.swing * (np.sin(k) + 0.1 * (start_year - 2007))
+
+
+class _Inputs:
+    def __init__(self, emissions_rate_so2, emissions_tot_so2):
+        self.lc = _LoadCurves()
+        self.emissions_rate_so2 = emissions_rate_so2
+        self.emissions_tot_so2 = emissions_tot_so2
+
+
+#a solved capacity planning scenario of three plants over two July days of
+#two hours, written to the output files of output_format and output_level
+#in directory (weight: the hours' representative day weights, or None),
+#returns the result and the output files
+def _cp_outputs(directory, output_format, output_level, weight):
+    import capacity_planning as cp
+    rng = np.random.RandomState(5)
+    grid = matrix_build.TimeGrid([(0, 7, 1), (0, 7, 2)], range(2))
+    table = hc_data.HealthCostTable(3, [7], [1, 2], range(2))
+    table.values[:] = rng.uniform(1.0, 5.0, table.values.shape)
+    pp, rate, tot = [], {}, {}
+    for i, plant_type in enumerate((0, 2, 4)): #coal, gas, nuclear
+        costs = cp.PowerPlantCosts(*([None] * 8 + [table.plant(i), None,
+                                                    None]))
+        name = "plant %d" % i
+        pp.append(cp.PowerPlant(plant_type, 0.9, 100.0, 0.2, name,
+                                cp.Location(33.0 + i, -84.0, "GA"), costs))
+        if plant_type != 4:
+            rate[name] = dict(((m, d, h), rng.uniform())
+                              for (t, m, d, h) in grid.keys)
+            tot[name] = dict(((m, d, h), rng.uniform())
+                             for (t, m, d, h) in grid.keys)
+
+    output_files = {}
+    if output_format == "npz":
+        output_files["summary"] = os.path.join(directory, "output.json")
+    elif columnar_output.writes(output_level, "plant"):
+        output_files["plant"] = os.path.join(directory, "plant.csv")
+        if columnar_output.writes(output_level, "hourly"):
+            output_files["output"] = os.path.join(directory, "output.csv")
+            output_files["plant_type"] = os.path.join(directory, "type.csv")
+    s = cp.Scenario(_Inputs(rate, tot), 3.0, 0.06, True, 2007, pp, None,
+                    None, None, output_files)
+    s.grid, s.weight = grid, weight
+    index = {"x": np.arange(3).reshape(3, 1),
+             "z": np.arange(3, 15).reshape(3, 4),
+             "rows": {"health_cost": np.arange(4)}}
+    s.matrices = (None, index)
+    s.solution = solver_backend.Solution(
+        "highs", solver_backend.OPTIMAL, rng.uniform(0.0, 90.0, 15),
+        rng.uniform(0.0, 10.0, 4), 1234.5, 1234.5, 0.0, 0.1, 0, 0,
+        (15, 4, 30, 0, 0))
+    settings = cp.output_format, cp.output_level
+    try:
+        cp.output_format, cp.output_level = output_format, output_level
+        return cp.extract_results(s), output_files
+    finally:
+        cp.output_format, cp.output_level = settings
+
+
+#rows of the csv file path after its header, and the header
+def _csv_rows(path):
+    with open(path, 'rb') as f:
+        rows = list(csv.reader(f))
+    return rows[1:], rows[0]
+
+
+def check_columnar_output():
+    directory = tempfile.mkdtemp(prefix="checks_")
+    try:
+        for run, weight in enumerate((None, np.array([1.0, 1.0, 3.0, 3.0]))):
+            csv_dir = os.path.join(directory, "csv_%d" % run)
+            os.mkdir(csv_dir)
+            result, files = _cp_outputs(csv_dir, "csv", "hourly", weight)
+            plant_rows = _csv_rows(files["plant"])[0]
+            rows, header = _csv_rows(files["output"])
+            type_rows, type_header = _csv_rows(files["plant_type"])
+            assert ("Weight" in header) == (weight is not None), header
+            assert ("Weight" in type_header) == (weight is not None)
+
+            for level in columnar_output.levels:
+                npz_dir = os.path.join(directory, "%s_%d" % (level, run))
+                os.mkdir(npz_dir)
+                r, files = _cp_outputs(npz_dir, "npz", level, weight)
+                meta = columnar_output.read_meta(files["summary"])
+                npz = columnar_output.paths(files["summary"])[0]
+                assert meta["level"] == level
+                for name in ("obj_val", "hc", "total_load",
+                             "total_plant_load", "optimal"):
+                    assert meta["summary"][name] == getattr(result, name), \
+                        (name, meta["summary"][name])
+                if level == "summary": #the sidecar only
+                    assert not os.path.exists(npz) and not meta["columns"]
+                    continue
+                meta, cols = columnar_output.read(npz)
+                for c in meta["columns"]:
+                    assert list(cols[c["name"]].shape) == c["shape"], c
+                    assert meta["dims"][c["dims"][0]] == c["shape"][0], c
+
+                #per-plant totals
+                assert cols["name"].tolist() == [row[0] for row in plant_rows]
+                assert np.allclose(cols["load"],
+                                   [float(row[4]) for row in plant_rows])
+                assert np.allclose(cols["health_impact"],
+                                   [float(row[5]) for row in plant_rows])
+                assert np.allclose(cols["capacity"], result.capacity)
+                if level == "plant":
+                    assert "gen" not in cols and "weight" not in cols, \
+                        sorted(cols)
+                    continue
+
+                #hourly rows, plant by plant within each hour
+                assert ("weight" in cols) == (weight is not None), \
+                    sorted(cols)
+                values = np.array([[float(v) for v in row[3:]]
+                                   for row in rows])
+                assert np.allclose(values[::3, 0] + 2007, cols["year"])
+                assert np.allclose(values[::3, 1:4], np.array(
+                    [cols["month"], cols["day"], cols["hour"]]).T)
+                for n, name in enumerate(("gen", "so2_rate", "so2_tot",
+                                          "health_cost")):
+                    assert np.allclose(values[:, 4 + n],
+                                       cols[name].T.ravel()), name
+                type_values = np.array([[float(v) for v in row[1:]]
+                                        for row in type_rows])
+                assert np.allclose(type_values[:, 4],
+                                   cols["type_load"].T.ravel())
+                if weight is not None:
+                    assert np.allclose(values[::3, 8], cols["weight"])
+                    assert np.allclose(type_values[::7, 5], cols["weight"])
+                    assert np.allclose(cols["weight"], weight)
+    finally:
+        shutil.rmtree(directory)
+
+
+def check_run_report():
+    directory = tempfile.mkdtemp(prefix="checks_")
+    try:
+        #without a started timer the marks do nothing
+        phase_timer.begin("untimed")
+        phase_timer.mark("step")
+        phase_timer.end()
+
+        #two builds of nested phases and steps, then a write
+        timer = phase_timer.start()
+        for n in range(2):
+            phase_timer.begin("build")
+            phase_timer.begin("matrices")
+            time.sleep(0.01)
+            phase_timer.mark("variables", 10)
+            phase_timer.mark("constraints", 5)
+            phase_timer.end()
+            phase_timer.end(3)
+        phase_timer.begin("write")
+        phase_timer.end()
+        assert phase_timer.stop() is timer and phase_timer.timer is None
+
+        first = os.path.join(directory, "first.json")
+        run_report.write(first, "UC", {"VSL": 3.0}, {"obj_val": 1.0}, timer)
+        time.sleep(0.01)
+        run_report.write(os.path.join(directory, "second.json"), "CP",
+                         {"VSL": 6.0}, None)
+        with open(os.path.join(directory, "other.json"), 'wb') as f:
+            f.write('{"not": "a report"}')
+
+        reports = run_report.read_all(directory)
+        assert [r["model"] for r in reports] == ["UC", "CP"], reports
+        report = reports[0]
+        assert report["file"] == first
+        assert report["scenario"] == {"VSL": 3.0}
+        assert report["result"] == {"obj_val": 1.0}
+        assert reports[1]["phases"] is None and reports[1]["result"] is None
+        phases = dict((p["name"], p) for p in report["phases"])
+        assert [p["name"] for p in report["phases"]] == \
+            ["build.matrices.variables", "build.matrices.constraints",
+             "build.matrices", "build", "write"], report["phases"]
+        assert [phases[name]["calls"] for name in ("build.matrices", "build",
+                                                   "write")] == [2, 2, 1]
+        assert [phases[name]["count"] for name in
+                ("build.matrices.variables", "build.matrices.constraints",
+                 "build.matrices", "build", "write")] == \
+            [20, 10, None, 6, None], phases
+        for p in report["phases"]:
+            assert p["seconds"] >= 0.0 and p["cpu_seconds"] >= 0.0, p
+            assert "rss_mb" in p and "peak_rss_mb" in p, p
+        assert phases["build.matrices.variables"]["seconds"] >= 0.02
+        assert phases["build"]["seconds"] >= \
+            phases["build.matrices"]["seconds"] >= \
+            phases["build.matrices.variables"]["seconds"] + \
+            phases["build.matrices.constraints"]["seconds"]
+        assert report["seconds"] >= phases["build"]["seconds"] + \
+            phases["write"]["seconds"]
+    finally:
+        phase_timer.stop()
+        shutil.rmtree(directory)
+
+
+#####################################
+########   Models and sweep  ########
+#####################################
+
+#result of unit_commitment.run_scenario as the sweep reads it
+class _PointResult:
+    def __init__(self, VSL):
+        self.obj_val = 100.0 * VSL
+        self.hc = 10.0 * VSL
+        self.total_load = 50.0
+        self.total_plant_load = 50.0
+        self.optimal = True
+        self.cached = False
+
+
+def check_sweep():
+    import unit_commitment as uc
+    import sweep
+    points, workers = sweep.sweep_arguments(
+        ["sweep.py", "1.5,6", "0.06", "True,False", "2007", "2"])
+    assert workers == 2
+    assert points == [(1.5, 0.06, True, 2007), (1.5, 0.06, False, 2007),
+                      (6.0, 0.06, True, 2007), (6.0, 0.06, False, 2007)], \
+        points
+    for bad in (["sweep.py", "1.5", "0.06", "True"],
+                ["sweep.py", "1.5", "0.5", "True", "2007"],
+                ["sweep.py", "1.5", "0.06", "True", "2007", "0"]):
+        assert_raises(lambda: sweep.sweep_arguments(bad), "sweep arguments")
+
+    directory = tempfile.mkdtemp(prefix="checks_")
+    run_scenario = uc.run_scenario
+    try:
+        file_name = os.path.join(directory, "points.csv")
+        with open(file_name, 'wb') as f:
+            f.write("VSL,BETA,HC,YEAR\n3, 0.04, False, 2008\n")
+        assert sweep.sweep_arguments(["sweep.py", file_name]) == \
+            ([(3.0, 0.04, False, 2008)], None)
+
+        #a point's row of the results table, empty for a solver error
+        calls = []
+        def solved(inputs, VSL, BETA, health_cost_included, start_year,
+                   params, label):
+            calls.append((VSL, BETA, health_cost_included, start_year,
+                          label))
+            return _PointResult(VSL) if health_cost_included else None
+        uc.run_scenario = solved
+        sweep._init_worker("inputs", {"Threads": 1})
+        row = sweep._run_point((3.0, 0.04, True, 2008))
+        assert row[:10] == (3.0, 0.04, True, 2008, 300.0, 30.0, 50.0, 50.0,
+                            True, False), row
+        row = sweep._run_point((3.0, 0.04, False, 2008))
+        assert row[4:10] == ("", "", "", "", False, False), row
+        assert calls[0] == (3.0, 0.04, True, 2008, "_VSL3.0_BETA0.04"), calls
+    finally:
+        uc.run_scenario = run_scenario
+        sweep._init_worker(None, None)
+        shutil.rmtree(directory)
+
+
+#unit commitment inputs of a coal, a gas and an oil plant over the start
+#years 2007 to 2009, with health costs per unit of VSL * BETA, fuel costs
+#by year and a load rising with the year
+def _uc_inputs(uc):
+    rng = np.random.RandomState(7)
+    table = hc_data.HealthCostTable(3, uc.months, uc.days, uc.hours)
+    table.values[:] = rng.uniform(0.0, 2e-3, table.values.shape)
+    pp = []
+    for i, (plant_type, fuel_type, capacity, min_power) in enumerate(
+            ((0, 0, 150.0, 0.2), (2, 2, 100.0, 0.3), (1, 10, 80.0, 0.2))):
+        hc = table.plant(i)
+        costs = uc.PowerPlantCosts(None, None, None, None, None, hc, hc, hc)
+        pp.append(uc.PowerPlant(plant_type, fuel_type, 0.9, capacity,
+                                min_power, "plant %d" % i, None, costs))
+    def table_by_year(low, high):
+        return dict((y, dict((f, rng.uniform(low, high)) for f in (0, 2, 10)))
+                    for y in range(2007, 2012))
+    return uc.ModelInputs(pp, table_by_year(0.01, 0.1),
+                          table_by_year(10.0, 60.0),
+                          table_by_year(0.5, 3.0), None, _LoadCurves(60.0),
+                          None, None)
+
+
+def check_persistent_models():
+    if not gurobi_available():
+        raise Skipped("no gurobipy")
+    import unit_commitment as uc
+    settings = uc.months, uc.days, uc.hours
+    params = {"OutputFlag": 0, "MIPGap": 0.0}
+    try:
+        uc.days, uc.hours = [1, 2], list(range(6))
+        inputs = _uc_inputs(uc)
+
+        #objective and commitment of a point built and solved from scratch
+        def fresh(VSL, BETA, health_cost_included, start_year):
+            pp = uc.scenario_plants(inputs.pp, (VSL * 1000000) * (BETA / 10.0))
+            cost_adj = uc.discount_factors(range(start_year,
+                                                 start_year + uc.num_years))
+            c = uc.scenario_coefficients(inputs, pp,
+                                         uc.scenario_grid(start_year),
+                                         cost_adj, start_year,
+                                         1 if health_cost_included else 0.0)
+            mm, index = matrix_build.uc_matrices(c)
+            s = solver_backend.solve(mm, params, "check_fresh", "gurobi")
+            return s.obj_val, np.round(s.x[index["on_u"]])
+
+        #new VSL, BETA and health costs on or off, then the first point again
+        model = uc.HealthCostModel(inputs, 2007, params)
+        commitments = set()
+        for point in ((3.0, 0.06, True), (9.0, 0.1, True),
+                      (3.0, 0.06, False), (3.0, 0.06, True)):
+            r = model.solve(*point)
+            obj_val, on = fresh(*(point + (2007,)))
+            assert np.isclose(r.obj_val, obj_val, rtol=1e-9, atol=1e-6), \
+                (point, r.obj_val, obj_val)
+            assert np.array_equal(np.round(r.on), on), (point, r.on, on)
+            commitments.add(on.tobytes())
+        assert len(commitments) > 1 and model.model.updates > 0
+
+        #new start years, loads and fuel costs, on July 1 and 2 and then on
+        #February 28 and 29 (a day 2007 and 2009 don't have, so 2008 gets a
+        #model of its own)
+        for months, days in (([7], [1, 2]), ([2], [28, 29])):
+            uc.months, uc.days = months, days
+            inputs = _uc_inputs(uc)
+            results = uc.run_years(inputs, 9.0, 0.1, True,
+                                   [2007, 2008, 2009], params)
+            for r, start_year in zip(results, [2007, 2008, 2009]):
+                obj_val, on = fresh(9.0, 0.1, True, start_year)
+                assert np.isclose(r.obj_val, obj_val, rtol=1e-9,
+                                  atol=1e-6), (start_year, r.obj_val, obj_val)
+                assert np.array_equal(np.round(r.on), on), \
+                    (start_year, r.on, on)
+    finally:
+        uc.months, uc.days, uc.hours = settings
+
+
+#first position where the lists of values a and b differ, None if they don't
+def first_difference(a, b):
+    if len(a) != len(b):
+        return min(len(a), len(b))
+    for n, (u, v) in enumerate(zip(a, b)):
+        if isinstance(u, float):
+            if not np.isclose(u, v, rtol=1e-10, atol=1e-10):
+                return n
+        elif u != v:
+            return n
+    return None
+
+
+#check that two gurobi models have the same columns and rows, in the same
+#order
+def compare_models(loop, matrix):
+    loop.update()
+    matrix.update()
+    for kind, get, attrs in (
+            ("column", lambda mod: mod.getVars(),
+             ("VarName", "LB", "UB", "Obj", "VType")),
+            ("row", lambda mod: mod.getConstrs(),
+             ("ConstrName", "Sense", "RHS"))):
+        names = loop.getAttr(attrs[0], get(loop))
+        for attr in attrs:
+            a, b = loop.getAttr(attr, get(loop)), \
+                matrix.getAttr(attr, get(matrix))
+            n = first_difference(a, b)
+            assert n is None, "%s %s of %d loop and %d matrix %ss differs " \
+                "at %s: %r != %r" % (kind, attr, len(a), len(b), kind,
+                                     names[min(n, len(names) - 1)],
+                                     a[n] if n < len(a) else None,
+                                     b[n] if n < len(b) else None)
+    a, b = loop.getA().tocsr(), matrix.getA().tocsr()
+    assert a.nnz == b.nnz, "%d loop and %d matrix coefficients" % (a.nnz,
+                                                                   b.nnz)
+    diff = abs(a - b)
+    assert diff.nnz == 0 or diff.max() <= 1e-10 * max(1.0, abs(a).max()), \
+        "coefficients differ by up to %s" % diff.max()
+    assert loop.ModelSense == matrix.ModelSense
+
+
+#build the models of module (one scenario over a few days) with the loop and
+#the matrix build, with the module's constants changed by settings
+def build_both(module, base_dir, settings, setup):
+    if not gurobi_available():
+        raise Skipped("no gurobipy")
+    if not os.path.isfile(base_dir + "data/plant_info.csv"):
+        raise Skipped("no model inputs under %r" % base_dir)
+    saved = dict((name, getattr(module, name)) for name in settings)
+    saved["use_matrix_build"] = module.use_matrix_build
+    try:
+        for name, value in settings.items():
+            setattr(module, name, value)
+        inputs = module.load_inputs(base_dir)
+        models = []
+        for use_matrix_build in (False, True):
+            module.use_matrix_build = use_matrix_build
+            models.append(module.build_model(setup(inputs)).mod)
+        return models
+    finally:
+        for name, value in saved.items():
+            setattr(module, name, value)
+
+
+def check_uc_builds(base_dir):
+    import unit_commitment as uc
+    def setup(inputs):
+        s = uc.setup_scenario(inputs, 6.0, 0.06, True, 2007,
+                              {"OutputFlag": 0}, "_check")
+        s.log_file = "" #no log file
+        return s
+    compare_models(*build_both(
+        uc, base_dir, {"base_dir": base_dir, "months": [7], "days": [1, 2],
+                       "solve_mode": "monolithic", "solver": "gurobi",
+                       "uc_formulation": "standard", "use_presolve": False,
+                       "use_model_cache": False, "use_result_cache": False},
+        setup))
+
+
+def check_cp_builds(base_dir):
+    import capacity_planning as cp
+    def setup(inputs):
+        s = cp.setup_scenario(inputs, 6.0, 0.06, True, 2007, "_check")
+        s.params = {"OutputFlag": 0}
+        return s
+    compare_models(*build_both(
+        cp, base_dir, {"base_dir": base_dir, "num_years": 2, "years": [0, 1],
+                       "months": [7], "days": [1], "solve_mode": "monolithic",
+                       "solver": "gurobi", "representative_day_count": 0,
+                       "use_model_cache": False, "use_result_cache": False},
+        setup))
+
+
+#####################################
+########        Main         ########
+#####################################
+
+def main(argv):
+    base_dir = argv[1] if len(argv) > 1 else ""
+    checks = [("matrix_build.TimeGrid", check_time_grid),
+              ("matrix_build.uc_matrices", check_uc_matrices),
+              ("matrix_build.cp_matrices", check_cp_matrices),
+              ("rolling_horizon window state", check_rolling_state),
+              ("rolling_horizon.solve_rolling", check_rolling_solve),
+              ("lagrangian plant dynamic program", check_lagrangian_dp),
+              ("lagrangian plant MIP", check_lagrangian_mip),
+              ("result_cache", check_result_cache),
+              ("sweep", check_sweep),
+              ("hc_data cache", check_health_cost_cache),
+              ("load_data", check_load_data),
+              ("clustered_uc", check_clustered_uc),
+              ("presolve.presolve_commitment", check_presolve),
+              ("unit commitment builds", lambda: check_uc_builds(base_dir)),
+              ("capacity planning builds",
+               lambda: check_cp_builds(base_dir)),
+              ("result_store", check_result_store),
+              ("solver_backend", check_solver_backend),
+              ("model_cache", check_model_cache),
+              ("annual_uc.month_blocks", check_month_blocks),
+              ("benders.solve_benders", check_benders),
+              ("representative_days.k_medoids", check_k_medoids),
+              ("representative_days.select_days", check_select_days),
+              ("tight unit commitment formulation", check_uc_formulations),
+              ("columnar_output", check_columnar_output),
+              ("phase_timer and run_report", check_run_report),
+              ("persistent unit commitment models", check_persistent_models)]
+    failed = 0
+    for name, check in checks:
+        try:
+            check()
+        except Skipped as e:
+            print "%s: skipped (%s)" % (name, e)
+        except Exception:
+            print "%s: FAILED" % name
+            traceback.print_exc()
+            failed += 1
+        else:
+            print "%s: ok" % name
+    print "%d of %d checks failed" % (failed, len(checks))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
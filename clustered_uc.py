@@ -0,0 +1,193 @@
+#   Clustered unit commitment
+#
+#   Author: Paul Kerl (paul.kerl@gatech.edu)
+#
+#   Plants that are alike (same value of every attribute in the cluster key,
+#   e.g. type, fuel type, capacity factor, minimum power and capacity bucket)
+#   are grouped into clusters. Each cluster is one plant of the model whose
+#   commitment, startups and shutdowns are integer counts of its units,
+#   instead of one set of binaries per plant. A cluster unit has the mean
+#   capacity of its plants and the capacity-weighted mean generation and
+#   health costs, so plants of one capacity bucket (width w) can differ from
+#   the cluster unit by up to w MW each: k units on in the clustered model
+#   stand for k members whose capacity is off by up to k w MW.
+#
+#   Commitments fixed by the presolve (presolve.py) fix a cluster's count in
+#   the hours where every member is fixed. After the solve, each cluster's
+#   count of units on is split back over its plants: the fixed members keep
+#   their fixed commitment and the rest of the count goes to the free members
+#   in merit order. The full model is then re-solved with that commitment
+#   fixed, which gives the per-plant solution for the output files.
+#   The difference between the clustered and the per-plant objective (and
+#   optionally the objective of the full model solved directly) is reported as
+#   the error of the clustering.
+#
+import numpy as np
+import matrix_build
+import lagrangian #commitment repair
+import rolling_horizon #whole model solve, for the comparison
+
+
+########    cluster   ########
+#plants of a cluster, looking like one plant of units units to the model
+#builder (matrix_build.uc_matrices)
+class Cluster:
+    def __init__(self, key, members, pp):
+        self.key = key
+        self.members = members #plant indices
+        self.units = len(members)
+        p = pp[members[0]]
+        self.type = p.type
+        self.fuel_type = p.fuel_type
+        self.cap_factor = np.mean([pp[i].cap_factor for i in members])
+        self.min_power = np.mean([pp[i].min_power for i in members])
+        self.capacity = np.mean([pp[i].capacity for i in members])
+        self.min_up = max(getattr(pp[i], "min_up", 1) for i in members)
+        self.min_down = max(getattr(pp[i], "min_down", 1) for i in members)
+        self.name = "cluster of %s" % ", ".join(pp[i].name for i in members)
+    def __str__(self):
+        return "Cluster %s: %d units of %.1f MW" % (self.key, self.units,
+                                                    self.capacity)
+
+
+########    clustered result   ########
+class ClusteredResult:
+    def __init__(self, on, start, shutdown, gen, obj_val, optimal,
+                 cluster_obj_val, num_clusters, num_plants, full_obj_val=None):
+        self.on = on
+        self.start = start
+        self.shutdown = shutdown
+        self.gen = gen
+        self.obj_val = obj_val                 #per-plant (split) objective
+        self.optimal = optimal                 #per-plant dispatch optimal
+        self.cluster_obj_val = cluster_obj_val #clustered model objective
+        self.num_clusters = num_clusters
+        self.num_plants = num_plants
+        self.full_obj_val = full_obj_val       #full model, if it was solved
+    def __str__(self):
+        s = "Clustered unit commitment: %d clusters of %d plants, " \
+            "clustered objective $%s, per-plant objective $%s " \
+            "(%.4f%% difference)" % \
+            (self.num_clusters, self.num_plants,
+             '{0:,.2f}'.format(self.cluster_obj_val),
+             '{0:,.2f}'.format(self.obj_val),
+             100 * (self.obj_val - self.cluster_obj_val) /
+             max(abs(self.obj_val), 1e-10))
+        if self.full_obj_val is not None:
+            s += ", full model objective $%s (%.4f%% error)" % \
+                ('{0:,.2f}'.format(self.full_obj_val),
+                 100 * (self.obj_val - self.full_obj_val) /
+                 max(abs(self.full_obj_val), 1e-10))
+        return s
+
+
+#####################################
+########     Clustering      ########
+#####################################
+
+#value of a key attribute of plant p: the attribute's value, or for an
+#(attribute, width) pair the bucket of width width its value falls in
+def key_value(p, attr):
+    if isinstance(attr, tuple):
+        attr, width = attr
+        return int(np.floor(getattr(p, attr) / float(width)))
+    return getattr(p, attr)
+
+
+#group the plants by the values of the key attributes, in order of first
+#appearance
+def clusters(pp, key):
+    groups = {}
+    order = []
+    for i, p in enumerate(pp):
+        k = tuple(key_value(p, attr) for attr in key)
+        if k not in groups:
+            groups[k] = []
+            order.append(k)
+        groups[k].append(i)
+    return [Cluster(k, groups[k], pp) for k in order]
+
+
+#count of units on of each cluster fixed by the presolve's fixings of c, in
+#the hours where every member is fixed (nan elsewhere), None without fixings
+def cluster_fixed_on(c, cl):
+    if c.fixed_on is None:
+        return None
+    fixed_on = np.full((len(cl), c.grid.num_hours), np.nan)
+    for n, g in enumerate(cl):
+        members = c.fixed_on[g.members]
+        every = ~np.isnan(members).any(axis=0)
+        fixed_on[n, every] = members[:, every].sum(axis=0)
+    return fixed_on
+
+
+#UCCoefficients of the clustered model of c
+def cluster_coefficients(c, cl):
+    capacity = np.array([p.capacity for p in c.pp])
+
+    def weighted(a, members): #capacity-weighted mean over the members
+        return np.average(a[members], axis=0, weights=capacity[members])
+
+    return matrix_build.UCCoefficients(
+        cl, c.grid, c.load,
+        np.array([weighted(c.fuel_cost, g.members) for g in cl]),
+        np.array([c.startup_cost[g.members].mean(axis=0) for g in cl]),
+        np.array([c.var_om_cost[g.members].mean(axis=0) for g in cl]),
+        c.disc,
+        np.array([weighted(c.health_cost, g.members) for g in cl]),
+        c.fs_emissions, c.pct_change, c.formulation, cluster_fixed_on(c, cl))
+
+
+#per-plant commitment of a clustered one: in each hour the members fixed by
+#the presolve keep their commitment, and the cheapest (over the horizon)
+#free members make up the rest of each cluster's on_count
+def disaggregate(c, cl, on_count):
+    cost = c.objective()[3].mean(axis=1)
+    K = c.grid.num_hours
+    fixed_on = c.fixed_on
+    if fixed_on is None:
+        fixed_on = np.full((len(c.pp), K), np.nan)
+    on = np.zeros((len(c.pp), K))
+    for n, g in enumerate(cl):
+        members = np.array(g.members)[np.argsort(cost[g.members],
+                                                  kind="mergesort")]
+        free = np.isnan(fixed_on[members])
+        on[members] = np.where(free, 0.0, fixed_on[members])
+        count = np.round(on_count[n]) - on[members].sum(axis=0)
+        rank = np.cumsum(free, axis=0) #rank of each free member, from 1
+        on[members] += free & (rank <= count[None, :])
+    return on
+
+
+#####################################
+########        Solve        ########
+#####################################
+
+#solve c with the plants grouped by the key attributes
+#   compare_full: also solve the full (per-plant) model to report the error
+#                 of the clustering against it
+def solve_clustered(c, key, params=None, compare_full=False):
+    params = params or {}
+    cl = clusters(c.pp, key)
+    for g in cl:
+        if g.units > 1:
+            print g
+    cc = cluster_coefficients(c, cl)
+    values, solution = rolling_horizon.solve_window(cc, None, params,
+                                                    "uc_clustered")
+    cluster_obj_val = cc.objective_value(*values)
+    print "Clustered model: %d integer commitment columns instead of %d " \
+        "binaries" % (3 * len(cl) * c.grid.num_hours,
+                      3 * len(c.pp) * c.grid.num_hours)
+
+    on = lagrangian.repair_commitment(c, disaggregate(c, cl, values[0]))
+    obj_val, optimal, on, start, shutdown, gen = \
+        lagrangian.repair(c, on, params)
+
+    full_obj_val = None
+    if compare_full:
+        full, full_solution = rolling_horizon.solve_window(c, None, params,
+                                                           "uc_full")
+        full_obj_val = c.objective_value(*full)
+    return ClusteredResult(on, start, shutdown, gen, obj_val, optimal,
+                           cluster_obj_val, len(cl), len(c.pp), full_obj_val)
@@ -0,0 +1,103 @@
+#   Columnar output files
+#
+#   Author: Paul Kerl (paul.kerl@gatech.edu)
+#
+#   The results of a scenario as named columns (numpy arrays) in a compressed
+#   .npz file, next to a .json sidecar describing them: the output level, the
+#   scenario summary (objective, health cost, totals, arguments), the length
+#   of each dimension (plant, hour, type) and for each column its dimensions,
+#   shape, dtype and meaning. Every column is its own member of the .npz (zip)
+#   file, so read(path, names) only decompresses the columns asked for, and
+#   the sidecar alone answers summary questions without opening the .npz.
+#
+#   Output levels, each including the ones before it:
+#     "summary": the sidecar only
+#     "plant":   per-plant totals (plant columns)
+#     "hourly":  the hour keys and the (plant x hour) and (type x hour) results
+#
+#   Either file's path stands for both, e.g.
+#        meta, cols = columnar_output.read(path, ["name", "gen"])
+#        cols["gen"][cols["name"] == "Bowen"] #hourly generation of one plant
+#
+import os
+import json
+import numpy as np
+
+levels = ("summary", "plant", "hourly")
+
+
+#rank of an output level in levels
+def level_rank(level):
+    if level not in levels:
+        raise Exception("Output level error, %s is not one of %s" %
+                        (level, ", ".join(levels)))
+    return levels.index(level)
+
+
+#whether output level includes the outputs of level needed
+def writes(level, needed):
+    return level_rank(level) >= level_rank(needed)
+
+
+#paths of the columnar file and its sidecar, from either of them
+def paths(path):
+    base = os.path.splitext(path)[0]
+    return base + ".npz", base + ".json"
+
+
+########    columns   ########
+#the columns of one output file, in order, with their dimensions
+class Columns:
+    def __init__(self):
+        self.arrays = {} #by column name
+        self.info = []   #name, dimensions, shape, dtype and meaning of each
+        self.dims = {}   #length of each dimension
+
+    def add(self, name, values, dims, description):
+        a = np.asarray(values)
+        if a.ndim != len(dims):
+            raise Exception("Column error, %s has %d dimensions, not %d (%s)"
+                            % (name, a.ndim, len(dims), ", ".join(dims)))
+        for dim, n in zip(dims, a.shape):
+            if self.dims.setdefault(dim, n) != n:
+                raise Exception("Column error, %s has %d of dimension %s, "
+                                "not %d" % (name, n, dim, self.dims[dim]))
+        self.arrays[name] = a
+        self.info.append({"name": name, "dims": list(dims),
+                          "shape": list(a.shape), "dtype": a.dtype.str,
+                          "description": description})
+
+    def __str__(self):
+        return "Columns %s" % ", ".join("%s%s" % (c["name"],
+                                                  tuple(c["shape"]))
+                                        for c in self.info)
+
+
+#write the summary (a dict of scalars) and the columns of level to the
+#columnar file of path and its sidecar; the columnar file is only written
+#above the summary level
+def write(path, level, summary, columns):
+    npz, sidecar = paths(path)
+    meta = {"level": level, "summary": summary, "dims": columns.dims,
+            "columns": columns.info}
+    if level_rank(level) > 0:
+        meta["file"] = os.path.basename(npz)
+        np.savez_compressed(npz, **columns.arrays)
+    with open(sidecar, 'wb') as f:
+        json.dump(meta, f, indent=1, sort_keys=True)
+
+
+#the sidecar of the columnar file of path
+def read_meta(path):
+    with open(paths(path)[1], 'rb') as f:
+        return json.load(f)
+
+
+#sidecar and columns (all, or just those named) of the columnar file of path
+def read(path, names=None):
+    meta = read_meta(path)
+    if names is None:
+        names = [c["name"] for c in meta["columns"]]
+    with np.load(paths(path)[0]) as data:
+        columns = dict((name, data[name]) for name in names)
+    return meta, columns
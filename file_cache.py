@@ -0,0 +1,58 @@
+#   On-disk cache of arrays parsed from input files
+#
+#   Author: Paul Kerl (paul.kerl@gatech.edu)
+#
+#   An input csv file is parsed once into named numpy arrays, which are saved
+#   in a cache directory as a .npz file named after the input file's size and
+#   modification time and the version of the parser. Later runs load the
+#   saved arrays instead of parsing the file again; a changed input file, or a
+#   parser whose version was bumped, gets a new cache file, replacing the old
+#   one. Used for the health cost files (hc_data.py) and the load curves
+#   (load_data.py), whose parse_version is bumped with every change to what
+#   they parse (columns, nan handling, array layout).
+#
+import os
+import zipfile
+import numpy as np
+
+_loaded = {} #arrays loaded by this process, by input file and cache name
+
+
+#dict of the arrays parse(file_name) returns, from the cache in directory
+#when neither the file nor the parser (its version) has changed since it
+#was cached
+def load(file_name, parse, directory, version):
+    st = os.stat(file_name)
+    name = "%s.%d.%d.v%s.npz" % (os.path.basename(file_name), st.st_size,
+                                 int(st.st_mtime * 1000000), version)
+    key = (os.path.abspath(file_name), name)
+    if key in _loaded:
+        return _loaded[key]
+
+    try:
+        with np.load(os.path.join(directory, name)) as f:
+            arrays = dict((k, f[k]) for k in f.files)
+    except (IOError, OSError, ValueError, zipfile.BadZipfile):
+        arrays = parse(file_name)
+        _save(arrays, file_name, directory, name)
+    _loaded[key] = arrays
+    return arrays
+
+
+#save the parsed arrays, replacing the cache files of older versions of the
+#input file or the parser (a failed save only costs the parse next time)
+def _save(arrays, file_name, directory, name):
+    prefix = os.path.basename(file_name) + "."
+    tmp = os.path.join(directory, "%s.tmp%d" % (name, os.getpid()))
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        for old in os.listdir(directory):
+            if old.startswith(prefix) and old.endswith(".npz"):
+                os.remove(os.path.join(directory, old))
+        with open(tmp, 'wb') as f:
+            np.savez(f, **arrays)
+        os.rename(tmp, os.path.join(directory, name))
+    except (IOError, OSError):
+        if os.path.exists(tmp):
+            os.remove(tmp)
@@ -0,0 +1,116 @@
+#   Health cost sensitivity data
+#
+#   Author: Paul Kerl (paul.kerl@gatech.edu)
+#
+#   Each data/hc_data_so4/*health_costs.csv file is parsed once into a float
+#   array with one row per hour and the columns below, and cached in
+#   data/cache/hc_data_so4/ (see file_cache.py), so later runs load the saved
+#   array instead of parsing the csv again.
+#
+#   The health costs read from these files are kept in one dense
+#   (plants x months x days x hours) HealthCostTable, see below.
+#
+import csv
+import numpy as np
+import file_cache
+import phase_timer #phase timing
+
+#the csv columns kept, in order (the first csv column, the source name, is
+#dropped); point source files have no emis_agg column, it is read as nan
+columns = ("month", "day", "hour", "val", "mwh", "emis", "emis_agg")
+
+cache_dir = "data/cache/hc_data_so4/"
+
+#version of parse, in the cache file names: bump it with every change to
+#the parsed array (columns, nan handling), so no stale cache file is read
+parse_version = 1
+
+
+#float value of a csv field, nan if it is missing or not a number
+def _field(row, n):
+    try:
+        return float(row[n])
+    except (IndexError, ValueError):
+        return np.nan
+
+
+#parse a health cost csv file into a (hours x columns) array
+def parse(file_name):
+    with open(file_name, 'rb') as f:
+        reader = csv.reader(f)
+        header = reader.next()
+        rows = [[_field(row, n) for n in range(1, len(columns) + 1)]
+                for row in reader if row]
+    return np.array(rows, dtype=float).reshape(len(rows), len(columns))
+
+
+#(hours x columns) array of a health cost csv file, from the cache when the
+#file hasn't changed since it was cached
+def load(file_name, directory=cache_dir):
+    phase_timer.begin("health_cost_files")
+    try:
+        return file_cache.load(file_name, lambda f: {"data": parse(f)},
+                               directory, parse_version)["data"]
+    finally:
+        phase_timer.end()
+
+
+#####################################
+########  Health cost table  ########
+#####################################
+
+########    health cost table   ########
+#dense (plants x months x days x hours) float array of health costs, one row
+#per plant. The costs don't change from year to year, so one row serves every
+#year of the horizon instead of a copy per year.
+class HealthCostTable:
+    def __init__(self, num_plants, months, days, hours):
+        self.pos = tuple(dict((v, n) for n, v in enumerate(axis))
+                         for axis in (months, days, hours))
+        self.values = np.zeros((num_plants, len(months), len(days),
+                                len(hours)))
+
+    #health costs of plant i, sharing the table's memory
+    def plant(self, i):
+        return PlantHealthCost(self.values[i], self.pos)
+
+    def __str__(self):
+        return "Health cost table: %d plants, %d x %d x %d hours, %.1f MB" % \
+            (self.values.shape + (self.values.nbytes / 1e6,))
+
+
+########    plant health costs   ########
+#(months x days x hours) health costs of one plant, looked up like the
+#scripts' dictionaries as hc[t, m, d, h] for any year t
+class PlantHealthCost:
+    def __init__(self, values, pos):
+        self.values = values #shape (months, days, hours)
+        self.pos = pos       #position of each month, day and hour
+
+    def __getitem__(self, key):
+        t, m, d, h = key
+        return float(self.values[self.pos[0][m], self.pos[1][d],
+                                 self.pos[2][h]])
+
+    #set the costs of every (month, day, hour) of the table from a
+    #(month, day, hour) keyed dictionary of one of the health cost files,
+    #file_months maps a month of the table to the month of the files it
+    #takes the costs of (e.g. the winter months to January), by default
+    #its own
+    def fill(self, hc, file_months=None):
+        for m, i in self.pos[0].items():
+            fm = file_months.get(m, m) if file_months else m
+            for d, j in self.pos[1].items():
+                for h, k in self.pos[2].items():
+                    self.values[i, j, k] = hc[fm, d, h]
+
+    #same costs multiplied by scale (e.g. VSL * BETA)
+    def scaled(self, scale):
+        return PlantHealthCost(self.values * scale, self.pos)
+
+    #index into values of the hours of a time grid, every year mapping to
+    #the same costs; values[grid_index(grid)] is the costs in grid order
+    def grid_index(self, grid):
+        keys = grid.keys
+        return tuple(np.array([self.pos[n][key[n + 1]] for key in keys],
+                              dtype=np.int64) for n in range(3))
@@ -0,0 +1,281 @@
+#   Lagrangian relaxation of the unit commitment model
+#
+#   Author: Paul Kerl (paul.kerl@gatech.edu)
+#
+#   The hourly load balance rows are the only rows coupling the plants. They
+#   are dualized with one price per hour, which splits the model into one
+#   commitment/dispatch subproblem per plant. The subproblems are solved in
+#   parallel worker processes (a two-state dynamic program, or a small MIP for
+#   the ramp-limited coal plants), the prices are updated with subgradient
+#   steps, and a primal repair turns the last commitment into a feasible
+#   solution of the full model.
+#
+import multiprocessing
+import numpy as np
+import lazy_import
+gp = lazy_import.LazyModule("gurobipy") #imported on first use
+import matrix_build
+import solver_backend #solve errors
+
+
+########    lagrangian result   ########
+class LagrangianResult:
+    def __init__(self, on, start, shutdown, gen, obj_val, lower_bound,
+                 optimal, iterations):
+        self.on = on
+        self.start = start
+        self.shutdown = shutdown
+        self.gen = gen
+        self.obj_val = obj_val         #objective of the repaired solution
+        self.lower_bound = lower_bound #best value of the dual function
+        self.optimal = optimal         #repair model solved to optimality
+        self.iterations = iterations
+        self.gap = (obj_val - lower_bound) / max(abs(obj_val), 1e-10)
+    def __str__(self):
+        return "Lagrangian relaxation: %d iterations, objective $%s, " \
+            "lower bound $%s, gap %.4f%%" % \
+            (self.iterations, '{0:,.2f}'.format(self.obj_val),
+             '{0:,.2f}'.format(self.lower_bound), 100 * self.gap)
+
+
+#####################################
+########   Plant subproblems ########
+#####################################
+
+_coeffs = None #UCCoefficients of the full model, set once in each worker
+_params = None #gurobi parameters of the plant MIPs
+_env = None    #gurobi environment of this worker, opened on first use
+_models = {}   #plant MIPs built by this worker, by plant index
+
+
+def _init_worker(c, params):
+    global _coeffs, _params, _env
+    _coeffs = c
+    _params = params
+    _env = None
+    _models.clear()
+
+
+#two-state (off/on) dynamic program over the hours for a plant without ramp
+#limits: when on, generation sits at minimum or full output depending on the
+#sign of its price-adjusted cost; in the hours the presolve fixed, only the
+#fixed state is allowed
+def _plant_dp(c, i, gen_cost):
+    p = c.pp[i]
+    K = c.grid.num_hours
+    prev = c.grid.prev
+    on_cost_k = c.var_om_cost[i, c.year]
+    start_cost_k = c.startup_cost[i, c.year]
+    low = p.min_power * p.capacity
+    high = p.capacity * p.cap_factor
+    on = np.zeros(K)
+    gen = np.zeros(K)
+    if low > high: #can never be on
+        return 0.0, on, np.zeros(K), np.zeros(K), gen
+
+    level = np.where(gen_cost < 0, high, low)
+    stage = on_cost_k + gen_cost * level
+    #cost of each state in each hour, infinite for the state a fixing rules
+    #out
+    barred = np.zeros((K, 2))
+    if c.fixed_on is not None:
+        fixed = c.fixed_on[i]
+        barred[fixed == 0.0, 1] = np.inf
+        barred[fixed == 1.0, 0] = np.inf
+
+    #value of ending hour k off (0) or on (1), and the state it came from
+    value = np.zeros(2)
+    came_from = np.zeros((K, 2), dtype=np.int64)
+    for k in range(K):
+        off_from = int(value[1] < value[0])
+        if prev[k] < 0: #no link to the previous hour, no startup cost
+            on_from = off_from
+            on_value = value[on_from]
+        else:
+            on_from = int(value[1] <= value[0] + start_cost_k[k])
+            on_value = value[1] if on_from else value[0] + start_cost_k[k]
+        came_from[k] = (off_from, on_from)
+        value = np.array([value[off_from], on_value + stage[k]]) + barred[k]
+
+    state = int(value[1] < value[0])
+    for k in range(K - 1, -1, -1):
+        on[k] = state
+        state = came_from[k, state]
+    gen = on * level
+    linked = prev >= 0
+    before = np.where(linked, on[np.maximum(prev, 0)], on)
+    start = np.where(linked, np.maximum(on - before, 0.0), 0.0)
+    shutdown = np.where(linked, np.maximum(before - on, 0.0), 0.0)
+    return min(value), on, start, shutdown, gen
+
+
+#plant subproblem as a small MIP, used for ramp-limited (coal) plants; the
+#model is built once per worker and only its objective changes afterwards
+def _plant_mip(c, i, gen_cost):
+    global _env
+    if _env is None:
+        _env = gp.Env()
+    if i not in _models:
+        mod = gp.Model("uc_plant_%s" % i, env=_env)
+        for param, value in _params.items():
+            mod.setParam(param, value)
+        mm, index = matrix_build.uc_matrices(c.plant(i), load_rows=False)
+        variables, constrs = mm.to_gurobi(mod)
+        _models[i] = (mod, variables, index)
+    mod, variables, index = _models[i]
+    gen_vars = [variables[col] for col in index["z"][0]]
+    mod.setAttr("Obj", gen_vars, list(gen_cost))
+    mod.optimize()
+    x = np.array(mod.getAttr("X", variables))
+    #the bound, not the incumbent, keeps the dual value a valid lower bound
+    return (mod.ObjBound,) + tuple(x[index[v]][0] for v in
+                                 ("on_u", "start_v", "shutdown_w", "z"))
+
+
+#solve the subproblem of plant i for hourly prices lam
+def _solve_plant(args):
+    i, lam = args
+    c = _coeffs
+    gen_cost = c.objective()[3][i] - lam
+    if c.pp[i].type == 0: #coal plants carry the ramp rows
+        return (i,) + _plant_mip(c, i, gen_cost)
+    return (i,) + _plant_dp(c, i, gen_cost)
+
+
+#####################################
+########   Dual and repair   ########
+#####################################
+
+#merit-order starting prices: in each hour, the generation cost of the
+#cheapest set of plants whose full output covers the load
+def _merit_order_prices(c):
+    gen_cost = c.objective()[3]
+    high = np.array([p.capacity * p.cap_factor for p in c.pp])
+    order = np.argsort(gen_cost, axis=0)
+    covered = np.cumsum(high[order], axis=0) >= c.load[None, :]
+    marginal = np.minimum(np.argmax(covered, axis=0), len(c.pp) - 1)
+    return gen_cost[order[marginal, np.arange(c.grid.num_hours)],
+                    np.arange(c.grid.num_hours)]
+
+
+#turn the relaxed commitment into one that can carry the load in every hour:
+#start the cheapest idle plants where capacity is short, stop the most
+#expensive running plants where minimum generation exceeds the load
+#(the commitments fixed by the presolve are kept)
+def repair_commitment(c, on):
+    on = np.round(on)
+    free = np.ones(on.shape, dtype=bool)
+    if c.fixed_on is not None:
+        free = np.isnan(c.fixed_on)
+        on = np.where(free, on, c.fixed_on)
+    gen_cost = c.objective()[3]
+    low = np.array([p.min_power * p.capacity for p in c.pp])
+    high = np.array([p.capacity * p.cap_factor for p in c.pp])
+    for k in range(c.grid.num_hours):
+        for i in np.argsort(gen_cost[:, k]):
+            if np.dot(high, on[:, k]) >= c.load[k]:
+                break
+            if free[i, k]:
+                on[i, k] = 1.0
+        for i in np.argsort(-gen_cost[:, k]):
+            if np.dot(low, on[:, k]) <= c.load[k]:
+                break
+            if on[i, k] and low[i] > 0 and free[i, k]:
+                on[i, k] = 0.0
+    return on
+
+
+#solve the full model with the commitment fixed (falling back to using it as
+#a MIP start if the fixed commitment violates e.g. the ramp rows), also used
+#for the disaggregated commitment of the clustered model (clustered_uc.py)
+def repair(c, on, params):
+    mod = gp.Model("uc_repair")
+    for param, value in params.items():
+        mod.setParam(param, value)
+    mm, index = matrix_build.uc_matrices(c)
+    variables, constrs = mm.to_gurobi(mod)
+    on_vars = [variables[col] for col in index["on_u"].ravel()]
+    mod.setAttr("LB", on_vars, list(on.ravel()))
+    mod.setAttr("UB", on_vars, list(on.ravel()))
+    mod.optimize()
+    if mod.SolCount == 0:
+        print "Fixed commitment infeasible, repairing from a MIP start"
+        lb, ub = np.zeros(on.shape), np.ones(on.shape)
+        if c.fixed_on is not None: #bounds of the presolve's fixings
+            lb = np.where(np.isnan(c.fixed_on), lb, c.fixed_on)
+            ub = np.where(np.isnan(c.fixed_on), ub, c.fixed_on)
+        mod.setAttr("LB", on_vars, list(lb.ravel()))
+        mod.setAttr("UB", on_vars, list(ub.ravel()))
+        mod.setAttr("Start", on_vars, list(on.ravel()))
+        mod.optimize()
+    if mod.SolCount == 0:
+        raise solver_backend.SolverError(
+            "Commitment repair found no solution, gurobi status %s" %
+            mod.status)
+    x = np.array(mod.getAttr("X", variables))
+    return (mod.objVal, mod.status == gp.GRB.status.OPTIMAL) + \
+        tuple(x[index[v]] for v in ("on_u", "start_v", "shutdown_w", "z"))
+
+
+#Lagrangian relaxation of the load rows of c with subgradient (Polyak) steps
+#   max_iterations: subgradient iterations
+#   workers: number of worker processes (None uses every core)
+#   params: gurobi parameters for the plant MIPs and the repair model
+#   bound_tolerance: relative excess of the lower bound over the repaired
+#                    objective that is reported
+def solve_lagrangian(c, max_iterations=50, workers=None, params=None,
+                     step_scale=2.0, min_step_scale=1e-4,
+                     bound_tolerance=1e-6):
+    params = params or {}
+    plant_params = dict(params)
+    plant_params.pop("LogFile", None)
+    plant_params["OutputFlag"] = 0
+    num_plants = len(c.pp)
+    lam = _merit_order_prices(c)
+    best_bound = -float("inf")
+    best_on = None
+    since_improved = 0
+
+    pool = multiprocessing.Pool(workers, _init_worker, (c, plant_params))
+    try:
+        for it in range(max_iterations):
+            results = pool.map(_solve_plant,
+                               [(i, lam) for i in range(num_plants)])
+            results.sort(key=lambda r: r[0])
+            on = np.array([r[2] for r in results])
+            gen = np.array([r[5] for r in results])
+            bound = sum(r[1] for r in results) + float(np.dot(lam, c.load))
+
+            if bound > best_bound:
+                best_bound = bound
+                best_on = on
+                since_improved = 0
+            else:
+                since_improved += 1
+                if since_improved >= 5:
+                    step_scale /= 2.0
+                    since_improved = 0
+
+            #subgradient of the dual function, the load row residuals
+            g = c.load - gen.sum(axis=0)
+            norm = float(np.dot(g, g))
+            print "LR iteration %d: lower bound $%s, residual %.1f MW" % \
+                (it + 1, '{0:,.2f}'.format(bound), np.sqrt(norm))
+            if norm < 1e-6 or step_scale < min_step_scale:
+                break
+            target = best_bound + 0.05 * abs(best_bound)
+            lam = lam + step_scale * (target - bound) / norm * g
+    finally:
+        pool.close()
+        pool.join()
+
+    obj_val, optimal, on, start, shutdown, gen = \
+        repair(c, repair_commitment(c, best_on), params)
+    #the dual value bounds the optimum from below, so a bound above a
+    #feasible objective points at an error in the subproblems
+    if best_bound > obj_val + bound_tolerance * max(abs(obj_val), 1.0):
+        print "Warning: Lagrangian lower bound $%s above the repaired " \
+            "objective $%s" % ('{0:,.2f}'.format(best_bound),
+                               '{0:,.2f}'.format(obj_val))
+    return LagrangianResult(on, start, shutdown, gen, obj_val, best_bound,
+                            optimal, it + 1)
@@ -0,0 +1,33 @@
+#   Deferred imports of slow-loading modules
+#
+#   Author: Paul Kerl (paul.kerl@gatech.edu)
+#
+#   gurobipy takes a while to import (and to check out its license), which
+#   every import of the model modules paid even just to read the inputs. The
+#   model modules bind it through a LazyModule instead, which imports the real
+#   module on the first attribute access (gp.Model, gp.GRB, ...), so importing
+#   them in a notebook or a long-lived worker process is quick and gurobipy is
+#   only loaded by the first model build.
+#
+import importlib
+
+
+########    lazy module   ########
+class LazyModule:
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    #the real module, imported on first use
+    def load(self):
+        if self._module is None:
+            self.__dict__["_module"] = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __str__(self):
+        if self._module is None:
+            return "Module %s (not imported yet)" % self._name
+        return str(self._module)
@@ -0,0 +1,121 @@
+#   Columnar load curve store
+#
+#   Author: Paul Kerl (paul.kerl@gatech.edu)
+#
+#   The data/lc_data/load_curves_*.csv files (YEAR, MONTH, DAY, HOUR, LOAD
+#   rows) are parsed once into one contiguous array of loads indexed by
+#   absolute hour, counted from hour 0 of the file's first day, and cached in
+#   data/cache/lc_data/ (see file_cache.py). A year, month, day or any window
+#   of days is then a slice of that array, and the load right hand sides of a
+#   time grid are one fancy index.
+#
+import csv
+import datetime
+import numpy as np
+import file_cache
+import phase_timer #phase timing
+
+cache_dir = "data/cache/lc_data/"
+
+#version of parse, in the cache file names: bump it with every change to
+#the parsed arrays (columns, missing hours, layout), so no stale cache file
+#is read
+parse_version = 1
+
+hours_per_day = 24
+
+
+########    load store   ########
+#load (MW) in each hour from hour 0 of first_day on, nan for hours missing
+#from the load curve file
+class LoadStore:
+    def __init__(self, first_day, load):
+        self.first_day = first_day #datetime.date
+        self.load = load
+        self.num_days = len(load) // hours_per_day
+
+    #absolute hour of an hour of a day
+    def hour_index(self, date, hour=0):
+        k = (date - self.first_day).days * hours_per_day + hour
+        if k < 0 or k >= len(self.load):
+            raise Exception("No load curve for %s hour %s, load curves cover "
+                            "%s to %s" % (date, hour, self.first_day,
+                                          self.first_day + datetime.timedelta(
+                                              self.num_days - 1)))
+        return k
+
+    #loads of num_days days from first on, in hour order
+    def window(self, first, num_days):
+        k = self.hour_index(first)
+        self.hour_index(first + datetime.timedelta(num_days - 1))
+        return self.load[k:k + num_days * hours_per_day]
+
+    def day(self, date):
+        return self.window(date, 1)
+
+    def month(self, year, month):
+        first = datetime.date(year, month, 1)
+        if month == 12:
+            last = datetime.date(year + 1, 1, 1)
+        else:
+            last = datetime.date(year, month + 1, 1)
+        return self.window(first, (last - first).days)
+
+    def year(self, year):
+        first = datetime.date(year, 1, 1)
+        return self.window(first,
+                           (datetime.date(year + 1, 1, 1) - first).days)
+
+    #load to be met in each hour of a (matrix_build) time grid, whose year t
+    #is start_year + t
+    def grid_load(self, grid, start_year):
+        day_start = np.array([self.hour_index(datetime.date(start_year + t,
+                                                            m, d))
+                              for (t, m, d) in grid.day_keys], dtype=np.int64)
+        idx = (day_start[:, None] + np.array(grid.hours)[None, :]).ravel()
+        load = self.load[idx]
+        if np.isnan(load).any():
+            t, m, d, h = grid.keys[int(np.flatnonzero(np.isnan(load))[0])]
+            raise Exception("No load in the load curves for %s hour %s" %
+                            (datetime.date(start_year + t, m, d), h))
+        return load
+
+    def __str__(self):
+        return "Load store: %d days from %s" % (self.num_days, self.first_day)
+
+
+#parse a load curve csv file into the arrays of a LoadStore
+def parse(file_name):
+    with open(file_name, 'rb') as f:
+        reader = csv.reader(f)
+        header = reader.next()
+        cols = [header.index(c) for c in ("YEAR", "MONTH", "DAY", "HOUR",
+                                          "LOAD")]
+        rows = np.array([[float(row[c]) for c in cols] for row in reader if row])
+    year, month, day, hour, load = rows.reshape(-1, len(cols)).T
+
+    #day number of each row, counted in days from 1970-01-01
+    dates = (year.astype(np.int64) - 1970).astype('datetime64[Y]') \
+        .astype('datetime64[M]') + \
+        (month.astype(np.int64) - 1).astype('timedelta64[M]')
+    dates = dates.astype('datetime64[D]') + \
+        (day.astype(np.int64) - 1).astype('timedelta64[D]')
+    day_num = dates.astype(np.int64)
+    first = day_num.min()
+
+    hourly = np.full((day_num.max() - first + 1) * hours_per_day, np.nan)
+    hourly[(day_num - first) * hours_per_day + hour.astype(np.int64)] = load
+    return {"first_day": np.array(first), "load": hourly}
+
+
+#LoadStore of a load curve csv file, from the cache when the file hasn't
+#changed since it was cached
+def load(file_name, directory=cache_dir):
+    phase_timer.begin("load_curve_files")
+    try:
+        arrays = file_cache.load(file_name, parse, directory, parse_version)
+    finally:
+        phase_timer.end()
+    first_day = datetime.date(1970, 1, 1) + \
+        datetime.timedelta(int(arrays["first_day"]))
+    return LoadStore(first_day, arrays["load"])
@@ -0,0 +1,1006 @@
+#   Matrix-form model construction for the unit commitment and capacity
+#   planning models
+#
+#   Author: Paul Kerl (paul.kerl@gatech.edu)
+#
+#   Instead of one mod.addVar / mod.addConstr call per index, the variable and
+#   constraint families are assembled as sparse coefficient matrices over a
+#   (plant x hour) grid and handed to gurobi in one call each, or to another
+#   solver (see solver_backend).
+#
+import numpy as np
+import scipy.sparse as sp
+import phase_timer #phase timing
+
+#row senses, column types and infinity of the matrices, with the values of
+#gp.GRB so that the matrices go to gurobi as they are, and are built without
+#gurobipy for the other solvers
+LESS_EQUAL, GREATER_EQUAL, EQUAL = "<", ">", "="
+CONTINUOUS, BINARY, INTEGER = "C", "B", "I"
+INFINITY = 1e100
+
+
+#####################################
+########        Classes      ########
+#####################################
+
+########    time grid   ########
+#flat hour index k over the (t, m, d, h) loops, in the same order the scripts
+#loop over them (years, then months, then days, then hours)
+#link_months: also link the first hour of the first day of a month to the
+#hour before it in the grid when that hour is in the previous month (the
+#grid then holds its last day, e.g. the windows of an annual run, see
+#annual_uc.py)
+class TimeGrid:
+    def __init__(self, day_keys, hours, link_months=False):
+        self.day_keys = list(day_keys) #(t, m, d) tuples, in loop order
+        self.hours = list(hours)
+        self.keys = [(t, m, d, h) for (t, m, d) in self.day_keys
+                     for h in self.hours]
+        self.num_hours = len(self.keys)
+        self.pos = dict((key, k) for k, key in enumerate(self.keys))
+
+        #flat index of the previous hour, -1 where the model has no link
+        #(first hour of the first day of a month, same as the scripts' "d != 1")
+        self.prev = np.full(self.num_hours, -1, dtype=np.int64)
+        for k, (t, m, d, h) in enumerate(self.keys):
+            if h != self.hours[0]:
+                self.prev[k] = k - 1
+            elif (t, m, d - 1, self.hours[-1]) in self.pos:
+                self.prev[k] = self.pos[t, m, d - 1, self.hours[-1]]
+            elif link_months and d == 1 and k > 0 and \
+                    self.keys[k - 1][:2] == ((t, m - 1) if m > 1 else
+                                             (t - 1, 12)):
+                self.prev[k] = k - 1
+
+    def index(self, t, m, d, h):
+        return self.pos[t, m, d, h]
+
+    #the hours up to hour k along the linked hours, at most n of them,
+    #oldest first
+    def linked_hours(self, k, n):
+        chain = []
+        while k >= 0 and len(chain) < n:
+            chain.append(k)
+            k = self.prev[k]
+        return chain[::-1]
+
+    def __str__(self):
+        return "Time grid: %d days, %d hours" % (len(self.day_keys),
+                                                  self.num_hours)
+
+
+#full (years x months x days x hours) grid used by the scripts
+def time_grid(years, months, days, hours):
+    return TimeGrid([(t, m, d) for t in years for m in months for d in days],
+                    hours)
+
+
+########    matrix model   ########
+#columns (objective, bounds, types, names) and rows (sparse triplets, senses,
+#right hand sides, names) of a model, collected block by block
+class MatrixModel:
+    def __init__(self):
+        self.num_vars = 0
+        self.num_constrs = 0
+        self.obj = []
+        self.lb = []
+        self.ub = []
+        self.vtype = []
+        self.var_names = []
+        self.rows = []
+        self.cols = []
+        self.vals = []
+        self.sense = []
+        self.rhs = []
+        self.constr_names = []
+
+    #add n columns, returns their indices
+    #(ub None is unbounded and vtype None continuous)
+    def add_vars(self, n, obj=0.0, lb=0.0, ub=None, vtype=None, names=None):
+        if ub is None:
+            ub = INFINITY
+        if vtype is None:
+            vtype = CONTINUOUS
+        self.obj.append(np.broadcast_to(np.asarray(obj, dtype=float), (n,)))
+        self.lb.append(np.broadcast_to(np.asarray(lb, dtype=float), (n,)))
+        self.ub.append(np.broadcast_to(np.asarray(ub, dtype=float), (n,)))
+        self.vtype.append(np.broadcast_to(np.asarray(vtype), (n,)))
+        self.var_names.extend(names if names is not None else [""] * n)
+        idx = np.arange(self.num_vars, self.num_vars + n)
+        self.num_vars += n
+        return idx
+
+    #add a block of rows given as (row, col, val) triplets, rows numbered
+    #from 0 within the block; returns the model row indices of the block
+    def add_constrs(self, rows, cols, vals, sense, rhs, names):
+        n = len(names)
+        self.rows.append(np.asarray(rows, dtype=np.int64) + self.num_constrs)
+        self.cols.append(np.asarray(cols, dtype=np.int64))
+        self.vals.append(np.asarray(vals, dtype=float))
+        self.sense.append(np.broadcast_to(np.asarray(sense), (n,)))
+        self.rhs.append(np.broadcast_to(np.asarray(rhs, dtype=float), (n,)))
+        self.constr_names.extend(names)
+        idx = np.arange(self.num_constrs, self.num_constrs + n)
+        self.num_constrs += n
+        return idx
+
+    #add (row, col, val) triplets to rows already in the model (model row
+    #indices), e.g. slack columns of existing rows
+    def add_terms(self, rows, cols, vals):
+        self.rows.append(np.asarray(rows, dtype=np.int64))
+        self.cols.append(np.asarray(cols, dtype=np.int64))
+        self.vals.append(np.asarray(vals, dtype=float))
+
+    #fix the columns cols to values, as continuous columns (a model whose
+    #integer columns are all fixed stays an LP, with duals)
+    def fix_vars(self, cols, values):
+        lb, ub = np.concatenate(self.lb), np.concatenate(self.ub)
+        vtype = np.concatenate(self.vtype)
+        lb[cols] = values
+        ub[cols] = values
+        vtype[cols] = CONTINUOUS
+        self.lb, self.ub, self.vtype = [lb], [ub], [vtype]
+
+    def matrix(self):
+        if not self.rows:
+            return sp.csr_matrix((0, self.num_vars))
+        A = sp.csr_matrix((np.concatenate(self.vals),
+                           (np.concatenate(self.rows),
+                            np.concatenate(self.cols))),
+                          shape=(self.num_constrs, self.num_vars))
+        A.eliminate_zeros() #e.g. min_power of 0.0
+        return A
+
+    #hand the whole model to gurobi in bulk, returns lists of the new Var and
+    #Constr objects in column / row order (addMVar / addMConstr need gurobipy
+    #9.1 or later; the names are set afterwards with one setAttr call each,
+    #as addMVar / addMConstr only take arrays of names in later versions)
+    def to_gurobi(self, mod):
+        first_var = mod.NumVars
+        first_constr = mod.NumConstrs
+        phase_timer.begin("variables")
+        x = mod.addMVar(self.num_vars,
+                        lb=np.concatenate(self.lb),
+                        ub=np.concatenate(self.ub),
+                        obj=np.concatenate(self.obj),
+                        vtype=np.concatenate(self.vtype))
+        phase_timer.end(self.num_vars)
+        phase_timer.begin("constraints")
+        if self.num_constrs > 0:
+            mod.addMConstr(self.matrix(), x, np.concatenate(self.sense),
+                           np.concatenate(self.rhs))
+        phase_timer.end(self.num_constrs)
+        phase_timer.begin("update")
+        mod.update()
+        phase_timer.end()
+        phase_timer.begin("names")
+        variables = mod.getVars()[first_var:]
+        constrs = mod.getConstrs()[first_constr:]
+        mod.setAttr("VarName", variables, self.var_names)
+        if self.num_constrs > 0:
+            mod.setAttr("ConstrName", constrs, self.constr_names)
+        mod.update()
+        phase_timer.end()
+        return variables, constrs
+
+    def __str__(self):
+        return "Matrix model: %d variables, %d constraints, %d nonzeros" % \
+            (self.num_vars, self.num_constrs, sum(len(v) for v in self.vals))
+
+
+########    variable grid   ########
+#(plant x hour) block of variables, indexed like the scripts' dictionaries,
+#e.g. z[i, t, m, d, h]
+class VarGrid:
+    def __init__(self, variables, cols, grid):
+        self.variables = variables #all model variables, column order
+        self.cols = cols           #column index, shape (plants, hours)
+        self.grid = grid
+
+    def __getitem__(self, key):
+        i, t, m, d, h = key
+        return self.variables[self.cols[i, self.grid.index(t, m, d, h)]]
+
+
+########    unit commitment coefficients   ########
+#per-hour and per-plant data of the unit commitment model over a time grid
+#   fuel_cost, startup_cost, var_om_cost: per-plant/per-year arrays
+#   disc: discount factor per year, health_cost: (plant x hour) array
+#   formulation: "standard" rows, or "tight" rows (see uc_matrices)
+#   fixed_on: optional (plant x hour) array of commitments fixed by the
+#             presolve (presolve.py), nan where not fixed
+class UCCoefficients:
+    def __init__(self, pp, grid, load, fuel_cost, startup_cost, var_om_cost,
+                 disc, health_cost, fs_emissions, pct_change,
+                 formulation="standard", fixed_on=None):
+        self.pp = pp
+        self.grid = grid
+        self.load = np.asarray(load, dtype=float)
+        self.fuel_cost = fuel_cost
+        self.startup_cost = startup_cost
+        self.var_om_cost = var_om_cost
+        self.disc = np.asarray(disc, dtype=float)
+        self.health_cost = health_cost
+        self.fs_emissions = fs_emissions
+        self.pct_change = pct_change
+        self.formulation = formulation
+        self.fixed_on = fixed_on
+        self.year = np.array([key[0] for key in grid.keys], dtype=np.int64)
+
+    #same data restricted to some of the days, plus the positions of the
+    #subset's hours in this grid
+    def subset(self, day_keys, link_months=False):
+        grid = TimeGrid(day_keys, self.grid.hours, link_months)
+        idx = np.array([self.grid.index(*key) for key in grid.keys],
+                       dtype=np.int64)
+        return UCCoefficients(self.pp, grid, self.load[idx], self.fuel_cost,
+                              self.startup_cost, self.var_om_cost, self.disc,
+                              self.health_cost[:, idx], self.fs_emissions,
+                              self.pct_change, self.formulation,
+                              self._fixed_on(idx)), idx
+
+    #same data for plant i alone
+    def plant(self, i):
+        return UCCoefficients([self.pp[i]], self.grid, self.load,
+                              self.fuel_cost[i:i + 1],
+                              self.startup_cost[i:i + 1],
+                              self.var_om_cost[i:i + 1], self.disc,
+                              self.health_cost[i:i + 1], self.fs_emissions,
+                              self.pct_change, self.formulation,
+                              self._fixed_on(slice(None), slice(i, i + 1)))
+
+    #same data with other (plant x hour) health costs and FS emissions switch
+    #(without the presolve's fixed commitments, which depend on the costs)
+    def with_health_cost(self, health_cost, fs_emissions):
+        return UCCoefficients(self.pp, self.grid, self.load, self.fuel_cost,
+                              self.startup_cost, self.var_om_cost, self.disc,
+                              health_cost, fs_emissions, self.pct_change,
+                              self.formulation)
+
+    #same data with the commitments of fixed_on fixed
+    def with_fixed_on(self, fixed_on):
+        return UCCoefficients(self.pp, self.grid, self.load, self.fuel_cost,
+                              self.startup_cost, self.var_om_cost, self.disc,
+                              self.health_cost, self.fs_emissions,
+                              self.pct_change, self.formulation, fixed_on)
+
+    def _fixed_on(self, hours, plants=slice(None)):
+        if self.fixed_on is None:
+            return None
+        return self.fixed_on[plants][:, hours]
+
+    #objective coefficients of on_u, start_v, shutdown_w and z, each of
+    #shape (plants, hours)
+    def objective(self):
+        return (self.var_om_cost[:, self.year],
+                self.startup_cost[:, self.year],
+                np.zeros((len(self.pp), self.grid.num_hours)),
+                self.disc[self.year][None, :] *
+                (self.fuel_cost[:, self.year] +
+                 self.health_cost * self.fs_emissions))
+
+    #objective value of a solution given as (plants x hours) arrays
+    def objective_value(self, on, start, shutdown, gen):
+        return sum(float((c * v).sum()) for c, v in
+                   zip(self.objective(), (on, start, shutdown, gen)))
+
+    def __str__(self):
+        return "Unit commitment coefficients: %d plants, %s" % \
+            (len(self.pp), self.grid)
+
+
+#####################################
+########   Cost coefficients ########
+#####################################
+
+#per-plant/per-year array of a per-fuel-type cost table (e.g. pp_fuel_costs),
+#cost[i, t] = table[start_year + t][column[i]] * scale[i], where the table
+#column defaults to the plant fuel type
+def plant_year_costs(pp, table, years, start_year, scale=None, column=None):
+    if column is None:
+        column = [p.fuel_type for p in pp]
+    cost = np.array([[float(table[start_year + t][c]) for t in years]
+                     for c in column]).reshape(len(pp), len(years))
+    if scale is not None:
+        cost *= np.asarray(scale, dtype=float)[:, None]
+    return cost
+
+
+#(plant x hour) array of the health costs stored on each plant (see
+#hc_data.PlantHealthCost), attr picks health_cost, health_cost_pct or
+#health_cost_fs
+def plant_health_costs(pp, grid, attr="health_cost"):
+    rows = []
+    pos = idx = None
+    for p in pp:
+        hc = getattr(p.costs, attr)
+        if hc.pos is not pos: #plants of one table share the grid index
+            pos, idx = hc.pos, hc.grid_index(grid)
+        rows.append(hc.values[idx])
+    return np.array(rows).reshape(len(pp), grid.num_hours)
+
+
+#solution values of a (plant x hour) block of variables looked up as
+#v[i, t, m, d, h] (a VarGrid or one of the scripts' dictionaries), fetched
+#with one getAttr call
+def grid_values(mod, v, num_plants, grid):
+    variables = [v[(i,) + key] for i in range(num_plants) for key in grid.keys]
+    return np.array(mod.getAttr("X", variables)).reshape(num_plants,
+                                                         grid.num_hours)
+
+
+#solution values of several (plant x hour) blocks of variables, as in
+#grid_values: the VarGrids of one model are sliced out of a single X query of
+#all its variables, the dictionaries fetched with one getAttr call each
+def solution_grids(mod, blocks, num_plants, grid):
+    x = {} #X of the model variables, by id of the variable list
+    values = []
+    for v in blocks:
+        if isinstance(v, VarGrid):
+            if id(v.variables) not in x:
+                x[id(v.variables)] = np.array(mod.getAttr("X", v.variables))
+            values.append(x[id(v.variables)][v.cols])
+        else:
+            values.append(grid_values(mod, v, num_plants, grid))
+    return values
+
+
+#####################################
+########   Unit commitment   ########
+#####################################
+
+#order of the load balance rows in the scripts, which loop over hours, then
+#months, then days, then years
+def _load_row_order(grid):
+    pos = [{}, {}, {}, {}] #position of each year, month, day and hour
+    for key in grid.keys:
+        for n, v in enumerate(key):
+            pos[n].setdefault(v, len(pos[n]))
+    t_pos, m_pos, d_pos, h_pos = pos
+    keys = grid.keys
+    return np.array(sorted(range(grid.num_hours), key=lambda k: (
+        h_pos[keys[k][3]], m_pos[keys[k][1]], d_pos[keys[k][2]],
+        t_pos[keys[k][0]])), dtype=np.int64)
+
+
+#hours before the first hour of the grid of c whose startups and shutdowns
+#its minimum up/down rows reach (tight formulation, 0 without minimums)
+def history_hours(c):
+    if c.formulation != "tight":
+        return 0
+    return max([getattr(p, "min_up", 1) for p in c.pp] +
+               [getattr(p, "min_down", 1) for p in c.pp] + [1]) - 1
+
+
+#unit commitment columns: for each hour, for each plant, on_u, start_v,
+#shutdown_w and z, which is the order the scripts create them in
+#   c: UCCoefficients
+#   initial: optional (on, gen) per-plant arrays for the hour before the first
+#            hour of the grid, e.g. the end of the previous rolling window,
+#            optionally followed by (plants x hours) startups and shutdowns
+#            of the hours up to it (oldest first, at most history_hours), which
+#            the tight minimum up/down rows of the first hours count
+#   final: optional (on, gen) per-plant arrays the last hour of the grid is
+#          fixed to, e.g. the boundary state of the next block of an annual
+#          run; a (plants x hours) on fixes the commitment of the last hours
+#   load_rows: False leaves out the load balance rows (dualized, e.g. in the
+#              Lagrangian plant subproblems)
+#with c.formulation == "tight", the same model gets the tight unit
+#commitment rows: minimum up/down time facets (sums of the startups over the
+#last min_up hours <= on, of the shutdowns over the last min_down hours
+#<= 1 - on), generation above minimum limited by the startup and shutdown
+#capability of the ramp-limited coal plants, and coal ramps that only allow
+#the ramp while on
+def uc_matrices(c, initial=None, load_rows=True, final=None):
+    pp = c.pp
+    grid = c.grid
+    load = c.load
+    pct_change = c.pct_change
+    num_plants = len(pp)
+    K = grid.num_hours
+    keys = grid.keys
+    phase_timer.begin("matrices") #a step per variable and constraint family
+    mm = MatrixModel()
+    if c.formulation not in ("standard", "tight"):
+        raise Exception("Unknown unit commitment formulation \"%s\"" %
+                        c.formulation)
+    tight = c.formulation == "tight"
+
+    #########  variables  #########
+    cols = np.arange(4 * num_plants * K).reshape(K, num_plants, 4)
+    on_cols = cols[:, :, 0].T
+    start_cols = cols[:, :, 1].T
+    shut_cols = cols[:, :, 2].T
+    gen_cols = cols[:, :, 3].T
+
+    obj = np.zeros((K, num_plants, 4))
+    for f, coeff in enumerate(c.objective()):
+        obj[:, :, f] = coeff.T
+
+    #a clustered plant (clustered_uc.py) of n units commits 0 to n of them,
+    #a plant is one unit with binary commitment
+    units = np.array([getattr(p, "units", 1) for p in pp], dtype=float)
+    vtype = np.empty((K, num_plants, 4), dtype=np.array(BINARY).dtype)
+    vtype[:, :, :3] = np.where(units > 1, INTEGER, BINARY)[None, :, None]
+    vtype[:, :, 3] = CONTINUOUS
+    ub = np.empty((K, num_plants, 4))
+    ub[:, :, :3] = units[None, :, None]
+    ub[:, :, 3] = INFINITY
+    lb = np.zeros((K, num_plants, 4))
+
+    #commitments fixed by the presolve (and the final state), and the
+    #startups and shutdowns they fix wherever the hour before is fixed too
+    fixed_on = c.fixed_on
+    if final is not None:
+        if fixed_on is None:
+            fixed_on = np.full((num_plants, K), np.nan)
+        fixed_on = fixed_on.copy()
+        final_on = np.round(np.asarray(final[0], dtype=float))
+        final_on = final_on.reshape(num_plants, -1)
+        fixed_on[:, K - final_on.shape[1]:] = final_on
+    if fixed_on is not None:
+        fixed = ~np.isnan(fixed_on.T) #shape (hours, plants)
+        lb[:, :, 0] = np.where(fixed, fixed_on.T, lb[:, :, 0])
+        ub[:, :, 0] = np.where(fixed, fixed_on.T, ub[:, :, 0])
+        linked = np.nonzero(grid.prev >= 0)[0]
+        both = fixed[linked] & fixed[grid.prev[linked]]
+        step = fixed_on.T[linked] - np.where(
+            both, fixed_on.T[grid.prev[linked]], 0.0)
+        for f, v in ((1, np.maximum(step, 0.0)), (2, np.maximum(-step, 0.0))):
+            lb[linked, :, f] = np.where(both, v, lb[linked, :, f])
+            ub[linked, :, f] = np.where(both, v, ub[linked, :, f])
+    if final is not None: #and the final generation
+        lb[K - 1, :, 3] = ub[K - 1, :, 3] = np.asarray(final[1], dtype=float)
+
+    names = []
+    for (t, m, d, h) in keys:
+        for i in range(num_plants):
+            suffix = (i, t, m, d, h)
+            names.append('on_or_off_%s_%s_%s_%s_%s' % suffix)
+            names.append('start_%s_%s_%s_%s_%s' % suffix)
+            names.append('shutdown_%s_%s_%s_%s_%s' % suffix)
+            names.append('gen_total_%s_%s_%s_%s_%s' % suffix)
+    mm.add_vars(4 * num_plants * K, obj=obj.ravel(), lb=lb.ravel(),
+                ub=ub.ravel(), vtype=vtype.ravel(), names=names)
+    phase_timer.mark("variables", 4 * num_plants * K)
+
+    capacity = np.array([p.capacity for p in pp])
+    cap_factor = np.array([p.cap_factor for p in pp])
+    min_power = np.array([p.min_power for p in pp])
+    #minimum up/down times in hours, 1 for no minimum
+    min_up = np.array([getattr(p, "min_up", 1) for p in pp], dtype=np.int64)
+    min_down = np.array([getattr(p, "min_down", 1) for p in pp],
+                        dtype=np.int64)
+
+    #########  constraints  #########
+    rows = {}
+
+    #demand must be met with available capacity
+    order = _load_row_order(grid)
+    if load_rows:
+        mm_rows = mm.add_constrs(
+            np.repeat(np.arange(K), num_plants),
+            gen_cols[:, order].T.ravel(),
+            np.ones(K * num_plants),
+            EQUAL, load[order],
+            ["load_%s_%s_%s_%s" % (keys[k][3], keys[k][1], keys[k][2],
+                                   keys[k][0]) for k in order])
+        rows["load"] = np.empty(K, dtype=np.int64)
+        rows["load"][order] = mm_rows
+        phase_timer.mark("load", K)
+
+    #plant on/off capacity and minimum generation, in the same h, m, d, t, i
+    #order as the load rows, two rows per index
+    r = np.arange(2 * K * num_plants).reshape(K, num_plants, 2)
+    gen = gen_cols[:, order].T
+    on = on_cols[:, order].T
+    mm.add_constrs(
+        np.concatenate([r[:, :, 0].ravel(), r[:, :, 0].ravel(),
+                        r[:, :, 1].ravel(), r[:, :, 1].ravel()]),
+        np.concatenate([gen.ravel(), on.ravel(), gen.ravel(), on.ravel()]),
+        np.concatenate([np.ones(K * num_plants),
+                        np.tile(-capacity * cap_factor, K),
+                        np.ones(K * num_plants),
+                        np.tile(-min_power * capacity, K)]),
+        np.tile([LESS_EQUAL, GREATER_EQUAL], K * num_plants),
+        0.0,
+        [name % (i, keys[k][0], keys[k][1], keys[k][2], keys[k][3])
+         for k in order for i in range(num_plants)
+         for name in ("plant_on_const_%s_%s_%s_%s_%s",
+                      "plant_min_cap_%s_%s_%s_%s_%s")])
+    phase_timer.mark("capacity", 2 * K * num_plants)
+
+    #change in power usage, coal plants only, hour to hour (including the
+    #23rd hour of the previous day)
+    coal = np.array([i for i, p in enumerate(pp) if p.type == 0],
+                    dtype=np.int64)
+    linked = np.nonzero(grid.prev >= 0)[0]
+    n = len(linked) * len(coal)
+    ramp = pct_change * capacity * cap_factor * units
+    #tight: up ramp <= ramp * on this hour, down ramp <= ramp * on the hour
+    #before (a unit that is off has no generation to ramp from or to), for
+    #single-unit plants
+    tight_ramp = tight & (units[coal] == 1)
+    if n > 0:
+        r = np.arange(2 * n).reshape(len(linked), len(coal), 2)
+        cur = gen_cols[coal][:, linked].T
+        prev = gen_cols[coal][:, grid.prev[linked]].T
+        row_ix = [r[:, :, 0].ravel(), r[:, :, 0].ravel(),
+                  r[:, :, 1].ravel(), r[:, :, 1].ravel()]
+        col_ix = [cur.ravel(), prev.ravel(), prev.ravel(), cur.ravel()]
+        val_ix = [np.repeat([1.0, -1.0, 1.0, -1.0], n)]
+        rhs = np.tile(ramp[coal], len(linked))
+        if tight_ramp.any():
+            on_cur = on_cols[coal][:, linked].T
+            on_prev = on_cols[coal][:, grid.prev[linked]].T
+            sel = np.tile(tight_ramp, len(linked))
+            row_ix.extend((r[:, :, 0].ravel()[sel], r[:, :, 1].ravel()[sel]))
+            col_ix.extend((on_cur.ravel()[sel], on_prev.ravel()[sel]))
+            val_ix.append(-np.tile(ramp[coal], (2, len(linked)))[:, sel]
+                          .ravel())
+            rhs = np.where(sel, 0.0, rhs)
+        mm.add_constrs(
+            np.concatenate(row_ix), np.concatenate(col_ix),
+            np.concatenate(val_ix), LESS_EQUAL, np.repeat(rhs, 2),
+            ["plant_change_usage_%s_%s_%s_%s_%s" % ((i,) + keys[k])
+             for k in linked for i in coal for _ in (0, 1)])
+        phase_timer.mark("ramping", 2 * n)
+
+    #tight: generation above minimum, z - min_power * on <= (full - min) * on,
+    #less what a coal plant can't reach in the hour it starts or the hour
+    #before it shuts down (ramp from / to zero): z <= full * on
+    #- (full - ramp) * start - (full - ramp) * shutdown of the next hour, in
+    #one row if the plant must stay on at least 2 hours, else in two rows
+    full = capacity * cap_factor
+    ramped = coal[tight_ramp & (ramp[coal] < full[coal])] if tight else []
+    if len(ramped) > 0:
+        nxt = np.full(K, -1, dtype=np.int64)
+        nxt[grid.prev[linked]] = linked
+        row_ix, col_ix, val_ix, names = [], [], [], []
+        count = 0
+        for i in ramped:
+            lost = full[i] - ramp[i]
+            for k in range(K):
+                terms = [(gen_cols[i, k], 1.0), (on_cols[i, k], -full[i])]
+                if grid.prev[k] >= 0:
+                    terms.append((start_cols[i, k], lost))
+                rows_k = [terms]
+                if nxt[k] >= 0:
+                    shut = (shut_cols[i, nxt[k]], lost)
+                    if min_up[i] >= 2:
+                        terms.append(shut)
+                    else:
+                        rows_k.append(terms[:2] + [shut])
+                for terms in rows_k:
+                    if len(terms) == 2: #the plain capacity row
+                        continue
+                    for col, val in terms:
+                        row_ix.append(count)
+                        col_ix.append(col)
+                        val_ix.append(val)
+                    names.append("plant_on_tight_%s_%s_%s_%s_%s" %
+                                 ((i,) + keys[k]))
+                    count += 1
+        mm.add_constrs(row_ix, col_ix, val_ix, LESS_EQUAL, 0.0, names)
+        phase_timer.mark("tight_capacity", count)
+
+    #shutdown startup constraints, two rows per index plus the state
+    #transition row wherever the previous hour is in the model
+    per_hour = 2 + (grid.prev >= 0)
+    first = np.concatenate([[0], np.cumsum(per_hour * num_plants)[:-1]])
+    base = (first[:, None] + np.arange(num_plants)[None, :] *
+            per_hour[:, None]) #shape (hours, plants)
+    row_ix = [base.ravel(), base.ravel(), base.ravel() + 1,
+              base.ravel() + 1]
+    col_ix = [start_cols.T.ravel(), on_cols.T.ravel(), shut_cols.T.ravel(),
+              on_cols.T.ravel()]
+    val_ix = [np.ones(K * num_plants), -np.ones(K * num_plants),
+              np.ones(K * num_plants), np.ones(K * num_plants)]
+    if len(linked) > 0:
+        b = base[linked].ravel() + 2
+        for c, v in ((start_cols, 1.0), (shut_cols, -1.0), (on_cols, -1.0)):
+            row_ix.append(b)
+            col_ix.append(c[:, linked].T.ravel())
+            val_ix.append(np.full(len(b), v))
+        row_ix.append(b)
+        col_ix.append(on_cols[:, grid.prev[linked]].T.ravel())
+        val_ix.append(np.ones(len(b)))
+    #startups (start rows) and shutdowns (shutdown rows) of the hours before
+    #the first hour, moved to the right hand sides
+    carried = np.zeros((K, num_plants, 2))
+    if tight:
+        #minimum up/down times: the startups of the last min_up hours (along
+        #the linked hours) in the start row, the shutdowns of the last
+        #min_down hours in the shutdown row
+        history = None
+        if initial is not None and len(initial) > 2:
+            history = [np.asarray(v, dtype=float).reshape(num_plants, -1)
+                       for v in initial[2:4]]
+        back = grid.prev.copy() #hour s hours back, -1 where there is none
+        last = np.arange(K) #hour s - 1 hours back
+        #hours before the first hour that hour s hours back is (1 for the
+        #hour before it), 0 where it isn't one
+        before = np.zeros(K, dtype=np.int64)
+        for s in range(1, max(min_up.max(), min_down.max()) if pp else 1):
+            has = back >= 0
+            before = np.where(last == 0, 1,
+                              np.where(before > 0, before + 1, 0))
+            for cols_f, length, offset in ((start_cols, min_up, 0),
+                                           (shut_cols, min_down, 1)):
+                plants = np.nonzero(length > s)[0]
+                ks = np.nonzero(has)[0]
+                row_ix.append((base[ks][:, plants] + offset).ravel())
+                col_ix.append(cols_f[plants][:, back[ks]].T.ravel())
+                val_ix.append(np.ones(len(ks) * len(plants)))
+                if history is not None:
+                    n = history[offset].shape[1]
+                    ks = np.nonzero((before > 0) & (before <= n))[0]
+                    carried[ks[:, None], plants[None, :], offset] += \
+                        history[offset][plants][:, n - before[ks]].T
+            last = back
+            back = np.where(has, grid.prev[np.maximum(back, 0)], -1)
+    sense = []
+    rhs = []
+    names = []
+    for k, key in enumerate(keys):
+        for i in range(num_plants):
+            suffix = (i,) + key
+            sense.extend((LESS_EQUAL, LESS_EQUAL))
+            rhs.extend((-carried[k, i, 0], units[i] - carried[k, i, 1]))
+            names.append("plant_startup_2_%s_%s_%s_%s_%s" % suffix)
+            names.append("plant_shutdown_%s_%s_%s_%s_%s" % suffix)
+            if grid.prev[k] >= 0:
+                sense.append(EQUAL)
+                rhs.append(0.0)
+                names.append("plant_startup_%s_%s_%s_%s_%s" % suffix)
+    mm.add_constrs(np.concatenate(row_ix), np.concatenate(col_ix),
+                   np.concatenate(val_ix), np.array(sense), np.array(rhs),
+                   names)
+    phase_timer.mark("startup_shutdown", len(names))
+
+    #state and generation carried over from before the first hour
+    if initial is not None:
+        on0 = np.round(np.asarray(initial[0], dtype=float))
+        gen0 = np.asarray(initial[1], dtype=float)
+        r = np.arange(num_plants)
+        rc = num_plants + 2 * np.arange(len(coal))
+        ramp = pct_change * capacity[coal] * cap_factor[coal] * units[coal]
+        mm.add_constrs(
+            np.concatenate([r, r, r, rc, rc + 1]),
+            np.concatenate([start_cols[:, 0], shut_cols[:, 0], on_cols[:, 0],
+                            gen_cols[coal, 0], gen_cols[coal, 0]]),
+            np.concatenate([np.ones(num_plants), -np.ones(num_plants),
+                            -np.ones(num_plants), np.ones(len(coal)),
+                            -np.ones(len(coal))]),
+            np.array([EQUAL] * num_plants +
+                     [LESS_EQUAL] * (2 * len(coal))),
+            np.concatenate([-on0, np.column_stack(
+                [gen0[coal] + ramp, ramp - gen0[coal]]).ravel()]),
+            ["plant_startup_%s_%s_%s_%s_%s" % ((i,) + keys[0])
+             for i in range(num_plants)] +
+            ["plant_change_usage_%s_%s_%s_%s_%s" % ((i,) + keys[0])
+             for i in coal for _ in (0, 1)])
+        phase_timer.mark("initial_state", num_plants + 2 * len(coal))
+
+    index = {"on_u": on_cols, "start_v": start_cols,
+             "shutdown_w": shut_cols, "z": gen_cols, "rows": rows}
+    phase_timer.end(mm.num_constrs)
+    return mm, index
+
+
+#build the unit commitment variables and constraints in bulk, returns the
+#on_u, start_v, shutdown_w and z variable grids
+def build_uc(mod, c, initial=None):
+    grid = c.grid
+    mm, index = uc_matrices(c, initial)
+    variables, constrs = mm.to_gurobi(mod)
+    return (VarGrid(variables, index["on_u"], grid),
+            VarGrid(variables, index["start_v"], grid),
+            VarGrid(variables, index["shutdown_w"], grid),
+            VarGrid(variables, index["z"], grid))
+
+
+#####################################
+########  Capacity planning  ########
+#####################################
+
+#per-year investment columns of the capacity planning model, returns their
+#(plant x year) column indices by name (x, y, q, pi_non, pi_pct, pi_fs)
+def cp_investment_vars(mm, pp, years, disc):
+    num_plants = len(pp)
+    num_years = len(years)
+    disc = np.asarray(disc, dtype=float)
+    fixed_cap_cost = np.array([p.costs.fixed_cap_cost for p in pp])
+    inc_cap_cost = np.array([p.costs.inc_cap_cost for p in pp])
+    dec_cap_cost = np.array([p.costs.dec_cap_cost for p in pp])
+
+    #capacity, inc capacity and dec capacity of plant i in year t
+    pairs = [(i, t) for t in years for i in range(num_plants)]
+    x_cols = mm.add_vars(num_years * num_plants,
+                         obj=np.outer(disc, fixed_cap_cost).ravel(),
+                         names=['capacity_%s_%s' % it for it in pairs])
+    y_cols = mm.add_vars(num_years * num_plants,
+                         obj=np.outer(disc, inc_cap_cost).ravel(),
+                         vtype=INTEGER,
+                         names=['inc_capacity_%s_%s' % it for it in pairs])
+    q_cols = mm.add_vars(num_years * num_plants,
+                         obj=np.outer(disc, dec_cap_cost).ravel(),
+                         vtype=INTEGER,
+                         names=['dec_capacity_%s_%s' % it for it in pairs])
+    #generation type of plant i in year t (binary)
+    pi_cols = mm.add_vars(3 * num_years * num_plants, ub=1.0,
+                          vtype=BINARY,
+                          names=[name % it for it in pairs
+                                 for name in ('pi_non_%s_%s', 'pi_pct_%s_%s',
+                                              'pi_fs_%s_%s')])
+    pi_cols = pi_cols.reshape(num_years, num_plants, 3)
+    return {"x": x_cols.reshape(num_years, num_plants).T,
+            "y": y_cols.reshape(num_years, num_plants).T,
+            "q": q_cols.reshape(num_years, num_plants).T,
+            "pi_non": pi_cols[:, :, 0].T, "pi_pct": pi_cols[:, :, 1].T,
+            "pi_fs": pi_cols[:, :, 2].T}
+
+
+#yearly change in capacity balance rows of the investment columns inv
+#(cp_investment_vars), returns their number
+def cp_change_capacity_rows(mm, inv, years):
+    x_cols, y_cols, q_cols = inv["x"], inv["y"], inv["q"]
+    num_plants = x_cols.shape[0]
+    n = (len(years) - 1) * num_plants
+    if n == 0:
+        return 0
+    r = np.arange(n)
+    mm.add_constrs(
+        np.tile(r, 4),
+        np.concatenate([x_cols[:, 1:].T.ravel(), x_cols[:, :-1].T.ravel(),
+                        y_cols[:, 1:].T.ravel(), q_cols[:, 1:].T.ravel()]),
+        np.repeat([1.0, -1.0, -1.0, 1.0], n),
+        EQUAL, 0.0,
+        ["change_cap_%s_%s" % (i, t) for t in years[1:]
+         for i in range(num_plants)])
+    return n
+
+
+#final max capacity and generation type choice rows of the investment
+#columns inv (cp_investment_vars), returns their number
+def cp_plant_type_rows(mm, pp, inv, years):
+    num_plants = len(pp)
+    capacity = np.array([p.capacity for p in pp])
+    x_cols = inv["x"]
+    pi_non_cols, pi_pct_cols, pi_fs_cols = \
+        inv["pi_non"], inv["pi_pct"], inv["pi_fs"]
+    pairs = [(i, t) for t in years for i in range(num_plants)]
+    n = len(years) * num_plants
+    r = np.arange(2 * n).reshape(n, 2)
+    mm.add_constrs(
+        np.concatenate([r[:, 0], r[:, 1], r[:, 1], r[:, 1]]),
+        np.concatenate([x_cols.T.ravel(), pi_pct_cols.T.ravel(),
+                        pi_fs_cols.T.ravel(), pi_non_cols.T.ravel()]),
+        np.ones(4 * n),
+        np.tile([LESS_EQUAL, EQUAL], n),
+        np.column_stack([np.tile(capacity, len(years)), np.ones(n)]).ravel(),
+        [name % it for it in pairs
+         for name in ("plant_cap_%s_%s", "plant_gen_type_%s_%s")])
+    return 2 * n
+
+
+#all plants set to no pct, no fs (TODO TESTING) rows of the investment
+#columns inv (cp_investment_vars), returns their number
+def cp_set_type_rows(mm, pp, inv, years):
+    num_plants = len(pp)
+    pairs = [(i, t) for t in years for i in range(num_plants)]
+    n = len(pairs)
+    mm.add_constrs(np.arange(n), inv["pi_pct"].T.ravel(), np.ones(n),
+                   EQUAL, 1.0,
+                   ["plant_gen_set_type_%s_%s" % it for it in pairs])
+    return n
+
+
+#capacity planning columns and rows, in the order the script creates them:
+#the per-year investment variables x, y, q and pi_* followed by the hourly
+#dispatch block z_non, z_pct, z_fs and z, which shares them
+#   var_cost: per-plant/per-year array, disc: discount factor per year
+#   health_cost, health_cost_pct, health_cost_fs: (plant x hour) arrays
+#   emissions_adj: (NONE_EMISSIONS_ADJ, PCT_EMISSIONS, FS_EMISSIONS)
+#   weight: optional per-hour weight of the dispatch and health costs, e.g.
+#           the days a representative day stands for (representative_days)
+def cp_matrices(pp, grid, years, load, var_cost, disc, health_cost,
+                health_cost_pct, health_cost_fs, emissions_adj, reserve,
+                pct_change, weight=None):
+    num_plants = len(pp)
+    num_years = len(years)
+    K = grid.num_hours
+    keys = grid.keys
+    year = np.array([key[0] for key in keys], dtype=np.int64)
+    disc = np.asarray(disc, dtype=float)
+    #discount factor of each hour, times its weight
+    hour_disc = disc[year]
+    if weight is not None:
+        hour_disc = hour_disc * np.asarray(weight, dtype=float)
+    phase_timer.begin("matrices") #a step per variable and constraint family
+    mm = MatrixModel()
+
+    capacity = np.array([p.capacity for p in pp])
+    cap_factor = np.array([p.cap_factor for p in pp])
+    min_power = np.array([p.min_power for p in pp])
+
+    #########  investment variables  #########
+    inv = cp_investment_vars(mm, pp, years, disc)
+    phase_timer.mark("investment_variables", 6 * num_years * num_plants)
+    x_cols, y_cols, q_cols = inv["x"], inv["y"], inv["q"]
+    pi_non_cols, pi_pct_cols, pi_fs_cols = \
+        inv["pi_non"], inv["pi_pct"], inv["pi_fs"]
+
+    #########  dispatch variables  #########
+    #electricity generated at plant i in year t, month m, day d, hour h
+    none_adj, pct_adj, fs_adj = emissions_adj
+    cost = var_cost[:, year]
+    obj = np.zeros((K, num_plants, 4))
+    obj[:, :, 0] = (hour_disc[:, None] *
+                    (cost + health_cost * none_adj).T)
+    obj[:, :, 1] = (hour_disc[:, None] *
+                    (cost + health_cost_pct * pct_adj).T)
+    obj[:, :, 2] = (hour_disc[:, None] *
+                    (cost + health_cost_fs * fs_adj).T)
+    names = []
+    for (t, m, d, h) in keys:
+        for i in range(num_plants):
+            suffix = (i, t, m, d, h)
+            names.append('gen_%s_%s_%s_%s_%s' % suffix)
+            names.append('gen_pct_%s_%s_%s_%s_%s' % suffix)
+            names.append('gen_fs_%s_%s_%s_%s_%s' % suffix)
+            names.append('gen_total_%s_%s_%s_%s_%s' % suffix)
+    cols = mm.add_vars(4 * num_plants * K, obj=obj.ravel(),
+                       names=names).reshape(K, num_plants, 4)
+    phase_timer.mark("dispatch_variables", 4 * num_plants * K)
+    non_cols = cols[:, :, 0].T
+    pct_cols = cols[:, :, 1].T
+    fs_cols = cols[:, :, 2].T
+    gen_cols = cols[:, :, 3].T
+
+    #########  constraints  #########
+    rows = {}
+
+    #yearly change in capacity balance constraints
+    if num_years > 1:
+        phase_timer.mark("change_capacity",
+                         cp_change_capacity_rows(mm, inv, years))
+
+    #demand must be met with available capacity
+    order = _load_row_order(grid)
+    hmdt = [(keys[k][3], keys[k][1], keys[k][2], keys[k][0]) for k in order]
+    rows["load"] = np.empty(K, dtype=np.int64)
+    rows["load"][order] = mm.add_constrs(
+        np.repeat(np.arange(K), num_plants),
+        gen_cols[:, order].T.ravel(),
+        np.ones(K * num_plants),
+        EQUAL, load[order],
+        ["load_%s_%s_%s_%s" % key for key in hmdt])
+    phase_timer.mark("load", K)
+
+    #reserve must be available if need be -- R = % above load needed on reserve
+    mm.add_constrs(
+        np.repeat(np.arange(K), num_plants),
+        x_cols[:, year[order]].T.ravel(),
+        np.ones(K * num_plants),
+        GREATER_EQUAL, load[order] * (1 + reserve),
+        ["reserve_%s_%s_%s_%s" % key for key in hmdt])
+    phase_timer.mark("reserve", K)
+
+    #capacity constraints, six rows per (h, m, d, t, i)
+    r = np.arange(6 * K * num_plants).reshape(K, num_plants, 6)
+    gen = gen_cols[:, order].T.ravel()
+    x_t = x_cols[:, year[order]].T.ravel()
+    ones = np.ones(K * num_plants)
+    row_ix = []
+    col_ix = []
+    val_ix = []
+    for n, terms in enumerate((
+            #baseload capacity (% of minimum capacities)
+            [(gen, ones), (x_t, -np.tile(min_power, K))],
+            #capacity of a plant (based on capacity factor and capacity)
+            [(gen, ones), (x_t, -np.tile(cap_factor, K))],
+            #generation must be one of FS, PCT or neither
+            [(gen, ones), (non_cols[:, order].T.ravel(), -ones),
+             (fs_cols[:, order].T.ravel(), -ones),
+             (pct_cols[:, order].T.ravel(), -ones)],
+            #must choose exactly one generation type (big-M rows)
+            [(pct_cols[:, order].T.ravel(), ones),
+             (pi_pct_cols[:, year[order]].T.ravel(), -np.tile(capacity, K))],
+            [(non_cols[:, order].T.ravel(), ones),
+             (pi_non_cols[:, year[order]].T.ravel(), -np.tile(capacity, K))],
+            [(fs_cols[:, order].T.ravel(), ones),
+             (pi_fs_cols[:, year[order]].T.ravel(), -np.tile(capacity, K))])):
+        for c, v in terms:
+            row_ix.append(r[:, :, n].ravel())
+            col_ix.append(c)
+            val_ix.append(v)
+    mm.add_constrs(
+        np.concatenate(row_ix), np.concatenate(col_ix), np.concatenate(val_ix),
+        np.tile([GREATER_EQUAL, LESS_EQUAL, EQUAL,
+                 LESS_EQUAL, LESS_EQUAL, LESS_EQUAL],
+                K * num_plants),
+        0.0,
+        [name % (i, keys[k][0], keys[k][1], keys[k][2], keys[k][3])
+         for k in order for i in range(num_plants)
+         for name in ("plant_min_cap_%s_%s_%s_%s_%s",
+                      "plant_cap_%s_%s_%s_%s_%s",
+                      "plant_gen_types_%s_%s_%s_%s_%s",
+                      "plant_gen_pct_%s_%s_%s_%s_%s",
+                      "plant_gen_non_%s_%s_%s_%s_%s",
+                      "plant_gen_fs_%s_%s_%s_%s_%s")])
+    phase_timer.mark("capacity", 6 * K * num_plants)
+
+    #all plants final max capacity and generation type choice
+    phase_timer.mark("final_capacity", cp_plant_type_rows(mm, pp, inv, years))
+
+    #TODO TESTING
+    #all plants set to no pct, no fs
+    phase_timer.mark("set_type", cp_set_type_rows(mm, pp, inv, years))
+
+    #change in power usage constraint, coal plants only, within each day
+    coal = np.array([i for i, p in enumerate(pp) if p.type == 0],
+                    dtype=np.int64)
+    within_day = np.array([k for k in range(K)
+                           if keys[k][3] != grid.hours[0]], dtype=np.int64)
+    n = len(within_day) * len(coal)
+    if n > 0:
+        r = np.arange(n)
+        mm.add_constrs(
+            np.tile(r, 3),
+            np.concatenate([gen_cols[coal][:, within_day].T.ravel(),
+                            gen_cols[coal][:, within_day - 1].T.ravel(),
+                            x_cols[coal][:, year[within_day]].T.ravel()]),
+            np.concatenate([np.ones(n), -np.ones(n),
+                            -pct_change * np.ones(n)]),
+            LESS_EQUAL, 0.0,
+            ["plant_change_usage_%s_%s_%s_%s_%s" % ((i,) + keys[k])
+             for k in within_day for i in coal])
+        phase_timer.mark("ramping", n)
+
+    #health cost total, then health cost plant totals (dummy rows read back
+    #after the solve)
+    hc_non = (health_cost * hour_disc[None, :]).ravel()
+    hc_pct = (health_cost_pct * hour_disc[None, :]).ravel()
+    hc_fs = (health_cost_fs * hour_disc[None, :]).ravel()
+    hc_cols = np.concatenate([non_cols.ravel(), pct_cols.ravel(),
+                              fs_cols.ravel()])
+    hc_vals = np.concatenate([hc_non, hc_pct, hc_fs])
+    plant = np.tile(np.repeat(np.arange(num_plants), K), 3)
+    rows["health_cost"] = mm.add_constrs(
+        np.concatenate([np.zeros(len(hc_cols), dtype=np.int64), plant + 1]),
+        np.concatenate([hc_cols, hc_cols]),
+        np.concatenate([hc_vals, hc_vals]),
+        GREATER_EQUAL, -1000000000,
+        ["health_cost"] + ["health_cost_%s" % i for i in range(num_plants)])
+    phase_timer.mark("health_cost", num_plants + 1)
+
+    index = {"x": x_cols, "y": y_cols, "q": q_cols, "pi_non": pi_non_cols,
+             "pi_pct": pi_pct_cols, "pi_fs": pi_fs_cols, "z_non": non_cols,
+             "z_pct": pct_cols, "z_fs": fs_cols, "z": gen_cols, "rows": rows}
+    phase_timer.end(mm.num_constrs)
+    return mm, index
+
+
+#(plant x year) block of variables as a dictionary keyed by (i, t)
+def year_vars(variables, cols, years):
+    return dict(((i, t), variables[cols[i, n]])
+                for i in range(cols.shape[0]) for n, t in enumerate(years))
+
+
+#build the capacity planning variables and constraints in bulk, returns the
+#x, y, q, pi_non, pi_pct and pi_fs dictionaries and the z_non, z_pct, z_fs
+#and z variable grids
+def build_cp(mod, pp, grid, years, load, var_cost, disc, health_cost,
+             health_cost_pct, health_cost_fs, emissions_adj, reserve,
+             pct_change, weight=None):
+    mm, index = cp_matrices(pp, grid, years, load, var_cost, disc,
+                            health_cost, health_cost_pct, health_cost_fs,
+                            emissions_adj, reserve, pct_change, weight)
+    variables, constrs = mm.to_gurobi(mod)
+    investment = [year_vars(variables, index[name], years)
+                  for name in ("x", "y", "q", "pi_non", "pi_pct", "pi_fs")]
+    dispatch = [VarGrid(variables, index[name], grid)
+                for name in ("z_non", "z_pct", "z_fs", "z")]
+    return tuple(investment + dispatch)
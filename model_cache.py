@@ -0,0 +1,104 @@
+#   Content-addressed cache of built models
+#
+#   Author: Paul Kerl (paul.kerl@gatech.edu)
+#
+#   A built matrix model (see matrix_build) is stored under a hash of
+#   everything that determines it: the parsed inputs, the run parameters and
+#   the formulation, but not the solver settings. A run that only changes the
+#   MIP gap, the threads, the time limit or the solver then hands the stored
+#   file to the solver instead of building the model again, and the file
+#   replays the exact instance in benchmarks or in any other solver.
+#
+#   Layout: <cache_dir>/<key>/model.mps.gz (free MPS, columns x<j> and rows
+#                                           r<k> in the model's order)
+#                             index.npz    (index maps of the column and row
+#                                           families, e.g. z[i, k] -> column)
+#                             info.json    (model size)
+#
+#   The entries are evicted like those of the result cache
+#   (result_cache.evict).
+#
+import os
+import json
+import numpy as np
+import result_cache #entries stored the same way
+import solver_backend #MPS files
+
+cache_dir = "data/cache/models/"
+
+
+#####################################
+########     Index maps      ########
+#####################################
+
+#index maps (nested dicts of arrays, e.g. index["rows"]["load"]) as flat
+#arrays named "rows.load" and back
+def _flat_index(index, prefix=""):
+    flat = {}
+    for name, value in index.items():
+        if isinstance(value, dict):
+            flat.update(_flat_index(value, prefix + name + "."))
+        else:
+            flat[prefix + name] = np.asarray(value)
+    return flat
+
+
+def _nested_index(flat):
+    index = {}
+    for name, value in flat.items():
+        parts = name.split(".")
+        d = index
+        for part in parts[:-1]:
+            d = d.setdefault(part, {})
+        d[parts[-1]] = value
+    return index
+
+
+#####################################
+########   Store and fetch   ########
+#####################################
+
+########    cached model   ########
+class CachedModel:
+    def __init__(self, path, index, info):
+        self.path = path   #cache entry directory
+        self.model_file = os.path.join(path, "model.mps.gz")
+        self.index = index #index maps of the column and row families
+        self.info = info   #model size
+
+    def __str__(self):
+        return "Cached model %s (%d variables, %d constraints)" % \
+            (os.path.basename(self.path), self.info["num_vars"],
+             self.info["num_constrs"])
+
+
+#cached model of key, or None on a miss
+def fetch(key, directory=cache_dir):
+    path = os.path.join(directory, key)
+    try:
+        with open(os.path.join(path, "info.json"), 'rb') as f:
+            info = json.load(f)
+        with np.load(os.path.join(path, "index.npz")) as data:
+            index = _nested_index(dict((name, data[name])
+                                       for name in data.files))
+    except (IOError, OSError, ValueError):
+        return None
+    if not os.path.isfile(os.path.join(path, "model.mps.gz")):
+        return None
+    os.utime(path, None) #last use, for eviction
+    return CachedModel(path, index, info)
+
+
+#store the matrix model mm and its index maps under key, returns the
+#CachedModel
+def store(key, mm, index, directory=cache_dir, name="model"):
+    info = {"name": name, "num_vars": mm.num_vars,
+            "num_constrs": mm.num_constrs,
+            "num_nonzeros": int(sum(len(v) for v in mm.vals))}
+    def write(tmp):
+        solver_backend.write_mps(mm, os.path.join(tmp, "model.mps.gz"), name)
+        np.savez(os.path.join(tmp, "index.npz"), **_flat_index(index))
+        with open(os.path.join(tmp, "info.json"), 'wb') as f:
+            json.dump(info, f, indent=1, sort_keys=True)
+    path = result_cache.store_entry(key, write, directory)
+    return CachedModel(path, index, info)
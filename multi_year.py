@@ -0,0 +1,68 @@
+#!/opt/python/bin/python2.7
+# above line for condor direct execution if need be via condor/isye
+
+#   Multi-year driver for the Electricity Unit Commitment Model
+#
+#   Author: Paul Kerl (paul.kerl@gatech.edu)
+#
+#   Arguments, in order: VSL (in millions of USD2007),
+#                        BETA (in percent per 10 microg / m**3),
+#                        Health_Cost_Included (True/False flag),
+#                        optionally the first and last start years
+#                        (2004 and 2011 by default)
+#
+#   The start years are solved on one model kept in memory per calendar (see
+#   unit_commitment.run_years) and summarized in one results table in
+#   data/output/.
+#
+import csv
+import time
+from sys import argv #to unpack arguments
+import unit_commitment as uc
+
+
+#point and start years from the arguments, checked like the arguments of
+#unit_commitment.py
+def multi_year_arguments(argv):
+    if len(argv) not in (4, 6):
+        raise Exception("Argument error, expected VSL, BETA, health cost "
+                        "and optionally the first and last start years")
+    first_year, last_year = "2004", "2011"
+    if len(argv) == 6:
+        first_year, last_year = argv[4], argv[5]
+    VSL, BETA, health_cost_included, first = \
+        uc.check_arguments(argv[:4] + [first_year])
+    last = uc.check_arguments(argv[:4] + [last_year])[3]
+    if last < first:
+        raise Exception("Argument error, last start year %s before the first "
+                        "%s" % (last, first))
+    return VSL, BETA, health_cost_included, range(first, last + 1)
+
+
+if __name__ == "__main__":
+    VSL, BETA, health_cost_included, start_years = multi_year_arguments(argv)
+    inputs = uc.load_inputs(uc.base_dir)
+    started = time.time()
+    results = uc.run_years(inputs, VSL, BETA, health_cost_included,
+                           start_years)
+
+    table = uc.base_dir + "data/output/multi_year_UC_" + \
+        str(int(time.time())) + ".csv"
+    with open(table, 'wb') as csvfile:
+        w = csv.writer(csvfile)
+        w.writerow(("VSL", "BETA", "Health_Cost_Included", "Start_Year",
+                    "Objective", "Health_Cost", "Total_Load", "Plant_Load",
+                    "Optimal"))
+        for start_year, r in zip(start_years, results):
+            if r is None: #no solution
+                w.writerow((VSL, BETA, health_cost_included, start_year, "",
+                            "", "", "", False))
+                continue
+            w.writerow((r.VSL, r.BETA, r.health_cost_included, r.start_year,
+                        r.obj_val, r.hc, r.total_load, r.total_plant_load,
+                        r.optimal))
+    print "--------------------------------------------"
+    print "%d start years: %.1f seconds" % (len(results),
+                                            time.time() - started)
+    print "Results table: %s" % table
+    print "--------------------------------------------"
@@ -0,0 +1,75 @@
+#   Unit commitment model kept in memory between solves
+#
+#   Author: Paul Kerl (paul.kerl@gatech.edu)
+#
+#   Scenarios that only differ in cost coefficients or loads share the
+#   structure of the unit commitment model. The model is built once, and each
+#   new scenario changes its objective coefficients and load right hand sides
+#   with one bulk attribute update per changed family, then re-solves from the
+#   previous solution instead of from scratch.
+#
+import numpy as np
+import lazy_import
+gp = lazy_import.LazyModule("gurobipy") #imported on first use
+import matrix_build
+
+families = ("on_u", "start_v", "shutdown_w", "z") #in c.objective() order
+
+
+########    persistent unit commitment model   ########
+class PersistentUC:
+    def __init__(self, c, params=None, name="uc"):
+        self.c = c
+        self.mod = gp.Model(name)
+        for param, value in (params or {}).items():
+            self.mod.setParam(param, value)
+        mm, self.index = matrix_build.uc_matrices(c)
+        self.variables, constrs = mm.to_gurobi(self.mod)
+        self.mod.setAttr(gp.GRB.attr.ModelSense, gp.GRB.MINIMIZE)
+        self.family_vars = dict(
+            (f, [self.variables[col] for col in self.index[f].ravel()])
+            for f in families)
+        self.load_constrs = [constrs[row] for row in self.index["rows"]["load"]]
+        self.obj = c.objective()
+        self.solution = None #all variable values of the last solve
+        self.updates = 0     #attribute updates since the model was built
+
+    #change the objective coefficients and load right hand sides to those of
+    #c, which must be over the same plants and hours, touching only the
+    #families that changed
+    def update(self, c):
+        obj = c.objective()
+        for f, old, new in zip(families, self.obj, obj):
+            if not np.array_equal(old, new):
+                self.mod.setAttr("Obj", self.family_vars[f],
+                                 list(new.ravel()))
+                self.updates += 1
+        if not np.array_equal(self.c.load, c.load):
+            self.mod.setAttr("RHS", self.load_constrs, list(c.load))
+            self.updates += 1
+        self.obj = obj
+        self.c = c
+
+    #solve, starting from the previous solution
+    #   warm_start: "solution" offers every previous value as the MIP start,
+    #               "commitment" only the on/start/shutdown values (for a new
+    #               load, the generation is left to the solver), None none
+    #returns the on_u, start_v, shutdown_w and z solution arrays (None if no
+    #solution was found) and the gurobi status
+    def solve(self, warm_start="solution"):
+        if self.solution is not None and warm_start is not None:
+            start = self.solution.copy()
+            if warm_start == "commitment":
+                start[self.index["z"].ravel()] = gp.GRB.UNDEFINED
+            self.mod.setAttr("Start", self.variables, list(start))
+        self.mod.optimize()
+        if self.mod.SolCount == 0:
+            return None, self.mod.status
+        self.solution = np.array(self.mod.getAttr("X", self.variables))
+        values = tuple(self.solution[self.index[f]] for f in families)
+        return values, self.mod.status
+
+    def __str__(self):
+        return "Persistent unit commitment model: %d variables, %d " \
+            "attribute updates, %s" % (len(self.variables), self.updates,
+                                       self.c)
@@ -0,0 +1,139 @@
+#   Phase timing of model runs
+#
+#   Author: Paul Kerl (paul.kerl@gatech.edu)
+#
+#   The model code marks its phases (building the coefficient matrices,
+#   adding the variables and the constraints, writing the output files, ...)
+#   with begin(name) ... end() pairs, and the drivers mark the steps around
+#   them (reading the inputs, building, solving, extracting). While a timer
+#   is started the wall time and the CPU time of each phase, the process's
+#   memory at its end and the number of objects (rows, variables, files) it
+#   handled are collected; phases begun inside another phase are named after
+#   it (e.g. "build.variables"), and a phase run several times (e.g. one per
+#   rolling window) adds up. mark(name) closes a step of the current phase
+#   (e.g. one constraint family while building the matrices), timed from
+#   the phase's beginning or its previous step. Without a started timer the
+#   marks cost nothing.
+#
+import os
+import time
+try:
+    import resource #peak memory, unix only
+except ImportError:
+    resource = None
+
+timer = None #the started PhaseTimer, None when not timing
+
+
+#peak resident memory of the process so far, in MB (None if unknown)
+def peak_rss_mb():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+#current resident memory of the process, in MB (None if unknown)
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (IOError, OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024.0 * 1024.0)
+
+
+#user + system CPU seconds of the process (its solver threads included) and
+#of its finished child processes (e.g. the highs command line solver)
+def cpu_seconds():
+    t = os.times()
+    return t[0] + t[1] + t[2] + t[3]
+
+
+########    phase timer   ########
+class PhaseTimer:
+    def __init__(self):
+        self.phases = [] #name, calls, wall and CPU seconds, memory (MB),
+                         #objects handled
+        self.by_name = {}
+        self.stack = []  #[name, wall, CPU, wall and CPU of the last step] of
+                         #the open phases
+        self.started = time.time()
+        self.started_cpu = cpu_seconds()
+
+    def begin(self, name):
+        if self.stack:
+            name = self.stack[-1][0] + "." + name
+        wall, cpu = time.time(), cpu_seconds()
+        self.stack.append([name, wall, cpu, wall, cpu])
+
+    def end(self, count=None):
+        name, wall, cpu = self.stack.pop()[:3]
+        self._add(name, wall, cpu, count)
+
+    def mark(self, name, count=None):
+        step = self.stack[-1]
+        self._add(step[0] + "." + name, step[3], step[4], count)
+        step[3], step[4] = time.time(), cpu_seconds()
+
+    #add a call of the phase name begun at wall, CPU
+    def _add(self, name, wall, cpu, count):
+        if name not in self.by_name:
+            self.by_name[name] = {"name": name, "calls": 0, "seconds": 0.0,
+                                  "cpu_seconds": 0.0, "count": None}
+            self.phases.append(self.by_name[name])
+        phase = self.by_name[name]
+        phase["calls"] += 1
+        phase["seconds"] += time.time() - wall
+        phase["cpu_seconds"] += cpu_seconds() - cpu
+        phase["rss_mb"] = rss_mb()
+        phase["peak_rss_mb"] = peak_rss_mb()
+        if count is not None:
+            phase["count"] = (phase["count"] or 0) + count
+
+    #phases in order of first appearance, with the total run time and CPU
+    #time, and the current and peak memory
+    def report(self):
+        return {"phases": self.phases,
+                "seconds": time.time() - self.started,
+                "cpu_seconds": cpu_seconds() - self.started_cpu,
+                "rss_mb": rss_mb(),
+                "peak_rss_mb": peak_rss_mb()}
+
+    def __str__(self):
+        return "\n".join("%-40s %8.2f s %8.2f s CPU %8.1f MB %10s" %
+                         (p["name"], p["seconds"], p["cpu_seconds"],
+                          p["peak_rss_mb"] or 0.0,
+                          p["count"] if p["count"] is not None else "")
+                         for p in self.phases)
+
+
+#start timing, returns the new timer
+def start():
+    global timer
+    timer = PhaseTimer()
+    return timer
+
+
+#stop timing, returns the timer
+def stop():
+    global timer
+    t, timer = timer, None
+    return t
+
+
+#mark the beginning of a phase
+def begin(name):
+    if timer is not None:
+        timer.begin(name)
+
+
+#mark the end of the last phase begun, count objects handled in it
+def end(count=None):
+    if timer is not None and timer.stack:
+        timer.end(count)
+
+
+#mark the end of a step of the current phase, count objects handled in it
+def mark(name, count=None):
+    if timer is not None and timer.stack:
+        timer.mark(name, count)
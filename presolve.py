@@ -0,0 +1,94 @@
+#   Commitment presolve for the unit commitment model
+#
+#   Author: Paul Kerl (paul.kerl@gatech.edu)
+#
+#   Before the model is built, cheap bounds fix the commitment of plants in
+#   the hours where it can only take one value:
+#     - off: a plant whose minimum generation exceeds its available capacity,
+#       or exceeds the load of the hour
+#     - on: a plant of a must-run type (by rule), a plant without which the
+#       other plants can't cover the load of the hour, and (optionally) a
+#       plant that is cheaper per MWh at full output, including its hourly on
+#       cost, than the cheapest generation of any other plant in every hour
+#       of the horizon
+#   The fixed commitments go to the model builder as bounds (fixed_on of
+#   matrix_build.UCCoefficients), which also fixes the startups and shutdowns
+#   between fixed hours.
+#
+import numpy as np
+
+
+########    presolve report   ########
+class PresolveReport:
+    def __init__(self, fixed_on, grid, counts):
+        self.counts = counts #plant-hours fixed by each rule
+        fixed = ~np.isnan(fixed_on)
+        linked = grid.prev >= 0
+        self.num_on = int(fixed.sum())
+        self.num_transitions = 2 * int((fixed[:, linked] &
+                                        fixed[:, grid.prev[linked]]).sum())
+        self.num_vars = 3 * fixed.size
+    def __str__(self):
+        return "Presolve: fixed %d of %d commitment variables (%d on/off, " \
+            "%d startup/shutdown; %s)" % \
+            (self.num_on + self.num_transitions, self.num_vars, self.num_on,
+             self.num_transitions,
+             ", ".join("%s %d" % (rule, n) for rule, n in self.counts))
+
+
+#fixed commitments of c, returns c with them fixed and the report
+#   must_run_types: plant types always on
+#   dominated: also fix the plants that are cheaper than every other plant in
+#              every hour on (this assumes the other plants can always back
+#              down to make room for them)
+def presolve_commitment(c, must_run_types=(), dominated=False):
+    num_plants = len(c.pp)
+    K = c.grid.num_hours
+    units = np.array([getattr(p, "units", 1) for p in c.pp], dtype=float)
+    low = np.array([p.min_power * p.capacity for p in c.pp])
+    high = np.array([p.capacity * p.cap_factor for p in c.pp])
+    fixed = np.full((num_plants, K), np.nan)
+    counts = []
+
+    #never on: minimum generation above the available capacity
+    off = np.repeat((low > high)[:, None], K, axis=1)
+    fixed[off] = 0.0
+    counts.append(("never on", int(off.sum())))
+
+    #must-run rule
+    must = np.array([p.type in must_run_types for p in c.pp], dtype=bool) & \
+        ~off[:, 0]
+    fixed[must] = units[must][:, None]
+    counts.append(("must run", int(must.sum()) * K))
+
+    #off where one unit's minimum generation exceeds the load
+    over = np.isnan(fixed) & (low[:, None] > c.load[None, :])
+    fixed[over] = 0.0
+    counts.append(("above load", int(over.sum())))
+
+    #on where the other plants' capacity can't cover the load (single-unit
+    #plants)
+    cap = np.where(fixed == 0.0, 0.0, (units * high)[:, None])
+    short = np.isnan(fixed) & (units[:, None] == 1) & \
+        (cap.sum(axis=0)[None, :] - cap < c.load[None, :])
+    fixed[short] = 1.0
+    counts.append(("needed", int(short.sum())))
+
+    #on in every hour: cheaper at full output than any other plant's
+    #generation, and room for its output next to the other fixed plants
+    if dominated:
+        on_cost, start_cost, shut_cost, gen_cost = c.objective()
+        full_cost = gen_cost + on_cost / np.maximum(high, 1e-10)[:, None]
+        n = 0
+        for i in np.argsort(full_cost.max(axis=1)):
+            if units[i] != 1 or not np.isnan(fixed[i]).all():
+                continue
+            others = np.delete(gen_cost, i, axis=0)
+            room = c.load - (np.nan_to_num(fixed) * low[:, None]).sum(axis=0)
+            if len(others) and (high[i] <= room).all() and \
+                    (full_cost[i] <= others.min(axis=0)).all():
+                fixed[i] = 1.0
+                n += K
+        counts.append(("dominated", n))
+
+    return c.with_fixed_on(fixed), PresolveReport(fixed, c.grid, counts)
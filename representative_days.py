@@ -0,0 +1,112 @@
+#   Representative days of the capacity planning model
+#
+#   Author: Paul Kerl (paul.kerl@gatech.edu)
+#
+#   Most days of a year have near-duplicate load shapes. The days of each year
+#   of the grid are described by their 24-hour load profile and their 24-hour
+#   (plant-averaged) health cost profile, both scaled to unit spread, and
+#   grouped by k-medoids into representative days (actual days of the grid,
+#   the medoids) weighted by the number of days they stand for. The peak load
+#   day of each year is always kept as a day of its own, so the reserve rows
+#   of the model still see the year's peak hour. The model is then built over
+#   the representative days only, with each hour's dispatch costs weighted.
+#
+import numpy as np
+import matrix_build
+
+
+########    representative days   ########
+#   day_keys: the representative days, in the grid's loop order
+#   day_weight: the number of days of the full grid each one stands for
+#   represented_by: day key of the full grid -> its representative day
+class RepresentativeDays:
+    def __init__(self, day_keys, day_weight, represented_by, hours,
+                 num_days, profile_error):
+        self.day_keys = day_keys
+        self.day_weight = day_weight
+        self.represented_by = represented_by
+        self.num_days = num_days #days of the full grid
+        self.profile_error = profile_error #RMS load error, share of the mean
+        self.grid = matrix_build.TimeGrid(day_keys, hours)
+        #per-hour weight of the dispatch costs over self.grid
+        self.hour_weight = np.repeat(np.asarray(day_weight, dtype=float),
+                                     len(self.grid.hours))
+    def __str__(self):
+        return "Representative days: %d of %d days, load profile error " \
+            "%.2f%%" % (len(self.day_keys), self.num_days,
+                        100 * self.profile_error)
+
+
+#k-medoids (alternating assignment and medoid update from a greedy build)
+#of the rows of the distance matrix dist, returns the medoids' rows and the
+#medoid of each row
+def k_medoids(dist, k, max_iterations=100):
+    n = dist.shape[0]
+    k = min(k, n)
+    #build: start from the most central row, then add the row that lowers
+    #the total distance to the nearest medoid the most
+    medoids = [int(np.argmin(dist.sum(axis=1)))]
+    nearest = dist[medoids[0]].copy()
+    while len(medoids) < k:
+        gain = np.maximum(nearest[None, :] - dist, 0.0).sum(axis=1)
+        gain[medoids] = -1.0
+        medoids.append(int(np.argmax(gain)))
+        nearest = np.minimum(nearest, dist[medoids[-1]])
+    medoids = np.array(medoids)
+
+    for it in range(max_iterations):
+        assigned = medoids[np.argmin(dist[medoids], axis=0)]
+        updated = medoids.copy()
+        for j, m in enumerate(medoids):
+            members = np.nonzero(assigned == m)[0]
+            if len(members) == 0: #a duplicate of another medoid
+                continue
+            updated[j] = members[np.argmin(
+                dist[np.ix_(members, members)].sum(axis=1))]
+        if (updated == medoids).all():
+            break
+        medoids = updated
+    return medoids, medoids[np.argmin(dist[medoids], axis=0)]
+
+
+#num_days representative days of each year of grid from the (hour) load and
+#(plant x hour) health cost arrays over it
+def select_days(grid, load, health_cost, num_days):
+    if num_days < 2:
+        raise Exception("Representative days error, %s days per year leave "
+                        "no day besides the peak day" % num_days)
+    H = len(grid.hours)
+    load_day = np.asarray(load, dtype=float).reshape(-1, H)
+    hc_day = np.asarray(health_cost, dtype=float).mean(axis=0).reshape(-1, H)
+    features = np.hstack([load_day / max(load_day.std(), 1e-10),
+                          hc_day / max(hc_day.std(), 1e-10)])
+
+    chosen = [] #(day index, weight)
+    represented = np.zeros(len(grid.day_keys), dtype=np.int64)
+    year = np.array([key[0] for key in grid.day_keys])
+    for t in sorted(set(year)):
+        rows = np.nonzero(year == t)[0]
+        peak = rows[np.argmax(load_day[rows].max(axis=1))]
+        represented[peak] = peak
+        chosen.append((peak, 1))
+        rest = rows[rows != peak]
+        if len(rest) == 0:
+            continue
+        f = features[rest]
+        dist = np.sqrt(np.maximum(
+            (f ** 2).sum(axis=1)[:, None] + (f ** 2).sum(axis=1)[None, :] -
+            2 * np.dot(f, f.T), 0.0))
+        medoids, assigned = k_medoids(dist, num_days - 1)
+        represented[rest] = rest[assigned]
+        for m in medoids:
+            if (assigned == m).any():
+                chosen.append((rest[m], int((assigned == m).sum())))
+
+    chosen.sort()
+    error = np.sqrt(((load_day - load_day[represented]) ** 2).mean()) / \
+        max(load_day.mean(), 1e-10)
+    return RepresentativeDays(
+        [grid.day_keys[d] for d, w in chosen], [w for d, w in chosen],
+        dict((key, grid.day_keys[represented[n]])
+             for n, key in enumerate(grid.day_keys)),
+        grid.hours, len(grid.day_keys), error)
@@ -0,0 +1,172 @@
+#   Content-addressed cache of solved scenarios
+#
+#   Author: Paul Kerl (paul.kerl@gatech.edu)
+#
+#   A solved scenario is stored under a hash of everything that determines
+#   it: the parsed inputs (plant table, cost tables, load curves, health
+#   costs), the run parameters (VSL, BETA, health costs on/off, start year,
+#   horizon), the solver settings and the model source code. A repeated
+#   scenario then returns the stored solution arrays and copies the stored
+#   output files instead of being solved again.
+#
+#   Layout: <cache_dir>/<key>/solution.npz  (solution arrays)
+#                             info.json     (objective, health cost, ...)
+#                             <label>.csv   (output files, .npz/.json for
+#                                            columnar outputs)
+#
+import os
+import time
+import json
+import shutil
+import hashlib
+import numpy as np
+
+cache_dir = "data/cache/results/"
+
+
+#####################################
+########     Cache keys      ########
+#####################################
+
+#feed a (nested) python/numpy value into the hash h in a canonical form
+def _feed(h, obj):
+    if isinstance(obj, dict):
+        h.update("{%d" % len(obj))
+        for k in sorted(obj):
+            _feed(h, k)
+            _feed(h, obj[k])
+        h.update("}")
+    elif isinstance(obj, (list, tuple)):
+        h.update("[%d" % len(obj))
+        for v in obj:
+            _feed(h, v)
+        h.update("]")
+    elif isinstance(obj, np.ndarray):
+        h.update("<%s%s" % (obj.dtype.str, obj.shape))
+        h.update(np.ascontiguousarray(obj).tobytes())
+        h.update(">")
+    elif hasattr(obj, "__dict__"): #plants, costs, locations, load curves
+        h.update("(%s" % obj.__class__.__name__)
+        _feed(h, vars(obj))
+        h.update(")")
+    else:
+        h.update("%s:%r;" % (type(obj).__name__, obj))
+
+
+#hash of the given parsed inputs/parameters and of the source code files
+#that turn them into a solution
+def scenario_key(parts, source_files=()):
+    h = hashlib.sha1()
+    _feed(h, parts)
+    for path in source_files:
+        if path.endswith(".pyc"):
+            path = path[:-1]
+        with open(path, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+#####################################
+########   Store and fetch   ########
+#####################################
+
+########    cached result   ########
+class CachedResult:
+    def __init__(self, path, arrays, info):
+        self.path = path     #cache entry directory
+        self.arrays = arrays #solution arrays by name
+        self.info = info     #scalar results (objective, health cost, ...)
+
+    #copy the stored output files to outputs[label] paths
+    def restore(self, outputs):
+        for label, dest in outputs.items():
+            shutil.copyfile(os.path.join(self.path,
+                                         label + os.path.splitext(dest)[1]),
+                            dest)
+
+    def __str__(self):
+        return "Cached result %s (%s)" % (os.path.basename(self.path),
+                                          ", ".join(sorted(self.arrays)))
+
+
+#file of the solution arrays of scenario key
+def solution_file(key, directory=cache_dir):
+    return os.path.join(directory, key, "solution.npz")
+
+
+#cached result of scenario key, or None on a miss
+def fetch(key, directory=cache_dir):
+    path = os.path.join(directory, key)
+    try:
+        with open(os.path.join(path, "info.json"), 'rb') as f:
+            info = json.load(f)
+        with np.load(solution_file(key, directory)) as data:
+            arrays = dict((name, data[name]) for name in data.files)
+    except (IOError, OSError, ValueError):
+        return None
+    os.utime(path, None) #last use, for eviction
+    return CachedResult(path, arrays, info)
+
+
+#store the entry key of directory, its files written by write(tmp) into an
+#empty temporary directory, returns the entry's path (also used by the model
+#cache, model_cache.store)
+def store_entry(key, write, directory=cache_dir):
+    path = os.path.join(directory, key)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    #written to a temporary directory and renamed, so a crashed or concurrent
+    #run never leaves a half-written entry behind
+    tmp = "%s.tmp%d" % (path, os.getpid())
+    shutil.rmtree(tmp, True)
+    os.makedirs(tmp)
+    write(tmp)
+    shutil.rmtree(path, True)
+    try:
+        os.rename(tmp, path)
+    except OSError: #stored by another run in the meantime
+        shutil.rmtree(tmp, True)
+    return path
+
+
+#store the solution arrays, the scalar results and the output files
+#(outputs[label] paths) of scenario key
+def store(key, arrays, info, outputs, directory=cache_dir):
+    def write(tmp):
+        np.savez_compressed(os.path.join(tmp, "solution.npz"), **arrays)
+        for label, src in outputs.items():
+            shutil.copyfile(src, os.path.join(
+                tmp, label + os.path.splitext(src)[1]))
+        with open(os.path.join(tmp, "info.json"), 'wb') as f:
+            json.dump(info, f, indent=1, sort_keys=True)
+    store_entry(key, write, directory)
+
+
+#remove entries unused for more than max_age_days, then the least recently
+#used entries until the cache is at most max_mb megabytes
+def evict(directory=cache_dir, max_mb=None, max_age_days=None):
+    if not os.path.isdir(directory):
+        return 0
+    entries = []
+    for key in os.listdir(directory):
+        path = os.path.join(directory, key)
+        if not os.path.isdir(path):
+            continue
+        size = sum(os.path.getsize(os.path.join(path, name))
+                   for name in os.listdir(path))
+        entries.append((os.path.getmtime(path), size, path))
+    entries.sort() #oldest first
+
+    now = time.time()
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for used, size, path in entries:
+        too_old = max_age_days is not None and \
+            now - used > max_age_days * 86400.0
+        too_big = max_mb is not None and total > max_mb * 1024.0 * 1024.0
+        if not (too_old or too_big):
+            continue
+        shutil.rmtree(path, True)
+        total -= size
+        removed += 1
+    return removed
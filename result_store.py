@@ -0,0 +1,172 @@
+#   Store of solved scenarios indexed by their run parameters
+#
+#   Author: Paul Kerl (paul.kerl@gatech.edu)
+#
+#   Every solved scenario is recorded in an SQLite file (store_file under the
+#   model's base_dir by default):
+#     runs:   one row per run, keyed by model ("UC" or "CP"), VSL, BETA,
+#             health_cost_included, start_year and solver settings (a re-run
+#             of a key replaces it), with its objective, health cost, totals,
+#             output files, a pointer to its hourly arrays (the columnar
+#             output file or the result cache entry) and the load profile
+#             error of its representative days (capacity planning)
+#     plants: the load and health impact totals of each plant of each run
+#   Comparing the runs of a sweep is then an indexed query instead of parsing
+#   every output CSV again, e.g. health cost vs VSL for 2007:
+#       result_store.series(path, "VSL", "hc", model="UC", start_year=2007)
+#   Runs answered from the result cache were recorded when first solved.
+#
+import os
+import json
+import time
+import sqlite3
+
+store_file = "data/output/results.sqlite"
+
+#columns of the runs table, the first six are the key of a run
+run_columns = (("model", "TEXT"),
+               ("VSL", "REAL"),
+               ("BETA", "REAL"),
+               ("health_cost_included", "INTEGER"),
+               ("start_year", "INTEGER"),
+               ("settings", "TEXT"), #json of the solver settings
+               ("solve_mode", "TEXT"),
+               ("mip_gap", "REAL"),
+               ("obj_val", "REAL"),
+               ("hc", "REAL"),
+               ("total_load", "REAL"),
+               ("total_plant_load", "REAL"),
+               ("optimal", "INTEGER"),
+               ("time_stamp", "TEXT"),
+               ("recorded", "REAL"),
+               ("cache_key", "TEXT"),
+               ("output_files", "TEXT"), #json of the output files by label
+               ("arrays", "TEXT"), #.npz file of the hourly arrays
+               ("profile_error", "REAL")) #of representative days (CP)
+run_key = [name for name, sql_type in run_columns[:6]]
+plant_columns = ("name", "type", "load", "health_impact")
+
+
+#####################################
+########       Schema        ########
+#####################################
+
+#open (and create) the store at path
+def connect(path=store_file):
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    conn = sqlite3.connect(path, timeout=60) #sweep workers share the file
+    conn.row_factory = sqlite3.Row
+    conn.execute("CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, "
+                 "%s, UNIQUE (%s))" %
+                 (", ".join("%s %s" % c for c in run_columns),
+                  ", ".join(run_key)))
+    #a store written before a run column was added gets it (empty for the
+    #runs recorded then)
+    known = set(row[1] for row in conn.execute("PRAGMA table_info(runs)"))
+    for name, sql_type in run_columns:
+        if name not in known:
+            conn.execute("ALTER TABLE runs ADD COLUMN %s %s" %
+                         (name, sql_type))
+    #the usual query: one model and start year, over the VSL and BETA points
+    conn.execute("CREATE INDEX IF NOT EXISTS runs_point ON runs (model, "
+                 "start_year, health_cost_included, VSL, BETA)")
+    conn.execute("CREATE TABLE IF NOT EXISTS plants (run_id INTEGER, "
+                 "name TEXT, type INTEGER, load REAL, health_impact REAL, "
+                 "PRIMARY KEY (run_id, name))")
+    return conn
+
+
+#a value as stored: settings and output files as (sorted) json
+def _value(name, value):
+    if name in ("settings", "output_files"):
+        return json.dumps(value, sort_keys=True)
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+#check column names against the runs table
+def _check_columns(names):
+    known = ["id"] + [name for name, sql_type in run_columns]
+    for name in names:
+        if name not in known:
+            raise Exception("Result store error, no run column %s" % name)
+
+
+#####################################
+########       Record        ########
+#####################################
+
+#record a run (dict of the run columns, without recorded) and its plants
+#((name, type, load, health impact) rows), replacing an earlier run of the
+#same key, returns the run id
+def record(path, run, plants):
+    run = dict(run)
+    run["recorded"] = time.time()
+    _check_columns(run)
+    names = [name for name, sql_type in run_columns if name in run]
+    conn = connect(path)
+    try:
+        with conn:
+            old = conn.execute(
+                "SELECT id FROM runs WHERE %s" %
+                " AND ".join("%s = ?" % k for k in run_key),
+                [_value(k, run.get(k)) for k in run_key]).fetchall()
+            for row in old:
+                conn.execute("DELETE FROM plants WHERE run_id = ?",
+                             (row["id"],))
+                conn.execute("DELETE FROM runs WHERE id = ?", (row["id"],))
+            run_id = conn.execute(
+                "INSERT INTO runs (%s) VALUES (%s)" %
+                (", ".join(names), ", ".join("?" * len(names))),
+                [_value(name, run[name]) for name in names]).lastrowid
+            conn.executemany("INSERT INTO plants VALUES (?, ?, ?, ?, ?)",
+                             [(run_id,) + tuple(p) for p in plants])
+    finally:
+        conn.close()
+    return run_id
+
+
+#####################################
+########       Queries       ########
+#####################################
+
+#runs matching where (run column = value), as dicts of the columns (all or
+#those named), ordered by order_by
+def query(path, columns=None, order_by=None, **where):
+    if columns is None:
+        columns = ["id"] + [name for name, sql_type in run_columns]
+    _check_columns(list(columns) + where.keys() + ([order_by] if order_by
+                                                   else []))
+    sql = "SELECT %s FROM runs" % ", ".join(columns)
+    if where:
+        sql += " WHERE " + " AND ".join("%s = ?" % k for k in sorted(where))
+    if order_by:
+        sql += " ORDER BY " + order_by
+    conn = connect(path)
+    try:
+        rows = conn.execute(sql, [_value(k, where[k])
+                                  for k in sorted(where)]).fetchall()
+    finally:
+        conn.close()
+    return [dict(zip(columns, row)) for row in rows]
+
+
+#(x, y) run column pairs of the runs matching where, ordered by x
+#   e.g. series(path, "VSL", "hc", model="UC", start_year=2007, BETA=0.06)
+def series(path, x, y, **where):
+    return [(r[x], r[y]) for r in query(path, [x, y], x, **where)]
+
+
+#plant totals of a run, as dicts of the plant columns
+def plant_totals(path, run_id):
+    conn = connect(path)
+    try:
+        rows = conn.execute("SELECT %s FROM plants WHERE run_id = ? ORDER BY "
+                            "rowid" % ", ".join(plant_columns),
+                            (run_id,)).fetchall()
+    finally:
+        conn.close()
+    return [dict(zip(plant_columns, row)) for row in rows]
@@ -0,0 +1,94 @@
+#   Rolling-horizon solve of the unit commitment model
+#
+#   Author: Paul Kerl (paul.kerl@gatech.edu)
+#
+#   Instead of one monolithic MIP over the whole horizon, the model is solved
+#   a window of days at a time. Each window is built with a look-ahead of extra
+#   days, only the window's own days are kept, and their committed state and
+#   last-hour generation (and the startups and shutdowns of their last hours,
+#   for the minimum up/down rows of the tight formulation) become the initial
+#   conditions of the next window.
+#
+import numpy as np
+import matrix_build
+import solver_backend #gurobi or HiGHS
+
+
+########    rolling horizon result   ########
+#stitched (plants x hours) solution arrays over the full horizon
+class RollingResult:
+    def __init__(self, on, start, shutdown, gen, obj_val, optimal,
+                 num_windows):
+        self.on = on
+        self.start = start
+        self.shutdown = shutdown
+        self.gen = gen
+        self.obj_val = obj_val
+        self.optimal = optimal #every window solved to optimality (MIPGap)
+        self.num_windows = num_windows
+    def __str__(self):
+        return "Rolling horizon: %d windows, objective $%s" % \
+            (self.num_windows, '{0:,.2f}'.format(self.obj_val))
+
+
+#initial conditions (as for matrix_build.uc_matrices) of a window of c whose
+#first hour follows hour k of c's grid, from the (plants x hours) solution
+#arrays over that grid
+def initial_state(c, k, on, start, shutdown, gen):
+    history = c.grid.linked_hours(k, matrix_build.history_hours(c))
+    return (on[:, k], gen[:, k], start[:, history], shutdown[:, history])
+
+
+#build and solve the unit commitment model over the grid of c with the solver
+#backend (initial and final states as for matrix_build.uc_matrices), returns
+#the on_u, start_v, shutdown_w and z solution arrays and the backend's
+#Solution
+def solve_window(c, initial=None, params=None, name="uc_window",
+                 solver="gurobi", final=None):
+    mm, index = matrix_build.uc_matrices(c, initial, final=final)
+    solution = solver_backend.solve(mm, params, name, solver)
+    if solution.x is None:
+        raise solver_backend.SolverError(
+            "Window \"%s\" has no solution, %s status %s" %
+            (name, solver, solution.status))
+    x = solution.x
+    values = tuple(x[index[v]] for v in ("on_u", "start_v", "shutdown_w", "z"))
+    return values, solution
+
+
+#solve the horizon of c window_days at a time, each window looking ahead
+#lookahead_days more days, with the solver backend
+def solve_rolling(c, window_days, lookahead_days=1, params=None,
+                  solver="gurobi"):
+    day_keys = c.grid.day_keys
+    num_hours = len(c.grid.hours)
+    shape = (len(c.pp), c.grid.num_hours)
+    on, start, shutdown, gen = [np.zeros(shape) for _ in range(4)]
+    optimal = True
+
+    num_windows = (len(day_keys) + window_days - 1) // window_days
+    for w in range(num_windows):
+        first = w * window_days
+        kept = len(day_keys[first:first + window_days]) * num_hours
+        sub, idx = c.subset(day_keys[first:first + window_days +
+                                     lookahead_days])
+
+        #committed state and generation of the hour before the window
+        prev = c.grid.prev[idx[0]]
+        initial = None
+        if prev >= 0:
+            initial = initial_state(c, prev, on, start, shutdown, gen)
+
+        values, solution = solve_window(sub, initial, params,
+                                        "uc_window_%s" % w, solver)
+        for full, part in zip((on, start, shutdown, gen), values):
+            full[:, idx[:kept]] = part[:, :kept]
+        optimal = optimal and solution.optimal
+        print "Window %d of %d (days %s to %s), status %s" % \
+            (w + 1, num_windows, day_keys[first],
+             day_keys[min(first + window_days, len(day_keys)) - 1],
+             solution.status)
+
+    return RollingResult(on, start, shutdown, gen,
+                         c.objective_value(on, start, shutdown, gen),
+                         optimal, num_windows)
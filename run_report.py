@@ -0,0 +1,87 @@
+#   Run reports of scenario runs
+#
+#   Author: Paul Kerl (paul.kerl@gatech.edu)
+#
+#   Every scenario run writes one JSON report next to its gurobi log (under
+#   log_dir of the model's base_dir): where it ran (host, process, command
+#   line), the scenario and its result, the phases of the run as timed by
+#   phase_timer (wall and CPU time, memory, objects handled, from reading
+#   each family of input files through building each constraint family,
+#   updating and optimizing the model to writing each output file) and the
+#   solver statistics (model size, runtime, nodes, final gap). The reports of
+#   a sweep spread over many Condor jobs are gathered with
+#       reports = run_report.read_all(base_dir + run_report.log_dir)
+#
+import os
+import sys
+import glob
+import json
+import time
+import socket
+import lazy_import
+gp = lazy_import.LazyModule("gurobipy") #imported on first use
+
+log_dir = "logs/gurobi_logs/"
+
+#reported gurobi model attributes, by report name
+solver_attributes = (("num_vars", "NumVars"),
+                     ("num_constrs", "NumConstrs"),
+                     ("num_nonzeros", "NumNZs"),
+                     ("num_bin_vars", "NumBinVars"),
+                     ("num_int_vars", "NumIntVars"),
+                     ("status", "Status"),
+                     ("runtime", "Runtime"),
+                     ("node_count", "NodeCount"),
+                     ("iter_count", "IterCount"),
+                     ("sol_count", "SolCount"),
+                     ("obj_val", "ObjVal"),
+                     ("obj_bound", "ObjBound"),
+                     ("mip_gap", "MIPGap"))
+
+
+#solver statistics of the gurobi model mod, None without a model (e.g. a
+#cached run, or one solved window by window)
+def solver_stats(mod):
+    if mod is None or mod.NumVars == 0:
+        return None
+    stats = {}
+    for name, attr in solver_attributes:
+        try:
+            stats[name] = mod.getAttr(attr)
+        except gp.GurobiError: #e.g. no bound or gap of an unsolved model
+            stats[name] = None
+    return stats
+
+
+#write the report of a run to path, returns it
+#   model: "UC" or "CP"
+#   scenario, result: dicts of the scenario's arguments and of its result
+#                     (None if it wasn't solved)
+#   timer: the run's PhaseTimer (None if it wasn't timed)
+#   solver: solver_stats of its model
+def write(path, model, scenario, result, timer=None, solver=None):
+    report = {"model": model, "host": socket.gethostname(),
+              "pid": os.getpid(), "argv": sys.argv, "written": time.time(),
+              "scenario": scenario, "result": result, "solver": solver,
+              "phases": None}
+    if timer is not None:
+        report.update(timer.report())
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    with open(path, 'wb') as f:
+        json.dump(report, f, indent=1, sort_keys=True)
+    return report
+
+
+#the reports in directory, in the order they were written
+def read_all(directory=log_dir):
+    reports = []
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        with open(path, 'rb') as f:
+            report = json.load(f)
+        if "phases" in report and "model" in report:
+            report["file"] = path
+            reports.append(report)
+    reports.sort(key=lambda r: r["written"])
+    return reports
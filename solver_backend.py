@@ -0,0 +1,395 @@
+#   Solver backends of the matrix models
+#
+#   Author: Paul Kerl (paul.kerl@gatech.edu)
+#
+#   A MatrixModel (see matrix_build) is solved by one of the backends, by
+#   name:
+#     "gurobi": gurobipy, as the models always were (a license is needed
+#               above the size-limited one)
+#     "highs":  the open-source HiGHS MIP solver, run as its command line
+#               solver (highs_executable) on the model written as an MPS
+#               file (write_mps), no license needed, so sweeps can fan out
+#               over any number of cores
+#   Both return a Solution: the column values, the row values (A x),
+#   objective, bound, gap, status, runtime and node count, and the model size
+#   (and the reduced costs of an LP). A solve that fails in the solver raises
+#   a SolverError (and gurobipy's GurobiError with gurobi, see gurobi_errors).
+#   Either takes the model as a MatrixModel (solve) or as an MPS file
+#   (solve_file, e.g. one stored by model_cache) in the same column and row
+#   order. The parameters are given by their gurobi names (MIPGap,
+#   TimeLimit, Threads, ...); the HiGHS backend translates those with an
+#   equivalent (highs_options) and ignores the others.
+#
+import os
+import re
+import sys
+import gzip
+import time
+import shutil
+import tempfile
+import subprocess
+import numpy as np
+import lazy_import
+gp = lazy_import.LazyModule("gurobipy") #imported on first use
+import matrix_build
+import phase_timer #phase timing
+
+backends = ("gurobi", "highs")
+
+#statuses of a Solution
+OPTIMAL = "optimal"
+TIME_LIMIT = "time_limit"
+INFEASIBLE = "infeasible"
+UNBOUNDED = "unbounded"
+OTHER = "other"
+
+#HiGHS command line solver (on the PATH, or its full path)
+highs_executable = "highs"
+
+#HiGHS options of the gurobi parameters (OutputFlag and LogFile apply to
+#the solver's log as read back, see solve_highs)
+highs_options = {"MIPGap": "mip_rel_gap",
+                 "TimeLimit": "time_limit",
+                 "Threads": "threads",
+                 "Seed": "random_seed"}
+
+#statuses of the HiGHS model statuses
+highs_statuses = {"Optimal": OPTIMAL,
+                  "Time limit reached": TIME_LIMIT,
+                  "Infeasible": INFEASIBLE,
+                  "Primal infeasible or unbounded": INFEASIBLE,
+                  "Unbounded": UNBOUNDED}
+
+
+########    solver error   ########
+#a solve that found no solution or failed in the solver
+class SolverError(Exception):
+    pass
+
+
+#check a backend name
+def check(backend):
+    if backend not in backends:
+        raise Exception("Solver error, %s is not one of %s" %
+                        (backend, ", ".join(backends)))
+
+
+#gurobipy's error of the gurobi backend, for an except clause next to
+#SolverError (empty for other backends, so gurobipy isn't needed by them)
+def gurobi_errors(backend):
+    if backend == "gurobi":
+        return (gp.GurobiError,)
+    return ()
+
+
+########    solution   ########
+#result of a backend solve, x None if no solution was found
+class Solution:
+    def __init__(self, backend, status, x, row_x, obj_val, obj_bound,
+                 mip_gap, runtime, node_count, iter_count, size,
+                 reduced_cost=None):
+        self.backend = backend
+        self.status = status #OPTIMAL, TIME_LIMIT, ...
+        self.optimal = status == OPTIMAL
+        self.x = x #column values
+        self.row_x = row_x #row values (A x), e.g. of dummy rows read back
+        self.obj_val = obj_val
+        self.obj_bound = obj_bound
+        self.mip_gap = mip_gap
+        self.runtime = runtime #seconds in the solver
+        self.node_count = node_count
+        self.iter_count = iter_count
+        (self.num_vars, self.num_constrs, self.num_nonzeros,
+         self.num_bin_vars, self.num_int_vars) = size
+        #column reduced costs of a solved LP (None for a MIP), e.g. the
+        #subgradient of the objective in the bounds of fixed columns
+        self.reduced_cost = reduced_cost
+
+    #the statistics of run_report.solver_stats
+    def stats(self):
+        return {"solver": self.backend, "num_vars": self.num_vars,
+                "num_constrs": self.num_constrs,
+                "num_nonzeros": self.num_nonzeros,
+                "num_bin_vars": self.num_bin_vars,
+                "num_int_vars": self.num_int_vars, "status": self.status,
+                "runtime": self.runtime, "node_count": self.node_count,
+                "iter_count": self.iter_count,
+                "sol_count": int(self.x is not None),
+                "obj_val": self.obj_val, "obj_bound": self.obj_bound,
+                "mip_gap": self.mip_gap}
+
+    def __str__(self):
+        return "%s solution: %s, objective %s, gap %s, %.2f seconds" % \
+            (self.backend, self.status, self.obj_val, self.mip_gap,
+             self.runtime)
+
+
+#####################################
+########      MPS files      ########
+#####################################
+
+#write the matrix model mm as a (gzipped if path ends with .gz) free MPS
+#file, the objective minimized, columns x<j> and rows r<k> in the model's
+#order
+def write_mps(mm, path, name="model"):
+    inf = matrix_build.INFINITY
+    A = mm.matrix().tocsc()
+    obj = np.concatenate(mm.obj) if mm.obj else np.zeros(0)
+    lb = np.concatenate(mm.lb) if mm.lb else np.zeros(0)
+    ub = np.concatenate(mm.ub) if mm.ub else np.zeros(0)
+    vtype = np.concatenate(mm.vtype) if mm.vtype else np.array([])
+    sense = np.concatenate(mm.sense) if mm.sense else np.array([])
+    rhs = np.concatenate(mm.rhs) if mm.rhs else np.zeros(0)
+    row_types = {matrix_build.LESS_EQUAL: "L",
+                 matrix_build.GREATER_EQUAL: "G", matrix_build.EQUAL: "E"}
+
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, 'wb') as f:
+        f.write("NAME %s\nROWS\n N obj\n" % name)
+        f.write("".join(" %s r%d\n" % (row_types[sn], k)
+                        for k, sn in enumerate(sense)))
+
+        f.write("COLUMNS\n")
+        integer = False
+        for j in range(mm.num_vars):
+            if (vtype[j] != matrix_build.CONTINUOUS) != integer:
+                integer = not integer
+                f.write("    MARKER 'MARKER' '%s'\n" %
+                        ("INTORG" if integer else "INTEND"))
+            start, end = A.indptr[j], A.indptr[j + 1]
+            lines = ["    x%d r%d %r\n" % (j, k, v) for k, v in
+                     zip(A.indices[start:end], A.data[start:end].tolist())]
+            if obj[j] != 0.0 or not lines: #every column appears
+                lines.insert(0, "    x%d obj %r\n" % (j, float(obj[j])))
+            f.write("".join(lines))
+        if integer:
+            f.write("    MARKER 'MARKER' 'INTEND'\n")
+
+        f.write("RHS\n")
+        f.write("".join("    rhs r%d %r\n" % (k, v)
+                        for k, v in enumerate(rhs.tolist()) if v != 0.0))
+
+        #default bounds are [0, infinity), written explicitly for integer
+        #columns (some readers default them to [0, 1])
+        f.write("BOUNDS\n")
+        lines = []
+        for j, (l, u, vt) in enumerate(zip(lb.tolist(), ub.tolist(), vtype)):
+            if vt == matrix_build.BINARY:
+                l, u = max(l, 0.0), min(u, 1.0)
+                if l == 0.0 and u == 1.0:
+                    lines.append(" BV bnd x%d\n" % j)
+                    continue
+            if l == u:
+                lines.append(" FX bnd x%d %r\n" % (j, l))
+                continue
+            if l <= -inf:
+                lines.append(" MI bnd x%d\n" % j)
+            elif l != 0.0:
+                lines.append(" LO bnd x%d %r\n" % (j, l))
+            if u < inf:
+                lines.append(" UP bnd x%d %r\n" % (j, u))
+            elif vt != matrix_build.CONTINUOUS:
+                lines.append(" PL bnd x%d\n" % j)
+        f.write("".join(lines))
+        f.write("ENDATA\n")
+
+
+#####################################
+########      Backends       ########
+#####################################
+
+#solve the matrix model mm (minimized) with backend, params by their gurobi
+#names, returns its Solution
+def solve(mm, params=None, name="model", backend="gurobi"):
+    check(backend)
+    if backend == "highs":
+        directory = tempfile.mkdtemp(prefix="highs_")
+        try:
+            path = os.path.join(directory, "model.mps")
+            phase_timer.begin("write")
+            write_mps(mm, path, name)
+            phase_timer.end()
+            return solve_highs(path, params or {}, directory)
+        finally:
+            shutil.rmtree(directory, True)
+    mod = gp.Model(name)
+    set_gurobi_params(mod, params or {})
+    variables, constrs = mm.to_gurobi(mod)
+    mod.setAttr(gp.GRB.attr.ModelSense, gp.GRB.MINIMIZE)
+    return solve_gurobi(mod, variables, constrs)
+
+
+#solve the model of the MPS file path (as solve)
+def solve_file(path, params=None, name="model", backend="gurobi"):
+    check(backend)
+    if backend == "highs":
+        directory = tempfile.mkdtemp(prefix="highs_")
+        try:
+            return solve_highs(path, params or {}, directory)
+        finally:
+            shutil.rmtree(directory, True)
+    phase_timer.begin("read")
+    mod = gp.read(path)
+    mod.ModelName = name
+    set_gurobi_params(mod, params or {})
+    phase_timer.end()
+    return solve_gurobi(mod, mod.getVars(), mod.getConstrs())
+
+
+#gurobi attribute of mod, None where it has none (e.g. no gap of an LP)
+def _attr(mod, attr):
+    try:
+        return mod.getAttr(attr)
+    except (gp.GurobiError, AttributeError):
+        return None
+
+
+def set_gurobi_params(mod, params):
+    for param, value in params.items():
+        mod.setParam(param, value)
+
+
+def solve_gurobi(mod, variables, constrs):
+    phase_timer.begin("optimize")
+    mod.optimize()
+    phase_timer.end()
+    status = {gp.GRB.OPTIMAL: OPTIMAL, gp.GRB.TIME_LIMIT: TIME_LIMIT,
+              gp.GRB.INFEASIBLE: INFEASIBLE, gp.GRB.INF_OR_UNBD: INFEASIBLE,
+              gp.GRB.UNBOUNDED: UNBOUNDED}.get(mod.status, OTHER)
+    x = None
+    row_x = None
+    obj_val = None
+    reduced_cost = None
+    if mod.SolCount > 0:
+        x = np.array(mod.getAttr("X", variables))
+        row_x = np.array(mod.getAttr("RHS", constrs)) - \
+            np.array(mod.getAttr("Slack", constrs))
+        obj_val = mod.objVal
+        if not mod.IsMIP and status == OPTIMAL:
+            reduced_cost = np.array(mod.getAttr("RC", variables))
+    size = (mod.NumVars, mod.NumConstrs, mod.NumNZs, mod.NumBinVars,
+            mod.NumIntVars)
+    return Solution("gurobi", status, x, row_x, obj_val,
+                    _attr(mod, "ObjBound"), _attr(mod, "MIPGap"), mod.Runtime,
+                    _attr(mod, "NodeCount"), _attr(mod, "IterCount"), size,
+                    reduced_cost)
+
+
+#options file lines of the gurobi parameters, with the solver's log kept in
+#directory (the log is read back from its output, see solve_highs)
+def highs_option_lines(params, directory):
+    lines = ["log_file = %s\n" % os.path.join(directory, "highs.log"),
+             "write_solution_style = 0\n"] #raw
+    for param, value in sorted(params.items()):
+        if param in highs_options:
+            lines.append("%s = %s\n" % (highs_options[param], value))
+        elif param not in ("OutputFlag", "LogFile"):
+            print "HiGHS has no option for gurobi parameter %s, ignored" % \
+                param
+    return lines
+
+
+#first group of the pattern in the highs log as kind, None if not logged
+def _log_value(log, pattern, kind=float):
+    match = re.search(pattern, log, re.M)
+    if match is None:
+        return None
+    return kind(match.group(1))
+
+
+#model status line, objective and value sections of a raw highs solution
+#file: values["primal" or "dual", "Columns" or "Rows"], only the sections of
+#a feasible solution
+def read_highs_solution(path):
+    with open(path, 'rb') as f:
+        lines = f.read().splitlines()
+    status = lines[1].strip() if len(lines) > 1 else None
+    obj_val = None
+    values = {}
+    part = None
+    feasible = False
+    n = 0
+    while n < len(lines):
+        words = lines[n].split()
+        n += 1
+        if lines[n - 1].startswith("# Basis"):
+            break
+        elif lines[n - 1].startswith("# Primal"):
+            part, feasible = "primal", lines[n].strip() == "Feasible"
+        elif lines[n - 1].startswith("# Dual"):
+            part, feasible = "dual", lines[n].strip() == "Feasible"
+        elif words[:1] == ["Objective"] and feasible:
+            obj_val = float(words[1])
+        elif len(words) == 3 and words[:2] in (["#", "Columns"],
+                                               ["#", "Rows"]):
+            count = int(words[2])
+            if feasible:
+                values[part, words[1]] = np.array(
+                    [line.rsplit(None, 1)[1] for line in lines[n:n + count]],
+                    dtype=float)
+            n += count
+    return status, obj_val, values
+
+
+#solve the model of the MPS file path with the highs command line solver
+#(options, solution and log files in directory), returns its Solution
+def solve_highs(path, params, directory):
+    options_file = os.path.join(directory, "options.txt")
+    solution_file = os.path.join(directory, "solution.txt")
+    with open(options_file, 'wb') as f:
+        f.write("".join(highs_option_lines(params, directory)))
+    started = time.time()
+    phase_timer.begin("optimize")
+    try:
+        process = subprocess.Popen(
+            [highs_executable, "--model_file", path, "--options_file",
+             options_file, "--solution_file", solution_file],
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    except OSError as e:
+        phase_timer.end()
+        raise SolverError("Solver error, can't run %s (%s)" %
+                          (highs_executable, e))
+    log = process.communicate()[0]
+    phase_timer.end()
+    runtime = time.time() - started
+    #the log as gurobi's OutputFlag and LogFile would show it
+    if params.get("OutputFlag", 1):
+        sys.stdout.write(log)
+        if params.get("LogFile"):
+            with open(params["LogFile"], 'ab') as f:
+                f.write(log)
+    if process.returncode != 0 or not os.path.isfile(solution_file):
+        raise SolverError("Solver error, %s exited with code %s on %s: %s" %
+                          (highs_executable, process.returncode, path,
+                           " / ".join(log.strip().splitlines()[-3:])))
+
+    model_status, obj_val, values = read_highs_solution(solution_file)
+    status = highs_statuses.get(model_status, OTHER)
+    size = re.search(r"has (\d+) rows?; (\d+) cols?; (\d+) nonzeros?"
+                     r"(?:; (\d+) integer variables? \((\d+) binary\))?",
+                     log)
+    if size is None:
+        raise SolverError("Solver error, no model size in the %s log of %s"
+                          % (highs_executable, path))
+    num_constrs, num_vars, num_nonzeros, num_int, num_bin = \
+        [int(v or 0) for v in size.groups()]
+    x = values.get(("primal", "Columns"))
+    reduced_cost = None
+    if num_int == 0 and status == OPTIMAL:
+        reduced_cost = values.get(("dual", "Columns"))
+    if num_int > 0:
+        obj_bound = _log_value(log, r"^\s*Dual bound\s+(\S+)")
+        mip_gap = _log_value(log, r"^\s*Gap\s+([^%\s]+)")
+        if mip_gap is not None:
+            mip_gap /= 100.0 #logged in percent
+        node_count = _log_value(log, r"^\s*Nodes\s+(\d+)", int)
+        iter_count = _log_value(log, r"^\s*LP iterations\s+(\d+)", int)
+    else:
+        obj_bound, mip_gap, node_count = obj_val, None, None
+        iter_count = _log_value(log, r"^\s*Simplex\s+iterations:\s+(\d+)",
+                                int)
+    return Solution("highs", status, x, values.get(("primal", "Rows")),
+                    obj_val, obj_bound, mip_gap, runtime, node_count,
+                    iter_count,
+                    (num_vars, num_constrs, num_nonzeros, num_bin, num_int),
+                    reduced_cost)
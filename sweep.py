@@ -0,0 +1,144 @@
+#!/opt/python/bin/python2.7
+# above line for condor direct execution if need be via condor/isye
+
+#   Parameter sweep over the Electricity Unit Commitment Model
+#
+#   Author: Paul Kerl (paul.kerl@gatech.edu)
+#
+#   Arguments, in order: VSL values, BETA values, Health_Cost_Included flags
+#                        and start years, each a comma separated list (every
+#                        combination is solved), optionally followed by the
+#                        number of worker processes
+#                   or:  a CSV file with one VSL, BETA, Health_Cost_Included,
+#                        start year point per row, optionally followed by the
+#                        number of worker processes
+#
+#   e.g. sweep.py 1.77,6.22,13.88 0.04,0.06 True,False 2007 4
+#
+#   The input files are read once, the points are solved over a pool of
+#   worker processes and summarized in one results table in data/output/.
+#
+import csv
+import time
+import itertools
+import multiprocessing
+from sys import argv #to unpack arguments
+import unit_commitment as uc
+
+#output level of every point (unit_commitment.output_level): the results
+#table holds the points' summaries, so by default they write no hourly or
+#per-plant files
+output_level = "summary"
+
+
+#####################################
+########       Workers       ########
+#####################################
+
+_inputs = None #ModelInputs, set once in each worker
+_params = None #gurobi parameters of every solve
+
+
+def _init_worker(inputs, params):
+    global _inputs, _params
+    _inputs = inputs
+    _params = params
+
+
+#solve one point, returns its row of the results table
+def _run_point(point):
+    VSL, BETA, health_cost_included, start_year = point
+    started = time.time()
+    result = uc.run_scenario(_inputs, VSL, BETA, health_cost_included,
+                             start_year, _params,
+                             "_VSL%s_BETA%s" % (VSL, BETA))
+    seconds = time.time() - started
+    if result is None: #solver error, printed by run_scenario
+        return point + ("", "", "", "", False, False, seconds)
+    return point + (result.obj_val, result.hc, result.total_load,
+                    result.total_plant_load, result.optimal, result.cached,
+                    seconds)
+
+
+#####################################
+########        Sweep        ########
+#####################################
+
+#sweep points and worker count from the arguments, each point checked like
+#the arguments of unit_commitment.py
+def sweep_arguments(argv):
+    args = list(argv[1:])
+    workers = None
+    if len(args) in (2, 5):
+        workers = int(args.pop())
+        if workers < 1:
+            raise Exception("Argument error, %s worker processes" % workers)
+
+    if len(args) == 1:
+        with open(args[0], 'rU') as f:
+            rows = [row for row in csv.reader(f) if row]
+        try:
+            float(rows[0][0])
+        except (IndexError, ValueError): #header row
+            rows = rows[1:]
+    elif len(args) == 4:
+        rows = itertools.product(*[arg.split(",") for arg in args])
+    else:
+        raise Exception("Argument error, expected VSL, BETA, health cost and "
+                        "start year lists or a points file, optionally "
+                        "followed by the number of workers")
+
+    points = [uc.check_arguments([argv[0]] + [v.strip() for v in row])
+              for row in rows]
+    if not points:
+        raise Exception("Argument error, no sweep points given")
+    return points, workers
+
+
+#solve every (VSL, BETA, health_cost_included, start_year) point over workers
+#processes (None uses every core), returns the results table rows
+def run_sweep(points, workers=None):
+    cores = multiprocessing.cpu_count()
+    if workers is None:
+        workers = min(len(points), cores)
+    #share the cores between the workers' gurobi solves
+    params = {"Threads": max(1, cores // workers)}
+    uc.output_level = output_level
+
+    inputs = uc.load_inputs(uc.base_dir)
+    print inputs
+    started = time.time()
+    if workers == 1:
+        _init_worker(inputs, params)
+        rows = map(_run_point, points)
+    else:
+        if uc.solve_mode in ("lagrangian", "annual"):
+            raise Exception("The %s solve mode runs its own process pool, "
+                            "sweep it with 1 worker" % uc.solve_mode)
+        #forked workers inherit the inputs instead of reading them again
+        pool = multiprocessing.Pool(workers, _init_worker, (inputs, params))
+        try:
+            rows = pool.map(_run_point, points, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+    table = uc.base_dir + "data/output/sweep_UC_" + str(int(time.time())) + \
+        ".csv"
+    with open(table, 'wb') as csvfile:
+        w = csv.writer(csvfile)
+        w.writerow(("VSL", "BETA", "Health_Cost_Included", "Start_Year",
+                    "Objective", "Health_Cost", "Total_Load", "Plant_Load",
+                    "Optimal", "Cached", "Seconds"))
+        w.writerows(rows)
+    print "--------------------------------------------"
+    print "Sweep of %d points over %d workers: %.1f seconds" % \
+        (len(points), workers, time.time() - started)
+    print "Results table: %s" % table
+    print "--------------------------------------------"
+    return rows
+
+
+if __name__ == "__main__":
+    points, workers = sweep_arguments(argv)
+    run_sweep(points, workers)
@@ -9,12 +9,36 @@
 #                        BETA (in percent per 10 microg / m**3), 
 #                        Health_Cost_Included (True/False flag)
 #
+#   Or import it and call load_inputs once and run_scenario for each scenario
+#   (or setup_scenario, build_model, solve_model and extract_results for the
+#   separate steps); importing it reads no files and doesn't load gurobipy
+#
 import datetime #for processing dates
 import time #for adding time stamps to files
-import gurobipy as gp
+import lazy_import
+gp = lazy_import.LazyModule("gurobipy") #imported on first use
 #from pylab import * #also includes numpy as np
+import numpy as np
 import csv
+import calendar
+import inspect
 from sys import argv #to unpack arguments
+import matrix_build #bulk (sparse matrix) model construction
+import rolling_horizon #window-by-window solves
+import lagrangian #plant-by-plant decomposition
+import clustered_uc #alike plants committed as integer unit counts
+import annual_uc #month-parallel annual solves
+import presolve #commitments fixed before the model is built
+import result_cache #solved scenario cache
+import model_cache #built model cache
+import columnar_output #npz output files
+import result_store #solved scenarios by run parameters
+import persistent_model #model kept in memory between solves
+import phase_timer #phase timing
+import run_report #json run reports
+import solver_backend #gurobi or HiGHS
+import hc_data #cached health cost sensitivity files
+import load_data #cached load curves
 #import random #for use on monte-carlo-izing demand load curves, health impacts
 
 
@@ -58,13 +82,6 @@ def check_arguments(argv):
     return VSL, BETA, health_cost_included, start_year
 
 
-
-VSL, BETA, health_cost_included, start_year = check_arguments(argv)
-print "VSL is ", str(VSL)
-print "Beta is ", str(BETA)
-print "hc_or_not is", str(health_cost_included)
-print "Start year is", str(start_year)
-
 ###############################################################################
 #################################  INPUT DATA  ################################
 ###############################################################################
@@ -77,32 +94,6 @@ print "Start year is", str(start_year)
 #health_cost_included = True
 #health_cost_included = False
 
-#Note: VSL is now an input argument
-VSL = VSL * 1000000 #convert to millions
-#VSL
-#$7.4MM, USD2006, adjusted to USD2007 via CPI, listed below
-
-#Source:http://yosemite.epa.gov/ee/epa/eerm.nsf/vwAN/EE-0568-22.pdf
-
-#Year    CPI #if needed for 2006 USD VSL
-#2006    201.6
-#2007    207.342
-
-#VSL = 13.88 * 1000000 #in millions USD 2007 (90th percentile)
-#VSL = 1.77 * 1000000 #in millions USD 2007 (10th percentile)
-#VSL = 6.22 * 1000000 #in millions USD 2007 (50th percentile, median)
-#VSL = 3.46 * 1000000 #in millions USD 2007 (25th percentile)
-#VSL = 9.89 * 1000000 #in millions USD 2007 (75th percentile)
-
-#timestamp for files
-time_stamp = str(int(time.time())) + "median_HI"
-print "Time stamp is: %s" % time_stamp
-
-#Note: BETA is now an input argument
-BETA = BETA / 10.0 #convert to 1 micrograms / m**3 PM2.5
-#Beta
-#BETA = 0.06 / 10.0 #6% per 10 micrograms / m**3 PM2.5
-
 #base_dir = "C:/Users/pyk/Desktop/elec_cap_planning/"
 base_dir = ""
 
@@ -150,6 +141,24 @@ pp_nox_emissions = {0 : 6, #coal
             5 : 5.4, #biomass
             6 : 0.0} #other
 
+#minimum up and down times (hours) by plant type, only modeled by the "tight"
+#unit commitment formulation; 1 hour is no minimum, as in the standard rows
+pp_min_up = {0 : 1, #coal
+            1 : 1, #oil
+            2 : 1, #natural gas
+            3 : 1, #hydro
+            4 : 1, #nuclear
+            5 : 1, #biomass
+            6 : 1} #other
+
+pp_min_down = {0 : 1, #coal
+            1 : 1, #oil
+            2 : 1, #natural gas
+            3 : 1, #hydro
+            4 : 1, #nuclear
+            5 : 1, #biomass
+            6 : 1} #other
+
 
 #load in variable and fuel costs, store via pp_var_costs[year][pp_type]
 pp_fuel_types = {0 : 'BIT', #coal, bituminous
@@ -165,95 +174,6 @@ pp_fuel_types = {0 : 'BIT', #coal, bituminous
             10 : 'DFO', #distillate fuel oil
             11 : 'RFO'}#residual fuel oil
 
-#load in variable O&M costs per MW of capacity, store in pp_var_costs
-#only charged if the unit is committed, rolled in with committment variable
-var_costs_file = base_dir + "data/var_costs.csv"
-pp_var_costs = {}
-
-with open(var_costs_file, 'rb') as f:
-    reader = csv.reader(f, delimiter=',')
-    header = reader.next()
-    i = -1
-    ## double check the header for consistent header order ##
-    for fuel_type in header:
-        #check to make sure the header matches the pp_fuel_types dictionary
-        if i == -1:
-            next
-        else:
-            if pp_fuel_types[i] not in fuel_type:
-                print "Error loading variable costs", \
-                       i, fuel_type, pp_fuel_types[i]
-        i += 1
-    for row in reader:
-        year = int(row.pop(0))
-        pp_var_costs[year] = map(float, row)
-
-#load in fuel costs per MWh, store in pp_fuel_costs[]
-fuel_costs_file = base_dir + "data/fuel_costs.csv"
-pp_fuel_costs = {}
-
-with open(fuel_costs_file, 'rb') as f:
-    reader = csv.reader(f, delimiter=',')
-    header = reader.next()
-    i = -1
-    ## double check the header for consistent header order ##
-    for fuel_type in header:
-        #check to make sure the header matches the pp_fuel_types dictionary
-        if i == -1:
-            next
-        else:
-            if pp_fuel_types[i] not in fuel_type:
-                print "Error loading variable costs", \
-                       i, fuel_type, pp_fuel_types[i]
-        i += 1
-    for row in reader:
-        year = int(row.pop(0))
-        pp_fuel_costs[year] = map(float, row)
-
-#load in startup costs per MW of capacity, store in startup_costs[]
-startup_costs_file = base_dir + "data/startup_costs.csv"
-pp_startup_costs = {}
-
-with open(startup_costs_file, 'rb') as f:
-    reader = csv.reader(f, delimiter=',')
-    header = reader.next()
-    i = -1
-    ## double check the header for consistent header order ##
-    for fuel_type in header:
-        #check to make sure the header matches the pp_fuel_types dictionary
-        if i == -1:
-            next
-        else:
-            if pp_fuel_types[i] not in fuel_type:
-                print "Error loading startup costs", \
-                       i, fuel_type, pp_fuel_types[i]
-        i += 1
-    for row in reader:
-        year = int(row.pop(0))
-        pp_startup_costs[year] = map(float, row)
-
-#load in fixed yearly per MW costs, store via pp_fixed_costs[year][pp_type]
-fixed_costs_file = base_dir + "data/var_costs.csv"
-pp_fixed_costs = {}
-
-with open(fixed_costs_file, 'rb') as f:
-    reader = csv.reader(f, delimiter=',')
-    header = reader.next()
-    i = -1
-    ## double check the header for consistent header order ##
-    for fuel_type in header:
-        #check to make sure the header matches the pp_fuel_types dictionary
-        if i == -1:
-            next
-        else:
-            if pp_fuel_types[i] not in fuel_type:
-                print "Error loading fixed costs", \
-                       i, fuel_type, pp_fuel_types[i]
-        i += 1
-    for row in reader:
-        year = int(row.pop(0))
-        pp_fixed_costs[year] = map(float, row)
-
 #Note: need to modify "my_color" array to match length of pp_types array above!
 num_plant_types = len(pp_types)
 #Note: need to modify "my_color" array to match length of pp_types array above!
@@ -268,21 +188,6 @@ R = 0.15 #13.5% within 3 years, and 15% for longer forecasts
 # through 2023."
 
 
-
-if health_cost_included == True:
-    #PCT emissions rate decrease
-    PCT_EMISSIONS = 1 #0.1 #TODO fix emissions rate change
-
-    #PCT emissions rate decrease
-    FS_EMISSIONS = 1 #0.01 #TODO fix emissions rate change
-
-    #NONE emissions rate (should be 1.0 except for testing)
-    NONE_EMISSIONS_ADJ = 1
-else:
-    PCT_EMISSIONS, FS_EMISSIONS, NONE_EMISSIONS_ADJ = 0.0, 0.0, 0.0
-
-
-
 #Risk-adjusted real discount factor (7%)
 int_rate = 0.07 #from dong gu's paper
 
@@ -298,8 +203,6 @@ running_cost = 10000
 
 num_years = 1 #number of years in horizon starting at year 2004 through 2012
 years = list(xrange(num_years))
-#start_year = 2007
-real_years = range(start_year, start_year + num_years)
 
 num_days = 31 #31 in July and January
 days = list(range(1, num_days+1))
@@ -311,6 +214,103 @@ hours = list(xrange(num_hours))
 #months = [1, 7]
 months = [7]
 
+#health cost sensitivities exist for January and July only: the months of
+#the files each month takes its costs (and SO2 emissions) from, the winter
+#months January's and the summer months July's
+hc_file_months = {1: 1, 2: 1, 3: 1, 4: 7, 5: 7, 6: 7, 7: 7, 8: 7, 9: 7,
+                  10: 1, 11: 1, 12: 1}
+
+#build the model from sparse coefficient matrices in bulk (True) or with one
+#addVar / addConstr call per index (False), both give the same model
+use_matrix_build = True
+
+#how the model is solved:
+#   "monolithic": one MIP over the whole horizon
+#   "rolling": rolling_window_days at a time, each window looking ahead
+#              look_ahead_days more days
+#   "lagrangian": load rows dualized, one subproblem per plant solved over
+#                 lagrangian_workers processes (None uses every core) for up
+#                 to lagrangian_iterations subgradient steps
+#   "clustered": plants with the same cluster_key attributes committed as
+#                integer counts of units, then split back into plants
+#                (cluster_compare_full also solves the full model to report
+#                the error of the clustering); an (attribute, width) pair of
+#                the key buckets the attribute's values, e.g. capacity in
+#                50 MW buckets, whose members can differ from the cluster's
+#                mean capacity by up to 50 MW each
+#   "annual": one block per month solved over annual_workers processes (None
+#             uses every core), the blocks linked by the boundary states of
+#             windows of annual_overlap_days on each side of the month
+#             boundaries (see annual_uc.py), for a full year set
+#             months = list(range(1, 13))
+solve_mode = "monolithic"
+rolling_window_days = 1
+look_ahead_days = 1
+lagrangian_iterations = 50
+lagrangian_workers = None
+cluster_key = ("type", "fuel_type", "cap_factor", "min_power",
+               ("capacity", 50.0))
+cluster_compare_full = False
+annual_workers = None
+annual_overlap_days = 1
+
+#solver backend (see solver_backend): "gurobi", or "highs" for the open-source
+#HiGHS command line solver, which needs no license (monolithic, rolling and
+#annual solve modes, the matrix-built model handed over as an MPS file)
+solver = "gurobi"
+
+#unit commitment rows: "standard", or "tight" for the tight formulation
+#(minimum up/down time facets, startup/shutdown-aware generation limits and
+#coal ramps, see matrix_build.uc_matrices), which gives the same solutions
+#with a stronger LP relaxation
+uc_formulation = "standard"
+
+#fix the commitments that can only take one value before building the model
+#(matrix-built models, off by default): plants that can't be on or must be on
+#to cover the load (exact, every solution of the model has them), plants of
+#must_run_types (e.g. (4,) for nuclear, a policy that changes the model), and
+#with presolve_dominated plants cheaper than every other plant in every hour
+#(a heuristic: it assumes such a plant is on in some optimum, off by default)
+use_presolve = False
+must_run_types = ()
+presolve_dominated = False
+
+#MIP gap the model is solved to
+mip_gap = .0025 #0.25% -- to ensure finishing
+
+#reuse the stored solution of an identical scenario (same inputs, arguments
+#and solver settings), evicting entries unused for result_cache_max_days or
+#beyond result_cache_max_mb in total (off by default)
+use_result_cache = False
+result_cache_max_mb = 2000
+result_cache_max_days = 30
+
+#keep the built monolithic model (matrix-built) as a compressed MPS file with
+#its index maps (see model_cache), keyed by a hash of the inputs and the
+#formulation: a run that only changes the solver settings (MIP gap, threads,
+#time limit, solver) reads the file instead of building the model, evicting
+#entries unused for model_cache_max_days or beyond model_cache_max_mb in total
+use_model_cache = False
+model_cache_max_mb = 5000
+model_cache_max_days = 30
+
+#output files: "csv" for the csv files, or "npz" for one compressed columnar
+#file with a json sidecar (see columnar_output), holding the outputs up to
+#output_level: "summary" (objective, health cost and totals only), "plant"
+#(also the per-plant totals) or "hourly" (also every hourly result)
+output_format = "csv"
+output_level = "hourly"
+
+#record every solved scenario in the result store (see result_store), an
+#SQLite file indexed by VSL, BETA, health costs on/off, start year and solver
+#settings (off by default)
+use_result_store = False
+
+#write a json run report of every scenario run (see run_report) next to its
+#gurobi log: phase timings, memory, object counts and solver statistics
+#(off by default)
+write_run_report = False
+
 ################################ END CONSTANTS ################################
 
 
@@ -366,7 +366,7 @@ class PowerPlantCosts:
 ########    power plants   ########
 class PowerPlant:
     def __init__(self, pp_type, pp_fuel_type, cap_factor, capacity,
-                 min_power, name, location, costs):
+                 min_power, name, location, costs, min_up=1, min_down=1):
         self.type = pp_type  #type of plant, in number form see "pp_types"
         self.fuel_type = pp_fuel_type #type of plant, as a number, see pp_types
         self.cap_factor = cap_factor#capacity factor, 0 to 1
@@ -375,6 +375,8 @@ class PowerPlant:
         self.name = name            #name of the plant
         self.location = location    #location of the plant
         self.costs = costs
+        self.min_up = min_up        #minimum up time in hours
+        self.min_down = min_down    #minimum down time in hours
     def __str__(self):
         return "%s \n\t Type: %s \n\t Cap Factor: %s \n\t Capacity (MW): \
             %s \n\t Minimum Gen (MW): %s \n\t %s \n\t %s" % \
@@ -382,307 +384,728 @@ class PowerPlant:
              self.min_power, self.location, self.costs)
 
 
+########    model inputs   ########
+#everything read from the input files, shared by all scenarios (the plants'
+#health costs are per unit of VSL * BETA)
+class ModelInputs:
+    def __init__(self, pp, pp_var_costs, pp_fuel_costs, pp_startup_costs,
+                 pp_fixed_costs, lc, emissions_rate_so2,
+                 emissions_tot_so2):
+        self.pp = pp
+        self.pp_var_costs = pp_var_costs
+        self.pp_fuel_costs = pp_fuel_costs
+        self.pp_startup_costs = pp_startup_costs
+        self.pp_fixed_costs = pp_fixed_costs
+        self.lc = lc #load_data.LoadStore, load by hour
+        self.emissions_rate_so2 = emissions_rate_so2
+        self.emissions_tot_so2 = emissions_tot_so2
+    def __str__(self):
+        return "Model inputs: %d plants, %d days of load curves" % \
+            (len(self.pp), self.lc.num_days)
+
+
+########    scenario result   ########
+class ScenarioResult:
+    def __init__(self, VSL, BETA, health_cost_included, start_year, obj_val,
+                 hc, total_load, total_plant_load, optimal, cached, on, start,
+                 gen):
+        self.VSL = VSL #as given, in millions of USD2007
+        self.BETA = BETA #as given, in percent per 10 microg / m**3
+        self.health_cost_included = health_cost_included
+        self.start_year = start_year
+        self.obj_val = obj_val
+        self.hc = hc
+        self.total_load = total_load
+        self.total_plant_load = total_plant_load
+        self.optimal = optimal
+        self.cached = cached #answered from the result cache
+        self.on = on         #(plants x hours) solution arrays
+        self.start = start
+        self.gen = gen
+    def __str__(self):
+        return "VSL %s, BETA %s, hc %s, %s: objective $%s, health cost $%s" \
+            % (self.VSL, self.BETA, self.health_cost_included,
+               self.start_year, '{0:,.2f}'.format(self.obj_val),
+               func(self.hc))
+
+
+########    scenario   ########
+#one (VSL, BETA, health_cost_included, start_year) point: its plants,
+#discounting, load curves and output files (setup_scenario), its gurobi model
+#(build_model) and its solution (solve_model)
+class Scenario:
+    def __init__(self, inputs, VSL_in, BETA_in, health_cost_included,
+                 start_year, params, time_stamp, pp, cost_adj, lc_array,
+                 output_files):
+        self.inputs = inputs
+        self.VSL_in = VSL_in #as given, in millions of USD2007
+        self.BETA_in = BETA_in #as given, in percent per 10 microg / m**3
+        self.health_cost_included = health_cost_included
+        self.start_year = start_year
+        self.params = params #extra gurobi parameters
+        self.time_stamp = time_stamp
+        self.pp = pp #plants with the scenario's health costs
+        self.cost_adj = cost_adj #discount factors by year
+        self.lc_array = lc_array
+        self.output_files = output_files
+        self.cache_key = None #result cache entry, None if the cache is off
+        self.cache_dir = None
+        self.model_key = None #model cache entry, None if the cache is off
+        self.model_dir = None
+        self.model_file = None #MPS file of the model, from the model cache
+        self.report_file = None #run report, None if not written
+        self.log_file = None #solver log
+        self.mod = None #gurobi model, set by build_model
+        self.variables = None #on_u, start_v, shutdown_w, z
+        self.uc_coeffs = None
+        self.matrices = None #matrix model and index, for solver backends
+        self.solution = None #solver backend Solution, set by solve_model
+        self.on = None #(plant x hour) solution, set by solve_model
+        self.start = None
+        self.gen = None
+        self.obj_val = None
+        self.optimal = False
+    def __str__(self):
+        state = "not built"
+        if self.obj_val is not None:
+            state = "solved"
+        elif self.mod is not None or self.matrices is not None:
+            state = "built"
+        return "Scenario VSL %s, BETA %s, hc %s, %s (%s)" % \
+            (self.VSL_in, self.BETA_in, self.health_cost_included,
+             self.start_year, state)
+
+
 
 ###############################################################################
 #################################  INPUT FILES ################################
 ###############################################################################
 
-#########################     power plant data    #############################
-#load the power plants with extra information
-pp = []
-# this file has everything in it that doesn't change year-to-year,
-# current capacity (2004) etc...
-pp_file = base_dir + "data/plant_info.csv"
-pp_file = open(pp_file, 'rU')
-reader = csv.reader(pp_file)
-
-header = {} #header row store
-pp_data = [] #the big set of all the stuff
-count = 0
-for row in reader:
-    #print iter
-    if count == 0:
-        header = row
-    else:
-        i = 0
-        pp_data_ele = {}
-        for h in header:
-            pp_data_ele[h] = row[i]
-            i = i + 1
-        pp_data.append(pp_data_ele)
-    count = count + 1
-total_capacity_avail = 0 #a check value
-
-emissions_rate_so2 = {} #hourly emissions rate dictionary for output files
-emissions_tot_so2 = {} #hourly emissions rate dictionary for output files
-
-for pow_plant in pp_data:
-    pp_name = pow_plant['PNAME']
-    pp_type = pp_type_inv[pow_plant['PLFUELCT'].upper()]
-    pp_oris = pow_plant['ORIS']
-    pp_short_name = ""
-    if "harllee" in pp_name.lower():
-        pp_short_name = "harllee"
-    elif "scherer" in pp_name.lower():
-        pp_short_name = "scherer"
-    elif "bowen" in pp_name.lower():
-        pp_short_name = "bowen"
-    elif "mcdonough" in pp_name.lower():
-        pp_short_name = "mcdonough"
-    pp_fuel_type = pp_fuel_type_inv[pow_plant['PLPRMFL']]
-    #print pp_type
-
-
-    #costs
-    #fixed_cost currently the same for each year (same real costs)
-    #TODO update if needed
-
-    #for 2 months of fixed costs
-    fixed_cap_cost = pp_fixed_costs[2007][pp_fuel_type] / 6.0
-    fixed_cap_cost_pct = pp_fixed_costs[2007][pp_fuel_type] / 6.0
-    fixed_cap_cost_fs = pp_fixed_costs[2007][pp_fuel_type]  / 6.0
-
-    #increase and decrease in capacity costs
-    inc_cap_cost = float(pow_plant['INC_COST'])
-    dec_cap_cost = float(pow_plant['DEC_COST'])
-
-    health_cost = {}
-    health_cost_pct = {}
-    health_cost_fs = {}
-    text_months = ["01", "07"]
-    #first load emissions sensitivities and values for point source plants
-    if pp_short_name in ["bowen", "mcdonough", "scherer", "harllee"]:
-        print "loading ", pp_short_name
-        hc = {}
-        if pp_name not in emissions_rate_so2:
-            emissions_rate_so2[pp_name] = {}
-            emissions_tot_so2[pp_name] = {}
-        print "emissions_rate loaded for %s" % pp_name
-        for text_month in text_months:
-            hc_file_name = base_dir + \
-                           "data/hc_data_so4/%s_%s_health_costs.csv" \
-                           % (pp_short_name, text_month)
-            hc_file = open(hc_file_name, 'rU')
-            print hc_file_name
-            reader = csv.reader(hc_file)
-            header = reader.next()
-            for row in reader:
-                month = int(row[1])
-                day = int(row[2])
-                hour = int(row[3])
-                val = row[4]
-                mwh = row[5]
-                emis = row[6]
-                emissions_rate_so2[pp_name][month, day, hour] = \
-                                                       float(emis) / float(mwh)
-                emissions_tot_so2[pp_name][month, day, hour] = float(emis)
-
-                #Calculation        (1/mwh = emissions / mwh * 1 / emissions )
-                hc[month, day, hour] = VSL * BETA * float(val) / float(mwh)
-                #print month, day, hour
-
-
-        hc_file.close()
-        for t in years:
-            for m in months:
-                for d in days:
-                    for h in hours:
-                        health_cost[t, m, d, h] = hc[m, d, h]
-                        health_cost_pct[t, m, d, h] = hc[m, d, h]
-                        health_cost_fs[t, m, d, h] = hc[m, d, h]
-    #next, Load health costs for each emitting (oil, gas, biomass and coal only!)
-    elif pp_type in [0, 1, 2, 5, 6]: #for plants in aggregated sources
-        #print "loading ", pp_name
-        #set the default emissions rate depending on plant type, from eGRID/EPA
-        so2_emissions_rate = pp_so2_emissions[pp_type] #lbs / mmbtu * heat rate, converted to per MWh vs. per BTU
-        nox_emissions_rate = pp_so2_emissions[pp_type] #lbs / mmbtu * heat rate, converted to per MWh vs. per BTU
-        hc = {}
-        for text_month in text_months:
-            hc_file_name = base_dir + "data/hc_data_so4/%s_%s_health_costs.csv" % (pp_oris, text_month)
-
-            #check if the plants has appeared in CEM files at all
-            try:
-                with open(hc_file_name):
+#read every input file, independent of the scenario
+def load_inputs(base_dir):
+    #load in variable O&M costs per MW of capacity, store in pp_var_costs
+    #only charged if the unit is committed, rolled in with committment variable
+    phase_timer.begin("cost_tables")
+    var_costs_file = base_dir + "data/var_costs.csv"
+    pp_var_costs = {}
+
+    with open(var_costs_file, 'rb') as f:
+        reader = csv.reader(f, delimiter=',')
+        header = reader.next()
+        i = -1
+        ## double check the header for consistent header order ##
+        for fuel_type in header:
+            #check to make sure the header matches the pp_fuel_types dictionary
+            if i == -1:
+                next
+            else:
+                if pp_fuel_types[i] not in fuel_type:
+                    print "Error loading variable costs", \
+                           i, fuel_type, pp_fuel_types[i]
+            i += 1
+        for row in reader:
+            year = int(row.pop(0))
+            pp_var_costs[year] = map(float, row)
+
+    #load in fuel costs per MWh, store in pp_fuel_costs[]
+    fuel_costs_file = base_dir + "data/fuel_costs.csv"
+    pp_fuel_costs = {}
+
+    with open(fuel_costs_file, 'rb') as f:
+        reader = csv.reader(f, delimiter=',')
+        header = reader.next()
+        i = -1
+        ## double check the header for consistent header order ##
+        for fuel_type in header:
+            #check to make sure the header matches the pp_fuel_types dictionary
+            if i == -1:
+                next
+            else:
+                if pp_fuel_types[i] not in fuel_type:
+                    print "Error loading variable costs", \
+                           i, fuel_type, pp_fuel_types[i]
+            i += 1
+        for row in reader:
+            year = int(row.pop(0))
+            pp_fuel_costs[year] = map(float, row)
+
+    #load in startup costs per MW of capacity, store in startup_costs[]
+    startup_costs_file = base_dir + "data/startup_costs.csv"
+    pp_startup_costs = {}
+
+    with open(startup_costs_file, 'rb') as f:
+        reader = csv.reader(f, delimiter=',')
+        header = reader.next()
+        i = -1
+        ## double check the header for consistent header order ##
+        for fuel_type in header:
+            #check to make sure the header matches the pp_fuel_types dictionary
+            if i == -1:
+                next
+            else:
+                if pp_fuel_types[i] not in fuel_type:
+                    print "Error loading startup costs", \
+                           i, fuel_type, pp_fuel_types[i]
+            i += 1
+        for row in reader:
+            year = int(row.pop(0))
+            pp_startup_costs[year] = map(float, row)
+
+    #load in fixed yearly per MW costs, store via pp_fixed_costs[year][pp_type]
+    fixed_costs_file = base_dir + "data/var_costs.csv"
+    pp_fixed_costs = {}
+
+    with open(fixed_costs_file, 'rb') as f:
+        reader = csv.reader(f, delimiter=',')
+        header = reader.next()
+        i = -1
+        ## double check the header for consistent header order ##
+        for fuel_type in header:
+            #check to make sure the header matches the pp_fuel_types dictionary
+            if i == -1:
+                next
+            else:
+                if pp_fuel_types[i] not in fuel_type:
+                    print "Error loading fixed costs", \
+                           i, fuel_type, pp_fuel_types[i]
+            i += 1
+        for row in reader:
+            year = int(row.pop(0))
+            pp_fixed_costs[year] = map(float, row)
+    phase_timer.end(4)
+
+    #########################     power plant data    #############################
+    #load the power plants with extra information
+    pp = []
+    phase_timer.begin("plant_table")
+    # this file has everything in it that doesn't change year-to-year,
+    # current capacity (2004) etc...
+    pp_file = base_dir + "data/plant_info.csv"
+    pp_file = open(pp_file, 'rU')
+    reader = csv.reader(pp_file)
+
+    header = {} #header row store
+    pp_data = [] #the big set of all the stuff
+    count = 0
+    for row in reader:
+        #print iter
+        if count == 0:
+            header = row
+        else:
+            i = 0
+            pp_data_ele = {}
+            for h in header:
+                pp_data_ele[h] = row[i]
+                i = i + 1
+            pp_data.append(pp_data_ele)
+        count = count + 1
+    phase_timer.end(len(pp_data))
+    total_capacity_avail = 0 #a check value
+
+    #health costs of every plant, shared by its health_cost, health_cost_pct
+    #and health_cost_fs
+    hc_table = hc_data.HealthCostTable(len(pp_data), months, days, hours)
+    hc_cache_dir = base_dir + hc_data.cache_dir #parsed health cost files
+
+    emissions_rate_so2 = {} #hourly emissions rate dictionary for output files
+    emissions_tot_so2 = {} #hourly emissions rate dictionary for output files
+
+    phase_timer.begin("plants") #records and health cost files of each plant
+    for pow_plant in pp_data:
+        pp_name = pow_plant['PNAME']
+        pp_type = pp_type_inv[pow_plant['PLFUELCT'].upper()]
+        pp_oris = pow_plant['ORIS']
+        pp_short_name = ""
+        if "harllee" in pp_name.lower():
+            pp_short_name = "harllee"
+        elif "scherer" in pp_name.lower():
+            pp_short_name = "scherer"
+        elif "bowen" in pp_name.lower():
+            pp_short_name = "bowen"
+        elif "mcdonough" in pp_name.lower():
+            pp_short_name = "mcdonough"
+        pp_fuel_type = pp_fuel_type_inv[pow_plant['PLPRMFL']]
+        #print pp_type
+
+
+        #costs
+        #fixed_cost currently the same for each year (same real costs)
+        #TODO update if needed
+
+        #for 2 months of fixed costs
+        fixed_cap_cost = pp_fixed_costs[2007][pp_fuel_type] / 6.0
+        fixed_cap_cost_pct = pp_fixed_costs[2007][pp_fuel_type] / 6.0
+        fixed_cap_cost_fs = pp_fixed_costs[2007][pp_fuel_type]  / 6.0
+
+        #increase and decrease in capacity costs
+        inc_cap_cost = float(pow_plant['INC_COST'])
+        dec_cap_cost = float(pow_plant['DEC_COST'])
+
+        health_cost = hc_table.plant(len(pp))
+        text_months = ["01", "07"]
+        #first load emissions sensitivities and values for point source plants
+        if pp_short_name in ["bowen", "mcdonough", "scherer", "harllee"]:
+            print "loading ", pp_short_name
+            hc = {}
+            if pp_name not in emissions_rate_so2:
+                emissions_rate_so2[pp_name] = {}
+                emissions_tot_so2[pp_name] = {}
+            print "emissions_rate loaded for %s" % pp_name
+            for text_month in text_months:
+                hc_file_name = base_dir + \
+                               "data/hc_data_so4/%s_%s_health_costs.csv" \
+                               % (pp_short_name, text_month)
+                print hc_file_name
+                for month, day, hour, val, mwh, emis, emis_agg in \
+                        hc_data.load(hc_file_name, hc_cache_dir).tolist():
+                    month, day, hour = int(month), int(day), int(hour)
+                    emissions_rate_so2[pp_name][month, day, hour] = emis / mwh
+                    emissions_tot_so2[pp_name][month, day, hour] = emis
+
+                    #Calculation        (1/mwh = emissions / mwh * 1 / emissions )
+                    #per unit of VSL * BETA, scaled in scenario_plants
+                    hc[month, day, hour] = val / mwh
+                    #print month, day, hour
+
+            health_cost.fill(hc, hc_file_months)
+        #next, Load health costs for each emitting (oil, gas, biomass and coal only!)
+        elif pp_type in [0, 1, 2, 5, 6]: #for plants in aggregated sources
+            #print "loading ", pp_name
+            #set the default emissions rate depending on plant type, from eGRID/EPA
+            so2_emissions_rate = pp_so2_emissions[pp_type] #lbs / mmbtu * heat rate, converted to per MWh vs. per BTU
+            nox_emissions_rate = pp_so2_emissions[pp_type] #lbs / mmbtu * heat rate, converted to per MWh vs. per BTU
+            hc = {}
+            for text_month in text_months:
+                hc_file_name = base_dir + "data/hc_data_so4/%s_%s_health_costs.csv" % (pp_oris, text_month)
+
+                #check if the plants has appeared in CEM files at all (only
+                #opening the file is tried, an error reading or caching it
+                #must not pass for a plant without a file)
+                try:
+                    open(hc_file_name).close()
+                    in_cem = True
+                except IOError:
+                    in_cem = False
+                if in_cem:
                     print "Appears in CEM and has HC file"
-                    hc_file = open(hc_file_name, 'rU')
                     print hc_file_name
-                    reader = csv.reader(hc_file)
-                    header = reader.next()
                     if pp_name not in emissions_rate_so2:
                         emissions_rate_so2[pp_name] = {}
                         emissions_tot_so2[pp_name] = {}
                     print "emissions_rate loaded for %s" % pp_name
-                    for row in reader:
-                        month = int(row[1])
-                        day = int(row[2])
-                        hour = int(row[3])
-                        val = row[4]
-                        mwh = row[5]
-                        emis = row[6]
-                        emis_agg = row[7]
-                        if float(mwh) > 0:
-                            hc[month, day, hour] = VSL * BETA * float(val) * float(emis) / float(mwh) / float(emis_agg) #val * emissions rate (emis/mwh) / agg emissions
-                            emissions_rate_so2[pp_name][month, day, hour] =  float(emis) / float(mwh)
-                            emissions_tot_so2[pp_name][month, day, hour] = float(emis_agg)
+                    for month, day, hour, val, mwh, emis, emis_agg in \
+                            hc_data.load(hc_file_name, hc_cache_dir).tolist():
+                        month, day, hour = int(month), int(day), int(hour)
+                        if mwh > 0:
+                            hc[month, day, hour] = val * emis / mwh / emis_agg #val * emissions rate (emis/mwh) / agg emissions
+                            emissions_rate_so2[pp_name][month, day, hour] =  emis / mwh
+                            emissions_tot_so2[pp_name][month, day, hour] = emis_agg
                         else:
-                            hc[month, day, hour] = VSL * BETA * float(val) * so2_emissions_rate / float(emis_agg) #val * emissions rate (emis/mwh) / agg emissions
+                            hc[month, day, hour] = val * so2_emissions_rate / emis_agg #val * emissions rate (emis/mwh) / agg emissions
                             emissions_rate_so2[pp_name][month, day, hour] =  so2_emissions_rate
-                            emissions_tot_so2[pp_name][month, day, hour] = float(emis_agg)
+                            emissions_tot_so2[pp_name][month, day, hour] = emis_agg
                         #print month, day, hour
-
-            except IOError:
-                #if the plant doesn't appear in a CEM file, set up the sensitivities, emissions and emissions rates
-                print "Does not appear in CEM"
-                print "%s|%s|%s" % (pp_name, pp_oris, pp_types[pp_type])
-
-                #use north ga, south ga or wansley depending on plant location
-                lat_check = float(pow_plant['LAT'])
-                for text_month in text_months:
-                    if int(pp_oris) == 55965: #Wansley Combined Cycle doesn't appear in CEM?
-                        hc_file_name = base_dir + "data/hc_data_so4/%s_%s_general_health_costs.csv" % ("wansley_comb", text_month)
-                    elif lat_check > 33.07: #north georgia for our purposes
-                        hc_file_name = base_dir + "data/hc_data_so4/%s_%s_general_health_costs.csv" % ("ga_north", text_month)
-                    elif lat_check < 33.07: #south georgia for our purposes
-                        hc_file_name = base_dir + "data/hc_data_so4/%s_%s_general_health_costs.csv" % ("ga_south", text_month)
-                    else: #plant didn't appear anywhere, that's a problem!
-                        print "Fail!"
-
-                   #assign costs for plants without their own CEM file
-                    with open(hc_file_name) as hc_file:
+                else:
+                    #if the plant doesn't appear in a CEM file, set up the sensitivities, emissions and emissions rates
+                    print "Does not appear in CEM"
+                    print "%s|%s|%s" % (pp_name, pp_oris, pp_types[pp_type])
+
+                    #use north ga, south ga or wansley depending on plant location
+                    lat_check = float(pow_plant['LAT'])
+                    for text_month in text_months:
+                        if int(pp_oris) == 55965: #Wansley Combined Cycle doesn't appear in CEM?
+                            hc_file_name = base_dir + "data/hc_data_so4/%s_%s_general_health_costs.csv" % ("wansley_comb", text_month)
+                        elif lat_check > 33.07: #north georgia for our purposes
+                            hc_file_name = base_dir + "data/hc_data_so4/%s_%s_general_health_costs.csv" % ("ga_north", text_month)
+                        elif lat_check < 33.07: #south georgia for our purposes
+                            hc_file_name = base_dir + "data/hc_data_so4/%s_%s_general_health_costs.csv" % ("ga_south", text_month)
+                        else: #plant didn't appear anywhere, that's a problem!
+                            print "Fail!"
+
+                       #assign costs for plants without their own CEM file
                         print "loading from %s" % hc_file_name
-                        reader = csv.reader(hc_file)
-                        header = reader.next()
                         if pp_name not in emissions_rate_so2:
                             emissions_rate_so2[pp_name] = {}
                             emissions_tot_so2[pp_name] = {}
                         print "emissions_rate loaded for %s" % pp_name
-                        for row in reader:
-                            month = int(row[1])
-                            day = int(row[2])
-                            hour = int(row[3])
-                            val = row[4]
-                            emis_agg = row[7]
-                            hc[month, day, hour] = VSL * BETA * float(val) * so2_emissions_rate / float(emis_agg) #val * (emissions rate / total aggregate source emissions)
+                        for month, day, hour, val, mwh, emis, emis_agg in \
+                                hc_data.load(hc_file_name, hc_cache_dir).tolist():
+                            month, day, hour = int(month), int(day), int(hour)
+                            hc[month, day, hour] = val * so2_emissions_rate / emis_agg #val * (emissions rate / total aggregate source emissions)
                             emissions_rate_so2[pp_name][month, day, hour] =  so2_emissions_rate
-                            emissions_tot_so2[pp_name][month, day, hour] = float(emis_agg)
+                            emissions_tot_so2[pp_name][month, day, hour] = emis_agg
 
-        for t in years:
-            for m in months:
-                for d in days:
-                    for h in hours:
-                        health_cost[t, m, d, h] = hc[m, d, h]
-                        health_cost_pct[t, m, d, h] = hc[m, d, h]
-                        health_cost_fs[t, m, d, h] = hc[m, d, h]
+            health_cost.fill(hc, hc_file_months)
 
 
 
-    #else case -- nuclear, other and hydro plants
-    else:
-        for t in years:
-            for m in months:
-                for d in days:
-                    for h in hours:
-                        health_cost[t, m, d, h] = 0.0
-                        health_cost_pct[t, m, d, h] = 0.0
-                        health_cost_fs[t, m, d, h] = 0.0
+        #else case -- nuclear, other and hydro plants, no health costs (the
+        #table starts at zero)
 
 
-    costs = PowerPlantCosts(fixed_cap_cost, fixed_cap_cost_pct, fixed_cap_cost_fs, inc_cap_cost, dec_cap_cost, health_cost, health_cost_pct, health_cost_fs)
+        costs = PowerPlantCosts(fixed_cap_cost, fixed_cap_cost_pct, fixed_cap_cost_fs, inc_cap_cost, dec_cap_cost, health_cost, health_cost, health_cost)
 
 
-    #check value of total capacity available
-    total_capacity_avail += float(pow_plant['NAMEPCAP'])*float(pow_plant['CAPFAC_FIXED'])
-    #location
-    # For reference or testing purposes,
-    # Georgia corner coordinates 34.966999, -85.649414
-    #                            30.694612, -80.90332
+        #check value of total capacity available
+        total_capacity_avail += float(pow_plant['NAMEPCAP'])*float(pow_plant['CAPFAC_FIXED'])
+        #location
+        # For reference or testing purposes,
+        # Georgia corner coordinates 34.966999, -85.649414
+        #                            30.694612, -80.90332
 
-    r_lat = float(pow_plant['LAT'])
-    r_lon = float(pow_plant['LON'])
-    loc = Location(r_lat, r_lon, "GA")
+        r_lat = float(pow_plant['LAT'])
+        r_lon = float(pow_plant['LON'])
+        loc = Location(r_lat, r_lon, "GA")
 
-    #add the power plant
-    cap_factor = float(pow_plant['CAPFAC_FIXED'])
-    capacity = float(pow_plant['NAMEPCAP'])
-    min_power = float(pow_plant['MIN_POW'])
+        #add the power plant
+        cap_factor = float(pow_plant['CAPFAC_FIXED'])
+        capacity = float(pow_plant['NAMEPCAP'])
+        min_power = float(pow_plant['MIN_POW'])
 
-            #         (type, cap_factor, capacity, min_p, name, location, costs):
-    ppadd = PowerPlant(pp_type, pp_fuel_type, cap_factor, capacity, min_power, pp_name, loc, costs)
+                #         (type, cap_factor, capacity, min_p, name, location, costs):
+        ppadd = PowerPlant(pp_type, pp_fuel_type, cap_factor, capacity, min_power, pp_name, loc, costs, pp_min_up[pp_type], pp_min_down[pp_type])
 
-    pp.append(ppadd)
+        pp.append(ppadd)
 
-num_plants = len(pp)
+    num_plants = len(pp)
+    phase_timer.end(num_plants)
 
-#close power plant data file
-pp_file.close()
+    #close power plant data file
+    pp_file.close()
 
-#load up array of load curves for use here 2004-2010 (or for years less than 2010)
-lc_data = []
-lc_dict = {}
-lc_file = base_dir + "data/lc_data/load_curves_2004_2013.csv"
-lc_file = open(lc_file, 'rU')
-reader = csv.reader(lc_file)
-count = 0
-for row in reader:
-    if count == 0:
-        header = row
-    else:
-        i = 0
-        lc_data_ele = {}
-        #load up a quick dictionary based on the headers (probably a better way to do this?)
-        for h in header:
-            lc_data_ele[h] = row[i]
-            i = i + 1
-        #construct a date
-        date = datetime.date(int(lc_data_ele["YEAR"]), int(lc_data_ele["MONTH"]), int(lc_data_ele["DAY"]))
-
-        #get the load from this row
-        load = lc_data_ele["LOAD"]
-
-        #get the hour from this row
-        hour = int(lc_data_ele["HOUR"])
-
-        #store the load in a load curve dictionary for a given date, hour combo
-        if date in lc_dict:
-            lc_dict[date][hour] = float(load)
-        else:
-            lc_dict[date] = {}
-            lc_dict[date][hour] = float(load)
-    count = count + 1
-
-#next, load the load_curve into LoadCurve objects (better way to do this?)
-lc_array = {}
-for t in years:
-    for m in months:
-        for d in days:
-            load_new = []
-            for hour in hours:
+    #load curves for use here 2004-2013, by hour
+    lc = load_data.load(base_dir + "data/lc_data/load_curves_2004_2013.csv",
+                        base_dir + load_data.cache_dir)
+
+    return ModelInputs(pp, pp_var_costs, pp_fuel_costs, pp_startup_costs,
+                       pp_fixed_costs, lc, emissions_rate_so2,
+                       emissions_tot_so2)
+
+
+#days of month m of year that are dates (e.g. 1 to 28 of days in February
+#2007)
+def calendar_days(year, m):
+    return [d for d in days if d <= calendar.monthrange(year, m)[1]]
+
+
+#(years x months x days x hours) grid of a scenario starting in start_year,
+#without the days that aren't dates
+def scenario_grid(start_year):
+    return matrix_build.TimeGrid([(t, m, d) for t in years for m in months
+                                  for d in calendar_days(start_year + t, m)],
+                                 hours)
+
+
+#load curves of a scenario, by (t, m, d)
+def load_curve_array(lc, start_year):
+    #next, load the load_curve into LoadCurve objects (better way to do this?)
+    lc_array = {}
+    for t in years:
+        for m in months:
+            for d in calendar_days(start_year + t, m):
                 year_in= start_year + t
                 date = datetime.date(year_in, m, d)
-                load_new.append(lc_dict[date][hour])
-                #print load_new
-            lc_array[t, m, d] = LoadCurve(load_new, date)
-#print lc
-
-#close load curve file
-lc_file.close()
+                load_new = lc.day(date)[hours].tolist()
+                lc_array[t, m, d] = LoadCurve(load_new, date)
+    #print lc
+    return lc_array
+
+
+#plants of a scenario, with the health costs scaled by hc_scale (VSL * BETA)
+def scenario_plants(pp, hc_scale):
+    plants = []
+    for p in pp:
+        c = p.costs
+        health_cost = c.health_cost.scaled(hc_scale)
+        costs = PowerPlantCosts(c.fixed_cap_cost, c.fixed_cap_cost_pct,
+                                c.fixed_cap_cost_fs, c.inc_cap_cost,
+                                c.dec_cap_cost, health_cost, health_cost,
+                                health_cost)
+        plants.append(PowerPlant(p.type, p.fuel_type, p.cap_factor,
+                                 p.capacity, p.min_power, p.name,
+                                 p.location, costs, p.min_up, p.min_down))
+    return plants
 
 
 #interest rate adjustments year to year
-cost_adj = {}
+def discount_factors(real_years):
+    cost_adj = {}
+
+    for y in real_years:
+        t = y - base_year
+        v = 1 / (1 + int_rate)**t
+        cost_adj[y] = v
+    #print cost_adj
+    return cost_adj
+
+
+#UCCoefficients of a scenario over grid, pp being the scenario's plants
+def scenario_coefficients(inputs, pp, grid, cost_adj, start_year,
+                          FS_EMISSIONS):
+    capacity = [p.capacity for p in pp]
+    fuel_cost = matrix_build.plant_year_costs(pp, inputs.pp_fuel_costs, years,
+                                              start_year)
+    startup_cost = matrix_build.plant_year_costs(pp, inputs.pp_startup_costs,
+                                                 years, start_year, capacity)
+    var_om_cost = matrix_build.plant_year_costs(pp, inputs.pp_var_costs, years,
+                                                start_year, capacity) * \
+                  np.array([[p.cap_factor] for p in pp])
+    disc = [cost_adj[start_year + t] for t in years] #discounting factors
+    return matrix_build.UCCoefficients(
+        pp, grid, inputs.lc.grid_load(grid, start_year), fuel_cost,
+        startup_cost, var_om_cost, disc,
+        matrix_build.plant_health_costs(pp, grid), FS_EMISSIONS, pct_change,
+        uc_formulation)
 
-for y in real_years:
-    t = y - base_year
-    v = 1 / (1 + int_rate)**t
-    cost_adj[y] = v
-#print cost_adj
 
 ###############################################################################
 ############################ END INPUT FILES FOR MODEL ########################
 ###############################################################################
 
-############################ OPTIMIZE #########################################
-try:
+#set up one scenario, returns its Scenario (not built yet)
+#   inputs: ModelInputs from load_inputs
+#   VSL (in millions of USD2007), BETA (in percent per 10 microg / m**3),
+#   health_cost_included and start_year as checked by check_arguments
+#   params: extra gurobi parameters (e.g. Threads)
+#   label: appended to the time stamp of the output and log files, keeps the
+#          files of scenarios started in the same second apart
+def setup_scenario(inputs, VSL, BETA, health_cost_included, start_year,
+                   params=None, label=""):
+    print "VSL is ", str(VSL)
+    print "Beta is ", str(BETA)
+    print "hc_or_not is", str(health_cost_included)
+    print "Start year is", str(start_year)
+    VSL_in, BETA_in = VSL, BETA
+    params = params or {}
+
+    #Note: VSL is now an input argument
+    VSL = VSL * 1000000 #convert to millions
+    #VSL
+    #$7.4MM, USD2006, adjusted to USD2007 via CPI, listed below
+
+    #Source:http://yosemite.epa.gov/ee/epa/eerm.nsf/vwAN/EE-0568-22.pdf
+
+    #Year    CPI #if needed for 2006 USD VSL
+    #2006    201.6
+    #2007    207.342
+
+    #VSL = 13.88 * 1000000 #in millions USD 2007 (90th percentile)
+    #VSL = 1.77 * 1000000 #in millions USD 2007 (10th percentile)
+    #VSL = 6.22 * 1000000 #in millions USD 2007 (50th percentile, median)
+    #VSL = 3.46 * 1000000 #in millions USD 2007 (25th percentile)
+    #VSL = 9.89 * 1000000 #in millions USD 2007 (75th percentile)
+
+    #timestamp for files
+    time_stamp = str(int(time.time())) + "median_HI" + label
+    print "Time stamp is: %s" % time_stamp
+
+    #Note: BETA is now an input argument
+    BETA = BETA / 10.0 #convert to 1 micrograms / m**3 PM2.5
+    #Beta
+    #BETA = 0.06 / 10.0 #6% per 10 micrograms / m**3 PM2.5
+
+    if health_cost_included == True:
+        #PCT emissions rate decrease
+        PCT_EMISSIONS = 1 #0.1 #TODO fix emissions rate change
+
+        #PCT emissions rate decrease
+        FS_EMISSIONS = 1 #0.01 #TODO fix emissions rate change
+
+        #NONE emissions rate (should be 1.0 except for testing)
+        NONE_EMISSIONS_ADJ = 1
+    else:
+        PCT_EMISSIONS, FS_EMISSIONS, NONE_EMISSIONS_ADJ = 0.0, 0.0, 0.0
+
+    #start_year = 2007
+    real_years = range(start_year, start_year + num_years)
+
+    pp = scenario_plants(inputs.pp, VSL * BETA)
+    pp_var_costs = inputs.pp_var_costs
+    pp_fuel_costs = inputs.pp_fuel_costs
+    pp_startup_costs = inputs.pp_startup_costs
+    emissions_rate_so2 = inputs.emissions_rate_so2
+    emissions_tot_so2 = inputs.emissions_tot_so2
+    lc_array = load_curve_array(inputs.lc, start_year)
+
+    #interest rate adjustments year to year
+    cost_adj = discount_factors(real_years)
+
+    #output files
+    years_days_hours = str(num_years) + str(num_days) + str(num_hours)
+    if health_cost_included:
+        hc_or_not = "_UC_"+ str(start_year) + "_hc_" + years_days_hours + "_" + time_stamp + "_so4"
+    else:
+        hc_or_not = "_UC_" + str(start_year) + "_no_hc_"  + years_days_hours + "_" + time_stamp + "_so4"
+    output_files = {}
+    if output_format == "npz":
+        output_files["summary"] = base_dir + 'data/output/output' + hc_or_not + '.json'
+        if columnar_output.writes(output_level, "plant"):
+            output_files["columns"] = base_dir + 'data/output/output' + hc_or_not + '.npz'
+    elif output_format == "csv":
+        if columnar_output.writes(output_level, "plant"):
+            output_files["plant"] = base_dir + 'data/output/output_plant_test' + hc_or_not + '.csv'
+        if columnar_output.writes(output_level, "hourly"):
+            output_files.update({
+                "output": base_dir + 'data/output/output' + hc_or_not + 'test.csv',
+                "plant_type": base_dir + 'data/output/output_plant_type_test' + hc_or_not + '.csv',
+                "plant_UC": base_dir + 'data/output/output_plant_UC_test' + hc_or_not + '.csv',
+                "plant_GEN": base_dir + 'data/output/output_plant_GEN_test' + hc_or_not + '.csv'})
+    else:
+        raise Exception("Output format error, %s is not csv or npz" %
+                        output_format)
+
+    s = Scenario(inputs, VSL_in, BETA_in, health_cost_included, start_year,
+                 params, time_stamp, pp, cost_adj, lc_array, output_files)
+    s.VSL, s.BETA = VSL, BETA #in USD2007 and per microg / m**3
+    s.FS_EMISSIONS = FS_EMISSIONS
+    s.log_file = base_dir + "logs/gurobi_logs/" + time_stamp + \
+        str(health_cost_included) + ".log"
+    solver_backend.check(solver)
+    if solver != "gurobi" and (solve_mode not in ("monolithic", "rolling",
+                                                  "annual") or
+                               not use_matrix_build):
+        raise Exception("Solver error, %s solves the matrix-built monolithic, "
+                        "rolling and annual solve modes only" % solver)
+    if use_model_cache and not use_matrix_build:
+        raise Exception("Model cache error, only matrix-built models are "
+                        "cached")
+    if not use_matrix_build and solve_mode == "monolithic" and any(
+            len(calendar_days(start_year + t, m)) < len(days)
+            for t in years for m in months):
+        raise Exception("Calendar error, the model built per index needs "
+                        "every one of days in each of months")
+    if write_run_report: #next to the gurobi log
+        s.report_file = base_dir + run_report.log_dir + time_stamp + \
+            str(health_cost_included) + ".json"
+
+    #########  model and result caches  #########
+    #the model is determined by the inputs, the formulation and the code that
+    #turns them into coefficients (not by this whole file, so that changing
+    #the solver settings here keeps the model), the solution also by the
+    #solver settings
+    model_parts = ("UC", pp, pp_fuel_costs, pp_startup_costs, pp_var_costs,
+                   lc_array, cost_adj, VSL, BETA, health_cost_included,
+                   start_year, years, months, days, hours, pct_change,
+                   int_rate, base_year, FS_EMISSIONS, uc_formulation,
+                   pp_min_up, pp_min_down, use_presolve, must_run_types,
+                   presolve_dominated,
+                   inspect.getsource(scenario_coefficients),
+                   inspect.getsource(model_coefficients))
+
+    #the model built before for the same inputs is read from the model cache
+    if use_model_cache and solve_mode == "monolithic":
+        s.model_key = result_cache.scenario_key(
+            model_parts, [matrix_build.__file__, presolve.__file__])
+        s.model_dir = base_dir + model_cache.cache_dir
+
+    #an identical scenario solved before is answered from the result cache
+    if use_result_cache:
+        cache_dir = base_dir + result_cache.cache_dir
+        cache_key = result_cache.scenario_key(
+            model_parts + (emissions_rate_so2, emissions_tot_so2, mip_gap,
+                           solve_mode, rolling_window_days, look_ahead_days,
+                           lagrangian_iterations, cluster_key,
+                           annual_overlap_days, output_format,
+                           output_level, solver,
+                           #threads don't change the solution
+                           dict((param, value) for param, value in
+                                params.items() if param != "Threads")),
+            [__file__, matrix_build.__file__, rolling_horizon.__file__,
+             lagrangian.__file__, clustered_uc.__file__, annual_uc.__file__,
+             presolve.__file__, columnar_output.__file__,
+             solver_backend.__file__])
+        s.cache_key, s.cache_dir = cache_key, cache_dir
+    return s
+
+
+#the result of s from the result cache, with its output files restored, or
+#None if s wasn't solved before (or the cache is off)
+def cached_result(s):
+    if s.cache_key is None:
+        return None
+    cache_key, output_files = s.cache_key, s.output_files
+    VSL_in, BETA_in, start_year = s.VSL_in, s.BETA_in, s.start_year
+    health_cost_included = s.health_cost_included
+    cached = result_cache.fetch(cache_key, s.cache_dir)
+    if cached is not None:
+        cached.restore(output_files)
+        print "Cached solution found (%s), output files restored" % cache_key
+        print "--------------------------------------------"
+        if health_cost_included == True:
+            print "Objective (with health costs): $" + '{0:,.2f}'.format(cached.info["obj_val"])
+        else:
+            print "Objective (no health costs): $" + '{0:,.2f}'.format(cached.info["obj_val"])
+        print "Health cost: $%s" % func(cached.info["hc"])
+        print "--------------------------------------------"
+        print "Total load (MWh): %s (generated)\nPlant load (MWh): %s (demanded)" % ('{0:,.2f}'.format(cached.info["total_load"]), '{0:,.2f}'.format(cached.info["total_plant_load"]))
+        if not cached.info["optimal"]:
+            print 'Relaxation is infeasible'
+        else:
+            print "Optimal Solution Found."
+        return ScenarioResult(VSL_in, BETA_in, health_cost_included,
+                              start_year, cached.info["obj_val"],
+                              cached.info["hc"], cached.info["total_load"],
+                              cached.info["total_plant_load"],
+                              cached.info["optimal"], True,
+                              cached.arrays["on"], cached.arrays["start"],
+                              cached.arrays["gen"])
+
+
+#coefficients of the model of s over grid, with the commitments presolve
+#fixes
+def model_coefficients(s, grid):
+    phase_timer.begin("coefficients")
+    uc_coeffs = scenario_coefficients(s.inputs, s.pp, grid, s.cost_adj,
+                                      s.start_year, s.FS_EMISSIONS)
+    if use_presolve:
+        uc_coeffs, presolve_report = presolve.presolve_commitment(
+            uc_coeffs, must_run_types, presolve_dominated)
+        print presolve_report
+    phase_timer.end()
+    return uc_coeffs
+
+
+#build the model of s for a solver backend other than gurobi or for the model
+#cache: the matrices of the monolithic model (or, for the rolling solve mode,
+#only its coefficients), kept in s; a cached model is only looked up, and
+#read by the solver
+def build_matrices(s):
+    s.grid = scenario_grid(s.start_year)
+    if s.model_key is not None:
+        cached = model_cache.fetch(s.model_key, s.model_dir)
+        if cached is not None:
+            print "Cached model found (%s), build skipped" % s.model_key
+            s.model_file, s.matrices = cached.model_file, (None, cached.index)
+            return s
+    s.uc_coeffs = model_coefficients(s, s.grid)
+    if solve_mode == "monolithic":
+        s.matrices = matrix_build.uc_matrices(s.uc_coeffs)
+    if s.model_key is not None:
+        phase_timer.begin("model_cache")
+        s.model_file = model_cache.store(s.model_key, s.matrices[0],
+                                         s.matrices[1], s.model_dir,
+                                         "uc").model_file
+        result_cache.evict(s.model_dir, model_cache_max_mb,
+                           model_cache_max_days)
+        phase_timer.end()
+    return s
+
+
+#build the gurobi model of s (or, for the decomposed solve modes, only its
+#coefficients), kept in s
+def build_model(s):
+    if solver != "gurobi" or s.model_key is not None:
+        return build_matrices(s)
+    inputs, pp, cost_adj, lc_array = s.inputs, s.pp, s.cost_adj, s.lc_array
+    start_year, health_cost_included = s.start_year, s.health_cost_included
+    time_stamp, params, FS_EMISSIONS = s.time_stamp, s.params, s.FS_EMISSIONS
+    pp_var_costs = inputs.pp_var_costs
+    pp_fuel_costs = inputs.pp_fuel_costs
+    pp_startup_costs = inputs.pp_startup_costs
+    num_plants = len(pp)
+    uc_coeffs = None
+
+
     #########  create model  #########
     mod = gp.Model("cap_planning")
 
@@ -690,8 +1113,10 @@ try:
     #Set tolerance if need be, default is 10^-04
     #mod.setParam("MIPGap", .000001)
     #mod.setParam("MIPGap", .001) #0.1% -- to ensure finishing
-    mod.setParam("MIPGap", .0025) #0.25% -- to ensure finishing
-    mod.setParam("LogFile", base_dir + "logs/gurobi_logs/" + time_stamp + str(health_cost_included) + ".log")
+    mod.setParam("MIPGap", mip_gap)
+    mod.setParam("LogFile", s.log_file)
+    for param, value in params.items():
+        mod.setParam(param, value)
 
 
     #########  variables  #########
@@ -748,49 +1173,65 @@ try:
     #                           obj = 0.0,
     #                           name = 'pi_fs_%s_%s' % (i, t))
 
-    #electricity generated at plant i in year t, month m, day d, hour h
-    #also unit commitment variables at plant i in year t, month m, day d, hour h
-    for t in years:
-        disc = cost_adj[start_year + t] #discounting factor
-        for m in months:
-            for d in days:
-                for h in hours:
-                    for i, p in enumerate(pp):
-                        fuel_cost = float(pp_fuel_costs[start_year+t][p.fuel_type])
-                        startup_cost = float(pp_startup_costs[start_year+t][p.fuel_type] * p.capacity)
-                        var_om_cost = float(pp_var_costs[start_year+t][p.fuel_type] * p.capacity * p.cap_factor)
-                        #variable indicating if a plant is on during an hour
-                        on_u[i, t, m, d, h] = mod.addVar(vtype = gp.GRB.BINARY,
-                                          obj = var_om_cost,
-                                          name = 'on_or_off_%s_%s_%s_%s_%s' % (i, t, m, d, h))                                                                                    
-                        #variable indicating if a plant started in an hour
-                        start_v[i, t, m, d, h] = mod.addVar(vtype = gp.GRB.BINARY,
-                                          obj = startup_cost,  #TODO add real startup cost here!
-                                          name = 'start_%s_%s_%s_%s_%s' % (i, t, m, d, h),
-                                          lb = 0.0,
-                                          ub = 1.0)                                          
-                        #variable indicating if a plant shut down in an hour
-                        shutdown_w[i, t, m, d, h] = mod.addVar(vtype = gp.GRB.BINARY,
-                                          obj = 0.0,  #TODO add real shutdown cost here!
-                                          name = 'shutdown_%s_%s_%s_%s_%s' % (i, t, m, d, h),
-                                          lb = 0.0,
-                                          ub = 1.0)
-                        # z_non[i, t, m, d, h] = mod.addVar(vtype = gp.GRB.CONTINUOUS,
-                        #                   obj = disc * (var_cost + p.costs.health_cost[t, m, d, h] * NONE_EMISSIONS_ADJ ),
-                        #                   name = 'gen_%s_%s_%s_%s_%s' % (i, t, m, d, h))
-                        # z_pct[i, t, m, d, h] = mod.addVar(vtype = gp.GRB.CONTINUOUS,
-                        #                   obj = disc * (var_cost + p.costs.health_cost_pct[t, m, d, h] * PCT_EMISSIONS ),
-                        #                   name = 'gen_pct_%s_%s_%s_%s_%s' % (i, t, m, d, h))
-                        # z_fs[i, t, m, d, h] = mod.addVar(vtype = gp.GRB.CONTINUOUS,
-                        #                   obj = disc * (var_cost + p.costs.health_cost_fs[t, m, d, h] * FS_EMISSIONS ),
-                        #                   name = 'gen_fs_%s_%s_%s_%s_%s' % (i, t, m, d, h))
-                        z[i, t, m, d, h] = mod.addVar(vtype = gp.GRB.CONTINUOUS,
-                        #                 obj = 0.0,
-                                          obj = disc * (fuel_cost + p.costs.health_cost[t, m, d, h] * FS_EMISSIONS ),
-                                          name = 'gen_total_%s_%s_%s_%s_%s' % (i, t, m, d, h))
+    grid = scenario_grid(s.start_year)
+    if use_matrix_build or solve_mode != "monolithic":
+        #every variable and constraint family is assembled as a sparse
+        #coefficient matrix over the (plant x hour) grid and added in bulk
+        uc_coeffs = model_coefficients(s, grid)
+
+    if solve_mode != "monolithic":
+        #the windows / plant subproblems are built and solved below
+        pass
+    elif use_matrix_build:
+        on_u, start_v, shutdown_w, z = matrix_build.build_uc(mod, uc_coeffs)
+    else:
+        phase_timer.begin("variables")
+        #electricity generated at plant i in year t, month m, day d, hour h
+        #also unit commitment variables at plant i in year t, month m, day d, hour h
+        for t in years:
+            disc = cost_adj[start_year + t] #discounting factor
+            for m in months:
+                for d in days:
+                    for h in hours:
+                        for i, p in enumerate(pp):
+                            fuel_cost = float(pp_fuel_costs[start_year+t][p.fuel_type])
+                            startup_cost = float(pp_startup_costs[start_year+t][p.fuel_type] * p.capacity)
+                            var_om_cost = float(pp_var_costs[start_year+t][p.fuel_type] * p.capacity * p.cap_factor)
+                            #variable indicating if a plant is on during an hour
+                            on_u[i, t, m, d, h] = mod.addVar(vtype = gp.GRB.BINARY,
+                                              obj = var_om_cost,
+                                              name = 'on_or_off_%s_%s_%s_%s_%s' % (i, t, m, d, h))                                                                                    
+                            #variable indicating if a plant started in an hour
+                            start_v[i, t, m, d, h] = mod.addVar(vtype = gp.GRB.BINARY,
+                                              obj = startup_cost,  #TODO add real startup cost here!
+                                              name = 'start_%s_%s_%s_%s_%s' % (i, t, m, d, h),
+                                              lb = 0.0,
+                                              ub = 1.0)                                          
+                            #variable indicating if a plant shut down in an hour
+                            shutdown_w[i, t, m, d, h] = mod.addVar(vtype = gp.GRB.BINARY,
+                                              obj = 0.0,  #TODO add real shutdown cost here!
+                                              name = 'shutdown_%s_%s_%s_%s_%s' % (i, t, m, d, h),
+                                              lb = 0.0,
+                                              ub = 1.0)
+                            # z_non[i, t, m, d, h] = mod.addVar(vtype = gp.GRB.CONTINUOUS,
+                            #                   obj = disc * (var_cost + p.costs.health_cost[t, m, d, h] * NONE_EMISSIONS_ADJ ),
+                            #                   name = 'gen_%s_%s_%s_%s_%s' % (i, t, m, d, h))
+                            # z_pct[i, t, m, d, h] = mod.addVar(vtype = gp.GRB.CONTINUOUS,
+                            #                   obj = disc * (var_cost + p.costs.health_cost_pct[t, m, d, h] * PCT_EMISSIONS ),
+                            #                   name = 'gen_pct_%s_%s_%s_%s_%s' % (i, t, m, d, h))
+                            # z_fs[i, t, m, d, h] = mod.addVar(vtype = gp.GRB.CONTINUOUS,
+                            #                   obj = disc * (var_cost + p.costs.health_cost_fs[t, m, d, h] * FS_EMISSIONS ),
+                            #                   name = 'gen_fs_%s_%s_%s_%s_%s' % (i, t, m, d, h))
+                            z[i, t, m, d, h] = mod.addVar(vtype = gp.GRB.CONTINUOUS,
+                            #                 obj = 0.0,
+                                              obj = disc * (fuel_cost + p.costs.health_cost[t, m, d, h] * FS_EMISSIONS ),
+                                              name = 'gen_total_%s_%s_%s_%s_%s' % (i, t, m, d, h))
+        phase_timer.end()
 
     # Integrate new variables
+    phase_timer.begin("update")
     mod.update()
+    phase_timer.end()
 
     #########  objective  #########
     #objective
@@ -798,116 +1239,119 @@ try:
     mod.setAttr(gp.GRB.attr.ModelSense, gp.GRB.MINIMIZE)
 
     #########  constraints  #########
-    cap_constr = {}
-
-    #yearly change in capacity balance constraints
-    #for t in years:
+    if not use_matrix_build and solve_mode == "monolithic":
+        phase_timer.begin("constraints")
+        cap_constr = {}
+
+        #yearly change in capacity balance constraints
+        #for t in years:
+            #for i, p in enumerate(pp):
+                #if(t > 0):
+                    #mod.addConstr(x[i, t] - x[i, (t-1)] == y[i, t] - q[i, t] , "change_cap_%s_%s" % (i, t))
+                    #cap_constr[i, t] = mod.addConstr(x[i, t] - x[i, (t-1)] == y[i, t] - q[i, t] , "change_cap_%s_%s" % (i, t))
+
+        ##starting capacity, year 0
         #for i, p in enumerate(pp):
-            #if(t > 0):
-                #mod.addConstr(x[i, t] - x[i, (t-1)] == y[i, t] - q[i, t] , "change_cap_%s_%s" % (i, t))
-                #cap_constr[i, t] = mod.addConstr(x[i, t] - x[i, (t-1)] == y[i, t] - q[i, t] , "change_cap_%s_%s" % (i, t))
-
-    ##starting capacity, year 0
-    #for i, p in enumerate(pp):
-    #    cap_constr[i, 0] = mod.addConstr(x[i, t] == p.capacity , "change_cap_%s_%s" % (i, t))
+        #    cap_constr[i, 0] = mod.addConstr(x[i, t] == p.capacity , "change_cap_%s_%s" % (i, t))
 
 
-    #constraints on pi vars
-    #for i, p in enumerate(pp):
-    #    for t in years:
-    #        if(t > 0):
-    #            cap_constr[i, t] = mod.addConstr(x[i, t] - x[i, (t-1)] == y[i, t] - q[i, t] , "change_cap_%s_%s" % (i, t))
+        #constraints on pi vars
+        #for i, p in enumerate(pp):
+        #    for t in years:
+        #        if(t > 0):
+        #            cap_constr[i, t] = mod.addConstr(x[i, t] - x[i, (t-1)] == y[i, t] - q[i, t] , "change_cap_%s_%s" % (i, t))
 
 
-    #demand must be met with available capacity
-    for h in hours:
-        for m in months:
-            for d in days:
-                for t in years:
-                    mod.addConstr(gp.quicksum([z[i, t, m, d, h] for i in range(num_plants)]) == lc_array[t, m, d].load[h], "load_%s_%s_%s_%s" % (h, m, d, t))
-
-    # #reserve must be available if need be -- R = % above load needed on reserve
-    # for h in hours:
-    #     for m in months:
-    #         for d in days:
-    #             for t in years:
-    #                 #TODO could just change this to >= max(lc_array) for the year t... but for now just leave it since it's easier
-    #                 mod.addConstr(gp.quicksum([x[i, t] for i in range(num_plants)]) >= lc_array[t, m, d].load[h] * (1+R), "reserve_%s_%s_%s_%s" % (h, m, d, t))
-
-    ##capacity constraints
-    #all plants
-    for h in hours:
-        for m in months:
-            for d in days:
-                for t in years:
-                    for i, p in enumerate(pp):
-                        #capacity of a plant (based on capacity factor and nameplate capacity)
-                        #mod.addConstr(z[i, t, m, d, h] <= p.cap_factor * x[i, t], "plant_cap_%s_%s_%s_%s_%s" % (i, t, m, d, h))
-
-                        #constraint indicating if a plant is on or not
-                        mod.addConstr(z[i, t, m, d, h] <= p.capacity * p.cap_factor * on_u[i, t, m, d, h], "plant_on_const_%s_%s_%s_%s_%s" % (i, t, m, d, h))                        
-                        
-                        #baseload capacity (% of minimum capacities) if plant is on
-                        mod.addConstr(z[i, t, m, d, h] >= p.min_power * p.capacity * on_u[i, t, m, d, h], "plant_min_cap_%s_%s_%s_%s_%s" % (i, t, m, d, h))
-
-                        #generation must be one of three different types of generation at a plant -- FS, PCT or neither
-                        #mod.addConstr(z[i, t, m, d, h] == z_non[i, t, m, d, h] + z_fs[i, t, m, d, h] + z_pct[i, t, m, d, h], "plant_gen_types_%s_%s_%s_%s_%s" % (i, t, m, d, h))
-
-                        #must choose exactly one generation type, but no more! (big-M constraints using p.capacity as "M")
-                        #mod.addConstr(z_pct[i, t, m, d, h] <= pi_pct[i, t]*p.capacity, "plant_gen_pct_%s_%s_%s_%s_%s" % (i, t, m, d, h))
-                        #mod.addConstr(z_non[i, t, m, d, h] <= pi_non[i, t]*p.capacity, "plant_gen_non_%s_%s_%s_%s_%s" % (i, t, m, d, h))
-                        #mod.addConstr(z_fs[i, t, m, d, h] <= pi_fs[i, t]*p.capacity, "plant_gen_fs_%s_%s_%s_%s_%s" % (i, t, m, d, h))
-
-
-    #all plants final max capacity
-    #for t in years:
-    #    for i, p in enumerate(pp):
-            #all plants final max capacity
-            #mod.addConstr(x[i, t] <= p.capacity , "plant_cap_%s_%s" % (i, t))
-
-            #generation type choice
-            #mod.addConstr(pi_pct[i, t] + pi_fs[i, t] + pi_non[i, t] == 1.0, "plant_gen_type_%s_%s" % (i, t))
-
-    #TODO TESTING
-    #all plants set to no pct, no fs
-    #for t in years:
-    #    for i, p in enumerate(pp):
-    #        #generation type choice
-    #        mod.addConstr(pi_pct[i, t] == 1.0, "plant_gen_set_type_%s_%s" % (i, t))
-
-    #TODO TESTING
-    #change in power usage constraint
-    for t in years:
-        for m in months:
-            for d in days:
-                for h in hours:
-                    for i, p in enumerate(pp):
-                        #baseload capacity (just % minimum capacities)
-                        if (h > 0 and p.type == 0): #coal plants only
-                            mod.addConstr(z[i, t, m, d, h] - z[i, t, m, d, (h-1)] <= pct_change * p.capacity * p.cap_factor, "plant_change_usage_%s_%s_%s_%s_%s" % (i, t, m, d, h))
-                            mod.addConstr(z[i, t, m, d, h-1] - z[i, t, m, d, h] <= pct_change * p.capacity * p.cap_factor, "plant_change_usage_%s_%s_%s_%s_%s" % (i, t, m, d, h))
-                        elif h == 0 and p.type == 0 and d != 1:
-                            #0th hour change vs. 23rd hour of the previous day
-                            mod.addConstr(z[i, t, m, d, h] - z[i, t, m, d-1, 23] <= pct_change * p.capacity * p.cap_factor, "plant_change_usage_%s_%s_%s_%s_%s" % (i, t, m, d, h))
-                            mod.addConstr(z[i, t, m, d-1, 23] - z[i, t, m, d, h] <= pct_change * p.capacity * p.cap_factor, "plant_change_usage_%s_%s_%s_%s_%s" % (i, t, m, d, h))
-
-    #shutdown startup constraints
-    for t in years:
-        for m in months:
-            for d in days:
-                for h in hours:
-                    for i, p in enumerate(pp):
-                        mod.addConstr(start_v[i, t, m, d, h] <= on_u[i, t, m, d, h], "plant_startup_2_%s_%s_%s_%s_%s" % (i, t, m, d, h))
-                        mod.addConstr(shutdown_w[i, t, m, d, h] <= 1.0 - on_u[i, t, m, d, h], "plant_shutdown_%s_%s_%s_%s_%s" % (i, t, m, d, h))                        
-                        
-                        ##the following are needed for the strongest valid inequalities for unit commitment
-                        if (h > 0) :
-                            mod.addConstr(start_v[i, t, m, d, h] - shutdown_w[i, t, m, d, h] == on_u[i, t, m, d, h] - on_u[i, t, m, d, h-1] , "plant_startup_%s_%s_%s_%s_%s" % (i, t, m, d, h))
-                        elif h == 0 and d != 1 :
-                            #0th hour change vs. 23rd hour of the previous day
-                            mod.addConstr(start_v[i, t, m, d, h] - shutdown_w[i, t, m, d, h] == on_u[i, t, m, d, h] - on_u[i, t, m, d-1, 23] , "plant_startup_%s_%s_%s_%s_%s" % (i, t, m, d, h))
-                        #elif h == 0 and d == 1 : #initial startup costs for that month
-                        #    mod.addConstr(start_v[i, t, m, d, h] - shutdown_w[i, t, m, d, h] == on_u[i, t, m, d, h] , "plant_startup_%s_%s_%s_%s_%s" % (i, t, m, d, h))
+        #demand must be met with available capacity
+        for h in hours:
+            for m in months:
+                for d in days:
+                    for t in years:
+                        mod.addConstr(gp.quicksum([z[i, t, m, d, h] for i in range(num_plants)]) == lc_array[t, m, d].load[h], "load_%s_%s_%s_%s" % (h, m, d, t))
+
+        # #reserve must be available if need be -- R = % above load needed on reserve
+        # for h in hours:
+        #     for m in months:
+        #         for d in days:
+        #             for t in years:
+        #                 #TODO could just change this to >= max(lc_array) for the year t... but for now just leave it since it's easier
+        #                 mod.addConstr(gp.quicksum([x[i, t] for i in range(num_plants)]) >= lc_array[t, m, d].load[h] * (1+R), "reserve_%s_%s_%s_%s" % (h, m, d, t))
+
+        ##capacity constraints
+        #all plants
+        for h in hours:
+            for m in months:
+                for d in days:
+                    for t in years:
+                        for i, p in enumerate(pp):
+                            #capacity of a plant (based on capacity factor and nameplate capacity)
+                            #mod.addConstr(z[i, t, m, d, h] <= p.cap_factor * x[i, t], "plant_cap_%s_%s_%s_%s_%s" % (i, t, m, d, h))
+
+                            #constraint indicating if a plant is on or not
+                            mod.addConstr(z[i, t, m, d, h] <= p.capacity * p.cap_factor * on_u[i, t, m, d, h], "plant_on_const_%s_%s_%s_%s_%s" % (i, t, m, d, h))                        
+                    
+                            #baseload capacity (% of minimum capacities) if plant is on
+                            mod.addConstr(z[i, t, m, d, h] >= p.min_power * p.capacity * on_u[i, t, m, d, h], "plant_min_cap_%s_%s_%s_%s_%s" % (i, t, m, d, h))
+
+                            #generation must be one of three different types of generation at a plant -- FS, PCT or neither
+                            #mod.addConstr(z[i, t, m, d, h] == z_non[i, t, m, d, h] + z_fs[i, t, m, d, h] + z_pct[i, t, m, d, h], "plant_gen_types_%s_%s_%s_%s_%s" % (i, t, m, d, h))
+
+                            #must choose exactly one generation type, but no more! (big-M constraints using p.capacity as "M")
+                            #mod.addConstr(z_pct[i, t, m, d, h] <= pi_pct[i, t]*p.capacity, "plant_gen_pct_%s_%s_%s_%s_%s" % (i, t, m, d, h))
+                            #mod.addConstr(z_non[i, t, m, d, h] <= pi_non[i, t]*p.capacity, "plant_gen_non_%s_%s_%s_%s_%s" % (i, t, m, d, h))
+                            #mod.addConstr(z_fs[i, t, m, d, h] <= pi_fs[i, t]*p.capacity, "plant_gen_fs_%s_%s_%s_%s_%s" % (i, t, m, d, h))
+
+
+        #all plants final max capacity
+        #for t in years:
+        #    for i, p in enumerate(pp):
+                #all plants final max capacity
+                #mod.addConstr(x[i, t] <= p.capacity , "plant_cap_%s_%s" % (i, t))
+
+                #generation type choice
+                #mod.addConstr(pi_pct[i, t] + pi_fs[i, t] + pi_non[i, t] == 1.0, "plant_gen_type_%s_%s" % (i, t))
+
+        #TODO TESTING
+        #all plants set to no pct, no fs
+        #for t in years:
+        #    for i, p in enumerate(pp):
+        #        #generation type choice
+        #        mod.addConstr(pi_pct[i, t] == 1.0, "plant_gen_set_type_%s_%s" % (i, t))
+
+        #TODO TESTING
+        #change in power usage constraint
+        for t in years:
+            for m in months:
+                for d in days:
+                    for h in hours:
+                        for i, p in enumerate(pp):
+                            #baseload capacity (just % minimum capacities)
+                            if (h > 0 and p.type == 0): #coal plants only
+                                mod.addConstr(z[i, t, m, d, h] - z[i, t, m, d, (h-1)] <= pct_change * p.capacity * p.cap_factor, "plant_change_usage_%s_%s_%s_%s_%s" % (i, t, m, d, h))
+                                mod.addConstr(z[i, t, m, d, h-1] - z[i, t, m, d, h] <= pct_change * p.capacity * p.cap_factor, "plant_change_usage_%s_%s_%s_%s_%s" % (i, t, m, d, h))
+                            elif h == 0 and p.type == 0 and d != 1:
+                                #0th hour change vs. 23rd hour of the previous day
+                                mod.addConstr(z[i, t, m, d, h] - z[i, t, m, d-1, 23] <= pct_change * p.capacity * p.cap_factor, "plant_change_usage_%s_%s_%s_%s_%s" % (i, t, m, d, h))
+                                mod.addConstr(z[i, t, m, d-1, 23] - z[i, t, m, d, h] <= pct_change * p.capacity * p.cap_factor, "plant_change_usage_%s_%s_%s_%s_%s" % (i, t, m, d, h))
+
+        #shutdown startup constraints
+        for t in years:
+            for m in months:
+                for d in days:
+                    for h in hours:
+                        for i, p in enumerate(pp):
+                            mod.addConstr(start_v[i, t, m, d, h] <= on_u[i, t, m, d, h], "plant_startup_2_%s_%s_%s_%s_%s" % (i, t, m, d, h))
+                            mod.addConstr(shutdown_w[i, t, m, d, h] <= 1.0 - on_u[i, t, m, d, h], "plant_shutdown_%s_%s_%s_%s_%s" % (i, t, m, d, h))                        
+                    
+                            ##the following are needed for the strongest valid inequalities for unit commitment
+                            if (h > 0) :
+                                mod.addConstr(start_v[i, t, m, d, h] - shutdown_w[i, t, m, d, h] == on_u[i, t, m, d, h] - on_u[i, t, m, d, h-1] , "plant_startup_%s_%s_%s_%s_%s" % (i, t, m, d, h))
+                            elif h == 0 and d != 1 :
+                                #0th hour change vs. 23rd hour of the previous day
+                                mod.addConstr(start_v[i, t, m, d, h] - shutdown_w[i, t, m, d, h] == on_u[i, t, m, d, h] - on_u[i, t, m, d-1, 23] , "plant_startup_%s_%s_%s_%s_%s" % (i, t, m, d, h))
+                            #elif h == 0 and d == 1 : #initial startup costs for that month
+                            #    mod.addConstr(start_v[i, t, m, d, h] - shutdown_w[i, t, m, d, h] == on_u[i, t, m, d, h] , "plant_startup_%s_%s_%s_%s_%s" % (i, t, m, d, h))
+        phase_timer.end()
 
 
 
@@ -935,178 +1379,311 @@ try:
 
     #renewable electricity standard
 
-    #########  solve  #########
-    mod.optimize()
+    s.mod, s.grid, s.uc_coeffs = mod, grid, uc_coeffs
+    s.variables = (on_u, start_v, shutdown_w, z)
+    return s
 
-    #########  output  #########
-
-    #calculate health costs
-
-    #health cost total
-    hc = 0.0 #calculate total health cost
-    for t in years:
-        disc = cost_adj[start_year + t] #discount factor
-        for m in months:
-            for d in days:
-                for h in hours:
-                    for i, p in enumerate(pp):
-                        hc = hc + z[i, t, m, d, h].getAttr("X") * disc * p.costs.health_cost[t, m, d, h]
-
-    #health cost plant total
-    hc_arr = {}
-    for i, p in enumerate(pp):
-        hc_arr[i] = 0.0
-        for t in years:
-            disc = cost_adj[start_year + t] #discounting factor
-            for m in months:
-                for d in days:
-                    for h in hours:
-                        hc_arr[i] = hc_arr[i] + z[i, t, m, d, h].getAttr("X") * disc * p.costs.health_cost[t, m, d, h]
-
-    for var in mod.getVars():
-        #gather data for each hour, for each power plant type (coal, nuclear, etc...)
-        #inverse the key-value mapping for power plant types
-        inv_pp_types = {var:k for k, v in pp_types.items()}
-        #print if larger than 0
-        #if v.x > 0.0:
-            #print "%s\t:\t%.1f " % (v.varName, v.x)
 
+#solve the model of s, keeps the (plant x hour) on, start and generation
+#solution arrays, the objective and whether it is optimal in s
+def solve_model(s):
+    mod, grid, uc_coeffs = s.mod, s.grid, s.uc_coeffs
+    num_plants = len(s.pp)
+    #the scenario's parameters set over the MIP gap, as in build_model
+    params = dict({"MIPGap": mip_gap, "LogFile": s.log_file}, **s.params)
 
-    load_totals = {}
-    for t in years:
-        for m in months:
-            for d in days:
-                for h in hours:
-                    for j, k in pp_types.items():
-                        load_totals[j, t, m, d, h] = 0.0
-
-    #calculate plant load and output results to output.csv
-    total_plant_load = 0.0
-
-
-    years_days_hours = str(num_years) + str(num_days) + str(num_hours)
-    if health_cost_included:
-        hc_or_not = "_UC_"+ str(start_year) + "_hc_" + years_days_hours + "_" + time_stamp + "_so4"
+    #########  solve  #########
+    if s.matrices is not None:
+        mm, index = s.matrices
+        if mm is None: #from the model cache
+            solution = solver_backend.solve_file(s.model_file, params, "uc",
+                                                 solver)
+        else:
+            solution = solver_backend.solve(mm, params, "uc", solver)
+        print solution
+        if solution.x is None:
+            raise solver_backend.SolverError(
+                "No solution found, %s status %s" % (solver, solution.status))
+        on, start, gen = [solution.x[index[v]]
+                          for v in ("on_u", "start_v", "z")]
+        obj_val = solution.obj_val
+        optimal = solution.optimal
+        s.solution = solution
+    elif solve_mode in ("rolling", "lagrangian", "clustered", "annual"):
+        phase_timer.begin(solve_mode)
+        if solve_mode == "rolling":
+            result = rolling_horizon.solve_rolling(
+                uc_coeffs, rolling_window_days, look_ahead_days, params,
+                solver)
+        elif solve_mode == "annual":
+            result = annual_uc.solve_annual(
+                uc_coeffs, s.start_year, annual_overlap_days, annual_workers,
+                params, solver)
+        elif solve_mode == "clustered":
+            result = clustered_uc.solve_clustered(
+                uc_coeffs, cluster_key, params, cluster_compare_full)
+        else:
+            result = lagrangian.solve_lagrangian(
+                uc_coeffs, lagrangian_iterations, lagrangian_workers, params)
+        phase_timer.end()
+        print result
+        on, start, gen = result.on, result.start, result.gen
+        obj_val = result.obj_val
+        optimal = result.optimal
     else:
-        hc_or_not = "_UC_" + str(start_year) + "_no_hc_"  + years_days_hours + "_" + time_stamp + "_so4"
+        phase_timer.begin("optimize")
+        mod.optimize()
+        phase_timer.end()
+        #one bulk X query for all the (plant x hour) arrays
+        phase_timer.begin("solution")
+        on_u, start_v, shutdown_w, z = s.variables
+        on, start, gen = matrix_build.solution_grids(
+            mod, (on_u, start_v, z), num_plants, grid)
+        phase_timer.end()
+        obj_val = mod.objVal
+        optimal = mod.status == gp.GRB.status.OPTIMAL
+
+    s.on, s.start, s.gen = on, start, gen
+    s.obj_val, s.optimal = obj_val, optimal
+    return s
+
+
+#health costs, totals and output files of the solved s (stored in the result
+#cache), returns its ScenarioResult
+def extract_results(s):
+    inputs, pp, grid, cost_adj = s.inputs, s.pp, s.grid, s.cost_adj
+    start_year, health_cost_included = s.start_year, s.health_cost_included
+    VSL_in, BETA_in = s.VSL_in, s.BETA_in
+    output_files = s.output_files
+    cache_key, cache_dir = s.cache_key, s.cache_dir
+    on, start, gen = s.on, s.start, s.gen
+    obj_val, optimal = s.obj_val, s.optimal
+    pp_var_costs = inputs.pp_var_costs
+    emissions_rate_so2 = inputs.emissions_rate_so2
+    emissions_tot_so2 = inputs.emissions_tot_so2
 
-    #turn off writing of huge file
-    with open(base_dir + 'data/output/output' + hc_or_not + 'test.csv', 'wb') as csvfile:
-        w = csv.writer(csvfile)
-        w.writerow(("Name", "Lat", "Lon", "Year", "Month", "Day", "Hour", "Load", "SO2_EMISSIONS_RATE", "SO2_EMISSIONS_TOT", "HEALTH_COST"))
-        for t in years:
-            for m in months:
-                for d in days:
-                    for h in hours:
-                        for i, p in enumerate(pp):
-                            total_plant_load += z[i, t, m, d, h].getAttr("X")
-                            for j, k in pp_types.items():
-                                if p.type == j:
-                                    load_totals[j, t, m, d, h] += z[i, t, m, d, h].getAttr("X")
-                            if p.type in [0, 1, 2, 5, 6]:
-                                emissions_rate_so2_hour = emissions_rate_so2[p.name][m, d, h]
-                                emissions_tot_so2_hour = emissions_tot_so2[p.name][m, d, h]
-                                health_cost_hour = p.costs.health_cost[t, m, d, h]
-                            else:
-                                emissions_rate_so2_hour = 0.0
-                                emissions_tot_so2_hour = 0.0
-                                health_cost_hour = 0.0
-                            #print (p.name, p.location.lat, p.location.lon, t, m, d, h, z[i, t, m, d, h].getAttr("X"), emissions_rate_so2_hour, emissions_tot_so2_hour, health_cost_hour)
-                            w.writerow((p.name, p.location.lat, p.location.lon, t, m, d, h, z[i, t, m, d, h].getAttr("X"), emissions_rate_so2_hour, emissions_tot_so2_hour, health_cost_hour))
-
-
-        print "--------------------------------------------"
-        if health_cost_included == True:
-            print "Objective (with health costs): $" + '{0:,.2f}'.format(mod.objVal)
-            print "Health cost: $%s" % func(hc)
+    #########  output  #########
+    #every total is a reduction of the (plant x hour) solution arrays, and the
+    #writers read the same arrays
+
+    #health cost total and plant totals
+    health_cost = matrix_build.plant_health_costs(pp, grid)
+    disc = np.array([cost_adj[start_year + t] for (t, m, d, h) in grid.keys])
+    hc_arr = (gen * health_cost * disc[None, :]).sum(axis=1)
+    hc = float(hc_arr.sum())
+
+    #load by plant, by plant type and hour, and in total
+    plant_load = gen.sum(axis=1)
+    plant_type = np.array([p.type for p in pp])
+    load_totals = np.array([gen[plant_type == j].sum(axis=0)
+                            for j in pp_types])
+    total_plant_load = float(plant_load.sum())
+
+    print "--------------------------------------------"
+    if health_cost_included == True:
+        print "Objective (with health costs): $" + '{0:,.2f}'.format(obj_val)
+        print "Health cost: $%s" % func(hc)
 
-        else:
-            print "Objective (no health costs): $" + '{0:,.2f}'.format(mod.objVal)
-            print "Health cost: $%s" % func(hc)
-        print "--------------------------------------------"
-    
-    #calculate individual plant load and output total results for each plant
-    with open(base_dir + 'data/output/output_plant_test' + hc_or_not + '.csv', 'wb') as csvfile:
-        w = csv.writer(csvfile)
-        w.writerow(("Name", "Type", "Lat", "Lon", "Load", "Health_Impact", "Var_Cost_2004", "Var_Cost_2011", "Capacity", "Fuel_Type"))
-        for i, p in enumerate(pp):
-            plant_load = 0.0
-            for t in years:
-                for m in months:
-                    for d in days:
-                        for h in hours:
-                            plant_load += z[i, t, m, d, h].getAttr("X")
-            w.writerow((p.name, pp_types[p.type], p.location.lat, p.location.lon, plant_load, hc_arr[i], pp_var_costs[2004][p.fuel_type], pp_var_costs[2011][p.fuel_type], p.capacity, pp_fuel_types[p.fuel_type]))
-
-    #calculate plant type load and output total results for each plant type
-    with open(base_dir + 'data/output/output_plant_type_test' + hc_or_not + '.csv', 'wb') as csvfile:
-        w = csv.writer(csvfile)
-        w.writerow(("Type", "Year", "Month", "Day", "Hour", "Load"))
-        for t in years:
-            for m in months:
-                for d in days:
-                    for h in hours:
-                        for j, pp_type in pp_types.items():
-                            w.writerow((pp_type, t, m, d, h, load_totals[j, t, m, d, h]))
-
-    #calculate individual plant commitment and output 0,1 matrix for each plant
-    with open(base_dir + 'data/output/output_plant_UC_test' + hc_or_not + '.csv', 'wb') as csvfile:
-        w = csv.writer(csvfile)
-        plant_arr = []
-        plant_arr.append("Year")
-        plant_arr.append("Month")
-        plant_arr.append("Day")
-        plant_arr.append("Hour")        
-        for i, p in enumerate(pp):
-            plant_arr.append(p.name)
-        w.writerow(plant_arr)
-        for t in years:
-            for m in months:
-                for d in days:
-                    for h in hours:
-                        row_write = []
-                        row_write.append(str(t+start_year)) #year                        
-                        row_write.append(str(m)) #month
-                        row_write.append(str(d)) #day
-                        row_write.append(str(h)) #hour
-                        for i, p in enumerate(pp):
-                            row_write.append(str(on_u[i, t, m, d, h].getAttr("X")+start_v[i, t, m, d, h].getAttr("X")))
-                        w.writerow(row_write)
-
-    #calculate individual plant generation and output generation for each plant
-    with open(base_dir + 'data/output/output_plant_GEN_test' + hc_or_not + '.csv', 'wb') as csvfile:
-        w = csv.writer(csvfile)
-        plant_arr = []
-        plant_arr.append("Year")
-        plant_arr.append("Month")
-        plant_arr.append("Day")
-        plant_arr.append("Hour")        
-        for i, p in enumerate(pp):
-            plant_arr.append(p.name)
-        w.writerow(plant_arr)
-        for t in years:
-            for m in months:
-                for d in days:
-                    for h in hours:
-                        row_write = []
-                        row_write.append(str(t+start_year)) #year                        
-                        row_write.append(str(m)) #month
-                        row_write.append(str(d)) #day
-                        row_write.append(str(h)) #hour
-                        for i, p in enumerate(pp):
-                            row_write.append(str(z[i, t, m, d, h].getAttr("X")))
-                        w.writerow(row_write)
+    else:
+        print "Objective (no health costs): $" + '{0:,.2f}'.format(obj_val)
+        print "Health cost: $%s" % func(hc)
+    print "--------------------------------------------"
+
+    #hourly SO2 emissions rates and totals of the emitting plants, (hour x
+    #plant) like the rows of the output file
+    hourly = columnar_output.writes(output_level, "hourly")
+    if hourly:
+        emitting = np.array([p.type in [0, 1, 2, 5, 6] for p in pp])
+        hour_keys = [(hc_file_months.get(m, m), d, h)
+                     for (t, m, d, h) in grid.keys]
+        so2_rate, so2_tot = [], []
+        for p, e in zip(pp, emitting):
+            if e:
+                so2_rate.append([emissions_rate_so2[p.name][key]
+                                 for key in hour_keys])
+                so2_tot.append([emissions_tot_so2[p.name][key]
+                                for key in hour_keys])
+            else:
+                so2_rate.append([0.0] * grid.num_hours)
+                so2_tot.append([0.0] * grid.num_hours)
+        so2_rate, so2_tot = zip(*so2_rate), zip(*so2_tot)
+        hour_hc = np.where(emitting[:, None], health_cost, 0.0)
 
     #add up total production across entire planning period
-    total_load = 0.0
-    for h in hours:
-        for m in months:
-            for d in days:
-                for t in years:
-                    total_load += lc_array[t, m, d].load[h]
+    total_load = float(inputs.lc.grid_load(grid, start_year).sum())
+
+    phase_timer.begin("write")
+    #columnar output file and its sidecar
+    if output_format == "npz":
+        phase_timer.begin("columns")
+        cols = columnar_output.Columns()
+        if columnar_output.writes(output_level, "plant"):
+            cols.add("name", [p.name for p in pp], ["plant"], "plant name")
+            cols.add("type", plant_type, ["plant"],
+                     "plant type (index of type_name)")
+            cols.add("fuel_type", [pp_fuel_types[p.fuel_type] for p in pp],
+                     ["plant"], "fuel type")
+            cols.add("lat", [p.location.lat for p in pp], ["plant"],
+                     "latitude")
+            cols.add("lon", [p.location.lon for p in pp], ["plant"],
+                     "longitude")
+            cols.add("capacity", [p.capacity for p in pp], ["plant"],
+                     "capacity (MW)")
+            cols.add("load", plant_load, ["plant"], "generation (MWh)")
+            cols.add("health_impact", hc_arr, ["plant"],
+                     "discounted health cost (USD2007)")
+            cols.add("var_cost_2004",
+                     [pp_var_costs[2004][p.fuel_type] for p in pp],
+                     ["plant"], "variable O&M cost in 2004")
+            cols.add("var_cost_2011",
+                     [pp_var_costs[2011][p.fuel_type] for p in pp],
+                     ["plant"], "variable O&M cost in 2011")
+        if hourly:
+            cols.add("year", [t + start_year for (t, m, d, h) in grid.keys],
+                     ["hour"], "year")
+            cols.add("month", [m for (t, m, d, h) in grid.keys], ["hour"],
+                     "month")
+            cols.add("day", [d for (t, m, d, h) in grid.keys], ["hour"],
+                     "day of the month")
+            cols.add("hour", [h for (t, m, d, h) in grid.keys], ["hour"],
+                     "hour of the day")
+            cols.add("gen", gen, ["plant", "hour"], "generation (MWh)")
+            cols.add("committed", on + start, ["plant", "hour"],
+                     "on (1) or off (0)")
+            cols.add("so2_rate", np.array(so2_rate).T, ["plant", "hour"],
+                     "SO2 emissions rate")
+            cols.add("so2_tot", np.array(so2_tot).T, ["plant", "hour"],
+                     "SO2 emissions")
+            cols.add("health_cost", hour_hc, ["plant", "hour"],
+                     "health cost per MWh (USD2007, undiscounted)")
+            cols.add("type_name", pp_types.values(), ["type"],
+                     "plant type name")
+            cols.add("type_load", load_totals, ["type", "hour"],
+                     "generation by plant type (MWh)")
+        summary = {"model": "UC", "VSL": VSL_in, "BETA": BETA_in,
+                   "health_cost_included": health_cost_included,
+                   "start_year": start_year, "obj_val": obj_val, "hc": hc,
+                   "total_load": total_load,
+                   "total_plant_load": total_plant_load,
+                   "optimal": bool(optimal), "solve_mode": solve_mode,
+                   "type_load": dict((k, float(load_totals[n].sum()))
+                                     for n, k in enumerate(pp_types.values()))}
+        columnar_output.write(output_files["summary"], output_level, summary,
+                              cols)
+        phase_timer.end(len(cols.info))
+
+    #hourly rows of each plant
+    if "output" in output_files:
+        phase_timer.begin("output")
+        with open(output_files["output"], 'wb') as csvfile:
+            w = csv.writer(csvfile)
+            w.writerow(("Name", "Lat", "Lon", "Year", "Month", "Day", "Hour", "Load", "SO2_EMISSIONS_RATE", "SO2_EMISSIONS_TOT", "HEALTH_COST"))
+            columns = [gen.T.tolist(), so2_rate, so2_tot, hour_hc.T.tolist()]
+            for k, (t, m, d, h) in enumerate(grid.keys):
+                w.writerows((p.name, p.location.lat, p.location.lon, t, m, d, h,
+                             load, rate, tot, cost)
+                            for p, load, rate, tot, cost in
+                            zip(pp, *[col[k] for col in columns]))
+        phase_timer.end(grid.num_hours * len(pp))
+
+    #total results for each plant
+    if "plant" in output_files:
+        phase_timer.begin("plant")
+        with open(output_files["plant"], 'wb') as csvfile:
+            w = csv.writer(csvfile)
+            w.writerow(("Name", "Type", "Lat", "Lon", "Load", "Health_Impact", "Var_Cost_2004", "Var_Cost_2011", "Capacity", "Fuel_Type"))
+            for i, p in enumerate(pp):
+                w.writerow((p.name, pp_types[p.type], p.location.lat, p.location.lon, float(plant_load[i]), float(hc_arr[i]), pp_var_costs[2004][p.fuel_type], pp_var_costs[2011][p.fuel_type], p.capacity, pp_fuel_types[p.fuel_type]))
+        phase_timer.end(len(pp))
+
+    #hourly total results for each plant type
+    if "plant_type" in output_files:
+        phase_timer.begin("plant_type")
+        with open(output_files["plant_type"], 'wb') as csvfile:
+            w = csv.writer(csvfile)
+            w.writerow(("Type", "Year", "Month", "Day", "Hour", "Load"))
+            type_load = load_totals.T.tolist()
+            for k, (t, m, d, h) in enumerate(grid.keys):
+                w.writerows((pp_type, t, m, d, h, load) for pp_type, load in
+                            zip(pp_types.values(), type_load[k]))
+        phase_timer.end(grid.num_hours * len(pp_types))
+
+    #individual plant commitment, 0,1 matrix for each plant
+    plant_arr = ["Year", "Month", "Day", "Hour"] + [p.name for p in pp]
+    if "plant_UC" in output_files:
+        phase_timer.begin("plant_UC")
+        with open(output_files["plant_UC"], 'wb') as csvfile:
+            w = csv.writer(csvfile)
+            w.writerow(plant_arr)
+            committed = (on + start).T.tolist()
+            for k, (t, m, d, h) in enumerate(grid.keys):
+                w.writerow([str(t+start_year), str(m), str(d), str(h)] +
+                           map(str, committed[k]))
+        phase_timer.end(grid.num_hours)
+
+    #individual plant generation for each plant
+    if "plant_GEN" in output_files:
+        phase_timer.begin("plant_GEN")
+        with open(output_files["plant_GEN"], 'wb') as csvfile:
+            w = csv.writer(csvfile)
+            w.writerow(plant_arr)
+            generated = gen.T.tolist()
+            for k, (t, m, d, h) in enumerate(grid.keys):
+                w.writerow([str(t+start_year), str(m), str(d), str(h)] +
+                           map(str, generated[k]))
+        phase_timer.end(grid.num_hours)
+
+    phase_timer.end()
+
     #these should match...
     print "Total load (MWh): %s (generated)\nPlant load (MWh): %s (demanded)" % ('{0:,.2f}'.format(total_load), '{0:,.2f}'.format(total_plant_load))
 
+    #store the solved scenario for identical runs
+    if use_result_cache:
+        result_cache.store(cache_key,
+                           {"on": on, "start": start, "gen": gen},
+                           {"obj_val": obj_val, "hc": hc,
+                            "total_load": total_load,
+                            "total_plant_load": total_plant_load,
+                            "optimal": bool(optimal)},
+                           output_files, cache_dir)
+        result_cache.evict(cache_dir, result_cache_max_mb,
+                           result_cache_max_days)
+
+    #record the run, pointing to its hourly arrays
+    if use_result_store:
+        arrays = None
+        if "columns" in output_files and hourly:
+            arrays = output_files["columns"]
+        elif use_result_cache:
+            arrays = result_cache.solution_file(cache_key, cache_dir)
+        settings = {"mip_gap": mip_gap, "solve_mode": solve_mode,
+                    "solver": solver,
+                    "uc_formulation": uc_formulation,
+                    "use_presolve": use_presolve,
+                    "must_run_types": must_run_types,
+                    "presolve_dominated": presolve_dominated,
+                    "rolling_window_days": rolling_window_days,
+                    "look_ahead_days": look_ahead_days,
+                    "annual_overlap_days": annual_overlap_days,
+                    "lagrangian_iterations": lagrangian_iterations,
+                    "cluster_key": cluster_key, "num_years": num_years,
+                    "months": months, "num_days": num_days,
+                    "params": dict((param, value) for param, value in
+                                   s.params.items() if param != "Threads")}
+        result_store.record(
+            base_dir + result_store.store_file,
+            {"model": "UC", "VSL": VSL_in, "BETA": BETA_in,
+             "health_cost_included": health_cost_included,
+             "start_year": start_year, "settings": settings,
+             "solve_mode": solve_mode, "mip_gap": mip_gap,
+             "obj_val": obj_val, "hc": hc, "total_load": total_load,
+             "total_plant_load": total_plant_load, "optimal": bool(optimal),
+             "time_stamp": s.time_stamp, "cache_key": cache_key,
+             "output_files": output_files, "arrays": arrays},
+            [(p.name, p.type, float(plant_load[i]), float(hc_arr[i]))
+             for i, p in enumerate(pp)])
+
 
     #check constraints
 #==============================================================================
@@ -1118,10 +1695,192 @@ try:
 #==============================================================================
 
     # Check optimization result
-    if mod.status != gp.GRB.status.OPTIMAL:
+    if not optimal:
         print 'Relaxation is infeasible'
     else:
         print "Optimal Solution Found."
 
-except gp.GurobiError as e:
-    print "Oops, gurobi error! \"%s, \" a.k.a. error #%s " % (e.message, e.errno)
\ No newline at end of file
+    return ScenarioResult(VSL_in, BETA_in, health_cost_included,
+                          start_year, obj_val, hc, total_load,
+                          total_plant_load, optimal, False, on, start, gen)
+
+
+#write the run report of s (result None if it wasn't solved, error the
+#solver error if one stopped it), stopping the phase timer
+def write_report(s, result, error=None):
+    timer = phase_timer.stop()
+    scenario = {"VSL": s.VSL_in, "BETA": s.BETA_in,
+                "health_cost_included": s.health_cost_included,
+                "start_year": s.start_year, "time_stamp": s.time_stamp,
+                "solve_mode": solve_mode, "solver": solver,
+                "mip_gap": mip_gap, "num_plants": len(s.pp),
+                "num_hours": scenario_grid(s.start_year).num_hours,
+                "cache_key": s.cache_key, "output_files": s.output_files,
+                "error": error}
+    if result is not None:
+        result = {"obj_val": float(result.obj_val), "hc": float(result.hc),
+                  "total_load": float(result.total_load),
+                  "total_plant_load": float(result.total_plant_load),
+                  "optimal": bool(result.optimal), "cached": result.cached}
+    if s.solution is not None:
+        stats = s.solution.stats()
+    else:
+        stats = run_report.solver_stats(s.mod)
+    run_report.write(s.report_file, "UC", scenario, result, timer, stats)
+
+
+#solve one scenario and write its output files, returns a ScenarioResult (None
+#after a solver error), arguments as for setup_scenario; with
+#write_run_report its phases are timed (along with those of a timer started
+#before, e.g. around load_inputs) and reported
+def run_scenario(inputs, VSL, BETA, health_cost_included, start_year,
+                 params=None, label=""):
+    if write_run_report and phase_timer.timer is None:
+        phase_timer.start()
+    phase_timer.begin("setup")
+    s = setup_scenario(inputs, VSL, BETA, health_cost_included, start_year,
+                       params, label)
+    phase_timer.end()
+    result = cached_result(s)
+    error = None
+
+    #########  optimize  #########
+    if result is None:
+        try:
+            phase_timer.begin("build")
+            build_model(s)
+            phase_timer.end()
+            phase_timer.begin("solve")
+            solve_model(s)
+            phase_timer.end()
+            phase_timer.begin("extract")
+            result = extract_results(s)
+            phase_timer.end()
+        except solver_backend.SolverError as e:
+            print "Oops, %s error! \"%s\"" % (solver, e)
+            error = str(e)
+        except solver_backend.gurobi_errors(solver) as e:
+            print "Oops, gurobi error! \"%s, \" a.k.a. error #%s " % (e.message, e.errno)
+            error = "%s (error #%s)" % (e.message, e.errno)
+    if write_run_report:
+        write_report(s, result, error)
+    return result
+
+
+
+#####################################
+########  Health cost points ########
+#####################################
+
+########    health cost model   ########
+#the (monolithic) model of one start year, built once and re-solved for
+#(VSL, BETA, health_cost_included) points: VSL and BETA scale the health cost
+#part of the z objective coefficients and health_cost_included switches it
+#on or off, so a new point is one bulk objective update and a warm solve
+class HealthCostModel:
+    def __init__(self, inputs, start_year, params=None):
+        self.start_year = start_year
+        grid = scenario_grid(start_year)
+        cost_adj = discount_factors(range(start_year, start_year + num_years))
+        #health costs per unit of VSL * BETA, as read by load_inputs
+        self.base = scenario_coefficients(inputs, inputs.pp, grid, cost_adj,
+                                          start_year, 1)
+        model_params = {"MIPGap": mip_gap}
+        model_params.update(params or {})
+        self.model = persistent_model.PersistentUC(self.base, model_params,
+                                                   "uc_%s" % start_year)
+
+    #solve a point (arguments as for run_scenario), returns a ScenarioResult
+    #without writing output files, or None if no solution was found
+    def solve(self, VSL, BETA, health_cost_included):
+        hc_scale = (VSL * 1000000) * (BETA / 10.0) #as in run_scenario
+        if health_cost_included == True:
+            FS_EMISSIONS = 1
+        else:
+            FS_EMISSIONS = 0.0
+        c = self.base.with_health_cost(hc_scale * self.base.health_cost,
+                                       FS_EMISSIONS)
+        self.model.update(c)
+        values, status = self.model.solve()
+        if values is None:
+            print "No solution found, gurobi status %s" % status
+            return None
+        return point_result(c, values, self.model.mod.objVal, status, VSL,
+                            BETA, health_cost_included, self.start_year)
+
+    def __str__(self):
+        return "Health cost model of %s: %s" % (self.start_year, self.model)
+
+
+#ScenarioResult (without output files) of the solution values (on, start,
+#shutdown, gen) of the coefficients c of a point, with the objective value
+#and gurobi status of its solve
+def point_result(c, values, obj_val, status, VSL, BETA, health_cost_included,
+                 start_year):
+    on, start, shutdown, gen = values
+    hc = float((gen * c.health_cost * c.disc[c.year][None, :]).sum())
+    return ScenarioResult(VSL, BETA, health_cost_included, start_year,
+                          obj_val, hc, float(c.load.sum()), float(gen.sum()),
+                          status == gp.GRB.status.OPTIMAL, False, on, start,
+                          gen)
+
+
+#solve the (monolithic) model of one (VSL, BETA, health_cost_included) point
+#for each of start_years on one model per calendar: between years with the
+#same days only the load right hand sides and the fuel, startup, variable
+#O&M and discounted generation objective coefficients change, and each year
+#starts from the commitment of the last year with the same days; a start
+#year whose grid has other days (e.g. February 29) gets a model of its own,
+#returns a ScenarioResult per year (without output files, None for years
+#without a solution)
+def run_years(inputs, VSL, BETA, health_cost_included, start_years,
+              params=None):
+    pp = scenario_plants(inputs.pp, (VSL * 1000000) * (BETA / 10.0))
+    if health_cost_included == True:
+        FS_EMISSIONS = 1
+    else:
+        FS_EMISSIONS = 0.0
+    model_params = {"MIPGap": mip_gap}
+    model_params.update(params or {})
+
+    models = {} #PersistentUC by the days of its grid
+    results = []
+    for start_year in start_years:
+        started = time.time()
+        grid = scenario_grid(start_year)
+        cost_adj = discount_factors(range(start_year, start_year + num_years))
+        c = scenario_coefficients(inputs, pp, grid, cost_adj, start_year,
+                                  FS_EMISSIONS)
+        day_keys = tuple(grid.day_keys)
+        model = models.get(day_keys)
+        if model is None:
+            model = persistent_model.PersistentUC(
+                c, model_params, "uc_years_%s" % (len(models) + 1))
+            models[day_keys] = model
+        else:
+            model.update(c)
+        values, status = model.solve("commitment")
+        if values is None:
+            print "Year %s: no solution found, gurobi status %s" % \
+                (start_year, status)
+            results.append(None)
+            continue
+        results.append(point_result(c, values, model.mod.objVal, status,
+                                    VSL, BETA, health_cost_included,
+                                    start_year))
+        print "Year %s: objective $%s, %.1f seconds" % \
+            (start_year, '{0:,.2f}'.format(model.mod.objVal),
+             time.time() - started)
+    for model in models.values():
+        print model
+    return results
+
+
+if __name__ == "__main__":
+    VSL, BETA, health_cost_included, start_year = check_arguments(argv)
+    if write_run_report:
+        phase_timer.start()
+    phase_timer.begin("inputs")
+    inputs = load_inputs(base_dir)
+    phase_timer.end()
+    run_scenario(inputs, VSL, BETA, health_cost_included, start_year)
\ No newline at end of file